@@ -9,6 +9,7 @@ from langchain_core.tools import Tool
 from ai.llm import get_google_model
 from ai.super_tool import create_super_tool
 from ai.rag_helper import RAGHelper
+from utils.db_routing import replica_reads
 import json
 import logging
 
@@ -150,7 +151,8 @@ def get_agent(authenticated_user=None):
                         "saraf_id": saraf_id
                     }, ensure_ascii=False)
                 
-                data = super_tool_instance.collect_all_data()
+                with replica_reads(authenticated_user):
+                    data = super_tool_instance.collect_all_data()
                 return json.dumps(data, ensure_ascii=False, indent=2)
                 
             except AttributeError as e:
@@ -0,0 +1,284 @@
+"""
+The shared embedding service behind ai.embeddings.EmbeddingServiceClient.
+
+One process (`manage.py run_embedding_service`) loads the model once and
+serves every worker over HTTP on localhost or a Unix socket:
+
+    POST /embed   {"texts": [...]}  ->  {"embeddings": [[...], ...], "model": ...}
+    GET  /health                    ->  {"model", "backend", "batches", "texts"}
+
+Requests are handled on threads, but all encoding goes through one
+EmbeddingBatcher. It waits up to MAX_WAIT_MS for other requests to arrive and
+encodes up to MAX_BATCH_SIZE texts in a single model call, so concurrent
+questions from several workers share one forward pass.
+
+Backends (EMBEDDING_SETTINGS['BACKEND']):
+
+- sentence-transformers: the model as published, on PyTorch.
+- onnx: the same model exported to ONNX Runtime with optimum. It is smaller
+  and faster on CPU, and does not need PyTorch once exported. QUANTIZE=True
+  applies dynamic int8 quantization. The vectors then differ slightly from
+  the fp32 ones the Pinecone index was built with, which is fine for
+  similarity search. The export is cached under ONNX_CACHE_DIR.
+- hash: deterministic vectors without a model, for tests and local runs.
+"""
+
+import hashlib
+import json
+import logging
+import math
+import os
+import queue
+import socketserver
+import threading
+import time
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import urlsplit
+
+logger = logging.getLogger(__name__)
+
+# Requests with more texts than this are rejected; indexing jobs should send chunks
+MAX_TEXTS_PER_REQUEST = 512
+
+
+class SentenceTransformerBackend:
+    name = 'sentence-transformers'
+
+    def __init__(self, model_name, **options):
+        from sentence_transformers import SentenceTransformer
+
+        self.model = SentenceTransformer(model_name, device='cpu')
+
+    def embed(self, texts):
+        return self.model.encode(texts, normalize_embeddings=True, batch_size=len(texts)).tolist()
+
+
+class ONNXBackend:
+    name = 'onnx'
+
+    def __init__(self, model_name, quantize=False, cache_dir=None, **options):
+        from optimum.onnxruntime import ORTModelForFeatureExtraction
+        from transformers import AutoTokenizer
+
+        path = Path(cache_dir or '.cache/onnx') / model_name.replace('/', '--')
+        file_name = 'model_quantized.onnx' if quantize else 'model.onnx'
+        if not (path / file_name).exists():
+            logger.info(f"Exporting {model_name} to ONNX in {path}")
+            model = ORTModelForFeatureExtraction.from_pretrained(model_name, export=True)
+            model.save_pretrained(path)
+            AutoTokenizer.from_pretrained(model_name).save_pretrained(path)
+            if quantize:
+                from optimum.onnxruntime import ORTQuantizer
+                from optimum.onnxruntime.configuration import AutoQuantizationConfig
+
+                quantizer = ORTQuantizer.from_pretrained(path, file_name='model.onnx')
+                quantizer.quantize(
+                    save_dir=path,
+                    quantization_config=AutoQuantizationConfig.avx2(is_static=False, per_channel=False),
+                )
+        self.name = 'onnx-int8' if quantize else 'onnx'
+        self.model = ORTModelForFeatureExtraction.from_pretrained(path, file_name=file_name)
+        self.tokenizer = AutoTokenizer.from_pretrained(path)
+
+    def embed(self, texts):
+        import numpy as np
+
+        inputs = self.tokenizer(texts, padding=True, truncation=True, max_length=128, return_tensors='np')
+        tokens = self.model(**inputs).last_hidden_state
+        # Mean pooling over real tokens, then L2 normalization, as sentence-transformers does for this model
+        mask = inputs['attention_mask'][..., None].astype(np.float32)
+        pooled = (tokens * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+        return pooled.tolist()
+
+
+class HashingBackend:
+    """Unit vectors derived from a hash of the text; no model, no semantics"""
+    name = 'hash'
+
+    def __init__(self, model_name=None, dimensions=16, delay=0.0, **options):
+        self.dimensions = dimensions
+        self.delay = delay
+        self.calls = []
+
+    def embed(self, texts):
+        self.calls.append(len(texts))
+        if self.delay:
+            time.sleep(self.delay)
+        vectors = []
+        for text in texts:
+            digest = hashlib.sha256(text.encode()).digest()
+            vector = [digest[i % len(digest)] - 127.5 for i in range(self.dimensions)]
+            norm = math.sqrt(sum(value * value for value in vector))
+            vectors.append([value / norm for value in vector])
+        return vectors
+
+
+BACKENDS = {
+    'sentence-transformers': SentenceTransformerBackend,
+    'onnx': ONNXBackend,
+    'hash': HashingBackend,
+}
+
+
+def load_backend(options):
+    name = options.get('BACKEND', 'sentence-transformers')
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown embedding backend {name!r}; choose one of {', '.join(BACKENDS)}")
+    return BACKENDS[name](
+        options['MODEL'],
+        quantize=options.get('QUANTIZE', False),
+        cache_dir=options.get('ONNX_CACHE_DIR'),
+    )
+
+
+class EmbeddingBatcher:
+    """Funnels concurrent embed() calls into batched backend calls on one thread"""
+
+    def __init__(self, backend, max_batch_size=32, max_wait=0.01):
+        self.backend = backend
+        self.max_batch_size = max(max_batch_size, 1)
+        self.max_wait = max_wait
+        self.batches = 0
+        self.texts = 0
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name='embedding-batcher', daemon=True)
+        self._thread.start()
+
+    def embed(self, texts, timeout=None):
+        future = Future()
+        self._queue.put((texts, future))
+        return future.result(timeout)
+
+    def stop(self):
+        self._queue.put(None)
+        self._thread.join()
+
+    def _collect(self, first):
+        batch = [first]
+        size = len(first[0])
+        deadline = time.monotonic() + self.max_wait
+        while size < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                # Finish this batch, then stop
+                self._queue.put(None)
+                break
+            batch.append(item)
+            size += len(item[0])
+        return batch
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            batch = self._collect(item)
+            texts = [text for item_texts, _ in batch for text in item_texts]
+            try:
+                vectors = self.backend.embed(texts)
+            except Exception as e:
+                logger.exception(f"Embedding a batch of {len(texts)} texts failed")
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            self.batches += 1
+            self.texts += len(texts)
+            offset = 0
+            for item_texts, future in batch:
+                future.set_result(vectors[offset:offset + len(item_texts)])
+                offset += len(item_texts)
+
+
+class EmbeddingRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def send_json(self, status, data):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path != '/health':
+            return self.send_json(404, {'error': 'Not found'})
+        batcher = self.server.batcher
+        self.send_json(200, {
+            'model': self.server.model_name,
+            'backend': batcher.backend.name,
+            'batches': batcher.batches,
+            'texts': batcher.texts,
+        })
+
+    def do_POST(self):
+        if self.path != '/embed':
+            return self.send_json(404, {'error': 'Not found'})
+        try:
+            payload = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+            texts = payload['texts']
+            if not isinstance(texts, list) or not all(isinstance(text, str) for text in texts):
+                raise ValueError('texts must be a list of strings')
+        except (ValueError, KeyError, TypeError) as e:
+            return self.send_json(400, {'error': str(e)})
+        if len(texts) > MAX_TEXTS_PER_REQUEST:
+            return self.send_json(413, {'error': f'At most {MAX_TEXTS_PER_REQUEST} texts per request'})
+        try:
+            embeddings = self.server.batcher.embed(texts, timeout=self.server.timeout_seconds)
+        except Exception as e:
+            return self.send_json(500, {'error': str(e)})
+        self.send_json(200, {'embeddings': embeddings, 'model': self.server.model_name})
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+
+class _ServiceMixin:
+    daemon_threads = True
+
+    def setup_service(self, batcher, model_name, timeout_seconds):
+        self.batcher = batcher
+        self.model_name = model_name
+        self.timeout_seconds = timeout_seconds
+
+
+class EmbeddingHTTPServer(_ServiceMixin, ThreadingHTTPServer):
+    pass
+
+
+class EmbeddingUnixServer(_ServiceMixin, socketserver.ThreadingUnixStreamServer):
+
+    def get_request(self):
+        request, _ = super().get_request()
+        # BaseHTTPRequestHandler expects a (host, port) client address
+        return request, ('unix', 0)
+
+    def server_close(self):
+        super().server_close()
+        if os.path.exists(self.server_address):
+            os.unlink(self.server_address)
+
+
+def create_server(url, batcher, model_name, timeout_seconds=30):
+    """Bind the service to http://host:port or unix:///path.sock"""
+    parts = urlsplit(url)
+    if parts.scheme == 'unix':
+        if os.path.exists(parts.path):
+            os.unlink(parts.path)
+        server = EmbeddingUnixServer(parts.path, EmbeddingRequestHandler)
+        os.chmod(parts.path, 0o660)
+    elif parts.scheme == 'http':
+        server = EmbeddingHTTPServer((parts.hostname, parts.port or 80), EmbeddingRequestHandler)
+    else:
+        raise ValueError(f"Unsupported embedding service URL: {url}")
+    server.setup_service(batcher, model_name, timeout_seconds)
+    return server
@@ -0,0 +1,109 @@
+"""
+Embeddings for RAG, served by the shared embedding service.
+
+Loading paraphrase-multilingual-mpnet-base-v2 costs about 1 GB of memory and
+several seconds, and used to happen in every worker that answered an AI
+question. EmbeddingServiceClient is a LangChain Embeddings that sends the
+text to `manage.py run_embedding_service` instead (ai.embedding_service),
+which holds the only copy of the model.
+
+EMBEDDING_SETTINGS['URL'] is http://host:port or unix:///path.sock. With an
+empty URL, get_embeddings() loads the model in this process as before.
+"""
+
+import http.client
+import json
+import logging
+import socket
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from langchain_core.embeddings import Embeddings
+
+from utils.metrics import external_call
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL = 'sentence-transformers/paraphrase-multilingual-mpnet-base-v2'
+
+
+def embedding_settings():
+    return getattr(settings, 'EMBEDDING_SETTINGS', {})
+
+
+class EmbeddingServiceError(Exception):
+    """The embedding service could not be reached or failed the request"""
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    """HTTPConnection over a Unix domain socket"""
+
+    def __init__(self, path, timeout=None):
+        super().__init__('localhost', timeout=timeout)
+        self.socket_path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+
+def open_connection(url, timeout=None):
+    parts = urlsplit(url)
+    if parts.scheme == 'unix':
+        return UnixHTTPConnection(parts.path, timeout=timeout)
+    if parts.scheme == 'http':
+        return http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=timeout)
+    raise ValueError(f"Unsupported embedding service URL: {url}")
+
+
+class EmbeddingServiceClient(Embeddings):
+    """LangChain embeddings computed by the shared embedding service"""
+
+    def __init__(self, url=None, timeout=None):
+        options = embedding_settings()
+        self.url = url or options['URL']
+        self.timeout = timeout or options.get('TIMEOUT', 10)
+
+    def request(self, method, path, payload=None):
+        connection = open_connection(self.url, timeout=self.timeout)
+        try:
+            with external_call('embedding'):
+                body = json.dumps(payload).encode() if payload is not None else None
+                connection.request(method, path, body=body, headers={'Content-Type': 'application/json'})
+                response = connection.getresponse()
+                data = json.loads(response.read() or b'{}')
+        except (OSError, http.client.HTTPException, ValueError) as e:
+            raise EmbeddingServiceError(f"Embedding service at {self.url} unavailable: {e}") from e
+        finally:
+            connection.close()
+        if response.status != 200:
+            raise EmbeddingServiceError(f"Embedding service error {response.status}: {data.get('error', '')}")
+        return data
+
+    def embed_documents(self, texts):
+        if not texts:
+            return []
+        return self.request('POST', '/embed', {'texts': list(texts)})['embeddings']
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+    def health(self):
+        return self.request('GET', '/health')
+
+
+def get_embeddings():
+    """The embeddings RAGHelper uses: the shared service, or an in-process model when no URL is set"""
+    options = embedding_settings()
+    if options.get('URL'):
+        return EmbeddingServiceClient()
+
+    from langchain_huggingface import HuggingFaceEmbeddings
+
+    logger.info("EMBEDDING_SETTINGS['URL'] is empty; loading the embedding model in this worker")
+    return HuggingFaceEmbeddings(
+        model_name=options.get('MODEL', DEFAULT_MODEL),
+        model_kwargs={'device': 'cpu'},
+        encode_kwargs={'normalize_embeddings': True}
+    )
@@ -3,14 +3,17 @@ LLM module for Google Generative AI integration
 Includes workaround for known finish_reason enum bug
 """
 
+from langchain_core.callbacks import BaseCallbackHandler
 from langchain_google_genai import ChatGoogleGenerativeAI
 from django.conf import settings
 import logging
+import time
+
+from utils.metrics import record_external
 
 logger = logging.getLogger(__name__)
 
-# Apply the workaround immediately when module is imported
-# This ensures the patch is active before any model is created
+# Set once the workaround below has been applied (by the first get_google_model() call)
 _PATCH_APPLIED = False
 
 # Workaround for langchain-google-genai finish_reason bug
@@ -120,8 +123,32 @@ def _patch_finish_reason_bug():
         logger.warning(f"Could not apply finish_reason bug workaround: {str(e)}")
         return False
 
-# Apply patch immediately on module import
-_patch_finish_reason_bug()
+
+class LLMCallTimer(BaseCallbackHandler):
+    """Report each model call (not the tools between them) to utils.metrics as an external call"""
+    # Run in the caller's context, where the request being measured is set
+    run_inline = True
+
+    def __init__(self, service='gemini'):
+        self.service = service
+        self._started = {}
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        self._started[run_id] = time.perf_counter()
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+        self._started[run_id] = time.perf_counter()
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        self._finish(run_id, 'ok')
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._finish(run_id, 'error')
+
+    def _finish(self, run_id, outcome):
+        started = self._started.pop(run_id, None)
+        if started is not None:
+            record_external(self.service, time.perf_counter() - started, outcome)
 
 
 def get_google_model(model="gemini-2.5-flash"):
@@ -130,7 +157,7 @@ def get_google_model(model="gemini-2.5-flash"):
     
     Note: There's a known bug in langchain-google-genai where finish_reason
     can be an integer (10) instead of an enum, causing AttributeError.
-    This is handled with a monkey-patch workaround applied at module import.
+    This is handled with a monkey-patch workaround applied before the first model is created.
     
     Args:
         model: Model name to use
@@ -138,9 +165,7 @@ def get_google_model(model="gemini-2.5-flash"):
     Returns:
         ChatGoogleGenerativeAI instance
     """
-    # Patch is already applied at module import time
     if not _PATCH_APPLIED:
-        logger.warning("Finish reason bug patch was not applied, attempting to apply now...")
         _patch_finish_reason_bug()
     
     api_key_from_settings = settings.GEMINI_API_KEY 
@@ -159,7 +184,8 @@ def get_google_model(model="gemini-2.5-flash"):
             max_tokens=None,
             timeout=None,
             max_retries=2,
-            api_key=api_key_from_settings 
+            api_key=api_key_from_settings,
+            callbacks=[LLMCallTimer()],
         )
         logger.info(f"Google GenAI model initialized: {model}")
         return model_instance
@@ -0,0 +1,68 @@
+import signal
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ai.embedding_service import BACKENDS, EmbeddingBatcher, create_server, load_backend
+from ai.embeddings import embedding_settings
+
+
+class Command(BaseCommand):
+    help = 'Serve RAG embeddings to every worker from one copy of the model'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--url',
+            help="Address to listen on, http://host:port or unix:///path.sock "
+                 "(default: EMBEDDING_SETTINGS['URL'])",
+        )
+        parser.add_argument(
+            '--backend',
+            choices=sorted(BACKENDS),
+            help="Model backend (default: EMBEDDING_SETTINGS['BACKEND'])",
+        )
+        parser.add_argument(
+            '--quantize',
+            action='store_true',
+            help='With the onnx backend, use a dynamically int8-quantized model',
+        )
+
+    def handle(self, *args, **options):
+        settings = dict(embedding_settings())
+        url = options['url'] or settings.get('URL')
+        if not url:
+            raise CommandError("Set EMBEDDING_SERVICE_URL or pass --url")
+        if options['backend']:
+            settings['BACKEND'] = options['backend']
+        if options['quantize']:
+            settings['QUANTIZE'] = True
+
+        started = time.monotonic()
+        backend = load_backend(settings)
+        self.stdout.write(
+            f"Loaded {settings['MODEL']} ({backend.name}) in {time.monotonic() - started:.1f}s"
+        )
+        batcher = EmbeddingBatcher(
+            backend,
+            max_batch_size=settings.get('MAX_BATCH_SIZE', 32),
+            max_wait=settings.get('MAX_WAIT_MS', 10) / 1000,
+        )
+        server = create_server(url, batcher, settings['MODEL'], timeout_seconds=settings.get('TIMEOUT', 10) * 3)
+
+        self.running = True
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        self.stdout.write(self.style.SUCCESS(f"Embedding service listening on {url}"))
+        while self.running and thread.is_alive():
+            time.sleep(0.5)
+
+        server.shutdown()
+        server.server_close()
+        batcher.stop()
+        self.stdout.write(self.style.WARNING('Embedding service stopped'))
+
+    def stop(self, signum, frame):
+        self.running = False
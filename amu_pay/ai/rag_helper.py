@@ -7,9 +7,8 @@ import logging
 import os
 from typing import List, Optional
 from decouple import config
-from pinecone import Pinecone
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_pinecone import PineconeVectorStore
+
+from utils.metrics import external_call
 
 logger = logging.getLogger(__name__)
 
@@ -34,6 +33,10 @@ class RAGHelper:
             return
         
         try:
+            from langchain_pinecone import PineconeVectorStore
+
+            from ai.embeddings import get_embeddings
+
             logger.info("Initializing RAG Helper...")
             
             # Explicitly check environment variable
@@ -41,12 +44,8 @@ class RAGHelper:
                 logger.error("Pinecone API key not found in environment variables")
                 return
             
-            # Initialize embeddings
-            cls._embeddings = HuggingFaceEmbeddings(
-                model_name="sentence-transformers/paraphrase-multilingual-mpnet-base-v2",
-                model_kwargs={'device': 'cpu'},
-                encode_kwargs={'normalize_embeddings': True}
-            )
+            # Initialize embeddings (the shared embedding service, see ai.embeddings)
+            cls._embeddings = get_embeddings()
             
             # Initialize Pinecone
             api_key = config('PINECONE_API_KEY')
@@ -93,7 +92,9 @@ class RAGHelper:
             
             # Perform similarity search
             logger.info(f"Searching Pinecone for query: '{query}'")
-            docs = cls._vector_store.similarity_search(query, k=top_k)
+            # Includes embedding the query, which is also timed on its own as 'embedding'
+            with external_call('pinecone'):
+                docs = cls._vector_store.similarity_search(query, k=top_k)
             
             if not docs:
                 logger.warning(f"No relevant documentation found for query: '{query}'")
@@ -1,3 +1,89 @@
-from django.test import TestCase
+import os
+import tempfile
+import threading
+from unittest import mock
 
-# Create your tests here.
+from django.test import SimpleTestCase, override_settings
+
+from .embedding_service import EmbeddingBatcher, HashingBackend, create_server
+from .embeddings import EmbeddingServiceClient, EmbeddingServiceError, get_embeddings
+
+
+class EmbeddingBatcherTests(SimpleTestCase):
+    """Concurrent requests share model calls"""
+
+    def test_concurrent_requests_are_batched(self):
+        backend = HashingBackend(delay=0.05)
+        batcher = EmbeddingBatcher(backend, max_batch_size=32, max_wait=0.05)
+        self.addCleanup(batcher.stop)
+
+        results = {}
+
+        def embed(number):
+            results[number] = batcher.embed([f'question {number}', f'context {number}'])
+
+        threads = [threading.Thread(target=embed, args=(number,)) for number in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertLess(len(backend.calls), 8)
+        self.assertEqual(sum(backend.calls), 16)
+        expected = HashingBackend()
+        for number, vectors in results.items():
+            self.assertEqual(vectors, expected.embed([f'question {number}', f'context {number}']))
+
+    def test_backend_errors_reach_the_caller(self):
+        backend = HashingBackend()
+        batcher = EmbeddingBatcher(backend, max_wait=0.001)
+        self.addCleanup(batcher.stop)
+        with mock.patch.object(backend, 'embed', side_effect=RuntimeError('out of memory')):
+            with self.assertRaisesMessage(RuntimeError, 'out of memory'):
+                batcher.embed(['a'])
+
+
+class EmbeddingServiceTests(SimpleTestCase):
+    """The service over a Unix socket and localhost HTTP, through the client"""
+
+    def start(self, url):
+        batcher = EmbeddingBatcher(HashingBackend(), max_wait=0.001)
+        server = create_server(url, batcher, 'test-model')
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(batcher.stop)
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        return server
+
+    def test_unix_socket_round_trip(self):
+        path = os.path.join(tempfile.mkdtemp(), 'embeddings.sock')
+        self.start(f'unix://{path}')
+        client = EmbeddingServiceClient(f'unix://{path}')
+
+        vectors = client.embed_documents(['how do I send a hawala?', 'exchange rates'])
+        self.assertEqual(vectors, HashingBackend().embed(['how do I send a hawala?', 'exchange rates']))
+        self.assertEqual(client.embed_query('exchange rates'), vectors[1])
+        self.assertEqual(client.embed_documents([]), [])
+        health = client.health()
+        self.assertEqual((health['model'], health['backend'], health['texts']), ('test-model', 'hash', 3))
+
+    def test_http_errors_and_unreachable_service(self):
+        server = self.start('http://127.0.0.1:0')
+        url = f'http://127.0.0.1:{server.server_address[1]}'
+        client = EmbeddingServiceClient(url)
+        self.assertEqual(len(client.embed_query('balance')), 16)
+        with self.assertRaisesMessage(EmbeddingServiceError, '400'):
+            client.request('POST', '/embed', {'texts': 'not a list'})
+
+        server.shutdown()
+        server.server_close()
+        with self.assertRaises(EmbeddingServiceError):
+            EmbeddingServiceClient(url, timeout=1).embed_query('balance')
+
+    def test_rag_embeddings_use_the_service_when_configured(self):
+        with override_settings(EMBEDDING_SETTINGS={'URL': 'unix:///tmp/embeddings.sock'}):
+            self.assertIsInstance(get_embeddings(), EmbeddingServiceClient)
+        with override_settings(EMBEDDING_SETTINGS={'URL': '', 'MODEL': 'local-model'}):
+            with mock.patch('langchain_huggingface.HuggingFaceEmbeddings') as local:
+                self.assertIs(get_embeddings(), local.return_value)
+        self.assertEqual(local.call_args.kwargs['model_name'], 'local-model')
@@ -9,51 +9,51 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
-from django.core.cache import cache
-import json
+from asgiref.sync import sync_to_async
 import logging
 
-# Load settings first to ensure environment variables are set
-from amu_pay import settings
-
-# Now import AI components that require environment variables
-from ai.rag_helper import get_documentation_context
-from ai.agent import get_agent
 from saraf_account.authentication import SarafJWTAuthentication
+from utils.async_views import AsyncAPIView
+from utils.cache import CacheNamespace
 
 logger = logging.getLogger(__name__)
 
+# Conversation memory lives in the shared cache so every worker sees the same history
+ai_memory = CacheNamespace('ai_memory', timeout=3600)  # 1 hour memory
+
 
-class AIChatView(APIView):
+class AIChatView(AsyncAPIView):
     """
     Simple chat endpoint with 10 message memory.
     No data collection - just conversation with LLM.
+    Async: the Gemini and Pinecone round trips do not hold a worker; the
+    agent's sync tools (ORM queries) run in a thread pool.
     """
     authentication_classes = [SarafJWTAuthentication]
     permission_classes = [IsAuthenticated]
     
-    def _get_memory_key(self, saraf_id):
-        """Generate cache key for conversation memory"""
-        return f"ai_memory_{saraf_id}"
-    
     def _get_conversation_history(self, saraf_id):
         """Get last 10 messages from memory buffer"""
-        memory_key = self._get_memory_key(saraf_id)
-        history = cache.get(memory_key, [])
+        history = ai_memory.get(saraf_id, [])
         return history[-10:] if history else []
     
+    def _get_agent(self, authenticated_user):
+        # The agent pulls in langchain, langgraph, Gemini and Pinecone, so it is
+        # imported on the first chat request rather than when URLs load
+        from ai.agent import get_agent
+        return get_agent(authenticated_user)
+
     def _save_to_memory(self, saraf_id, user_msg, ai_msg):
         """Save conversation to memory buffer"""
-        memory_key = self._get_memory_key(saraf_id)
-        history = cache.get(memory_key, [])
+        history = ai_memory.get(saraf_id, [])
         history.append({"role": "user", "content": user_msg})
         history.append({"role": "assistant", "content": ai_msg})
         # Keep last 20 messages (10 exchanges)
         if len(history) > 20:
             history = history[-20:]
-        cache.set(memory_key, history, timeout=3600)  # 1 hour memory
+        ai_memory.set(saraf_id, history)
     
-    def post(self, request):
+    async def post(self, request):
         """
         Process user query using Agent with dual tools.
         Agent automatically chooses between:
@@ -75,7 +75,7 @@ class AIChatView(APIView):
                               status=status.HTTP_400_BAD_REQUEST)
             
             # Get conversation history
-            history = self._get_conversation_history(saraf_id)
+            history = await sync_to_async(self._get_conversation_history)(saraf_id)
             
             # Build context with history
             messages = []
@@ -103,7 +103,7 @@ class AIChatView(APIView):
             
             # Create agent with dual tools
             try:
-                agent = get_agent(authenticated_user)
+                agent = await sync_to_async(self._get_agent)(authenticated_user)
             except Exception as e:
                 logger.error(f"Error creating agent: {str(e)}", exc_info=True)
                 return Response({'error': f'Agent creation failed: {str(e)}'}, 
@@ -111,7 +111,7 @@ class AIChatView(APIView):
             
             # Invoke agent
             try:
-                result = agent.invoke({
+                result = await agent.ainvoke({
                     "messages": messages
                 })
             except AttributeError as e:
@@ -127,7 +127,7 @@ class AIChatView(APIView):
                         'technical_details': 'finish_reason enum conversion error in langchain-google-genai'
                     }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
                 else:
-                    logger.error(f"AttributeError in agent.invoke: {error_msg}", exc_info=True)
+                    logger.error(f"AttributeError in agent.ainvoke: {error_msg}", exc_info=True)
                     return Response({'error': f'Agent invocation error: {error_msg}'}, 
                                   status=status.HTTP_500_INTERNAL_SERVER_ERROR)
             
@@ -146,7 +146,7 @@ class AIChatView(APIView):
             logger.info(f"Response preview: {response_preview}...")
             
             # Save to memory buffer
-            self._save_to_memory(saraf_id, query, ai_response)
+            await sync_to_async(self._save_to_memory)(saraf_id, query, ai_response)
             
             logger.info(f"✅ Query processed successfully for saraf_id {saraf_id}")
             
@@ -173,8 +173,7 @@ class ClearMemoryView(APIView):
                 return Response({'error': 'Saraf ID not found'}, 
                               status=status.HTTP_400_BAD_REQUEST)
             
-            memory_key = f"ai_memory_{saraf_id}"
-            cache.delete(memory_key)
+            ai_memory.delete(saraf_id)
             logger.info(f"Memory cleared for saraf_id {saraf_id}")
             
             return Response({'message': 'Memory cleared successfully'})
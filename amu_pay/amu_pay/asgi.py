@@ -11,6 +11,9 @@ import os
 
 from django.core.asgi import get_asgi_application
 
+from utils.static_files import StaticRootHandler
+
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'amu_pay.settings')
 
-application = get_asgi_application()
+# Static files outside the middleware chain, which must stay async (see utils.static_files)
+application = StaticRootHandler(get_asgi_application())
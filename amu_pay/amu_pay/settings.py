@@ -12,25 +12,43 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 
 from pathlib import Path
 import os
+import tempfile
+import warnings
 from datetime import timedelta
 
-# --- STORAGE BACKENDS (must be before any Django imports) -------------
+# --- STORAGE BACKENDS ------------------------------------------------
+# Resolved lazily by django.core.files.storage on first use (see STORAGES below)
 from decouple import config
 USE_S3 = config('USE_S3', default=True, cast=bool)
 USE_S3_FOR_STATIC = config('USE_S3_FOR_STATIC', default=False, cast=bool)
+# Store uploads once per distinct content under cas/<sha256> (see amu_pay.storage_backends)
+MEDIA_CONTENT_ADDRESSED = config('MEDIA_CONTENT_ADDRESSED', default=True, cast=bool)
 
 if USE_S3:
-    DEFAULT_FILE_STORAGE = 'amu_pay.storage_backends.MediaStorage'
+    DEFAULT_FILE_STORAGE = (
+        'amu_pay.storage_backends.ContentAddressedMediaStorage'
+        if MEDIA_CONTENT_ADDRESSED
+        else 'amu_pay.storage_backends.MediaStorage'
+    )
     STATICFILES_STORAGE = (
         'amu_pay.storage_backends.StaticStorage'
         if USE_S3_FOR_STATIC
         else 'whitenoise.storage.CompressedManifestStaticFilesStorage'
     )
 else:
-    DEFAULT_FILE_STORAGE = 'django.core.files.storage.FileSystemStorage'
+    DEFAULT_FILE_STORAGE = (
+        'amu_pay.storage_backends.ContentAddressedFileSystemStorage'
+        if MEDIA_CONTENT_ADDRESSED
+        else 'django.core.files.storage.FileSystemStorage'
+    )
     STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 
-# AWS S3 Configuration (must come BEFORE default_storage rebuild)
+STORAGES = {
+    'default': {'BACKEND': DEFAULT_FILE_STORAGE},
+    'staticfiles': {'BACKEND': STATICFILES_STORAGE},
+}
+
+# AWS S3 Configuration
 AWS_ACCESS_KEY_ID = config('AWS_ACCESS_KEY_ID')
 AWS_SECRET_ACCESS_KEY = config('AWS_SECRET_ACCESS_KEY')
 AWS_STORAGE_BUCKET_NAME = config('AWS_STORAGE_BUCKET_NAME')
@@ -44,13 +62,7 @@ AWS_S3_CUSTOM_DOMAIN = config('AWS_S3_CUSTOM_DOMAIN', default=None)
 # Public URL settings for media files when using S3
 MEDIA_URL = f'https://{AWS_STORAGE_BUCKET_NAME}.s3.{AWS_S3_REGION_NAME}.amazonaws.com/media/'
 
-# Force Django to rebuild default_storage with the new backend (AFTER AWS config)
-from django.core.files.storage import default_storage
-from django.utils.module_loading import import_string
-default_storage._wrapped = import_string(DEFAULT_FILE_STORAGE)()
-
-
-from decouple import config, Csv
+from decouple import Csv
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -125,6 +137,10 @@ INSTALLED_APPS = [
     'exchange',
     'saraf_post',
     'user_feedback',
+    'media_uploads',
+    'outbound',
+    'ai',
+    'utils',  # Shared modules; also holds the benchmark and profiling commands
     'rest_framework',
     'rest_framework_simplejwt',
     'storages',  # AWS S3 storage backend
@@ -140,16 +156,21 @@ INSTALLED_APPS = [
 
 
 MIDDLEWARE = [
+    'utils.metrics.MetricsMiddleware',  # First, so it times everything below
+    'utils.profiling.ProfilingMiddleware',  # Only requests with X-Profile-Token
     'corsheaders.middleware.CorsMiddleware',  # Re-enabled for CORS support
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',  # For static files in production
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'utils.db_routing.ReplicaStickinessMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
+# Every middleware must be async-capable, or Django adapts the chain and runs
+# each ASGI request under async_to_sync. Static files are served outside it
+# (nginx, utils.static_files, or WhiteNoise in amu_pay.wsgi).
 
 ROOT_URLCONF = 'amu_pay.urls'
 
@@ -220,7 +241,6 @@ if db_use_ssl:
     if ssl_ca and os.path.exists(ssl_ca):
         # Use specified CA certificate path
         database_options['ssl'] = {'ca': ssl_ca}
-        print(f"Using SSL with CA certificate: {ssl_ca}")
     elif ssl_ca:
         # CA path specified but file doesn't exist - this is likely the problem!
         raise FileNotFoundError(
@@ -237,15 +257,13 @@ if db_use_ssl:
         )
     else:
         # SSL enabled but no CA provided - this will likely fail
-        print("⚠️  WARNING: DB_USE_SSL=True but no DB_SSL_CA specified!")
-        print("   This will likely cause SSL certificate verification errors.")
-        print("   Either:")
-        print("   1. Set DB_USE_SSL=False in .env, OR")
-        print("   2. Download RDS CA bundle and set DB_SSL_CA")
+        warnings.warn(
+            "DB_USE_SSL=True but no DB_SSL_CA specified; this will likely cause SSL certificate "
+            "verification errors. Set DB_USE_SSL=False in .env, or download the RDS CA bundle "
+            "and set DB_SSL_CA."
+        )
         # Try without CA (will likely fail, but let's try)
         database_options['ssl'] = {}
-else:
-    print("ℹ️  SSL is disabled (DB_USE_SSL=False)")
 
 # Database connection settings
 DATABASES = {
@@ -273,6 +291,28 @@ if not DATABASES['default']['USER'] or not DATABASES['default']['PASSWORD']:
         "  DB_HOST=amupaydb.cxea220s03us.eu-north-1.rds.amazonaws.com"
     )
 
+# Read replicas (utils.db_routing): one alias per host in DB_REPLICA_HOSTS, with the
+# primary's credentials. Only views decorated with @read_replica read from them;
+# all writes, and any read that should see them, go to 'default'
+DB_REPLICA_HOSTS = config('DB_REPLICA_HOSTS', default='', cast=Csv())
+for index, replica_host in enumerate(DB_REPLICA_HOSTS):
+    DATABASES[f'replica_{index}'] = {
+        **DATABASES['default'],
+        'HOST': replica_host,
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['utils.db_routing.ReplicaRouter']
+DATABASE_REPLICA_SETTINGS = {
+    'REPLICAS': [alias for alias in DATABASES if alias.startswith('replica_')],
+    # A replica further behind than this is skipped until it catches up
+    'MAX_LAG_SECONDS': config('DB_REPLICA_MAX_LAG_SECONDS', default=5, cast=int),
+    'LAG_CHECK_INTERVAL': config('DB_REPLICA_LAG_CHECK_INTERVAL', default=5, cast=int),
+    # After a write, the user's replica reads go to the primary for this long.
+    # Keep it at least MAX_LAG_SECONDS + LAG_CHECK_INTERVAL
+    'STICKY_SECONDS': config('DB_REPLICA_STICKY_SECONDS', default=10, cast=int),
+}
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -389,6 +429,123 @@ MESSAGE_SETTINGS = {
     'ALLOWED_AUDIO_TYPES': ['mp3', 'wav', 'm4a', 'aac'],
     'MESSAGE_RETENTION_DAYS': config('MESSAGE_RETENTION_DAYS', default=365, cast=int),
     'ENABLE_IN_APP_NOTIFICATIONS': config('ENABLE_IN_APP_NOTIFICATIONS', default=True, cast=bool),
+    # Notifications/audit/push for sent messages run in `manage.py run_message_fanout`;
+    # set to False to process them right after the send commits (no worker needed)
+    'ASYNC_FANOUT': config('MESSAGE_ASYNC_FANOUT', default=True, cast=bool),
+    'FANOUT_MAX_ATTEMPTS': config('MESSAGE_FANOUT_MAX_ATTEMPTS', default=5, cast=int),
+}
+
+# Shared cache tier (see utils.cache). Every gunicorn worker and background worker must
+# see the same cache: Redis when REDIS_URL is set, otherwise a file cache on this host
+# (CACHE_BACKEND=locmem gives a per-process cache, for tests only)
+REDIS_URL = config('REDIS_URL', default='')
+CACHE_BACKEND = config('CACHE_BACKEND', default='redis' if REDIS_URL else 'file')
+if CACHE_BACKEND == 'redis':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+            'KEY_PREFIX': 'amu_pay',
+            'TIMEOUT': 300,
+            'OPTIONS': {
+                'socket_connect_timeout': 2,
+                'socket_timeout': 2,
+            },
+        }
+    }
+elif CACHE_BACKEND == 'locmem':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'KEY_PREFIX': 'amu_pay',
+            'TIMEOUT': 300,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': config('CACHE_FILE_LOCATION', default=str(BASE_DIR / '.cache')),
+            'KEY_PREFIX': 'amu_pay',
+            'TIMEOUT': 300,
+            'OPTIONS': {'MAX_ENTRIES': 10000},
+        }
+    }
+
+# Presigned direct-to-storage uploads (media_uploads app)
+# 's3' presigns POSTs against the MediaStorage bucket; 'local' uses a signed URL on this server
+DIRECT_UPLOAD_SETTINGS = {
+    'BACKEND': config('DIRECT_UPLOAD_BACKEND', default='s3' if USE_S3 else 'local'),
+    'SLOT_EXPIRY_SECONDS': config('DIRECT_UPLOAD_SLOT_EXPIRY_SECONDS', default=900, cast=int),
+}
+
+# Thumbnail/medium variants of uploaded images (media_uploads.variants)
+# Rendered by `manage.py run_image_variants`; set IMAGE_VARIANT_ASYNC=False to render right after the upload commits
+IMAGE_VARIANT_SETTINGS = {
+    'ASYNC': config('IMAGE_VARIANT_ASYNC', default=True, cast=bool),
+    'FORMAT': config('IMAGE_VARIANT_FORMAT', default='WEBP'),  # WEBP or JPEG
+    'QUALITY': config('IMAGE_VARIANT_QUALITY', default=80, cast=int),
+    'SIZES': {'thumbnail': 256, 'medium': 1024},  # longest edge in pixels
+    'MAX_SOURCE_PIXELS': 50_000_000,
+    'MAX_ATTEMPTS': 5,
+}
+
+# Outbound email/SMS/WhatsApp (outbound.queue), delivered by `manage.py run_outbound_notifications`.
+# Set ASYNC_DELIVERY to False to send right after the request commits (no worker needed).
+# CONCURRENCY caps simultaneous sends per provider across all workers; the fake
+# providers (outbound.fakes.FakeSMTPProvider / FakeTwilioProvider) deliver offline
+OUTBOUND_SETTINGS = {
+    'ASYNC_DELIVERY': config('OUTBOUND_ASYNC_DELIVERY', default=True, cast=bool),
+    'MAX_ATTEMPTS': config('OUTBOUND_MAX_ATTEMPTS', default=5, cast=int),
+    'CONCURRENCY': {
+        'smtp': config('OUTBOUND_SMTP_CONCURRENCY', default=4, cast=int),
+        'twilio': config('OUTBOUND_TWILIO_CONCURRENCY', default=8, cast=int),
+    },
+    # Pooled clients (outbound.clients): probe an SMTP connection idle this long
+    # before reuse, and rebuild the Twilio HTTP session after this long unused
+    'SMTP_IDLE_SECONDS': config('OUTBOUND_SMTP_IDLE_SECONDS', default=30, cast=int),
+    'HTTP_IDLE_SECONDS': config('OUTBOUND_HTTP_IDLE_SECONDS', default=60, cast=int),
+    'PROVIDERS': {
+        'smtp': config('OUTBOUND_SMTP_PROVIDER', default='outbound.providers.SMTPProvider'),
+        'twilio': config('OUTBOUND_TWILIO_PROVIDER', default='outbound.providers.TwilioProvider'),
+    },
+}
+
+# Saraf dashboard snapshot (saraf_account.dashboard), cached per saraf and section.
+# Writes drop the sections they affect; the short timeout bounds anything else
+DASHBOARD_SETTINGS = {
+    'CACHE_TIMEOUT': config('DASHBOARD_CACHE_TIMEOUT', default=30, cast=int),
+    'RECENT_ITEMS': 5,
+}
+
+# Per-request metrics (utils.metrics), served in Prometheus format at /metrics.
+# Every process writes its histograms under DIR and /metrics merges them, so DIR
+# must be shared by all gunicorn workers (and may be shared by the worker containers).
+# /metrics answers requests from ALLOWED_NETWORKS that did not come through nginx,
+# or with `Authorization: Bearer <TOKEN>`
+METRICS_SETTINGS = {
+    'ENABLED': config('METRICS_ENABLED', default=True, cast=bool),
+    'DIR': config('METRICS_DIR', default=os.path.join(tempfile.gettempdir(), 'amu_pay_metrics')),
+    'FLUSH_INTERVAL': config('METRICS_FLUSH_INTERVAL', default=5, cast=int),
+    'TOKEN': config('METRICS_TOKEN', default=''),
+    'ALLOWED_NETWORKS': config(
+        'METRICS_ALLOWED_NETWORKS',
+        default='127.0.0.0/8,::1/128,10.0.0.0/8,172.16.0.0/12,192.168.0.0/16',
+        cast=Csv(),
+    ),
+    # Requests slower than this are logged to logs/performance.log
+    'SLOW_REQUEST_SECONDS': config('SLOW_REQUEST_SECONDS', default=2.0, cast=float),
+}
+
+# On-demand request profiling (utils.profiling). Requests with an
+# X-Profile-Token header from `manage.py profiling_token` are profiled and their
+# reports kept under DIR (the newest KEEP), downloadable at /profiles/.
+PROFILING_SETTINGS = {
+    'ENABLED': config('PROFILING_ENABLED', default=True, cast=bool),
+    'DIR': config('PROFILING_DIR', default=os.path.join(tempfile.gettempdir(), 'amu_pay_profiles')),
+    'KEEP': config('PROFILING_KEEP', default=100, cast=int),
+    # EXPLAIN plans for this many of the slowest SELECT statements
+    'EXPLAIN_SLOWEST': config('PROFILING_EXPLAIN_SLOWEST', default=5, cast=int),
 }
 
 # AI Integration
@@ -397,6 +554,22 @@ os.environ["PINECONE_API_KEY"] = PINECONE_API_KEY
 GEMINI_API_KEY = config('GEMINI_API_KEY', default=None)
 PINECONE_INDEX_NAME = config('PINECONE_INDEX_NAME', default='amu-pay-docs')
 
+# Shared embedding service (ai.embedding_service, `manage.py run_embedding_service`):
+# one process holds the model and batches requests from every worker. URL is
+# http://host:port or unix:///path.sock; empty (the default) loads the model in each
+# worker instead; the compose files set it for their embedding_service container.
+# BACKEND is sentence-transformers, onnx (QUANTIZE for int8) or hash (tests)
+EMBEDDING_SETTINGS = {
+    'URL': config('EMBEDDING_SERVICE_URL', default=''),
+    'MODEL': config('EMBEDDING_MODEL', default='sentence-transformers/paraphrase-multilingual-mpnet-base-v2'),
+    'BACKEND': config('EMBEDDING_BACKEND', default='sentence-transformers'),
+    'QUANTIZE': config('EMBEDDING_QUANTIZE', default=False, cast=bool),
+    'ONNX_CACHE_DIR': config('EMBEDDING_ONNX_CACHE_DIR', default=str(BASE_DIR / '.cache' / 'onnx')),
+    'MAX_BATCH_SIZE': config('EMBEDDING_MAX_BATCH_SIZE', default=32, cast=int),
+    'MAX_WAIT_MS': config('EMBEDDING_MAX_WAIT_MS', default=10, cast=int),
+    'TIMEOUT': config('EMBEDDING_TIMEOUT', default=10, cast=int),
+}
+
 # AWS S3 Configuration (read securely from environment variables)
 AWS_ACCESS_KEY_ID = config('AWS_ACCESS_KEY_ID')
 AWS_SECRET_ACCESS_KEY = config('AWS_SECRET_ACCESS_KEY')
@@ -426,7 +599,13 @@ if USE_S3 and (not AWS_ACCESS_KEY_ID or not AWS_SECRET_ACCESS_KEY or not AWS_STO
 
 # S3 Object Parameters
 AWS_S3_OBJECT_PARAMETERS = {
-    'CacheControl': 'max-age=86400',  # Cache for 1 day
+    'CacheControl': 'max-age=86400',  # Cache for 1 day (content-addressed objects use a year, immutable)
+}
+
+# Content-addressed media: PUBLIC_URLS serves cas/ objects without signatures so their
+# URLs never change (needs a bucket policy allowing public reads of media/cas/*)
+MEDIA_STORAGE_SETTINGS = {
+    'PUBLIC_URLS': config('MEDIA_CAS_PUBLIC_URLS', default=False, cast=bool),
 }
 
 # Production logging configuration
@@ -454,6 +633,12 @@ LOGGING = {
             'filename': BASE_DIR / 'logs' / 'django.log',
             'formatter': 'verbose',
         },
+        'performance': {
+            'level': 'WARNING',
+            'class': 'logging.FileHandler',
+            'filename': BASE_DIR / 'logs' / 'performance.log',
+            'formatter': 'verbose',
+        },
     },
     'loggers': {
         'django': {
@@ -476,6 +661,12 @@ LOGGING = {
             'level': 'INFO',
             'propagate': False,
         },
+        # Slow requests (METRICS_SETTINGS['SLOW_REQUEST_SECONDS'])
+        'utils.metrics': {
+            'handlers': ['console', 'performance'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
     },
     'root': {
         'handlers': ['console'],
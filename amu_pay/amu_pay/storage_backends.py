@@ -2,21 +2,156 @@
 Custom storage backends for AWS S3
 Separates static files and media files into different S3 locations
 """
+import hashlib
+import os
+
 from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.db.models import F
 from storages.backends.s3boto3 import S3Boto3Storage
 
+from utils.metrics import instrument_boto3
+
+CONTENT_ADDRESSED_PREFIX = 'cas/'
+# Content-addressed objects never change, so clients and CDNs may keep them forever
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
 
-class StaticStorage(S3Boto3Storage):
+class InstrumentedS3Mixin:
+    """Report every S3 API call of this storage to utils.metrics as 's3'"""
+    @property
+    def connection(self):
+        connection = super().connection
+        if getattr(self._connections, 'instrumented', None) is not connection:
+            instrument_boto3(connection.meta.client, 's3')
+            self._connections.instrumented = connection
+        return connection
+
+
+class StaticStorage(InstrumentedS3Mixin, S3Boto3Storage):
     """Storage backend for static files (CSS, JS, images)"""
     location = 'static'
     default_acl = 'public-read'
     file_overwrite = False
 
 
-class MediaStorage(S3Boto3Storage):
+class MediaStorage(InstrumentedS3Mixin, S3Boto3Storage):
     """Storage backend for media files (user uploads)"""
     location = 'media'
     file_overwrite = False
     # Get ACL from settings - None means bucket has ACLs disabled (use bucket policies instead)
     default_acl = getattr(settings, 'AWS_DEFAULT_ACL', None)
 
+
+def is_content_addressed(name):
+    return bool(name) and name.startswith(CONTENT_ADDRESSED_PREFIX)
+
+
+class ContentAddressedMixin:
+    """
+    Store every distinct file once, under cas/<first 2 hex>/<sha256><ext>.
+
+    save() hashes the content and returns the existing name when the same bytes
+    are already stored, so a duplicate upload is only a ref_count update on its
+    MediaBlob row. delete() decrements the count and, when no references are
+    left, removes the object once that commits and only if no save() has
+    referenced the same bytes again in the meantime. Names outside cas/ (files stored before, direct
+    uploads) behave as in the base storage.
+    """
+    def save(self, name, content, max_length=None):
+        from media_uploads.models import MediaBlob
+
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+
+        checksum = hashlib.sha256()
+        size = 0
+        if hasattr(content, 'seek'):
+            content.seek(0)
+        for chunk in content.chunks():
+            checksum.update(chunk)
+            size += len(chunk)
+        checksum = checksum.hexdigest()
+        extension = os.path.splitext(name)[1].lower()[:10]
+        key = f"{CONTENT_ADDRESSED_PREFIX}{checksum[:2]}/{checksum}{extension}"
+
+        with transaction.atomic():
+            # Locked so a concurrent delete() cannot remove the object we are referencing
+            blob = MediaBlob.objects.select_for_update().filter(checksum=checksum).first()
+            if blob is not None:
+                MediaBlob.objects.filter(pk=checksum).update(ref_count=F('ref_count') + 1)
+                return blob.name
+
+        if hasattr(content, 'seek'):
+            content.seek(0)
+        if not self._content_exists(key):
+            key = self._save(key, content)
+        blob, _ = MediaBlob.objects.get_or_create(checksum=checksum, defaults={'name': key, 'size': size})
+        MediaBlob.objects.filter(pk=checksum).update(ref_count=F('ref_count') + 1)
+        return blob.name
+
+    def save_exact(self, name, content):
+        """Store content under exactly this name, without deduplication (presigned upload stand-in)"""
+        if self.exists(name):
+            super().delete(name)
+        return self._save(name, content)
+
+    def delete(self, name):
+        from media_uploads.models import MediaBlob
+
+        if not is_content_addressed(name):
+            return super().delete(name)
+        with transaction.atomic():
+            blob = MediaBlob.objects.select_for_update().filter(name=name).first()
+            if blob is not None and blob.ref_count > 1:
+                MediaBlob.objects.filter(pk=blob.pk).update(ref_count=F('ref_count') - 1)
+                return
+            if blob is not None:
+                blob.delete()
+            # Not now: an outer atomic() may still roll the row back
+            transaction.on_commit(lambda: self._delete_unreferenced(name))
+
+    def _delete_unreferenced(self, name):
+        from media_uploads.models import MediaBlob
+
+        with transaction.atomic():
+            # Locked like save(), which may have stored the same bytes again since
+            if MediaBlob.objects.select_for_update().filter(name=name).exists():
+                return
+            super().delete(name)
+
+    def _content_exists(self, key):
+        # Writing the same bytes to the same key is harmless, so only check where a write would fail
+        return False
+
+
+class ContentAddressedMediaStorage(ContentAddressedMixin, MediaStorage):
+    """
+    MediaStorage with SHA-256 keys and deduplication.
+    Content-addressed objects are written with a far-future immutable Cache-Control;
+    with MEDIA_STORAGE_SETTINGS['PUBLIC_URLS'] their URLs are unsigned, so the
+    same file always has the same URL and CDNs can cache it.
+    """
+    def get_object_parameters(self, name):
+        params = super().get_object_parameters(name)
+        if is_content_addressed(name):
+            params['CacheControl'] = IMMUTABLE_CACHE_CONTROL
+        return params
+
+    def url(self, name, parameters=None, expire=None, http_method=None):
+        url = super().url(name, parameters=parameters, expire=expire, http_method=http_method)
+        public = getattr(settings, 'MEDIA_STORAGE_SETTINGS', {}).get('PUBLIC_URLS', False)
+        if public and is_content_addressed(name) and self.querystring_auth and not self.custom_domain:
+            return self._strip_signing_parameters(url)
+        return url
+
+
+class ContentAddressedFileSystemStorage(ContentAddressedMixin, FileSystemStorage):
+    """Local filesystem variant used when USE_S3 is off (development and tests)"""
+    def _content_exists(self, key):
+        # FileSystemStorage._save renames instead of overwriting an existing file
+        return self.exists(key)
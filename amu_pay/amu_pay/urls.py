@@ -8,6 +8,8 @@ from rest_framework_simplejwt.views import (
 )
 from saraf_account.views import CustomTokenRefreshView
 from django.http import JsonResponse
+from utils.metrics import metrics_view
+from utils.profiling import profile_view, profiles_view
 import os
 
 # Temporary debug view to inspect storage backend and env vars
@@ -38,6 +40,13 @@ urlpatterns = [
     path('debug-s3/', debug_s3),
     path('admin/', admin.site.urls),
 
+    # Prometheus metrics, internal callers only (see utils.metrics)
+    path('metrics', metrics_view, name='metrics'),
+
+    # Stored request profiles for staff, or for the token that made them (see utils.profiling)
+    path('profiles/', profiles_view, name='profiles'),
+    path('profiles/<str:profile_id>.<str:extension>', profile_view, name='profile'),
+
     # JWT Authentication endpoints
     path('token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('token/refresh/', CustomTokenRefreshView.as_view(), name='token_refresh'),
@@ -84,6 +93,9 @@ urlpatterns = [
     # User feedback endpoints
     path('api/user-feedback/', include('user_feedback.urls')),
 
+    # Presigned direct upload endpoints
+    path('api/uploads/', include('media_uploads.urls')),
+
 ]
 
 # Serve static and media files during development
@@ -94,6 +106,6 @@ if settings.DEBUG:
     # Serve media files (user uploads) in development
     urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
 else:
-    # In production, static files are served by WhiteNoise or nginx
+    # In production, static files are served by nginx or utils.static_files
     # Media files should be served by nginx or S3
     urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
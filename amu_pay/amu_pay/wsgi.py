@@ -9,8 +9,12 @@ https://docs.djangoproject.com/en/5.2/howto/deployment/wsgi/
 
 import os
 
+from django.conf import settings
 from django.core.wsgi import get_wsgi_application
+from whitenoise import WhiteNoise
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'amu_pay.settings')
 
 application = get_wsgi_application()
+# Static files outside the middleware chain, which is shared with ASGI (see utils.static_files)
+application = WhiteNoise(application, root=settings.STATIC_ROOT, prefix=settings.STATIC_URL)
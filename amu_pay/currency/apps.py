@@ -4,4 +4,8 @@ from django.apps import AppConfig
 class CurrencyConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'currency'
-    verbose_name = 'Currency Management'
\ No newline at end of file
+    verbose_name = 'Currency Management'
+
+    def ready(self):
+        # Connect the registry's invalidation signal handlers
+        from . import registry  # noqa: F401
@@ -0,0 +1,146 @@
+"""
+In-process registry of Currency rows.
+
+Deposits, withdrawals, exchanges and hawalas each looked a currency up by
+code, often twice per request, although currencies almost never change. The
+registry loads every currency once per worker process and answers lookups
+from memory, without any database queries.
+
+A save or delete of a Currency bumps a version key in the shared cache
+(utils.cache). Every worker compares its loaded version against that key at
+most once per VERSION_CHECK_INTERVAL seconds and reloads when it has moved.
+Queryset update() and bulk_create() send no signals, so call
+invalidate_currency_registry() after using them on Currency.
+
+The returned Currency instances are shared between requests: read them or
+use them as foreign key values, but do not modify or save them.
+
+Each saraf's set of supported currency codes is cached in the shared cache
+as well (supported_currency_codes()), and dropped whenever one of its
+SarafSupportedCurrency rows is saved or deleted.
+"""
+
+import threading
+import time
+from types import MappingProxyType
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.http import Http404
+
+from utils.cache import CacheNamespace
+
+from .models import Currency, SarafSupportedCurrency
+
+# How often a worker checks the shared version key for changes made by other workers
+VERSION_CHECK_INTERVAL = 1.0
+
+_versions = CacheNamespace('currency_registry')
+_supported = CacheNamespace('saraf_currencies', timeout=3600)
+_lock = threading.Lock()
+_state = {'currencies': None, 'version': None, 'checked_at': 0.0}
+
+
+def _load():
+    version = _versions.version()
+    # Currency's primary key is its code, so one map serves lookups by code and by id
+    currencies = MappingProxyType({currency.currency_code: currency for currency in Currency.objects.all()})
+    _state.update(currencies=currencies, version=version, checked_at=time.monotonic())
+    return currencies
+
+
+def _currencies():
+    currencies = _state['currencies']
+    if currencies is not None and time.monotonic() - _state['checked_at'] < VERSION_CHECK_INTERVAL:
+        return currencies
+    with _lock:
+        currencies = _state['currencies']
+        if currencies is None:
+            return _load()
+        if time.monotonic() - _state['checked_at'] >= VERSION_CHECK_INTERVAL:
+            if _versions.version() != _state['version']:
+                return _load()
+            _state['checked_at'] = time.monotonic()
+        return currencies
+
+
+def get_currency(code, active_only=True):
+    """
+    Currency for a code (case-insensitive). Raises Currency.DoesNotExist, like
+    Currency.objects.get(), when it is unknown or (with active_only) inactive.
+    """
+    currency = _currencies().get(str(code or '').strip().upper())
+    if currency is None or (active_only and not currency.is_active):
+        raise Currency.DoesNotExist(f"Currency {code} not found or not active")
+    return currency
+
+
+def get_currency_or_404(code, active_only=False):
+    """get_currency() for views, raising Http404 like get_object_or_404(Currency, ...)"""
+    try:
+        return get_currency(code, active_only=active_only)
+    except Currency.DoesNotExist:
+        raise Http404(f"No currency matches {code}")
+
+
+def all_currencies(active_only=False):
+    """Every currency ordered by code, optionally only the active ones"""
+    return tuple(
+        currency for currency in _currencies().values()
+        if currency.is_active or not active_only
+    )
+
+
+def invalidate_currency_registry():
+    """Reload on the next lookup in this process, and within VERSION_CHECK_INTERVAL in the others"""
+    with _lock:
+        _state['currencies'] = None
+    _versions.invalidate()
+
+
+@receiver(post_save, sender=Currency)
+@receiver(post_delete, sender=Currency)
+def currency_changed(sender, **kwargs):
+    invalidate_currency_registry()
+    # Again after commit, in case a worker reloaded before the change was visible to it
+    transaction.on_commit(invalidate_currency_registry)
+
+
+def _saraf_key(saraf_account):
+    return str(getattr(saraf_account, 'saraf_id', saraf_account))
+
+
+def supported_currency_codes(saraf_account):
+    """frozenset of the codes a saraf (SarafAccount or saraf_id) has active in its supported list"""
+    return _supported.get_or_set(_saraf_key(saraf_account), lambda: frozenset(
+        SarafSupportedCurrency.objects.filter(
+            saraf_account_id=_saraf_key(saraf_account), is_active=True
+        ).values_list('currency_id', flat=True)
+    ))
+
+
+def is_supported_currency(saraf_account, currency):
+    """Whether a currency (Currency or code) is active in the saraf's supported list"""
+    code = getattr(currency, 'currency_code', currency)
+    return str(code or '').strip().upper() in supported_currency_codes(saraf_account)
+
+
+def supported_currencies(saraf_account):
+    """The saraf's supported currencies as Currency instances, ordered by code"""
+    return tuple(
+        get_currency(code, active_only=False)
+        for code in sorted(supported_currency_codes(saraf_account))
+    )
+
+
+def invalidate_supported_currencies(saraf_account):
+    _supported.delete(_saraf_key(saraf_account))
+
+
+@receiver(post_save, sender=SarafSupportedCurrency)
+@receiver(post_delete, sender=SarafSupportedCurrency)
+def supported_currency_changed(sender, instance, **kwargs):
+    saraf_id = instance.saraf_account_id
+    invalidate_supported_currencies(saraf_id)
+    transaction.on_commit(lambda: invalidate_supported_currencies(saraf_id))
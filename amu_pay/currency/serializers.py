@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from .models import Currency, SarafSupportedCurrency
+from .registry import get_currency
 
 
 class CurrencySerializer(serializers.ModelSerializer):
@@ -39,7 +40,7 @@ class SarafSupportedCurrencySerializer(serializers.ModelSerializer):
     def validate_currency_code(self, value):
         """Currency code validation"""
         try:
-            currency = Currency.objects.get(currency_code=value.upper(), is_active=True)
+            currency = get_currency(value)
             return currency
         except Currency.DoesNotExist:
             raise serializers.ValidationError(f"Currency with code {value} not found or inactive")
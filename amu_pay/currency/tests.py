@@ -1,3 +1,91 @@
+from unittest import mock
+
+from django.core.cache import cache
 from django.test import TestCase
 
-# Create your tests here.
+from saraf_account.models import AmuPayCode, SarafAccount
+
+from . import registry
+from .models import Currency, SarafSupportedCurrency
+from .registry import all_currencies, get_currency, is_supported_currency, supported_currencies
+
+
+class CurrencyRegistryTests(TestCase):
+    """In-process currency lookups and their invalidation"""
+
+    def setUp(self):
+        Currency.objects.create(currency_code='USD', currency_name='US Dollar', currency_name_local='Dollar', symbol='$')
+        Currency.objects.create(
+            currency_code='EUR', currency_name='Euro', currency_name_local='Euro', symbol='€', is_active=False
+        )
+
+    def test_lookups_after_load_make_no_queries(self):
+        get_currency('USD')
+        with self.assertNumQueries(0):
+            self.assertEqual(get_currency('usd').symbol, '$')
+            self.assertEqual(get_currency('EUR', active_only=False).currency_name, 'Euro')
+            self.assertEqual([c.currency_code for c in all_currencies(active_only=True)], ['USD'])
+
+    def test_unknown_and_inactive_codes_raise_does_not_exist(self):
+        with self.assertRaises(Currency.DoesNotExist):
+            get_currency('XXX')
+        with self.assertRaises(Currency.DoesNotExist):
+            get_currency('EUR')
+
+    def test_currency_save_reloads_registry(self):
+        self.assertEqual(get_currency('USD').symbol, '$')
+        currency = Currency.objects.get(currency_code='USD')
+        currency.symbol = 'US$'
+        currency.save()
+        self.assertEqual(get_currency('USD').symbol, 'US$')
+
+    def test_version_bump_from_another_worker_reloads_registry(self):
+        get_currency('USD')
+        Currency.objects.filter(currency_code='EUR').update(is_active=True)
+        # A queryset update sends no signal; the registry keeps its copy until the version moves
+        with self.assertRaises(Currency.DoesNotExist):
+            get_currency('EUR')
+        registry._versions.invalidate()
+        with mock.patch.object(registry, 'VERSION_CHECK_INTERVAL', 0):
+            self.assertEqual(get_currency('EUR').currency_code, 'EUR')
+
+
+class SupportedCurrencySetTests(TestCase):
+    """Cached per-saraf supported currency codes"""
+
+    def setUp(self):
+        cache.clear()
+        AmuPayCode.objects.create(code="CURR0001CODE")
+        self.saraf = SarafAccount.objects.create(
+            full_name="Currency Saraf",
+            exchange_name="Currency Exchange",
+            email="currency@example.com",
+            email_or_whatsapp_number="+93711222444",
+            amu_pay_code="CURR0001CODE",
+            province="Kabul",
+            is_active=True
+        )
+        self.usd = Currency.objects.create(
+            currency_code='USD', currency_name='US Dollar', currency_name_local='Dollar', symbol='$'
+        )
+        self.afn = Currency.objects.create(
+            currency_code='AFN', currency_name='Afghan Afghani', currency_name_local='Afghani', symbol='؋'
+        )
+        self.supported = SarafSupportedCurrency.objects.create(saraf_account=self.saraf, currency=self.usd)
+
+    def test_membership_is_cached(self):
+        self.assertTrue(is_supported_currency(self.saraf, 'usd'))
+        get_currency('USD')
+        with self.assertNumQueries(0):
+            self.assertTrue(is_supported_currency(self.saraf.saraf_id, self.usd))
+            self.assertFalse(is_supported_currency(self.saraf, 'AFN'))
+            self.assertEqual([c.currency_code for c in supported_currencies(self.saraf)], ['USD'])
+
+    def test_adding_and_deactivating_currencies_invalidates_the_set(self):
+        self.assertFalse(is_supported_currency(self.saraf, 'AFN'))
+        SarafSupportedCurrency.objects.create(saraf_account=self.saraf, currency=self.afn)
+        self.assertTrue(is_supported_currency(self.saraf, 'AFN'))
+
+        self.supported.is_active = False
+        self.supported.save()
+        self.assertFalse(is_supported_currency(self.saraf, 'USD'))
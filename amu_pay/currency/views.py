@@ -12,6 +12,7 @@ from .serializers import (
     SarafSupportedCurrencyListSerializer
 )
 from saraf_account.models import SarafAccount, SarafEmployee, ActionLog
+from utils.conditional import conditional_get, queryset_version
 import logging
 
 logger = logging.getLogger(__name__)
@@ -48,12 +49,17 @@ def get_user_info_from_token(request):
         return None
 
 
+def _available_currencies_version(request):
+    return queryset_version(Currency.objects.filter(is_active=True))
+
+
 class AvailableCurrenciesView(APIView):
     """
     List of all currencies available in the system
     """
     permission_classes = [IsAuthenticated]
     
+    @conditional_get(_available_currencies_version)
     def get(self, request):
         """Get list of all active currencies"""
         try:
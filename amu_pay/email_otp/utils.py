@@ -1,20 +1,17 @@
-from django.core.mail import send_mail
-from django.conf import settings
 from django.template.loader import render_to_string
 from django.utils.html import strip_tags
+from asgiref.sync import sync_to_async
+from outbound.queue import OTP_EXPIRY_SECONDS, queue_email
 import logging
 
 logger = logging.getLogger(__name__)
 
-def send_otp_email(email, otp_code):
-    """
-    Send OTP code to the specified email address
-    """
-    try:
-        subject = 'Your OTP Code'
-        
-        # Create HTML message
-        html_message = f"""
+def _otp_email(otp_code):
+    """queue_email() subject and bodies for an OTP email"""
+    subject = 'Your OTP Code'
+    
+    # Create HTML message
+    html_message = f"""
         <html>
         <body>
             <h2>Your OTP Code</h2>
@@ -25,9 +22,9 @@ def send_otp_email(email, otp_code):
         </body>
         </html>
         """
-        
-        # Create plain text version
-        plain_message = f"""
+    
+    # Create plain text version
+    plain_message = f"""
         Your OTP Code
         
         Your One-Time Password (OTP) code is: {otp_code}
@@ -36,20 +33,27 @@ def send_otp_email(email, otp_code):
         
         If you didn't request this code, please ignore this email.
         """
+    
+    return {
+        'subject': subject,
+        'message': plain_message,
+        'html_message': html_message,
+    }
+
+def send_otp_email(email, otp_code):
+    """
+    Queue the OTP code email for the specified address (delivered by outbound)
+    """
+    try:
+        queue_email(email, purpose='email_otp', expires_in=OTP_EXPIRY_SECONDS, **_otp_email(otp_code))
         
-        # Send email
-        send_mail(
-            subject=subject,
-            message=plain_message,
-            from_email=settings.EMAIL_HOST_USER,
-            recipient_list=[email],
-            html_message=html_message,
-            fail_silently=False,
-        )
-        
-        logger.info(f"OTP email sent successfully to {email}")
+        logger.info(f"OTP email queued for {email}")
         return True
         
     except Exception as e:
-        logger.error(f"Failed to send OTP email to {email}: {str(e)}")
+        logger.error(f"Failed to queue OTP email to {email}: {str(e)}")
         return False
+
+async def asend_otp_email(email, otp_code):
+    """send_otp_email() for async views"""
+    return await sync_to_async(send_otp_email)(email, otp_code)
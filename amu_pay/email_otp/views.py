@@ -2,46 +2,49 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.permissions import AllowAny
+from asgiref.sync import sync_to_async
 from django.utils import timezone
 from .models import EmailOTP
 from .serializers import GenerateOTPSerializer, VerifyOTPSerializer, EmailOTPSerializer
-from .utils import send_otp_email
+from .utils import asend_otp_email
+from utils.async_views import AsyncAPIView
 import logging
 
 logger = logging.getLogger(__name__)
 
-class GenerateOTPView(APIView):
+class GenerateOTPView(AsyncAPIView):
     permission_classes = [AllowAny]
     """
     API endpoint to generate and send OTP to email
+    (async: the SMTP send does not hold a worker)
     """
-    def post(self, request):
+    async def post(self, request):
         serializer = GenerateOTPSerializer(data=request.data)
         
-        if serializer.is_valid():
+        if await sync_to_async(serializer.is_valid)():
             email = serializer.validated_data['email']
             
             try:
                 # Check if OTP already exists for this email
                 try:
-                    email_otp = EmailOTP.objects.get(email=email)
+                    email_otp = await EmailOTP.objects.aget(email=email)
                     # Delete existing OTP to create a new one
-                    email_otp.delete()
+                    await email_otp.adelete()
                 except EmailOTP.DoesNotExist:
                     pass
                 
                 # Create new OTP
-                email_otp = EmailOTP.objects.create(email=email)
+                email_otp = await EmailOTP.objects.acreate(email=email)
                 
                 # Send OTP via email
-                if send_otp_email(email, email_otp.otp_code):
+                if await asend_otp_email(email, email_otp.otp_code):
                     return Response({
                         'message': 'OTP sent successfully to your email',
                         'email': email
                     }, status=status.HTTP_200_OK)
                 else:
                     # Delete the OTP if email sending failed
-                    email_otp.delete()
+                    await email_otp.adelete()
                     return Response({
                         'error': 'Failed to send OTP email. Please try again.'
                     }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -16,6 +16,7 @@ from .serializers import (
     ExchangeTransactionUpdateSerializer
 )
 from saraf_account.models import SarafAccount, SarafEmployee, ActionLog
+from utils.db_routing import read_replica
 
 logger = logging.getLogger(__name__)
 
@@ -53,6 +54,7 @@ class ExchangeTransactionListView(APIView):
     """
     permission_classes = [IsAuthenticated]
     
+    @read_replica
     def get(self, request):
         """Get list of exchange transactions with filters"""
         try:
@@ -346,9 +348,9 @@ class ExchangeTransactionCreateView(APIView):
             customer_account = exchange_transaction.customer_account
             
             # Get currency objects
-            from currency.models import Currency
-            sell_currency = Currency.objects.get(currency_code=exchange_transaction.sell_currency)
-            buy_currency = Currency.objects.get(currency_code=exchange_transaction.buy_currency)
+            from currency.registry import get_currency
+            sell_currency = get_currency(exchange_transaction.sell_currency, active_only=False)
+            buy_currency = get_currency(exchange_transaction.buy_currency, active_only=False)
             
             if transaction_type == 'customer' and customer_account:
                 # Customer transaction: Update customer balance and saraf balance
@@ -701,11 +703,11 @@ class ExchangeTransactionCreateWithBalanceView(APIView):
     def _update_saraf_balances(self, saraf_account, exchange_transaction):
         """Update saraf balances based on exchange transaction"""
         from saraf_balance.models import SarafBalance
-        from currency.models import Currency
+        from currency.registry import get_currency
         
         # Get currency objects
-        sell_currency = Currency.objects.get(currency_code=exchange_transaction.sell_currency)
-        buy_currency = Currency.objects.get(currency_code=exchange_transaction.buy_currency)
+        sell_currency = get_currency(exchange_transaction.sell_currency, active_only=False)
+        buy_currency = get_currency(exchange_transaction.buy_currency, active_only=False)
         
         # Update sell currency balance (decrease - saraf is selling)
         if exchange_transaction.sell_amount > 0:
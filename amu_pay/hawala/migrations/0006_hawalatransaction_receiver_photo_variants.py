@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-19 04:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hawala', '0005_receiver_photo_metadata'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='hawalatransaction',
+            name='receiver_photo_variants',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
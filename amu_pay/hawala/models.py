@@ -4,6 +4,9 @@ from django.core.exceptions import ValidationError
 from django.utils import timezone
 import uuid
 
+from media_uploads.metadata import capture_file_metadata
+from media_uploads.variants import queue_image_variants
+
 
 class HawalaTransaction(models.Model):
     """
@@ -62,6 +65,14 @@ class HawalaTransaction(models.Model):
         blank=True,
         help_text="Photo of receiver (taken by receiving saraf)"
     )
+    # Receiver photo metadata captured at upload (see media_uploads.metadata)
+    receiver_photo_size = models.BigIntegerField(null=True, blank=True)
+    receiver_photo_content_type = models.CharField(max_length=100, blank=True, default='')
+    receiver_photo_checksum = models.CharField(max_length=64, blank=True, default='', help_text="SHA-256 hex digest")
+    receiver_photo_width = models.PositiveIntegerField(null=True, blank=True)
+    receiver_photo_height = models.PositiveIntegerField(null=True, blank=True)
+    # Rendered thumbnail/medium variants (see media_uploads.variants)
+    receiver_photo_variants = models.JSONField(default=dict, blank=True)
     
     # Transaction Details
     amount = models.DecimalField(
@@ -172,6 +183,7 @@ class HawalaTransaction(models.Model):
 
     def save(self, *args, **kwargs):
         """Validate hawala number is provided and unique"""
+        kwargs['update_fields'] = capture_file_metadata(self, 'receiver_photo', update_fields=kwargs.get('update_fields'))
         if not self.hawala_number:
             raise ValidationError("Hawala number is required and must be manually entered.")
         
@@ -191,6 +203,7 @@ class HawalaTransaction(models.Model):
                 pass  # If original doesn't exist, it's likely a new instance
         
         super().save(*args, **kwargs)
+        queue_image_variants(self, 'receiver_photo', update_fields=kwargs.get('update_fields'))
 
     def mark_as_sent(self):
         """Mark transaction as sent"""
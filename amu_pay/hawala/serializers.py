@@ -3,10 +3,35 @@ from django.core.exceptions import ValidationError
 from django.core.validators import RegexValidator
 from .models import HawalaTransaction, HawalaReceipt
 from saraf_account.models import SarafAccount, SarafEmployee
-from currency.models import Currency, SarafSupportedCurrency
+from currency.models import Currency
+from currency.registry import get_currency, is_supported_currency, supported_currencies
+from media_uploads.fields import DirectUploadImageField, ImageVariantsField
 
 
-class HawalaTransactionSerializer(serializers.ModelSerializer):
+class HawalaListSerializerMany(serializers.ListSerializer):
+    """
+    Loads the destination exchanges of all hawalas in one query.
+    destination_exchange_id is not a foreign key, so select_related cannot follow it.
+    """
+
+    def to_representation(self, data):
+        hawalas = list(data.all() if hasattr(data, 'all') else data)
+        destination_ids = {hawala.destination_exchange_id for hawala in hawalas if hawala.destination_exchange_id}
+        self.context['destination_exchanges'] = SarafAccount.objects.in_bulk(destination_ids)
+        return super().to_representation(hawalas)
+
+
+class DestinationExchangeMixin:
+
+    def get_destination_exchange(self, obj):
+        """The saraf behind destination_exchange_id, from the list's bulk lookup when there is one"""
+        exchanges = self.context.get('destination_exchanges')
+        if exchanges is not None:
+            return exchanges.get(obj.destination_exchange_id)
+        return SarafAccount.objects.filter(saraf_id=obj.destination_exchange_id).first()
+
+
+class HawalaTransactionSerializer(DestinationExchangeMixin, serializers.ModelSerializer):
     """
     Serializer for HawalaTransaction model
     Used for creating and updating hawala transactions
@@ -112,52 +137,42 @@ class HawalaTransactionSerializer(serializers.ModelSerializer):
     def get_destination_exchange_display(self, obj):
         """Get destination exchange display information"""
         if obj.destination_exchange_id:
-            try:
-                destination_exchange = SarafAccount.objects.get(saraf_id=obj.destination_exchange_id)
-                return {
-                    'id': destination_exchange.saraf_id,
-                    'name': destination_exchange.exchange_name,
-                    'full_name': destination_exchange.full_name,
-                    'amu_pay_code': destination_exchange.amu_pay_code
-                }
-            except SarafAccount.DoesNotExist:
+            destination_exchange = self.get_destination_exchange(obj)
+            if destination_exchange is None:
                 return None
+            return {
+                'id': destination_exchange.saraf_id,
+                'name': destination_exchange.exchange_name,
+                'full_name': destination_exchange.full_name,
+                'amu_pay_code': destination_exchange.amu_pay_code
+            }
         return None
 
     def get_supported_currencies(self, obj):
         """Get currencies supported by the saraf"""
         saraf_account = self.context.get('saraf_account')
         if saraf_account:
-            supported_currencies = SarafSupportedCurrency.objects.filter(
-                saraf_account=saraf_account,
-                is_active=True
-            ).select_related('currency')
-            
             return [
                 {
-                    'code': sc.currency.currency_code,
-                    'name': sc.currency.currency_name,
-                    'name_local': sc.currency.currency_name_local,
-                    'symbol': sc.currency.symbol
+                    'code': currency.currency_code,
+                    'name': currency.currency_name,
+                    'name_local': currency.currency_name_local,
+                    'symbol': currency.symbol
                 }
-                for sc in supported_currencies
+                for currency in supported_currencies(saraf_account)
             ]
         return []
 
     def validate_currency_code(self, value):
         """Validate currency code - must be supported by the saraf"""
         try:
-            currency = Currency.objects.get(currency_code=value.upper(), is_active=True)
+            currency = get_currency(value)
             
             # Get saraf account from context
             saraf_account = self.context.get('saraf_account')
             if saraf_account:
                 # Check if saraf supports this currency
-                if not SarafSupportedCurrency.objects.filter(
-                    saraf_account=saraf_account,
-                    currency=currency,
-                    is_active=True
-                ).exists():
+                if not is_supported_currency(saraf_account, currency):
                     raise serializers.ValidationError(
                         f"Currency '{value}' is not supported by your exchange. "
                         f"Please add this currency to your supported currencies first."
@@ -244,7 +259,7 @@ class HawalaTransactionSerializer(serializers.ModelSerializer):
         destination_exchange_id = validated_data.pop('destination_exchange_id', None)
         
         # Get foreign key objects
-        currency = Currency.objects.get(currency_code=currency_code)
+        currency = get_currency(currency_code, active_only=False)
         
         # Handle sender exchange - either from sender_exchange_id or from context
         if sender_exchange_id:
@@ -290,7 +305,7 @@ class HawalaReceiveSerializer(serializers.ModelSerializer):
         required=True,
         validators=[RegexValidator(r'^\+?1?\d{9,15}$', 'Enter a valid phone number')]
     )
-    receiver_photo = serializers.ImageField(required=True)
+    receiver_photo = DirectUploadImageField(purpose='hawala_receiver_photo', required=True)
     
     class Meta:
         model = HawalaTransaction
@@ -326,7 +341,7 @@ class HawalaExternalReceiveSerializer(serializers.ModelSerializer):
     
     # Required fields for external receive
     receiver_phone = serializers.CharField(required=True)
-    receiver_photo = serializers.ImageField(required=True)
+    receiver_photo = DirectUploadImageField(purpose='hawala_receiver_photo', required=True)
     
     class Meta:
         model = HawalaTransaction
@@ -346,17 +361,13 @@ class HawalaExternalReceiveSerializer(serializers.ModelSerializer):
     def validate_currency_code(self, value):
         """Validate currency code - must be supported by the saraf"""
         try:
-            currency = Currency.objects.get(currency_code=value.upper(), is_active=True)
+            currency = get_currency(value)
             
             # Get saraf account from context
             saraf_account = self.context.get('saraf_account')
             if saraf_account:
                 # Check if saraf supports this currency
-                if not SarafSupportedCurrency.objects.filter(
-                    saraf_account=saraf_account,
-                    currency=currency,
-                    is_active=True
-                ).exists():
+                if not is_supported_currency(saraf_account, currency):
                     raise serializers.ValidationError(
                         f"Currency '{value}' is not supported by your exchange. "
                         f"Please add this currency to your supported currencies first."
@@ -392,7 +403,7 @@ class HawalaExternalReceiveSerializer(serializers.ModelSerializer):
         receiver_exchange_id = validated_data.pop('receiver_exchange_id')
         
         # Get foreign key objects
-        currency = Currency.objects.get(currency_code=currency_code)
+        currency = get_currency(currency_code, active_only=False)
         receiver_exchange = SarafAccount.objects.get(saraf_id=receiver_exchange_id)
         
         # Set foreign key fields
@@ -421,7 +432,7 @@ class HawalaExternalReceiveSerializer(serializers.ModelSerializer):
         return super().create(validated_data)
 
 
-class HawalaListSerializer(serializers.ModelSerializer):
+class HawalaListSerializer(DestinationExchangeMixin, serializers.ModelSerializer):
     """
     Serializer for listing hawala transactions
     Provides summary information for transaction lists
@@ -432,6 +443,7 @@ class HawalaListSerializer(serializers.ModelSerializer):
     destination_exchange_display = serializers.SerializerMethodField()
     total_amount = serializers.SerializerMethodField()
     receiver_photo_url = serializers.SerializerMethodField()
+    receiver_photo_variants = ImageVariantsField('receiver_photo')
     
     class Meta:
         model = HawalaTransaction
@@ -440,8 +452,9 @@ class HawalaListSerializer(serializers.ModelSerializer):
             'amount', 'transfer_fee', 'total_amount', 'currency_display',
             'sender_exchange_display', 'destination_exchange_display',
             'status', 'mode', 'created_at', 'sent_at', 'received_at',
-            'completed_at', 'receiver_photo_url'
+            'completed_at', 'receiver_photo_url', 'receiver_photo_variants'
         ]
+        list_serializer_class = HawalaListSerializerMany
     
     def get_currency_display(self, obj):
         """Get currency display information"""
@@ -487,14 +500,13 @@ class HawalaListSerializer(serializers.ModelSerializer):
         
         # For normal hawalas, show destination_exchange
         if obj.destination_exchange_id:
-            try:
-                destination_exchange = SarafAccount.objects.get(saraf_id=obj.destination_exchange_id)
-                return {
-                    'id': destination_exchange.saraf_id,
-                    'name': destination_exchange.exchange_name
-                }
-            except SarafAccount.DoesNotExist:
+            destination_exchange = self.get_destination_exchange(obj)
+            if destination_exchange is None:
                 return None
+            return {
+                'id': destination_exchange.saraf_id,
+                'name': destination_exchange.exchange_name
+            }
         return None
     
     def get_total_amount(self, obj):
@@ -21,6 +21,7 @@ from saraf_account.models import SarafAccount, SarafEmployee
 from saraf_account.authentication import SarafJWTAuthentication
 from currency.models import SarafSupportedCurrency
 from currency.models import Currency
+from utils.db_routing import read_replica
 
 
 class SendHawalaView(APIView):
@@ -168,7 +169,7 @@ class ReceiveHawalaListView(APIView):
                     (Q(sender_exchange=saraf_id) & Q(mode='external_receiver'))
                 ),
                 status__in=['pending', 'sent']  # Show pending and sent hawalas
-            ).order_by('-created_at')
+            ).select_related('currency', 'sender_exchange').order_by('-created_at')
             
             serializer = HawalaListSerializer(hawalas, many=True, context={'request': request})
             
@@ -288,7 +289,9 @@ class ReceiveHawalaDetailView(APIView):
                     'error': 'This transaction cannot be received in its current status'
                 }, status=status.HTTP_400_BAD_REQUEST)
             
-            serializer = HawalaReceiveSerializer(hawala, data=request.data, partial=True)
+            serializer = HawalaReceiveSerializer(
+                hawala, data=request.data, partial=True, context={'request': request}
+            )
             
             if serializer.is_valid():
                 # Update transaction with receiver details
@@ -395,7 +398,7 @@ class ExternalReceiveHawalaView(APIView):
             
             serializer = HawalaExternalReceiveSerializer(
                 data=request_data,
-                context={'employee': employee, 'saraf_account': saraf_account}
+                context={'employee': employee, 'saraf_account': saraf_account, 'request': request}
             )
             
             if serializer.is_valid():
@@ -426,6 +429,7 @@ class HawalaHistoryView(APIView):
     authentication_classes = [SarafJWTAuthentication]
     permission_classes = [IsAuthenticated]
 
+    @read_replica
     def get(self, request):
         """Get hawala transaction history"""
         try:
@@ -541,7 +545,9 @@ class HawalaHistoryView(APIView):
                     query &= Q(created_at__gte=start_date)
             
             # Execute query
-            hawalas = HawalaTransaction.objects.filter(query).order_by('-created_at')[offset:offset+limit]
+            hawalas = HawalaTransaction.objects.filter(query).select_related(
+                'currency', 'sender_exchange'
+            ).order_by('-created_at')[offset:offset+limit]
             total_count = HawalaTransaction.objects.filter(query).count()
             
             serializer = HawalaListSerializer(hawalas, many=True, context={'request': request})
@@ -728,7 +734,9 @@ class ListAllHawalasView(APIView):
                 query &= Q(status=status_filter)
             
             # Execute query
-            hawalas = HawalaTransaction.objects.filter(query).order_by('-created_at')[offset:offset+limit]
+            hawalas = HawalaTransaction.objects.filter(query).select_related(
+                'currency', 'sender_exchange'
+            ).order_by('-created_at')[offset:offset+limit]
             total_count = HawalaTransaction.objects.filter(query).count()
             
             serializer = HawalaListSerializer(hawalas, many=True, context={'request': request})
@@ -1033,7 +1041,7 @@ class NormalUserHawalaLookupView(APIView):
             hawala_transactions = HawalaTransaction.objects.filter(
                 receiver_phone=receiver_phone,
                 status__in=['pending', 'completed']  # Only show pending and completed transactions
-            ).order_by('-created_at')
+            ).select_related('currency').order_by('-created_at')
             
             if not hawala_transactions.exists():
                 return Response({
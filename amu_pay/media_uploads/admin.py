@@ -0,0 +1,18 @@
+from django.contrib import admin
+
+from .models import ImageVariantTask, MediaBlob
+
+
+@admin.register(ImageVariantTask)
+class ImageVariantTaskAdmin(admin.ModelAdmin):
+    list_display = ['task_id', 'model_label', 'object_id', 'field_name', 'status', 'attempts', 'available_at', 'processed_at']
+    list_filter = ['status', 'model_label', 'created_at']
+    search_fields = ['source_name', 'last_error']
+    readonly_fields = ['task_id', 'created_at', 'processed_at', 'locked_at']
+
+
+@admin.register(MediaBlob)
+class MediaBlobAdmin(admin.ModelAdmin):
+    list_display = ['name', 'size', 'ref_count', 'created_at', 'last_referenced_at']
+    search_fields = ['checksum', 'name']
+    readonly_fields = ['checksum', 'name', 'size', 'created_at', 'last_referenced_at']
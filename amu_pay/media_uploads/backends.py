@@ -0,0 +1,87 @@
+"""
+Storage backends for direct-to-storage uploads.
+
+S3PresignedUploadBackend hands the client a presigned POST so the file goes
+straight to the bucket behind MediaStorage. LocalUploadBackend is the
+development/test stand-in: it hands out a signed URL on this server that
+writes into the local default storage with the same size and type checks.
+"""
+from django.conf import settings
+from django.core import signing
+from django.core.files.storage import default_storage
+from django.urls import reverse
+
+LOCAL_UPLOAD_SALT = 'media_uploads.local_upload'
+
+
+class S3PresignedUploadBackend:
+    """Presigned POST uploads into the MediaStorage bucket"""
+
+    def __init__(self, storage=None):
+        self.storage = storage or default_storage
+
+    def _object_key(self, key):
+        location = getattr(self.storage, 'location', '')
+        return f'{location}/{key}' if location else key
+
+    def _client(self):
+        return self.storage.connection.meta.client
+
+    def presign(self, key, content_type, max_size, expires_in):
+        fields = {'Content-Type': content_type}
+        conditions = [
+            {'Content-Type': content_type},
+            ['content-length-range', 1, max_size],
+        ]
+        default_acl = getattr(settings, 'AWS_DEFAULT_ACL', None)
+        if default_acl:
+            fields['acl'] = default_acl
+            conditions.append({'acl': default_acl})
+
+        post = self._client().generate_presigned_post(
+            Bucket=self.storage.bucket_name,
+            Key=self._object_key(key),
+            Fields=fields,
+            Conditions=conditions,
+            ExpiresIn=expires_in
+        )
+        return {'method': 'POST', 'url': post['url'], 'fields': post['fields']}
+
+    def stat(self, key):
+        """Return {'size', 'content_type'} for an uploaded object, or None if missing"""
+        from botocore.exceptions import ClientError
+
+        try:
+            head = self._client().head_object(Bucket=self.storage.bucket_name, Key=self._object_key(key))
+        except ClientError:
+            return None
+        return {'size': head['ContentLength'], 'content_type': head.get('ContentType', '')}
+
+
+class LocalUploadBackend:
+    """Signed upload URL on this server, backed by the local default storage"""
+
+    def __init__(self, storage=None):
+        self.storage = storage or default_storage
+
+    def presign(self, key, content_type, max_size, expires_in):
+        token = signing.dumps({'k': key, 'ct': content_type, 'max': max_size}, salt=LOCAL_UPLOAD_SALT)
+        return {
+            'method': 'PUT',
+            'url': reverse('media_uploads:local_upload', args=[token]),
+            'headers': {'Content-Type': content_type},
+        }
+
+    def stat(self, key):
+        if not self.storage.exists(key):
+            return None
+        # Content type is checked by local_upload before anything is stored
+        return {'size': self.storage.size(key), 'content_type': None}
+
+
+def get_upload_backend():
+    """Backend selected by DIRECT_UPLOAD_SETTINGS['BACKEND'] ('s3' or 'local')"""
+    backend = getattr(settings, 'DIRECT_UPLOAD_SETTINGS', {}).get('BACKEND', 'local')
+    if backend == 's3':
+        return S3PresignedUploadBackend()
+    return LocalUploadBackend()
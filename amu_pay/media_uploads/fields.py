@@ -0,0 +1,53 @@
+from rest_framework import serializers
+
+from .uploads import UploadError, confirm_upload
+from .variants import image_variant_urls
+
+
+class DirectUploadMixin:
+    """
+    Accept either a multipart file or an upload key from the presigned upload flow.
+    Upload keys are confirmed against storage and returned as a DirectUpload name.
+    They must belong to the user of context['request'].
+    """
+    def __init__(self, *args, purpose, **kwargs):
+        self.purpose = purpose
+        super().__init__(*args, **kwargs)
+
+    def to_internal_value(self, data):
+        if isinstance(data, str):
+            try:
+                request = self.context.get('request')
+                return confirm_upload(data, self.purpose, getattr(request, 'user', None))
+            except UploadError as e:
+                raise serializers.ValidationError(str(e))
+        return super().to_internal_value(data)
+
+
+class DirectUploadFileField(DirectUploadMixin, serializers.FileField):
+    pass
+
+
+class DirectUploadImageField(DirectUploadMixin, serializers.ImageField):
+    pass
+
+
+class ImageVariantsField(serializers.Field):
+    """
+    Read-only {variant: url} for an image field with a <field>_variants column.
+    Falls back to the original image URL until the variants are rendered.
+    """
+    def __init__(self, image_field, absolute_urls=True, **kwargs):
+        self.image_field = image_field
+        self.absolute_urls = absolute_urls
+        kwargs['source'] = '*'
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, instance):
+        request = self.context.get('request') if self.absolute_urls else None
+        return image_variant_urls(
+            getattr(instance, self.image_field),
+            getattr(instance, f'{self.image_field}_variants', None),
+            request
+        )
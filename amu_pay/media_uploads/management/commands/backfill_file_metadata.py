@@ -0,0 +1,72 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from media_uploads.metadata import TRACKED_FILE_FIELDS, metadata_field_names, read_file_metadata
+
+
+class Command(BaseCommand):
+    help = 'Fill size/content type/checksum/dimension columns for stored files that are missing them'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--model',
+            help='Only backfill one model, e.g. msg.Message',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=200,
+            help='Rows to update per bulk_update (default: 200)',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Count rows that need metadata without reading any files',
+        )
+
+    def handle(self, *args, **options):
+        tracked = TRACKED_FILE_FIELDS
+        if options['model']:
+            tracked = [(label, field) for label, field in tracked if label.lower() == options['model'].lower()]
+            if not tracked:
+                self.stdout.write(self.style.ERROR(f"No tracked file fields on {options['model']}"))
+                return
+
+        for label, field_name in tracked:
+            model = apps.get_model(label)
+            # Rows with a file but no checksum: never captured, or a direct upload
+            rows = model.objects.exclude(Q(**{field_name: ''}) | Q(**{f'{field_name}__isnull': True})).filter(
+                **{f'{field_name}_checksum': ''}
+            )
+            if options['dry_run']:
+                self.stdout.write(f'{label}.{field_name}: {rows.count()} rows need metadata')
+                continue
+
+            updated = failed = 0
+            batch = []
+            for instance in rows.iterator(chunk_size=options['batch_size']):
+                fieldfile = getattr(instance, field_name)
+                try:
+                    with fieldfile.open('rb') as file:
+                        metadata = read_file_metadata(file, fieldfile.name)
+                except Exception as e:
+                    failed += 1
+                    self.stdout.write(self.style.WARNING(f'{label} {instance.pk}: {fieldfile.name}: {str(e)}'))
+                    continue
+                if getattr(instance, f'{field_name}_content_type'):
+                    # Keep the type verified at upload over a guess from the file name
+                    metadata['content_type'] = getattr(instance, f'{field_name}_content_type')
+                for suffix, value in metadata.items():
+                    setattr(instance, f'{field_name}_{suffix}', value)
+                batch.append(instance)
+
+                if len(batch) >= options['batch_size']:
+                    model.objects.bulk_update(batch, metadata_field_names(field_name))
+                    updated += len(batch)
+                    batch = []
+
+            if batch:
+                model.objects.bulk_update(batch, metadata_field_names(field_name))
+                updated += len(batch)
+            self.stdout.write(self.style.SUCCESS(f'{label}.{field_name}: updated {updated} rows, {failed} failed'))
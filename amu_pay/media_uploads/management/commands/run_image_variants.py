@@ -0,0 +1,67 @@
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from media_uploads.variants import process_pending, queue_missing_variants, release_stale_tasks
+
+
+class Command(BaseCommand):
+    help = 'Render thumbnail/medium variants for uploaded images'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Drain the queue once and exit instead of polling',
+        )
+        parser.add_argument(
+            '--backfill',
+            action='store_true',
+            help='First queue every stored image that has no variants for its current file',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=20,
+            help='Maximum images to process per poll (default: 20)',
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=2.0,
+            help='Seconds to wait when the queue is empty (default: 2.0)',
+        )
+
+    def handle(self, *args, **options):
+        self.running = True
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        if options['backfill']:
+            queued = queue_missing_variants()
+            self.stdout.write(f'Queued {queued} images without variants')
+
+        if options['once']:
+            release_stale_tasks()
+            total = 0
+            while self.running:
+                processed = process_pending(limit=options['batch_size'])
+                total += processed
+                if processed < options['batch_size']:
+                    break
+            self.stdout.write(self.style.SUCCESS(f'Processed {total} image variant tasks'))
+            return
+
+        self.stdout.write(self.style.SUCCESS('Image variant worker started'))
+        while self.running:
+            close_old_connections()
+            release_stale_tasks()
+            processed = process_pending(limit=options['batch_size'])
+            if processed < options['batch_size']:
+                time.sleep(options['sleep'])
+        self.stdout.write(self.style.WARNING('Image variant worker stopped'))
+
+    def stop(self, signum, frame):
+        self.running = False
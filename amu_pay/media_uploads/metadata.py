@@ -0,0 +1,115 @@
+"""
+File metadata stored next to upload fields.
+
+Each tracked FileField/ImageField <field> has sibling columns <field>_size,
+<field>_content_type, <field>_checksum (SHA-256 hex), <field>_width and
+<field>_height. They are filled when a new file is assigned, so serializers
+never have to ask storage (an S3 HEAD request per row) for them.
+Rows that predate the columns are filled by `manage.py backfill_file_metadata`.
+"""
+import hashlib
+import mimetypes
+
+from .uploads import DirectUpload
+
+# (app_label.ModelName, file field) pairs carrying metadata columns
+TRACKED_FILE_FIELDS = [
+    ('msg.Message', 'attachment'),
+    ('hawala.HawalaTransaction', 'receiver_photo'),
+    ('saraf_post.SarafPost', 'photo'),
+    ('saraf_create_accounts.SarafCustomerAccount', 'photo'),
+    ('saraf_account.SarafAccount', 'saraf_logo'),
+    ('saraf_account.SarafAccount', 'saraf_logo_wallpeper'),
+]
+
+METADATA_SUFFIXES = ('size', 'content_type', 'checksum', 'width', 'height')
+
+
+def metadata_field_names(field_name):
+    return [f'{field_name}_{suffix}' for suffix in METADATA_SUFFIXES]
+
+
+def read_file_metadata(file, name='', content_type=None):
+    """Size, content type, SHA-256 checksum and image dimensions of a file object"""
+    checksum = hashlib.sha256()
+    size = 0
+    file.seek(0)
+    for chunk in file.chunks() if hasattr(file, 'chunks') else iter(lambda: file.read(64 * 1024), b''):
+        checksum.update(chunk)
+        size += len(chunk)
+    file.seek(0)
+
+    content_type = content_type or mimetypes.guess_type(name)[0] or ''
+    width = height = None
+    if content_type.startswith('image/'):
+        from PIL import Image
+        try:
+            # Only the header is parsed to read the size
+            with Image.open(file) as image:
+                width, height = image.size
+        except Exception:
+            pass
+        file.seek(0)
+
+    return {
+        'size': size,
+        'content_type': content_type[:100],
+        'checksum': checksum.hexdigest(),
+        'width': width,
+        'height': height,
+    }
+
+
+def _apply(instance, field_name, metadata):
+    for suffix in METADATA_SUFFIXES:
+        setattr(instance, f'{field_name}_{suffix}', metadata[suffix])
+
+
+def capture_file_metadata(instance, *field_names, update_fields=None):
+    """
+    Fill metadata columns for newly assigned files on instance. Call from save().
+
+    Files already in storage are left alone (their metadata was captured at upload
+    or is filled by the backfill command). Returns update_fields extended with the
+    metadata columns, or None when update_fields is None.
+    """
+    captured = []
+    for field_name in field_names:
+        if update_fields is not None and field_name not in update_fields:
+            continue
+        fieldfile = getattr(instance, field_name)
+        if not fieldfile:
+            _apply(instance, field_name, {'size': None, 'content_type': '', 'checksum': '', 'width': None, 'height': None})
+        elif isinstance(fieldfile.name, DirectUpload):
+            # Uploaded straight to storage: size and type were verified when the key was
+            # confirmed; checksum and dimensions are filled later by the backfill command
+            _apply(instance, field_name, {
+                'size': fieldfile.name.size,
+                'content_type': fieldfile.name.content_type,
+                'checksum': '',
+                'width': None,
+                'height': None,
+            })
+        elif not fieldfile._committed:
+            _apply(instance, field_name, read_file_metadata(
+                fieldfile.file, fieldfile.name, getattr(fieldfile.file, 'content_type', None)
+            ))
+        else:
+            continue
+        captured.extend(metadata_field_names(field_name))
+
+    if update_fields is None:
+        return None
+    return list(update_fields) + [name for name in captured if name not in update_fields]
+
+
+def format_file_size(size):
+    """Human-readable size, e.g. '1.5 MB'"""
+    if size is None:
+        return None
+    size = float(size)
+    for unit in ['B', 'KB', 'MB', 'GB']:
+        if size < 1024.0:
+            return f"{size:.1f} {unit}"
+        size /= 1024.0
+    return f"{size:.1f} TB"
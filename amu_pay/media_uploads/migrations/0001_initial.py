@@ -0,0 +1,37 @@
+# Generated by Django 5.2.6 on 2026-10-19 04:13
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageVariantTask',
+            fields=[
+                ('task_id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('model_label', models.CharField(help_text='app_label.ModelName of the owning row', max_length=100)),
+                ('object_id', models.CharField(max_length=64)),
+                ('field_name', models.CharField(max_length=64)),
+                ('source_name', models.CharField(help_text='Storage name of the original image', max_length=255)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('done', 'Done'), ('failed', 'Failed')], default='pending', max_length=20)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True)),
+                ('available_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('locked_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('processed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Image Variant Task',
+                'verbose_name_plural': 'Image Variant Tasks',
+                'indexes': [models.Index(fields=['status', 'available_at'], name='media_uploa_status_ed236a_idx'), models.Index(fields=['model_label', 'object_id', 'field_name'], name='media_uploa_model_l_41c303_idx')],
+            },
+        ),
+    ]
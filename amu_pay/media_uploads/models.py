@@ -0,0 +1,61 @@
+from django.db import models
+from django.utils import timezone
+
+
+class ImageVariantTask(models.Model):
+    """
+    Queued thumbnail/medium generation for one uploaded image.
+    Created when a tracked image field gets a new file; processed by the
+    run_image_variants worker (see media_uploads.variants).
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('processing', 'Processing'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+
+    task_id = models.BigAutoField(primary_key=True)
+    model_label = models.CharField(max_length=100, help_text="app_label.ModelName of the owning row")
+    object_id = models.CharField(max_length=64)
+    field_name = models.CharField(max_length=64)
+    source_name = models.CharField(max_length=255, help_text="Storage name of the original image")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    available_at = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = 'Image Variant Task'
+        verbose_name_plural = 'Image Variant Tasks'
+        indexes = [
+            models.Index(fields=['status', 'available_at']),
+            models.Index(fields=['model_label', 'object_id', 'field_name']),
+        ]
+
+    def __str__(self):
+        return f"Variants for {self.model_label} {self.object_id}.{self.field_name} ({self.status})"
+
+
+class MediaBlob(models.Model):
+    """
+    One file in content-addressed media storage (amu_pay.storage_backends)
+    and how many saves reference it. Uploading a file that is already stored
+    only increments ref_count; the object is deleted when it drops to zero.
+    """
+    checksum = models.CharField(max_length=64, primary_key=True, help_text="SHA-256 hex digest")
+    name = models.CharField(max_length=255, unique=True, help_text="Storage name, cas/<2 hex>/<checksum><ext>")
+    size = models.BigIntegerField()
+    ref_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_referenced_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'Media Blob'
+        verbose_name_plural = 'Media Blobs'
+
+    def __str__(self):
+        return f"{self.name} ({self.ref_count} refs)"
@@ -0,0 +1,367 @@
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+from types import SimpleNamespace
+from unittest.mock import PropertyMock, patch
+
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import DatabaseError, transaction
+from django.test import override_settings
+from PIL import Image
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from msg.models import Conversation, Message
+from msg.serializers import MessageSerializer
+from saraf_account.models import AmuPayCode, SarafAccount
+from saraf_account.serializers import SarafListSerializer
+from amu_pay.storage_backends import ContentAddressedFileSystemStorage, ContentAddressedMediaStorage
+from .models import ImageVariantTask, MediaBlob
+from .uploads import UploadError, confirm_upload
+from .variants import process_pending
+
+MEDIA_ROOT = tempfile.mkdtemp()
+# USE_S3 defaults to on; these tests must not depend on the network or AWS credentials
+FILESYSTEM_STORAGES = {
+    'default': {'BACKEND': 'amu_pay.storage_backends.ContentAddressedFileSystemStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+}
+
+
+def png_bytes(width=30, height=20):
+    buffer = io.BytesIO()
+    Image.new('RGB', (width, height), 'red').save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def jpeg_bytes(width, height, orientation=None):
+    exif = Image.Exif()
+    exif[0x010E] = 'Device owner description'
+    if orientation:
+        exif[0x0112] = orientation
+    buffer = io.BytesIO()
+    Image.new('RGB', (width, height), 'blue').save(buffer, format='JPEG', exif=exif)
+    return buffer.getvalue()
+
+
+@override_settings(
+    MEDIA_ROOT=MEDIA_ROOT,
+    STORAGES=FILESYSTEM_STORAGES,
+    DIRECT_UPLOAD_SETTINGS={'BACKEND': 'local', 'SLOT_EXPIRY_SECONDS': 900},
+)
+class UploadTestCase(APITestCase):
+    """Two sarafs, an authenticated client and the local upload stand-in, on local storage"""
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.sarafs = []
+        for index in (1, 2):
+            AmuPayCode.objects.create(code=f"UPLD{index:04d}CODE")
+            saraf = SarafAccount.objects.create(
+                full_name=f"Upload Saraf {index}",
+                exchange_name=f"Upload Exchange {index}",
+                email=f"upload{index}@example.com",
+                email_or_whatsapp_number=f"+93711000{index:03d}",
+                amu_pay_code=f"UPLD{index:04d}CODE",
+                province="Kabul",
+                is_active=True
+            )
+            self.sarafs.append(saraf)
+        refresh = RefreshToken()
+        refresh['user_type'] = 'saraf'
+        refresh['user_id'] = self.sarafs[0].saraf_id
+        refresh['saraf_id'] = self.sarafs[0].saraf_id
+        refresh['full_name'] = self.sarafs[0].full_name
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+        # request.user of the client above, as SarafJWTAuthentication builds it
+        self.user = SimpleNamespace(is_authenticated=True, user_type='saraf', id=self.sarafs[0].saraf_id)
+
+    def request_slot(self, **overrides):
+        data = {'purpose': 'message_attachment', 'content_type': 'image/png', 'size': 8, 'filename': 'photo.png'}
+        data.update(overrides)
+        return self.client.post('/api/uploads/slots/', data, format='json')
+
+    def assertStoredLocally(self, name):
+        # Files are read back from storage, which must be the local one
+        self.assertTrue(os.path.isfile(os.path.join(MEDIA_ROOT, name)), name)
+
+    def put_file(self, slot, body, content_type=None):
+        return self.client.generic(
+            'PUT', slot['upload']['url'], body,
+            content_type=content_type or slot['upload']['headers']['Content-Type']
+        )
+
+
+class DirectUploadTests(UploadTestCase):
+    """Presigned upload slots with the local filesystem stand-in"""
+    def test_slot_enforces_type_and_size(self):
+        """Slots are only issued for allowed content types within the size limit"""
+        self.assertEqual(self.request_slot(content_type='application/pdf').status_code, 400)
+        self.assertEqual(self.request_slot(size=100 * 1024 * 1024).status_code, 400)
+        self.assertEqual(self.request_slot(purpose='unknown').status_code, 400)
+
+        response = self.request_slot()
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(response.data['key'].startswith('message_files/direct/'))
+        self.assertTrue(response.data['key'].endswith('-photo.png'))
+
+    def test_send_message_with_upload_key(self):
+        """The client uploads directly, then sends the upload key instead of the file"""
+        content = png_bytes()
+        slot = self.request_slot().data
+        self.assertEqual(self.put_file(slot, content).status_code, 201)
+
+        conversation = Conversation.objects.create(conversation_type='direct')
+        conversation.saraf_participants.set(self.sarafs)
+        response = self.client.post('/api/messages/messages/send/', {
+            'conversation_id': conversation.conversation_id,
+            'message_type': 'image',
+            'attachment': slot['upload_key']
+        }, format='json')
+
+        self.assertEqual(response.status_code, 201)
+        message = conversation.messages.get()
+        self.assertEqual(message.attachment.name, slot['key'])
+        self.assertEqual(message.attachment.size, len(content))
+
+    def test_local_upload_enforces_slot(self):
+        """The stand-in rejects other content types and oversized bodies"""
+        slot = self.request_slot().data
+        self.assertEqual(self.put_file(slot, b'data', content_type='image/gif').status_code, 400)
+
+        with self.settings(MESSAGE_SETTINGS={'MAX_FILE_SIZE': 16}):
+            slot = self.request_slot().data
+            self.assertEqual(self.put_file(slot, b'x' * 17).status_code, 400)
+        self.assertEqual(self.client.generic('PUT', '/api/uploads/local/forged/', b'x').status_code, 403)
+
+    def test_confirm_upload_checks_key(self):
+        """Keys are bound to a purpose and a user and must point at an uploaded object"""
+        slot = self.request_slot().data
+        with self.assertRaisesMessage(UploadError, 'Uploaded file not found'):
+            confirm_upload(slot['upload_key'], 'message_attachment', self.user)
+
+        self.put_file(slot, png_bytes())
+        with self.assertRaisesMessage(UploadError, 'different purpose'):
+            confirm_upload(slot['upload_key'], 'post_photo', self.user)
+        with self.assertRaisesMessage(UploadError, 'Invalid upload key'):
+            confirm_upload(slot['upload_key'] + 'x', 'message_attachment', self.user)
+        other_saraf = SimpleNamespace(is_authenticated=True, user_type='saraf', id=self.sarafs[1].saraf_id)
+        normal_user = SimpleNamespace(is_authenticated=True, user_type='normal_user', id=self.user.id)
+        for user in (other_saraf, normal_user, None):
+            with self.assertRaisesMessage(UploadError, 'different user'):
+                confirm_upload(slot['upload_key'], 'message_attachment', user)
+        self.assertEqual(confirm_upload(slot['upload_key'], 'message_attachment', self.user), slot['key'])
+
+    def test_image_keys_must_hold_an_image_of_the_slot_type(self):
+        """Storage only checks the declared Content-Type, so the bytes are opened on confirm"""
+        slot = self.request_slot(purpose='post_photo').data
+        self.put_file(slot, b'<html>not an image</html>')
+        with self.assertRaisesMessage(UploadError, 'not a valid image'):
+            confirm_upload(slot['upload_key'], 'post_photo', self.user)
+
+        slot = self.request_slot(purpose='post_photo').data
+        self.put_file(slot, jpeg_bytes(10, 10))
+        with self.assertRaisesMessage(UploadError, 'does not match'):
+            confirm_upload(slot['upload_key'], 'post_photo', self.user)
+
+        slot = self.request_slot(purpose='message_attachment', content_type='audio/mpeg', filename='note.mp3').data
+        self.put_file(slot, b'ID3 audio bytes')
+        self.assertEqual(confirm_upload(slot['upload_key'], 'message_attachment', self.user), slot['key'])
+
+
+class FileMetadataTests(UploadTestCase):
+    """Size/type/checksum/dimension columns captured at upload time"""
+    def create_conversation(self):
+        conversation = Conversation.objects.create(conversation_type='direct')
+        conversation.saraf_participants.set(self.sarafs)
+        return conversation
+
+    def test_multipart_upload_captures_metadata(self):
+        """A file saved through the model fills every metadata column"""
+        content = png_bytes()
+        message = Message.objects.create(
+            conversation=self.create_conversation(),
+            sender_saraf=self.sarafs[0],
+            message_type='image',
+            content='',
+            attachment=SimpleUploadedFile('photo.png', content, content_type='image/png')
+        )
+        message.refresh_from_db()
+
+        self.assertStoredLocally(message.attachment.name)
+        self.assertEqual(message.attachment_size, len(content))
+        self.assertEqual(message.attachment_content_type, 'image/png')
+        self.assertEqual(message.attachment_checksum, hashlib.sha256(content).hexdigest())
+        self.assertEqual((message.attachment_width, message.attachment_height), (30, 20))
+
+    def test_serializer_reads_columns_only(self):
+        """Serializing attachments never asks storage for the file size"""
+        message = Message.objects.create(
+            conversation=self.create_conversation(),
+            sender_saraf=self.sarafs[0],
+            message_type='image',
+            content='',
+            attachment=SimpleUploadedFile('photo.png', png_bytes(), content_type='image/png')
+        )
+        message = Message.objects.get(pk=message.pk)
+        with patch('django.db.models.fields.files.FieldFile.size', new_callable=PropertyMock) as size:
+            data = MessageSerializer(message).data
+        size.assert_not_called()
+        self.assertEqual(data['attachment_width'], 30)
+        self.assertTrue(data['file_size'].endswith('B'))
+        self.assertEqual(data['attachment'], data['attachment_url'])
+
+    def test_backfill_completes_direct_uploads(self):
+        """Direct uploads store size/type at confirm time; backfill adds checksum and dimensions"""
+        content = png_bytes(12, 34)
+        slot = self.request_slot(size=len(content)).data
+        self.put_file(slot, content)
+        conversation = self.create_conversation()
+        self.client.post('/api/messages/messages/send/', {
+            'conversation_id': conversation.conversation_id,
+            'message_type': 'image',
+            'attachment': slot['upload_key']
+        }, format='json')
+        message = conversation.messages.get()
+        self.assertStoredLocally(message.attachment.name)
+        self.assertEqual(message.attachment_size, len(content))
+        self.assertEqual(message.attachment_checksum, '')
+
+        call_command('backfill_file_metadata', '--model', 'msg.Message', stdout=io.StringIO())
+        message.refresh_from_db()
+        self.assertEqual(message.attachment_checksum, hashlib.sha256(content).hexdigest())
+        self.assertEqual((message.attachment_width, message.attachment_height), (12, 34))
+        self.assertEqual(message.attachment_content_type, 'image/png')
+
+
+@override_settings(IMAGE_VARIANT_SETTINGS={'SIZES': {'thumbnail': 64, 'medium': 256}, 'FORMAT': 'WEBP'})
+class ImageVariantTests(UploadTestCase):
+    """Thumbnail/medium rendering by the image variant worker"""
+    def set_logo(self, content, name='logo.jpg'):
+        saraf = self.sarafs[0]
+        saraf.saraf_logo = SimpleUploadedFile(name, content, content_type='image/jpeg')
+        saraf.save()
+        return saraf
+
+    def test_variants_rendered_and_exposed(self):
+        """Variants are downscaled WebP without EXIF; serializers fall back to the original until ready"""
+        saraf = self.set_logo(jpeg_bytes(600, 300, orientation=6))
+        self.assertEqual(ImageVariantTask.objects.filter(status='pending').count(), 1)
+        data = SarafListSerializer(SarafAccount.objects.get(pk=saraf.pk)).data
+        self.assertEqual(data['saraf_logo_variants']['thumbnail'], data['saraf_logo'])
+
+        self.assertEqual(process_pending(), 1)
+        saraf.refresh_from_db()
+        variants = saraf.saraf_logo_variants
+        self.assertEqual(variants['source'], saraf.saraf_logo.name)
+        for name in (variants['source'], variants['thumbnail'], variants['medium']):
+            self.assertStoredLocally(name)
+        with saraf.saraf_logo.storage.open(variants['thumbnail']) as file, Image.open(file) as image:
+            self.assertEqual(image.format, 'WEBP')
+            # Orientation 6 is applied, so the landscape original becomes portrait
+            self.assertEqual(image.size, (32, 64))
+            self.assertEqual(len(image.getexif()), 0)
+        with saraf.saraf_logo.storage.open(variants['medium']) as file, Image.open(file) as image:
+            self.assertEqual(image.size, (128, 256))
+
+        data = SarafListSerializer(saraf).data
+        self.assertTrue(data['saraf_logo_variants']['thumbnail'].endswith('.webp'))
+        self.assertNotEqual(data['saraf_logo_variants']['medium'], data['saraf_logo'])
+
+        # A plain save of an image that already has variants queues nothing
+        saraf.save()
+        self.assertEqual(ImageVariantTask.objects.count(), 1)
+
+    def test_replaced_image_supersedes_queued_task(self):
+        """A task for an image that was replaced before processing is skipped"""
+        self.set_logo(jpeg_bytes(100, 100))
+        saraf = self.set_logo(jpeg_bytes(200, 100), name='new-logo.jpg')
+        self.assertEqual(process_pending(), 2)
+
+        first, second = ImageVariantTask.objects.order_by('task_id')
+        self.assertEqual(first.last_error, 'Superseded')
+        self.assertEqual(second.status, 'done')
+        saraf.refresh_from_db()
+        self.assertEqual(saraf.saraf_logo_variants['source'], saraf.saraf_logo.name)
+        with saraf.saraf_logo.storage.open(saraf.saraf_logo_variants['thumbnail']) as file, Image.open(file) as image:
+            self.assertEqual(image.size, (64, 32))
+
+    def test_unreadable_image_is_not_requeued(self):
+        """Files Pillow cannot read fail once and keep serving the original"""
+        saraf = self.set_logo(b'not an image')
+        process_pending()
+        self.assertEqual(ImageVariantTask.objects.get().status, 'failed')
+
+        saraf.refresh_from_db()
+        saraf.save()
+        self.assertEqual(ImageVariantTask.objects.count(), 1)
+        data = SarafListSerializer(saraf).data
+        self.assertEqual(data['saraf_logo_variants']['thumbnail'], data['saraf_logo'])
+
+
+class ContentAddressedStorageTests(UploadTestCase):
+    """SHA-256 keyed media storage with reference counts"""
+    def setUp(self):
+        super().setUp()
+        # The mixin itself, on the filesystem, whatever USE_S3 is
+        self.storage = ContentAddressedFileSystemStorage(location=MEDIA_ROOT)
+
+    def test_duplicate_uploads_share_one_object(self):
+        """The same bytes under two names are stored once and counted twice"""
+        content = png_bytes()
+        first = self.storage.save('saraf_photos/logo.png', ContentFile(content))
+        second = self.storage.save('customer_photos/other-name.PNG', ContentFile(content))
+
+        self.assertEqual(first, second)
+        self.assertEqual(first, f"cas/{hashlib.sha256(content).hexdigest()[:2]}/{hashlib.sha256(content).hexdigest()}.png")
+        blob = MediaBlob.objects.get()
+        self.assertEqual((blob.ref_count, blob.size), (2, len(content)))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.storage.delete(first)
+        self.assertTrue(self.storage.exists(first))
+        self.assertEqual(MediaBlob.objects.get().ref_count, 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.storage.delete(first)
+        self.assertFalse(self.storage.exists(first))
+        self.assertFalse(MediaBlob.objects.exists())
+
+    def test_object_is_kept_when_the_delete_rolls_back_or_is_re_referenced(self):
+        """The last reference removes the object only after commit, if nothing saved it again"""
+        content = png_bytes()
+        name = self.storage.save('saraf_photos/logo.png', ContentFile(content))
+        with self.captureOnCommitCallbacks(execute=True), self.assertRaises(DatabaseError):
+            with transaction.atomic():
+                self.storage.delete(name)
+                raise DatabaseError('rolled back')
+        self.assertTrue(self.storage.exists(name))
+        self.assertEqual(MediaBlob.objects.get().ref_count, 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.storage.delete(name)
+            # A concurrent upload of the same bytes before the delete commits
+            self.assertEqual(self.storage.save('customer_photos/again.png', ContentFile(content)), name)
+        self.assertTrue(self.storage.exists(name))
+        self.assertEqual(MediaBlob.objects.get().ref_count, 1)
+
+    def test_model_uploads_are_deduplicated(self):
+        """Two rows uploading the same logo point at the same stored file"""
+        content = png_bytes()
+        for saraf in self.sarafs:
+            saraf.saraf_logo = SimpleUploadedFile('logo.png', content, content_type='image/png')
+            saraf.save()
+        self.assertEqual(self.sarafs[0].saraf_logo.name, self.sarafs[1].saraf_logo.name)
+        self.assertEqual(MediaBlob.objects.get().ref_count, 2)
+
+    def test_s3_objects_are_immutable(self):
+        """Content-addressed S3 objects get a far-future immutable Cache-Control"""
+        storage = ContentAddressedMediaStorage(bucket_name='test-bucket')
+        self.assertIn('immutable', storage.get_object_parameters('cas/ab/abcdef.png')['CacheControl'])
+        self.assertNotIn('immutable', storage.get_object_parameters('saraf_photos/old.png').get('CacheControl', ''))
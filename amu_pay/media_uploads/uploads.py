@@ -0,0 +1,209 @@
+"""
+Presigned direct-to-storage uploads.
+
+1. The client asks for an upload slot (purpose, content type, size) and gets
+   an upload key plus the URL/fields to upload to.
+2. The client uploads the file directly to storage, without passing through
+   an app worker.
+3. The client sends the upload key in place of the file field. The key is
+   verified with confirm_upload() and assigned to the model's FileField by name.
+
+Upload keys are signed, expire after SLOT_EXPIRY_SECONDS and are tied to one
+purpose and to the user who requested the slot. Storage only checks the
+declared Content-Type, so image uploads are opened with Pillow on confirm.
+"""
+import os
+import uuid
+
+from django.conf import settings
+from django.core import signing
+
+from .backends import get_upload_backend
+
+UPLOAD_KEY_SALT = 'media_uploads.upload_key'
+
+IMAGE_CONTENT_TYPES = {
+    'image/jpeg': '.jpg',
+    'image/png': '.png',
+    'image/gif': '.gif',
+    'image/webp': '.webp',
+}
+# What Pillow must identify an uploaded image as, by slot content type
+IMAGE_FORMATS = {
+    'image/jpeg': 'JPEG',
+    'image/png': 'PNG',
+    'image/gif': 'GIF',
+    'image/webp': 'WEBP',
+}
+AUDIO_CONTENT_TYPES = {
+    'audio/mpeg': '.mp3',
+    'audio/wav': '.wav',
+    'audio/x-wav': '.wav',
+    'audio/mp4': '.m4a',
+    'audio/x-m4a': '.m4a',
+    'audio/aac': '.aac',
+}
+
+
+def _upload_purposes():
+    message_settings = getattr(settings, 'MESSAGE_SETTINGS', {})
+    return {
+        'message_attachment': {
+            'prefix': 'message_files/direct/',
+            'content_types': {
+                content_type: extension
+                for content_type, extension in {**IMAGE_CONTENT_TYPES, **AUDIO_CONTENT_TYPES}.items()
+                if extension != '.webp'
+            },
+            'max_size': message_settings.get('MAX_FILE_SIZE', 10 * 1024 * 1024),
+        },
+        'hawala_receiver_photo': {
+            'prefix': 'hawala_receiver_photos/',
+            'content_types': IMAGE_CONTENT_TYPES,
+            'max_size': 10 * 1024 * 1024,
+        },
+        'customer_photo': {
+            'prefix': 'customer_photos/',
+            'content_types': IMAGE_CONTENT_TYPES,
+            'max_size': 5 * 1024 * 1024,
+        },
+        'post_photo': {
+            'prefix': 'posts/direct/',
+            'content_types': IMAGE_CONTENT_TYPES,
+            'max_size': 10 * 1024 * 1024,
+        },
+        'saraf_picture': {
+            'prefix': 'saraf_photos/',
+            'content_types': {
+                content_type: extension
+                for content_type, extension in IMAGE_CONTENT_TYPES.items()
+                if extension != '.gif'
+            },
+            'max_size': 5 * 1024 * 1024,
+        },
+    }
+
+
+class UploadError(ValueError):
+    """Raised when an upload slot request or upload key is invalid"""
+
+
+class DirectUpload(str):
+    """
+    Storage name of a confirmed direct upload.
+
+    A str subclass, so assigning it to a FileField stores the name without
+    re-uploading. It also exposes name/size/content_type like an UploadedFile
+    for existing validators.
+    """
+
+    def __new__(cls, name, size, content_type):
+        value = super().__new__(cls, name)
+        value.size = size
+        value.content_type = content_type
+        return value
+
+    @property
+    def name(self):
+        return str(self)
+
+
+def get_slot_expiry():
+    return getattr(settings, 'DIRECT_UPLOAD_SETTINGS', {}).get('SLOT_EXPIRY_SECONDS', 900)
+
+
+def upload_owner(user):
+    """Who an upload key belongs to: user type and id, or None when not signed in"""
+    if user is None or not getattr(user, 'is_authenticated', False):
+        return None
+    return f"{getattr(user, 'user_type', None) or 'user'}:{user.id}"
+
+
+def _check_image(storage, key, content_type):
+    from PIL import Image, UnidentifiedImageError
+
+    try:
+        with storage.open(key, 'rb') as file, Image.open(file) as image:
+            image_format = image.format
+    except (OSError, UnidentifiedImageError, Image.DecompressionBombError, SyntaxError):
+        raise UploadError('Uploaded file is not a valid image')
+    if image_format != IMAGE_FORMATS[content_type]:
+        raise UploadError('Uploaded image does not match the upload slot content type')
+
+
+def create_upload_slot(user, purpose, content_type, size, filename=''):
+    """Validate a slot request and return the upload key and upload instructions"""
+    purposes = _upload_purposes()
+    if purpose not in purposes:
+        raise UploadError(f"Unknown upload purpose. Must be one of: {', '.join(purposes)}")
+    config = purposes[purpose]
+
+    content_type = (content_type or '').lower()
+    if content_type not in config['content_types']:
+        raise UploadError(f"Content type must be one of: {', '.join(config['content_types'])}")
+    try:
+        size = int(size)
+    except (TypeError, ValueError):
+        raise UploadError('size must be a positive integer')
+    if size <= 0:
+        raise UploadError('size must be a positive integer')
+    if size > config['max_size']:
+        raise UploadError(f"File size cannot exceed {config['max_size'] // (1024 * 1024)}MB")
+
+    # Keep a readable stem from the client filename, but never trust its extension
+    stem = os.path.splitext(os.path.basename(filename or ''))[0][:40]
+    stem = ''.join(c for c in stem if c.isalnum() or c in '-_')
+    key = f"{config['prefix']}{uuid.uuid4().hex}{'-' + stem if stem else ''}{config['content_types'][content_type]}"
+
+    expires_in = get_slot_expiry()
+    upload_key = signing.dumps(
+        {'k': key, 'p': purpose, 'ct': content_type, 'u': upload_owner(user)}, salt=UPLOAD_KEY_SALT
+    )
+    return {
+        'upload_key': upload_key,
+        'key': key,
+        'expires_in': expires_in,
+        'max_size': config['max_size'],
+        'upload': get_upload_backend().presign(key, content_type, config['max_size'], expires_in),
+    }
+
+
+def confirm_upload(upload_key, purpose, user):
+    """Verify an upload key, its owner and the uploaded object; return it as a DirectUpload"""
+    try:
+        slot = signing.loads(upload_key, salt=UPLOAD_KEY_SALT, max_age=get_slot_expiry())
+    except signing.SignatureExpired:
+        raise UploadError('Upload key has expired')
+    except signing.BadSignature:
+        raise UploadError('Invalid upload key')
+    if slot['p'] != purpose:
+        raise UploadError('Upload key was issued for a different purpose')
+    if slot.get('u') is None or slot.get('u') != upload_owner(user):
+        raise UploadError('Upload key was issued to a different user')
+
+    config = _upload_purposes()[purpose]
+    backend = get_upload_backend()
+    info = backend.stat(slot['k'])
+    if info is None:
+        raise UploadError('Uploaded file not found')
+    if info['size'] > config['max_size']:
+        raise UploadError(f"File size cannot exceed {config['max_size'] // (1024 * 1024)}MB")
+    if info['content_type'] is not None and info['content_type'].lower() != slot['ct']:
+        raise UploadError('Uploaded file content type does not match the upload slot')
+    if slot['ct'] in IMAGE_FORMATS:
+        _check_image(backend.storage, slot['k'], slot['ct'])
+    return DirectUpload(slot['k'], info['size'], slot['ct'])
+
+
+def uploaded_file_or_key(request, field, purpose):
+    """
+    Return request.FILES[field], or the confirmed direct upload when the
+    client sent an upload key in that field instead. Raises UploadError.
+    """
+    uploaded_file = request.FILES.get(field)
+    if uploaded_file:
+        return uploaded_file
+    upload_key = request.data.get(field)
+    if isinstance(upload_key, str) and upload_key:
+        return confirm_upload(upload_key, purpose, request.user)
+    return None
@@ -0,0 +1,9 @@
+from django.urls import path
+from .views import UploadSlotView, local_upload
+
+app_name = 'media_uploads'
+
+urlpatterns = [
+    path('slots/', UploadSlotView.as_view(), name='upload_slot'),
+    path('local/<str:token>/', local_upload, name='local_upload'),
+]
@@ -0,0 +1,296 @@
+"""
+Thumbnail and medium variants for uploaded images.
+
+List screens (saraf list, post feed, customer list) only need small images,
+but every upload was served at its original resolution. When a tracked image
+field gets a new file, the model's save() queues an ImageVariantTask; the
+run_image_variants worker renders each size in IMAGE_VARIANT_SETTINGS as
+WebP (or JPEG), applies the EXIF orientation, drops EXIF/XMP metadata
+(GPS position, device info) and never upscales.
+
+Variant names are stored on the row in <field>_variants, e.g.
+{'source': 'posts/a.jpg', 'thumbnail': 'posts/a.thumbnail.webp', 'medium': ...}.
+Variants only count while 'source' matches the field's current file, so a
+replaced image falls back to the original URL until its variants are ready.
+"""
+import io
+import logging
+import os
+from datetime import timedelta
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import ImageVariantTask
+
+logger = logging.getLogger(__name__)
+
+# (app_label.ModelName, image field) pairs with a <field>_variants column
+TRACKED_IMAGE_FIELDS = [
+    ('saraf_account.SarafAccount', 'saraf_logo'),
+    ('saraf_account.SarafAccount', 'saraf_logo_wallpeper'),
+    ('saraf_account.SarafAccount', 'front_id_card'),
+    ('saraf_account.SarafAccount', 'back_id_card'),
+    ('saraf_post.SarafPost', 'photo'),
+    ('saraf_create_accounts.SarafCustomerAccount', 'photo'),
+    ('hawala.HawalaTransaction', 'receiver_photo'),
+]
+
+DEFAULT_SIZES = {'thumbnail': 256, 'medium': 1024}
+DEFAULT_MAX_ATTEMPTS = 5
+MAX_RETRY_DELAY_SECONDS = 300
+# A task left in 'processing' this long belongs to a worker that died
+STALE_LOCK_SECONDS = 300
+
+
+class VariantError(ValueError):
+    """The source file cannot be turned into variants; retrying will not help"""
+
+
+def _variant_settings():
+    return getattr(settings, 'IMAGE_VARIANT_SETTINGS', {})
+
+
+def variant_sizes():
+    """Variant name -> longest edge in pixels"""
+    return _variant_settings().get('SIZES', DEFAULT_SIZES)
+
+
+def _image_format():
+    return 'JPEG' if _variant_settings().get('FORMAT', 'WEBP').upper() in ('JPEG', 'JPG') else 'WEBP'
+
+
+def variant_name(source_name, variant, image_format):
+    root = os.path.splitext(source_name)[0]
+    return f"{root}.{variant}.{'jpg' if image_format == 'JPEG' else 'webp'}"
+
+
+def render_variants(file):
+    """
+    Render every configured size from an image file object.
+    Returns {variant: encoded bytes}. Raises VariantError for unreadable or oversized images.
+    """
+    from PIL import Image, ImageOps, UnidentifiedImageError
+
+    config = _variant_settings()
+    sizes = variant_sizes()
+    image_format = _image_format()
+    max_pixels = config.get('MAX_SOURCE_PIXELS', 50_000_000)
+
+    try:
+        with Image.open(file) as image:
+            if image.width * image.height > max_pixels:
+                raise VariantError(f"Image is {image.width}x{image.height}, above the {max_pixels} pixel limit")
+            # Let the JPEG decoder scale down while decoding instead of after
+            image.draft('RGB', (max(sizes.values()), max(sizes.values())))
+            image = ImageOps.exif_transpose(image)
+    except (UnidentifiedImageError, Image.DecompressionBombError, SyntaxError) as e:
+        raise VariantError(f"Not a readable image: {str(e)}")
+
+    has_alpha = image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info)
+    if has_alpha and image_format == 'WEBP':
+        image = image.convert('RGBA')
+    elif has_alpha:
+        # JPEG has no alpha channel: flatten onto white
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image.convert('RGBA'), mask=image.convert('RGBA').getchannel('A'))
+        image = background
+    else:
+        image = image.convert('RGB')
+
+    rendered = {}
+    # Largest first, each smaller size is resized from the previous one
+    for variant, edge in sorted(sizes.items(), key=lambda item: item[1], reverse=True):
+        image = image.copy()
+        image.thumbnail((edge, edge), Image.Resampling.LANCZOS)
+        # Saving a fresh info dict keeps EXIF/XMP/comments out of the output
+        image.info = {}
+        buffer = io.BytesIO()
+        if image_format == 'JPEG':
+            image.save(buffer, format='JPEG', quality=config.get('QUALITY', 80), optimize=True, progressive=True)
+        else:
+            image.save(buffer, format='WEBP', quality=config.get('QUALITY', 80), method=4)
+        rendered[variant] = buffer.getvalue()
+    return rendered
+
+
+def queue_image_variants(instance, *field_names, update_fields=None):
+    """
+    Queue variant generation for image fields whose file has no variants yet.
+    Call from save() after the row is written.
+    """
+    for field_name in field_names:
+        if update_fields is not None and field_name not in update_fields:
+            continue
+        fieldfile = getattr(instance, field_name)
+        if not fieldfile or getattr(instance, f'{field_name}_variants', {}).get('source') == fieldfile.name:
+            continue
+        lookup = {
+            'model_label': instance._meta.label,
+            'object_id': str(instance.pk),
+            'field_name': field_name,
+            'source_name': fieldfile.name,
+        }
+        if ImageVariantTask.objects.filter(status__in=['pending', 'processing'], **lookup).exists():
+            continue
+        task = ImageVariantTask.objects.create(**lookup)
+        if not _variant_settings().get('ASYNC', True):
+            task_id = task.task_id
+            transaction.on_commit(lambda: process_pending(task_id=task_id))
+
+
+def image_variant_urls(fieldfile, variants, request=None):
+    """
+    {variant: url} for an image field. Sizes without a rendered variant for
+    the current file use the original URL. Returns None when there is no file.
+    """
+    if not fieldfile:
+        return None
+    variants = variants or {}
+    current = variants.get('source') == fieldfile.name
+    original_url = None
+    urls = {}
+    for variant in variant_sizes():
+        if current and variants.get(variant):
+            url = fieldfile.storage.url(variants[variant])
+        else:
+            original_url = original_url or fieldfile.url
+            url = original_url
+        urls[variant] = request.build_absolute_uri(url) if request else url
+    return urls
+
+
+def release_stale_tasks():
+    """Return tasks abandoned by a crashed worker to the queue"""
+    cutoff = timezone.now() - timedelta(seconds=STALE_LOCK_SECONDS)
+    return ImageVariantTask.objects.filter(status='processing', locked_at__lt=cutoff).update(
+        status='pending', locked_at=None
+    )
+
+
+def claim_next_task(task_id=None):
+    """Claim the oldest due task (or the given one), or return None"""
+    now = timezone.now()
+    candidates = ImageVariantTask.objects.filter(status='pending', available_at__lte=now)
+    if task_id is not None:
+        candidates = candidates.filter(task_id=task_id)
+    for candidate_id in candidates.order_by('task_id').values_list('task_id', flat=True)[:10]:
+        # Compare-and-set so concurrent workers never claim the same task
+        claimed = ImageVariantTask.objects.filter(task_id=candidate_id, status='pending').update(
+            status='processing', locked_at=now, attempts=F('attempts') + 1
+        )
+        if claimed:
+            return ImageVariantTask.objects.get(task_id=candidate_id)
+    return None
+
+
+def _finish(task, status, error=''):
+    ImageVariantTask.objects.filter(task_id=task.task_id).update(
+        status=status, processed_at=timezone.now(), locked_at=None, last_error=error
+    )
+
+
+def process_task(task):
+    """Render and store the variants for one claimed task; retry with backoff on storage errors"""
+    model = apps.get_model(task.model_label)
+    instance = model.objects.filter(pk=task.object_id).first()
+    fieldfile = getattr(instance, task.field_name, None) if instance else None
+    if not fieldfile or fieldfile.name != task.source_name:
+        # Row deleted or image replaced since the task was queued
+        _finish(task, 'done', 'Superseded')
+        return True
+
+    variants_field = f'{task.field_name}_variants'
+    previous = getattr(instance, variants_field) or {}
+    image_format = _image_format()
+    saved = []
+    try:
+        with fieldfile.open('rb') as file:
+            rendered = render_variants(file)
+        variants = {'source': task.source_name}
+        for variant, content in rendered.items():
+            name = fieldfile.storage.save(variant_name(task.source_name, variant, image_format), ContentFile(content))
+            saved.append(name)
+            variants[variant] = name
+    except VariantError as e:
+        # Record the source as handled so the row is not queued again on every save
+        model.objects.filter(pk=instance.pk, **{task.field_name: task.source_name}).update(
+            **{variants_field: {'source': task.source_name}}
+        )
+        _finish(task, 'failed', str(e))
+        logger.warning(f"No image variants for {task.model_label} {task.object_id}.{task.field_name}: {str(e)}")
+        return False
+    except Exception as e:
+        for name in saved:
+            fieldfile.storage.delete(name)
+        max_attempts = _variant_settings().get('MAX_ATTEMPTS', DEFAULT_MAX_ATTEMPTS)
+        delay = min(2 ** task.attempts, MAX_RETRY_DELAY_SECONDS)
+        ImageVariantTask.objects.filter(task_id=task.task_id).update(
+            status='failed' if task.attempts >= max_attempts else 'pending',
+            available_at=timezone.now() + timedelta(seconds=delay),
+            locked_at=None,
+            last_error=str(e)
+        )
+        logger.error(f"Image variant task {task.task_id} failed (attempt {task.attempts}): {str(e)}")
+        return False
+
+    # Only attach the variants if the row still points at the same image. Bump
+    # updated_at too, so conditional GET (utils.conditional) serves the new URLs
+    changes = {variants_field: variants}
+    if any(field.name == 'updated_at' for field in model._meta.concrete_fields):
+        changes['updated_at'] = timezone.now()
+    updated = model.objects.filter(pk=instance.pk, **{task.field_name: task.source_name}).update(**changes)
+    stale = saved if not updated else [
+        name for key, name in previous.items() if key != 'source' and name not in saved
+    ]
+    for name in stale:
+        try:
+            fieldfile.storage.delete(name)
+        except Exception as e:
+            logger.warning(f"Could not delete old image variant {name}: {str(e)}")
+    _finish(task, 'done', '' if updated else 'Superseded')
+    return True
+
+
+def process_pending(limit=100, task_id=None):
+    """Process up to limit due tasks in order. Returns the number processed."""
+    processed = 0
+    while processed < limit:
+        task = claim_next_task(task_id=task_id)
+        if task is None:
+            break
+        process_task(task)
+        processed += 1
+        if task_id is not None:
+            break
+    return processed
+
+
+def queue_missing_variants(batch_size=500):
+    """Queue tasks for stored images that have no variants for their current file"""
+    queued = 0
+    for label, field_name in TRACKED_IMAGE_FIELDS:
+        model = apps.get_model(label)
+        rows = model.objects.exclude(**{field_name: ''}).exclude(**{f'{field_name}__isnull': True}).only(
+            model._meta.pk.attname, field_name, f'{field_name}_variants'
+        )
+        pending = set(ImageVariantTask.objects.filter(
+            model_label=label, field_name=field_name, status__in=['pending', 'processing']
+        ).values_list('object_id', 'source_name'))
+        tasks = []
+        for instance in rows.iterator(chunk_size=batch_size):
+            name = getattr(instance, field_name).name
+            if (getattr(instance, f'{field_name}_variants') or {}).get('source') == name:
+                continue
+            if (str(instance.pk), name) in pending:
+                continue
+            tasks.append(ImageVariantTask(
+                model_label=label, object_id=str(instance.pk), field_name=field_name, source_name=name
+            ))
+        ImageVariantTask.objects.bulk_create(tasks, batch_size=batch_size)
+        queued += len(tasks)
+    return queued
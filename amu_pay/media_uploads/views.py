@@ -0,0 +1,85 @@
+from rest_framework.views import APIView
+from rest_framework.response import Response
+from rest_framework import status
+from rest_framework.permissions import IsAuthenticated
+from django.conf import settings
+from django.core import signing
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.http import Http404, JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_http_methods
+
+from .backends import LOCAL_UPLOAD_SALT
+from .uploads import UploadError, create_upload_slot, get_slot_expiry
+import logging
+
+logger = logging.getLogger(__name__)
+
+LOCAL_UPLOAD_CHUNK_SIZE = 64 * 1024
+
+
+class UploadSlotView(APIView):
+    """
+    Request a presigned upload slot.
+    Body: purpose, content_type, size (bytes) and optional filename.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        try:
+            slot = create_upload_slot(
+                user=request.user,
+                purpose=request.data.get('purpose'),
+                content_type=request.data.get('content_type'),
+                size=request.data.get('size'),
+                filename=request.data.get('filename', '')
+            )
+            return Response(slot, status=status.HTTP_201_CREATED)
+        except UploadError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            logger.error(f"Error in UploadSlotView: {str(e)}")
+            return Response({'error': 'Internal server error'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@csrf_exempt
+@require_http_methods(['PUT'])
+def local_upload(request, token):
+    """
+    Local filesystem stand-in for the presigned storage URL (development and tests).
+    Accepts the raw file body and enforces the slot's content type and size limit.
+    """
+    if getattr(settings, 'DIRECT_UPLOAD_SETTINGS', {}).get('BACKEND', 'local') != 'local':
+        raise Http404
+    try:
+        slot = signing.loads(token, salt=LOCAL_UPLOAD_SALT, max_age=get_slot_expiry())
+    except signing.BadSignature:
+        return JsonResponse({'error': 'Invalid or expired upload URL'}, status=403)
+
+    content_type = request.META.get('CONTENT_TYPE', '').split(';')[0].strip().lower()
+    if content_type != slot['ct']:
+        return JsonResponse({'error': 'Content-Type does not match the upload slot'}, status=400)
+
+    # Read in chunks so an oversized body is rejected without buffering all of it
+    chunks = []
+    received = 0
+    while True:
+        chunk = request.read(LOCAL_UPLOAD_CHUNK_SIZE)
+        if not chunk:
+            break
+        received += len(chunk)
+        if received > slot['max']:
+            return JsonResponse({'error': 'File exceeds the maximum upload size'}, status=400)
+        chunks.append(chunk)
+    if not received:
+        return JsonResponse({'error': 'Empty upload'}, status=400)
+
+    if hasattr(default_storage, 'save_exact'):
+        # Content-addressed storage would rename the file; the slot key must be kept
+        default_storage.save_exact(slot['k'], ContentFile(b''.join(chunks)))
+    else:
+        if default_storage.exists(slot['k']):
+            default_storage.delete(slot['k'])
+        default_storage.save(slot['k'], ContentFile(b''.join(chunks)))
+    return JsonResponse({'key': slot['k']}, status=201)
@@ -1,5 +1,7 @@
 from django.contrib import admin
-from .models import Conversation, Message, MessageDelivery, MessageNotification
+from .models import (
+    Conversation, ConversationParticipant, Message, MessageDelivery, MessageFanoutTask, MessageNotification
+)
 
 @admin.register(Conversation)
 class ConversationAdmin(admin.ModelAdmin):
@@ -57,3 +59,22 @@ class MessageNotificationAdmin(admin.ModelAdmin):
     def get_recipient_display(self, obj):
         return obj.get_recipient_name()
     get_recipient_display.short_description = 'Recipient'
+
+@admin.register(ConversationParticipant)
+class ConversationParticipantAdmin(admin.ModelAdmin):
+    list_display = ['participant_id', 'conversation', 'get_participant_display', 'unread_count', 'last_read_message_id', 'last_message_at', 'is_deleted']
+    list_filter = ['is_deleted', 'last_message_at']
+    search_fields = ['saraf_account__full_name', 'normal_user__full_name']
+    readonly_fields = ['participant_id', 'created_at', 'updated_at']
+    
+    def get_participant_display(self, obj):
+        participant = obj.get_participant()
+        return participant.full_name if participant else 'Unknown Participant'
+    get_participant_display.short_description = 'Participant'
+
+@admin.register(MessageFanoutTask)
+class MessageFanoutTaskAdmin(admin.ModelAdmin):
+    list_display = ['task_id', 'message', 'conversation', 'status', 'attempts', 'available_at', 'processed_at']
+    list_filter = ['status', 'created_at']
+    search_fields = ['message__content', 'last_error']
+    readonly_fields = ['task_id', 'created_at', 'processed_at', 'locked_at']
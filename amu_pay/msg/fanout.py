@@ -0,0 +1,175 @@
+"""
+Asynchronous fan-out for sent messages.
+
+Send views commit the message, the participant counters and a MessageFanoutTask
+in one short transaction and return. The run_message_fanout worker then creates
+the in-app notifications, writes the ActionLog entry and sends the
+message_fanned_out signal for push integrations, so send latency no longer
+grows with the number of participants.
+
+Ordering: a task is only claimed when no earlier task of the same conversation
+is still pending or processing, so recipients see notifications in send order
+even with several workers running.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef
+from django.utils import timezone
+
+from .models import MessageFanoutTask, MessageNotification
+from .signals import message_fanned_out
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_ATTEMPTS = 5
+MAX_RETRY_DELAY_SECONDS = 300
+# A task left in 'processing' this long belongs to a worker that died
+STALE_LOCK_SECONDS = 300
+
+
+def _message_settings():
+    return getattr(settings, 'MESSAGE_SETTINGS', {})
+
+
+def enqueue_fanout(message, action_log=None):
+    """
+    Queue post-send work for a message. Call inside the send transaction.
+
+    action_log holds the ActionLog fields known only at request time
+    (user_type, user_id, user_name, ip_address, user_agent, employee_name).
+    When MESSAGE_SETTINGS['ASYNC_FANOUT'] is off the task runs right after commit.
+    """
+    task = MessageFanoutTask.objects.create(
+        message=message,
+        conversation_id=message.conversation_id,
+        payload={'action_log': action_log} if action_log else {}
+    )
+    if not _message_settings().get('ASYNC_FANOUT', True):
+        conversation_id = message.conversation_id
+        transaction.on_commit(lambda: process_pending(conversation_id=conversation_id))
+    return task
+
+
+def release_stale_tasks():
+    """Return tasks abandoned by a crashed worker to the queue"""
+    cutoff = timezone.now() - timedelta(seconds=STALE_LOCK_SECONDS)
+    return MessageFanoutTask.objects.filter(status='processing', locked_at__lt=cutoff).update(
+        status='pending', locked_at=None
+    )
+
+
+def claim_next_task(conversation_id=None):
+    """
+    Claim the oldest runnable task, or return None.
+    A task is runnable when it is due and no earlier task of its conversation is unfinished.
+    """
+    now = timezone.now()
+    earlier_unfinished = MessageFanoutTask.objects.filter(
+        conversation_id=OuterRef('conversation_id'),
+        task_id__lt=OuterRef('task_id'),
+        status__in=['pending', 'processing']
+    )
+    candidates = MessageFanoutTask.objects.filter(status='pending', available_at__lte=now)
+    if conversation_id is not None:
+        candidates = candidates.filter(conversation_id=conversation_id)
+    candidates = candidates.exclude(Exists(earlier_unfinished)).order_by('task_id')
+
+    for task_id in candidates.values_list('task_id', flat=True)[:10]:
+        # Compare-and-set so concurrent workers never claim the same task
+        claimed = MessageFanoutTask.objects.filter(task_id=task_id, status='pending').update(
+            status='processing', locked_at=now, attempts=F('attempts') + 1
+        )
+        if claimed:
+            return MessageFanoutTask.objects.select_related(
+                'message', 'message__sender_employee'
+            ).get(task_id=task_id)
+    return None
+
+
+def process_task(task):
+    """Run one claimed task; on failure schedule a retry with exponential backoff"""
+    message = task.message
+    try:
+        with transaction.atomic():
+            recipient_saraf_ids = _create_notifications(message)
+            _write_action_log(task, message, len(recipient_saraf_ids))
+            MessageFanoutTask.objects.filter(task_id=task.task_id).update(
+                status='done', processed_at=timezone.now(), locked_at=None, last_error=''
+            )
+    except Exception as e:
+        max_attempts = _message_settings().get('FANOUT_MAX_ATTEMPTS', DEFAULT_MAX_ATTEMPTS)
+        failed = task.attempts >= max_attempts
+        delay = min(2 ** task.attempts, MAX_RETRY_DELAY_SECONDS)
+        MessageFanoutTask.objects.filter(task_id=task.task_id).update(
+            status='failed' if failed else 'pending',
+            available_at=timezone.now() + timedelta(seconds=delay),
+            locked_at=None,
+            last_error=str(e)
+        )
+        logger.error(f"Fan-out task {task.task_id} for message {message.message_id} failed "
+                     f"(attempt {task.attempts}): {str(e)}")
+        return False
+
+    try:
+        message_fanned_out.send(sender=message.__class__, message=message, recipient_saraf_ids=recipient_saraf_ids)
+    except Exception as e:
+        # Push delivery is best effort; notifications are already committed
+        logger.error(f"Push event for message {message.message_id} failed: {str(e)}")
+    return True
+
+
+def process_pending(limit=100, conversation_id=None):
+    """Process up to limit runnable tasks in order. Returns the number processed."""
+    processed = 0
+    while processed < limit:
+        task = claim_next_task(conversation_id=conversation_id)
+        if task is None:
+            break
+        process_task(task)
+        processed += 1
+    return processed
+
+
+def _create_notifications(message):
+    """In-app notifications for every saraf participant except the sender"""
+    recipient_saraf_ids = list(
+        message.conversation.saraf_participants.exclude(
+            saraf_id=message.sender_saraf_id
+        ).values_list('saraf_id', flat=True)
+    )
+    if _message_settings().get('ENABLE_IN_APP_NOTIFICATIONS', True):
+        MessageNotification.objects.bulk_create([
+            MessageNotification(message=message, recipient_saraf_id=saraf_id, is_read=False)
+            for saraf_id in recipient_saraf_ids
+        ], batch_size=500)
+    return recipient_saraf_ids
+
+
+def _write_action_log(task, message, recipient_count):
+    """Write the send_message audit entry captured at request time"""
+    action_log = task.payload.get('action_log')
+    if not action_log or not message.sender_saraf_id:
+        return
+    from saraf_account.models import ActionLog
+
+    employee_name = action_log.get('employee_name')
+    ActionLog.objects.create(
+        saraf_id=message.sender_saraf_id,
+        user_type=action_log['user_type'],
+        user_id=action_log['user_id'],
+        user_name=action_log['user_name'],
+        action_type='send_message',
+        description=f'Sent message {message.message_id} in conversation {message.conversation_id}' + (f' (by employee: {employee_name})' if employee_name else ''),
+        ip_address=action_log.get('ip_address'),
+        user_agent=action_log.get('user_agent', ''),
+        metadata={
+            'message_id': message.message_id,
+            'conversation_id': message.conversation_id,
+            'message_type': message.message_type,
+            'recipient_count': recipient_count,
+            'sent_at': message.created_at.isoformat()
+        }
+    )
@@ -0,0 +1,112 @@
+import statistics
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+from rest_framework.test import APIRequestFactory
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from msg.models import Conversation
+from msg.views import SendMessageView
+from saraf_account.models import SarafAccount
+
+BENCHMARK_EMAIL_DOMAIN = 'send-benchmark.invalid'
+
+
+class Command(BaseCommand):
+    help = 'Measure SendMessageView latency against conversation size, with async and inline fan-out'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes',
+            default='2,10,50,200',
+            help='Comma separated participant counts (default: 2,10,50,200)',
+        )
+        parser.add_argument(
+            '--messages',
+            type=int,
+            default=20,
+            help='Messages to send per conversation and mode (default: 20)',
+        )
+
+    def handle(self, *args, **options):
+        sizes = [int(size) for size in options['sizes'].split(',') if size.strip()]
+        if SarafAccount.objects.filter(email__endswith=f'@{BENCHMARK_EMAIL_DOMAIN}').exists():
+            self.cleanup()
+
+        sarafs = self.create_sarafs(max(sizes))
+        sender = sarafs[0]
+        factory = APIRequestFactory()
+        view = SendMessageView.as_view()
+        token = self.sender_token(sender)
+
+        self.stdout.write(f"{'participants':>12} {'mode':>8} {'p50 ms':>9} {'p95 ms':>9} {'queries':>8}")
+        try:
+            for size in sizes:
+                for mode, async_fanout in (('async', True), ('inline', False)):
+                    conversation = Conversation.objects.create(conversation_type='direct', title=f'Benchmark {size}')
+                    conversation.saraf_participants.set(sarafs[:size])
+
+                    message_settings = {**settings.MESSAGE_SETTINGS, 'ASYNC_FANOUT': async_fanout}
+                    timings = []
+                    query_counts = []
+                    with override_settings(MESSAGE_SETTINGS=message_settings):
+                        for index in range(options['messages']):
+                            request = factory.post('/api/messages/messages/send/', {
+                                'conversation_id': conversation.conversation_id,
+                                'content': f'Benchmark message {index}',
+                                'message_type': 'text'
+                            }, format='json', HTTP_AUTHORIZATION=f'Bearer {token}')
+                            with CaptureQueriesContext(connection) as queries:
+                                started = time.perf_counter()
+                                response = view(request)
+                                timings.append((time.perf_counter() - started) * 1000)
+                            if response.status_code != 201:
+                                self.stdout.write(self.style.ERROR(f'Send failed: {response.data}'))
+                                return
+                            query_counts.append(len(queries))
+
+                    p95 = statistics.quantiles(timings, n=20)[-1] if len(timings) > 1 else timings[0]
+                    self.stdout.write(
+                        f'{size:>12} {mode:>8} {statistics.median(timings):>9.2f} {p95:>9.2f} '
+                        f'{max(query_counts):>8}'
+                    )
+        finally:
+            self.cleanup()
+
+    def create_sarafs(self, count):
+        SarafAccount.objects.bulk_create([
+            SarafAccount(
+                full_name=f'Benchmark Saraf {index}',
+                exchange_name=f'Benchmark Exchange {index}',
+                email=f'saraf{index}@{BENCHMARK_EMAIL_DOMAIN}',
+                email_or_whatsapp_number=f'+93799{index:06d}',
+                amu_pay_code=f'BENCH{index:06d}',
+                province='Kabul',
+                is_active=True
+            )
+            for index in range(count)
+        ], batch_size=500)
+        return list(SarafAccount.objects.filter(
+            email__endswith=f'@{BENCHMARK_EMAIL_DOMAIN}'
+        ).order_by('saraf_id'))
+
+    def sender_token(self, saraf):
+        refresh = RefreshToken()
+        refresh['user_type'] = 'saraf'
+        refresh['user_id'] = saraf.saraf_id
+        refresh['saraf_id'] = saraf.saraf_id
+        refresh['full_name'] = saraf.full_name
+        return str(refresh.access_token)
+
+    def cleanup(self):
+        """Remove benchmark sarafs and their conversations"""
+        sarafs = SarafAccount.objects.filter(email__endswith=f'@{BENCHMARK_EMAIL_DOMAIN}')
+        Conversation.objects.filter(
+            conversation_id__in=Conversation.saraf_participants.through.objects.filter(
+                sarafaccount__in=sarafs
+            ).values('conversation_id')
+        ).delete()
+        sarafs.delete()
@@ -0,0 +1,58 @@
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from msg.fanout import process_pending, release_stale_tasks
+
+
+class Command(BaseCommand):
+    help = 'Process queued message fan-out tasks (notifications, audit log, push events)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Drain the queue once and exit instead of polling',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=100,
+            help='Maximum tasks to process per poll (default: 100)',
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=1.0,
+            help='Seconds to wait when the queue is empty (default: 1.0)',
+        )
+
+    def handle(self, *args, **options):
+        self.running = True
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        if options['once']:
+            release_stale_tasks()
+            total = 0
+            while True:
+                processed = process_pending(limit=options['batch_size'])
+                total += processed
+                if processed < options['batch_size']:
+                    break
+            self.stdout.write(self.style.SUCCESS(f'Processed {total} fan-out tasks'))
+            return
+
+        self.stdout.write(self.style.SUCCESS('Message fan-out worker started'))
+        while self.running:
+            close_old_connections()
+            release_stale_tasks()
+            processed = process_pending(limit=options['batch_size'])
+            if processed < options['batch_size']:
+                time.sleep(options['sleep'])
+        self.stdout.write(self.style.WARNING('Message fan-out worker stopped'))
+
+    def stop(self, signum, frame):
+        self.running = False
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.6 on 2026-10-19 03:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('msg', '0001_initial'),
+        ('normal_user_account', '0003_alter_normaluser_email'),
+        ('saraf_account', '0004_remove_sarafaccount_whatsapp_number_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ConversationParticipant',
+            fields=[
+                ('participant_id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('unread_count', models.PositiveIntegerField(default=0)),
+                ('last_read_message_id', models.BigIntegerField(blank=True, help_text='Highest message_id read by this participant', null=True)),
+                ('last_message_at', models.DateTimeField(help_text='Time of the latest message (or conversation creation)')),
+                ('is_deleted', models.BooleanField(default=False, help_text='Conversation soft-deleted by this participant')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('conversation', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='participant_states', to='msg.conversation')),
+                ('normal_user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='conversation_states', to='normal_user_account.normaluser')),
+                ('saraf_account', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='conversation_states', to='saraf_account.sarafaccount')),
+            ],
+            options={
+                'verbose_name': 'Conversation Participant',
+                'verbose_name_plural': 'Conversation Participants',
+                'indexes': [models.Index(fields=['saraf_account', 'is_deleted', 'last_message_at'], name='msg_convers_saraf_a_86187c_idx'), models.Index(fields=['normal_user', 'is_deleted', 'last_message_at'], name='msg_convers_normal__41f84c_idx')],
+                'constraints': [models.UniqueConstraint(fields=('conversation', 'saraf_account'), name='unique_conversation_saraf_state'), models.UniqueConstraint(fields=('conversation', 'normal_user'), name='unique_conversation_normal_user_state')],
+            },
+        ),
+    ]
@@ -0,0 +1,79 @@
+from django.db import migrations
+from django.db.models import Count, Max, Q
+
+
+def backfill_participant_states(apps, schema_editor):
+    """Create ConversationParticipant rows for existing conversations"""
+    Conversation = apps.get_model('msg', 'Conversation')
+    ConversationParticipant = apps.get_model('msg', 'ConversationParticipant')
+    Message = apps.get_model('msg', 'Message')
+    MessageDelivery = apps.get_model('msg', 'MessageDelivery')
+
+    last_message_at = dict(
+        Message.objects.values('conversation_id').annotate(last=Max('created_at')).values_list('conversation_id', 'last')
+    )
+    last_message_id = dict(
+        Message.objects.values('conversation_id').annotate(last=Max('message_id')).values_list('conversation_id', 'last')
+    )
+    unread_filter = Q(delivery_status__in=['sent', 'delivered'])
+    saraf_unread = {
+        (row['message__conversation_id'], row['recipient_saraf_id']): row['unread']
+        for row in MessageDelivery.objects.filter(unread_filter, recipient_saraf__isnull=False).values(
+            'message__conversation_id', 'recipient_saraf_id'
+        ).annotate(unread=Count('delivery_id'))
+    }
+    normal_user_unread = {
+        (row['message__conversation_id'], row['recipient_normal_user_id']): row['unread']
+        for row in MessageDelivery.objects.filter(unread_filter, recipient_normal_user__isnull=False).values(
+            'message__conversation_id', 'recipient_normal_user_id'
+        ).annotate(unread=Count('delivery_id'))
+    }
+
+    states = []
+    for conversation in Conversation.objects.prefetch_related(
+        'saraf_participants', 'normal_user_participants',
+        'deleted_by_saraf_participants', 'deleted_by_normal_user_participants'
+    ).iterator(chunk_size=500):
+        conversation_id = conversation.conversation_id
+        activity_at = last_message_at.get(conversation_id) or conversation.created_at
+        deleted_saraf_ids = {p.saraf_id for p in conversation.deleted_by_saraf_participants.all()}
+        deleted_user_ids = {p.user_id for p in conversation.deleted_by_normal_user_participants.all()}
+
+        for saraf in conversation.saraf_participants.all():
+            unread = saraf_unread.get((conversation_id, saraf.saraf_id), 0)
+            states.append(ConversationParticipant(
+                conversation_id=conversation_id,
+                saraf_account_id=saraf.saraf_id,
+                unread_count=unread,
+                last_read_message_id=None if unread else last_message_id.get(conversation_id),
+                last_message_at=activity_at,
+                is_deleted=saraf.saraf_id in deleted_saraf_ids,
+            ))
+        for normal_user in conversation.normal_user_participants.all():
+            unread = normal_user_unread.get((conversation_id, normal_user.user_id), 0)
+            states.append(ConversationParticipant(
+                conversation_id=conversation_id,
+                normal_user_id=normal_user.user_id,
+                unread_count=unread,
+                last_read_message_id=None if unread else last_message_id.get(conversation_id),
+                last_message_at=activity_at,
+                is_deleted=normal_user.user_id in deleted_user_ids,
+            ))
+
+        if len(states) >= 1000:
+            ConversationParticipant.objects.bulk_create(states, ignore_conflicts=True)
+            states = []
+
+    if states:
+        ConversationParticipant.objects.bulk_create(states, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('msg', '0002_conversationparticipant'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_participant_states, migrations.RunPython.noop),
+    ]
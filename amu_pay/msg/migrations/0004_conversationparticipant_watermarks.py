@@ -0,0 +1,28 @@
+# Generated by Django 5.2.6 on 2026-10-19 03:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('msg', '0003_backfill_conversation_participants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='conversationparticipant',
+            name='last_delivered_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='conversationparticipant',
+            name='last_delivered_message_id',
+            field=models.BigIntegerField(blank=True, help_text='Highest message_id delivered to this participant', null=True),
+        ),
+        migrations.AddField(
+            model_name='conversationparticipant',
+            name='last_read_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
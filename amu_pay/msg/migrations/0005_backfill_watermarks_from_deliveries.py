@@ -0,0 +1,90 @@
+from django.db import migrations
+from django.db.models import Max
+
+
+def backfill_watermarks(apps, schema_editor):
+    """Derive delivered/read watermarks from existing MessageDelivery rows"""
+    ConversationParticipant = apps.get_model('msg', 'ConversationParticipant')
+    Message = apps.get_model('msg', 'Message')
+    MessageDelivery = apps.get_model('msg', 'MessageDelivery')
+
+    def watermark_map(statuses, recipient_field):
+        rows = MessageDelivery.objects.filter(
+            delivery_status__in=statuses,
+            **{f'{recipient_field}__isnull': False}
+        ).values('message__conversation_id', f'{recipient_field}_id').annotate(
+            watermark=Max('message_id'),
+            at=Max('read_at' if statuses == ['read'] else 'delivered_at')
+        )
+        return {
+            (row['message__conversation_id'], row[f'{recipient_field}_id']): (row['watermark'], row['at'])
+            for row in rows
+        }
+
+    # A participant has always delivered/read their own messages
+    def sent_map(sender_field):
+        rows = Message.objects.filter(**{f'{sender_field}__isnull': False}).values(
+            'conversation_id', f'{sender_field}_id'
+        ).annotate(watermark=Max('message_id'), at=Max('created_at'))
+        return {
+            (row['conversation_id'], row[f'{sender_field}_id']): (row['watermark'], row['at'])
+            for row in rows
+        }
+
+    sources = {
+        'saraf_account': (
+            watermark_map(['delivered', 'read'], 'recipient_saraf'),
+            watermark_map(['read'], 'recipient_saraf'),
+            sent_map('sender_saraf'),
+        ),
+        'normal_user': (
+            watermark_map(['delivered', 'read'], 'recipient_normal_user'),
+            watermark_map(['read'], 'recipient_normal_user'),
+            sent_map('sender_normal_user'),
+        ),
+    }
+
+    def highest(*candidates):
+        present = [c for c in candidates if c and c[0] is not None]
+        if not present:
+            return None, None
+        return max(present, key=lambda c: c[0])
+
+    batch = []
+    for state in ConversationParticipant.objects.all().iterator(chunk_size=1000):
+        field = 'saraf_account' if state.saraf_account_id else 'normal_user'
+        delivered_map, read_map, own_map = sources[field]
+        key = (state.conversation_id, getattr(state, f'{field}_id'))
+        own = own_map.get(key)
+        existing_read = (state.last_read_message_id, state.updated_at) if state.last_read_message_id else None
+
+        read_id, read_at = highest(read_map.get(key), own, existing_read)
+        delivered_id, delivered_at = highest(delivered_map.get(key), own, (read_id, read_at) if read_id else None)
+
+        state.last_read_message_id = read_id
+        state.last_read_at = read_at
+        state.last_delivered_message_id = delivered_id
+        state.last_delivered_at = delivered_at
+        batch.append(state)
+
+        if len(batch) >= 1000:
+            ConversationParticipant.objects.bulk_update(batch, [
+                'last_read_message_id', 'last_read_at', 'last_delivered_message_id', 'last_delivered_at'
+            ])
+            batch = []
+
+    if batch:
+        ConversationParticipant.objects.bulk_update(batch, [
+            'last_read_message_id', 'last_read_at', 'last_delivered_message_id', 'last_delivered_at'
+        ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('msg', '0004_conversationparticipant_watermarks'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_watermarks, migrations.RunPython.noop),
+    ]
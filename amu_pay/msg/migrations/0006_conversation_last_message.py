@@ -0,0 +1,38 @@
+# Generated by Django 5.2.6 on 2026-10-19 03:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('msg', '0005_backfill_watermarks_from_deliveries'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='conversation',
+            name='last_message_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='conversation',
+            name='last_message_id',
+            field=models.BigIntegerField(blank=True, help_text='message_id of the latest message', null=True),
+        ),
+        migrations.AddField(
+            model_name='conversation',
+            name='last_message_preview',
+            field=models.CharField(blank=True, default='', max_length=103),
+        ),
+        migrations.AddField(
+            model_name='conversation',
+            name='last_message_sender_name',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='conversation',
+            name='last_message_type',
+            field=models.CharField(blank=True, default='', max_length=10),
+        ),
+    ]
@@ -0,0 +1,60 @@
+from django.db import migrations
+
+
+def backfill_last_message(apps, schema_editor):
+    """Copy each conversation's latest message into the denormalized columns"""
+    Conversation = apps.get_model('msg', 'Conversation')
+    Message = apps.get_model('msg', 'Message')
+
+    batch = []
+    for conversation in Conversation.objects.all().iterator(chunk_size=500):
+        message = Message.objects.filter(
+            conversation_id=conversation.conversation_id
+        ).select_related('sender_saraf', 'sender_normal_user', 'sender_employee').order_by('-message_id').first()
+        if not message:
+            continue
+
+        # Historical models have no custom methods, so mirror get_sender_display_name
+        if message.sender_employee_id and message.sender_saraf_id:
+            sender_name = f"{message.sender_saraf.full_name} ({message.sender_employee.full_name})"
+        elif message.sender_saraf_id:
+            sender_name = message.sender_saraf.full_name
+        elif message.sender_normal_user_id:
+            sender_name = message.sender_normal_user.full_name
+        else:
+            sender_name = "Unknown Sender"
+
+        preview = message.content[:100]
+        if len(message.content) > 100:
+            preview += "..."
+
+        conversation.last_message_id = message.message_id
+        conversation.last_message_preview = preview
+        conversation.last_message_sender_name = sender_name[:255]
+        conversation.last_message_type = message.message_type
+        conversation.last_message_at = message.created_at
+        batch.append(conversation)
+
+        if len(batch) >= 500:
+            Conversation.objects.bulk_update(batch, [
+                'last_message_id', 'last_message_preview', 'last_message_sender_name',
+                'last_message_type', 'last_message_at'
+            ])
+            batch = []
+
+    if batch:
+        Conversation.objects.bulk_update(batch, [
+            'last_message_id', 'last_message_preview', 'last_message_sender_name',
+            'last_message_type', 'last_message_at'
+        ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('msg', '0006_conversation_last_message'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_last_message, migrations.RunPython.noop),
+    ]
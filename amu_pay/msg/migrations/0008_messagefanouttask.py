@@ -0,0 +1,36 @@
+# Generated by Django 5.2.6 on 2026-10-19 04:00
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('msg', '0007_backfill_conversation_last_message'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MessageFanoutTask',
+            fields=[
+                ('task_id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('done', 'Done'), ('failed', 'Failed')], default='pending', max_length=20)),
+                ('payload', models.JSONField(blank=True, default=dict)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True)),
+                ('available_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('locked_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('processed_at', models.DateTimeField(blank=True, null=True)),
+                ('conversation', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='fanout_tasks', to='msg.conversation')),
+                ('message', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='fanout_task', to='msg.message')),
+            ],
+            options={
+                'verbose_name': 'Message Fan-out Task',
+                'verbose_name_plural': 'Message Fan-out Tasks',
+                'indexes': [models.Index(fields=['status', 'available_at'], name='msg_message_status_eb5cc3_idx'), models.Index(fields=['conversation', 'status'], name='msg_message_convers_bd21ff_idx')],
+            },
+        ),
+    ]
@@ -3,6 +3,8 @@ from django.utils import timezone
 from django.core.validators import FileExtensionValidator
 import os
 
+from media_uploads.metadata import capture_file_metadata, format_file_size
+
 def message_file_upload_path(instance, filename):
     """Generate upload path for message files"""
     return f'message_files/{instance.conversation.conversation_id}/{filename}'
@@ -24,6 +26,13 @@ class Conversation(models.Model):
     title = models.CharField(max_length=255, blank=True, help_text="Optional title for the conversation")
     is_active = models.BooleanField(default=True)
     
+    # Denormalized copy of the latest message for conversation lists
+    last_message_id = models.BigIntegerField(null=True, blank=True, help_text="message_id of the latest message")
+    last_message_preview = models.CharField(max_length=103, blank=True, default='')
+    last_message_sender_name = models.CharField(max_length=255, blank=True, default='')
+    last_message_type = models.CharField(max_length=10, blank=True, default='')
+    last_message_at = models.DateTimeField(null=True, blank=True)
+    
     # Soft delete fields for individual users
     deleted_by_saraf_participants = models.ManyToManyField('saraf_account.SarafAccount', related_name='deleted_conversations', blank=True)
     deleted_by_normal_user_participants = models.ManyToManyField('normal_user_account.NormalUser', related_name='deleted_conversations', blank=True)
@@ -60,23 +69,49 @@ class Conversation(models.Model):
     
     def get_last_message(self):
         """Get the most recent message in this conversation"""
-        return self.messages.order_by('-created_at').first()
+        if self.last_message_id is None:
+            return None
+        return self.messages.filter(message_id=self.last_message_id).first()
+    
+    def get_last_message_preview(self):
+        """Build the last message preview from the denormalized columns only"""
+        if self.last_message_id is None:
+            return None
+        return {
+            'content': self.last_message_preview,
+            'sender': self.last_message_sender_name,
+            'message_type': self.last_message_type,
+            'created_at': self.last_message_at
+        }
+    
+    def record_last_message(self, message):
+        """Atomically store message as the latest one unless a newer one is already recorded"""
+        preview = message.content[:100]
+        if len(message.content) > 100:
+            preview += "..."
+        now = timezone.now()
+        Conversation.objects.filter(
+            models.Q(last_message_id__isnull=True) | models.Q(last_message_id__lt=message.message_id),
+            conversation_id=self.conversation_id
+        ).update(
+            last_message_id=message.message_id,
+            last_message_preview=preview,
+            last_message_sender_name=message.get_sender_display_name()[:255],
+            last_message_type=message.message_type,
+            last_message_at=message.created_at,
+            updated_at=now
+        )
+        self.refresh_from_db(fields=[
+            'last_message_id', 'last_message_preview', 'last_message_sender_name',
+            'last_message_type', 'last_message_at', 'updated_at'
+        ])
     
     def get_unread_count(self, user):
         """Get unread message count for a specific user"""
-        # Handle both SarafAccount and NormalUser
-        if hasattr(user, 'saraf_id'):
-            # SarafAccount
-            return self.messages.filter(
-                deliveries__recipient_saraf=user,
-                deliveries__delivery_status__in=['sent', 'delivered']
-            ).count()
-        elif hasattr(user, 'user_id'):
-            # NormalUser
-            return self.messages.filter(
-                deliveries__recipient_normal_user=user,
-                deliveries__delivery_status__in=['sent', 'delivered']
-            ).count()
+        # Read from the denormalized per-participant counter
+        state = self.get_participant_state(user)
+        if state:
+            return state.unread_count
         return 0
     
     def is_deleted_by_user(self, user):
@@ -97,6 +132,7 @@ class Conversation(models.Model):
         elif hasattr(user, 'user_id'):
             # NormalUser
             self.deleted_by_normal_user_participants.add(user)
+        ConversationParticipant.objects.for_user(user).filter(conversation=self).update(is_deleted=True)
         self.save()
     
     def restore_for_user(self, user):
@@ -107,8 +143,41 @@ class Conversation(models.Model):
         elif hasattr(user, 'user_id'):
             # NormalUser
             self.deleted_by_normal_user_participants.remove(user)
+        ConversationParticipant.objects.for_user(user).filter(conversation=self).update(is_deleted=False)
         self.save()
     
+    def get_participant_state(self, user):
+        """Get the ConversationParticipant state row for a specific user"""
+        return ConversationParticipant.objects.for_user(user).filter(conversation=self).first()
+    
+    def ensure_participant_states(self):
+        """Create missing ConversationParticipant rows for current participants"""
+        existing_saraf_ids = set(self.participant_states.filter(
+            saraf_account__isnull=False
+        ).values_list('saraf_account_id', flat=True))
+        existing_user_ids = set(self.participant_states.filter(
+            normal_user__isnull=False
+        ).values_list('normal_user_id', flat=True))
+        
+        activity_at = self.created_at or timezone.now()
+        states = []
+        for saraf_id in self.saraf_participants.values_list('saraf_id', flat=True):
+            if saraf_id not in existing_saraf_ids:
+                states.append(ConversationParticipant(
+                    conversation=self,
+                    saraf_account_id=saraf_id,
+                    last_message_at=activity_at
+                ))
+        for user_id in self.normal_user_participants.values_list('user_id', flat=True):
+            if user_id not in existing_user_ids:
+                states.append(ConversationParticipant(
+                    conversation=self,
+                    normal_user_id=user_id,
+                    last_message_at=activity_at
+                ))
+        if states:
+            ConversationParticipant.objects.bulk_create(states, ignore_conflicts=True)
+    
     def is_visible_to_user(self, user):
         """Check if conversation is visible to specific user (not deleted by them)"""
         return not self.is_deleted_by_user(user)
@@ -136,6 +205,12 @@ class Message(models.Model):
         ],
         help_text="Audio or image file attachment"
     )
+    # Attachment metadata captured at upload (see media_uploads.metadata)
+    attachment_size = models.BigIntegerField(null=True, blank=True)
+    attachment_content_type = models.CharField(max_length=100, blank=True, default='')
+    attachment_checksum = models.CharField(max_length=64, blank=True, default='', help_text="SHA-256 hex digest")
+    attachment_width = models.PositiveIntegerField(null=True, blank=True)
+    attachment_height = models.PositiveIntegerField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     
     class Meta:
@@ -152,6 +227,10 @@ class Message(models.Model):
         sender_name = self.get_sender_display_name()
         return f"{sender_name}: {self.content[:50]}{'...' if len(self.content) > 50 else ''}"
     
+    def save(self, *args, **kwargs):
+        kwargs['update_fields'] = capture_file_metadata(self, 'attachment', update_fields=kwargs.get('update_fields'))
+        super().save(*args, **kwargs)
+    
     def get_sender_display_name(self):
         """Get the display name of the sender"""
         if self.sender_employee:
@@ -163,20 +242,42 @@ class Message(models.Model):
         return "Unknown Sender"
     
     def get_file_size(self):
-        """Get human-readable file size"""
+        """Get human-readable file size from the stored attachment metadata"""
         if self.attachment:
-            size = self.attachment.size
-            for unit in ['B', 'KB', 'MB', 'GB']:
-                if size < 1024.0:
-                    return f"{size:.1f} {unit}"
-                size /= 1024.0
+            return format_file_size(self.attachment_size)
         return None
     
     def is_file_message(self):
         """Check if this message has a file attachment"""
         return bool(self.attachment)
+    
+    def is_sent_by(self, state):
+        """Check if the participant owning a ConversationParticipant row sent this message"""
+        if state.saraf_account_id:
+            return self.sender_saraf_id == state.saraf_account_id and not self.sender_normal_user_id
+        return bool(state.normal_user_id) and self.sender_normal_user_id == state.normal_user_id
+    
+    def get_recipient_statuses(self, participant_states=None):
+        """Derive per-recipient delivery status from participant watermarks"""
+        if participant_states is None:
+            participant_states = self.conversation.participant_states.select_related('saraf_account', 'normal_user')
+        return [
+            {
+                'recipient': state.get_participant(),
+                'delivery_status': state.get_delivery_status(self.message_id),
+                'sent_at': self.created_at,
+                'delivered_at': state.last_delivered_at if state.has_delivered(self.message_id) else None,
+                'read_at': state.last_read_at if state.has_read(self.message_id) else None,
+            }
+            for state in participant_states
+            if state.conversation_id == self.conversation_id and not self.is_sent_by(state)
+        ]
 
 class MessageDelivery(models.Model):
+    """
+    Legacy per-recipient delivery row. New messages track delivery and read
+    state through ConversationParticipant watermarks instead.
+    """
     DELIVERY_STATUS_CHOICES = [
         ('sent', 'Sent'),
         ('delivered', 'Delivered'),
@@ -272,3 +373,187 @@ class MessageNotification(models.Model):
     
     def __str__(self):
         return f"In-app notification for {self.message} to {self.get_recipient_name()}"
+
+
+class ConversationParticipantQuerySet(models.QuerySet):
+    def for_user(self, user):
+        """Filter state rows belonging to a SarafAccount or NormalUser"""
+        if hasattr(user, 'saraf_id'):
+            return self.filter(saraf_account_id=user.saraf_id)
+        elif hasattr(user, 'user_id'):
+            return self.filter(normal_user_id=user.user_id)
+        return self.none()
+    
+    def visible(self):
+        """State rows for active conversations the participant has not deleted"""
+        return self.filter(is_deleted=False, conversation__is_active=True)
+
+class ConversationParticipant(models.Model):
+    """
+    Per-participant conversation state with denormalized unread counter.
+    One row per (conversation, participant); maintained on send and read so the
+    conversation list is a range scan instead of a join over all deliveries.
+    
+    Delivery and read receipts are stored as high-water marks: every message
+    with message_id <= last_read_message_id counts as read by this participant.
+    """
+    participant_id = models.BigAutoField(primary_key=True)
+    conversation = models.ForeignKey(Conversation, on_delete=models.CASCADE, related_name='participant_states')
+    saraf_account = models.ForeignKey('saraf_account.SarafAccount', on_delete=models.CASCADE, related_name='conversation_states', null=True, blank=True)
+    normal_user = models.ForeignKey('normal_user_account.NormalUser', on_delete=models.CASCADE, related_name='conversation_states', null=True, blank=True)
+    unread_count = models.PositiveIntegerField(default=0)
+    last_delivered_message_id = models.BigIntegerField(null=True, blank=True, help_text="Highest message_id delivered to this participant")
+    last_delivered_at = models.DateTimeField(null=True, blank=True)
+    last_read_message_id = models.BigIntegerField(null=True, blank=True, help_text="Highest message_id read by this participant")
+    last_read_at = models.DateTimeField(null=True, blank=True)
+    last_message_at = models.DateTimeField(help_text="Time of the latest message (or conversation creation)")
+    is_deleted = models.BooleanField(default=False, help_text="Conversation soft-deleted by this participant")
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    objects = ConversationParticipantQuerySet.as_manager()
+    
+    class Meta:
+        verbose_name = 'Conversation Participant'
+        verbose_name_plural = 'Conversation Participants'
+        constraints = [
+            models.UniqueConstraint(fields=['conversation', 'saraf_account'], name='unique_conversation_saraf_state'),
+            models.UniqueConstraint(fields=['conversation', 'normal_user'], name='unique_conversation_normal_user_state'),
+        ]
+        indexes = [
+            models.Index(fields=['saraf_account', 'is_deleted', 'last_message_at']),
+            models.Index(fields=['normal_user', 'is_deleted', 'last_message_at']),
+        ]
+    
+    def get_participant(self):
+        """Get the participant (either SarafAccount or NormalUser)"""
+        if self.saraf_account_id:
+            return self.saraf_account
+        elif self.normal_user_id:
+            return self.normal_user
+        return None
+    
+    def __str__(self):
+        participant = self.get_participant()
+        name = participant.full_name if participant else "Unknown Participant"
+        return f"{name} in conversation {self.conversation_id} ({self.unread_count} unread)"
+    
+    def has_delivered(self, message_id):
+        """Check if the delivered watermark covers a message"""
+        return self.last_delivered_message_id is not None and self.last_delivered_message_id >= message_id
+    
+    def has_read(self, message_id):
+        """Check if the read watermark covers a message"""
+        return self.last_read_message_id is not None and self.last_read_message_id >= message_id
+    
+    def get_delivery_status(self, message_id):
+        """Status of a message for this participant derived from the watermarks"""
+        if self.has_read(message_id):
+            return 'read'
+        if self.has_delivered(message_id):
+            return 'delivered'
+        return 'sent'
+    
+    @classmethod
+    def record_message(cls, message):
+        """Update every participant's state for a newly sent message"""
+        now = timezone.now()
+        states = cls.objects.filter(conversation_id=message.conversation_id)
+        if message.sender_normal_user_id:
+            sender_states = states.filter(normal_user_id=message.sender_normal_user_id)
+        elif message.sender_saraf_id:
+            sender_states = states.filter(saraf_account_id=message.sender_saraf_id)
+        else:
+            sender_states = states.none()
+        
+        states.exclude(pk__in=sender_states.values('pk')).update(
+            unread_count=models.F('unread_count') + 1,
+            last_message_at=message.created_at,
+            updated_at=now
+        )
+        # The sender has implicitly read everything up to their own message
+        sender_states.update(
+            unread_count=0,
+            last_delivered_message_id=message.message_id,
+            last_delivered_at=now,
+            last_read_message_id=message.message_id,
+            last_read_at=now,
+            last_message_at=message.created_at,
+            updated_at=now
+        )
+    
+    @classmethod
+    def mark_conversation_read(cls, conversation, user):
+        """Move both watermarks to the latest message for a user who opened the conversation"""
+        last_message_id = conversation.messages.order_by('-message_id').values_list('message_id', flat=True).first()
+        if last_message_id is None:
+            return
+        cls.advance_watermarks(conversation.conversation_id, user, last_message_id, 'read')
+    
+    @classmethod
+    def advance_watermarks(cls, conversation_id, user, message_id, delivery_status):
+        """
+        Move the delivered (and for 'read', the read) watermark forward to message_id.
+        Watermarks never move backwards. Returns True if the read watermark changed.
+        """
+        now = timezone.now()
+        states = cls.objects.for_user(user).filter(conversation_id=conversation_id)
+        states.filter(
+            models.Q(last_delivered_message_id__isnull=True) | models.Q(last_delivered_message_id__lt=message_id)
+        ).update(last_delivered_message_id=message_id, last_delivered_at=now, updated_at=now)
+        
+        if delivery_status != 'read':
+            return False
+        
+        updated = states.filter(
+            models.Q(last_read_message_id__isnull=True) | models.Q(last_read_message_id__lt=message_id)
+        ).update(last_read_message_id=message_id, last_read_at=now, updated_at=now)
+        if updated:
+            # Unread = messages from other participants above the new read watermark
+            messages = Message.objects.filter(conversation_id=conversation_id, message_id__gt=message_id)
+            if hasattr(user, 'saraf_id'):
+                messages = messages.exclude(sender_saraf_id=user.saraf_id, sender_normal_user__isnull=True)
+            elif hasattr(user, 'user_id'):
+                messages = messages.exclude(sender_normal_user_id=user.user_id)
+            states.update(unread_count=messages.count())
+            if hasattr(user, 'saraf_id'):
+                from saraf_account.dashboard import invalidate_dashboard
+                invalidate_dashboard(user.saraf_id, 'messages')
+        return bool(updated)
+
+
+class MessageFanoutTask(models.Model):
+    """
+    Queued post-send work for a message: in-app notifications, the audit log
+    entry and push events. Send views only commit the message and this row;
+    the run_message_fanout worker processes tasks in task_id order per conversation.
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('processing', 'Processing'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+    
+    task_id = models.BigAutoField(primary_key=True)
+    message = models.OneToOneField(Message, on_delete=models.CASCADE, related_name='fanout_task')
+    conversation = models.ForeignKey(Conversation, on_delete=models.CASCADE, related_name='fanout_tasks')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    payload = models.JSONField(default=dict, blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    available_at = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        verbose_name = 'Message Fan-out Task'
+        verbose_name_plural = 'Message Fan-out Tasks'
+        indexes = [
+            models.Index(fields=['status', 'available_at']),
+            models.Index(fields=['conversation', 'status']),
+        ]
+    
+    def __str__(self):
+        return f"Fan-out task {self.task_id} for message {self.message_id} ({self.status})"
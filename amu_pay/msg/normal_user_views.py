@@ -9,10 +9,10 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
 from django.db import transaction
 from django.core.paginator import Paginator
-from django.utils import timezone
-from django.db.models import Q, Count
 
-from .models import Conversation, Message, MessageDelivery, MessageNotification
+from .models import Conversation, ConversationParticipant, Message, MessageNotification
+from .fanout import enqueue_fanout
+from .pagination import InvalidCursor, paginate_messages
 from .serializers import (
     ConversationSerializer, SendMessageSerializer, MessageSerializer,
     MessageStatusSerializer, ConversationListSerializer, MessageNotificationSerializer
@@ -67,29 +67,26 @@ class NormalUserConversationListView(APIView):
             normal_user_id = user_info['normal_user_id']
             normal_user = NormalUser.objects.get(user_id=normal_user_id)
             
-            # Get conversations where user is a participant and not deleted by them
-            conversations = Conversation.objects.filter(
-                normal_user_participants=normal_user,
-                is_active=True
-            ).exclude(
-                deleted_by_normal_user_participants=normal_user
-            ).annotate(
-                unread_count=Count(
-                    'messages__deliveries',
-                    filter=Q(
-                        messages__deliveries__recipient_normal_user=normal_user,
-                        messages__deliveries__delivery_status__in=['sent', 'delivered']
-                    )
-                )
-            ).order_by('-updated_at')
+            # Range scan over the user's participant state rows (not deleted by them)
+            participant_states = ConversationParticipant.objects.for_user(normal_user).visible().select_related(
+                'conversation'
+            ).prefetch_related(
+                'conversation__saraf_participants',
+                'conversation__normal_user_participants'
+            ).order_by('-last_message_at', '-conversation_id')
             
             # Pagination
             page = request.GET.get('page', 1)
             page_size = request.GET.get('page_size', 20)
-            paginator = Paginator(conversations, page_size)
+            paginator = Paginator(participant_states, page_size)
             page_obj = paginator.get_page(page)
             
-            serializer = ConversationListSerializer(page_obj.object_list, many=True, context={'request': request})
+            conversations = []
+            for state in page_obj.object_list:
+                state.conversation.unread_count = state.unread_count
+                conversations.append(state.conversation)
+            
+            serializer = ConversationListSerializer(conversations, many=True, context={'request': request})
             
             return Response({
                 'conversations': serializer.data,
@@ -195,37 +192,39 @@ class NormalUserConversationDetailView(APIView):
             except Conversation.DoesNotExist:
                 return Response({'error': 'Conversation not found'}, status=status.HTTP_404_NOT_FOUND)
             
-            # Get messages with pagination
-            messages = conversation.messages.all().order_by('created_at')
-            
-            page = request.GET.get('page', 1)
-            page_size = request.GET.get('page_size', 50)
-            paginator = Paginator(messages, page_size)
-            page_obj = paginator.get_page(page)
+            if 'page' in request.GET:
+                # Legacy offset pagination, kept for clients that still send ?page=
+                messages = conversation.messages.all().order_by('created_at')
+                page_size = request.GET.get('page_size', 50)
+                paginator = Paginator(messages, page_size)
+                page_obj = paginator.get_page(request.GET.get('page'))
+                message_list = page_obj.object_list
+                pagination = {
+                    'current_page': page_obj.number,
+                    'total_pages': paginator.num_pages,
+                    'total_count': paginator.count,
+                    'has_next': page_obj.has_next(),
+                    'has_previous': page_obj.has_previous()
+                }
+            else:
+                # Cursor pagination: latest N, ?before=<message_id> or ?since=<message_id>
+                try:
+                    message_list, pagination = paginate_messages(conversation, request.GET)
+                except InvalidCursor as e:
+                    return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
             
-            # Mark messages as read for this user
-            MessageDelivery.objects.filter(
-                message__conversation=conversation,
-                recipient_normal_user=normal_user,
-                delivery_status__in=['sent', 'delivered']
-            ).update(
-                delivery_status='read',
-                read_at=timezone.now()
-            )
+            # Mark messages as read for this user by moving the read watermark.
+            # Scrolling back through older history does not change what has been read.
+            if not request.GET.get('before'):
+                ConversationParticipant.mark_conversation_read(conversation, normal_user)
             
             conversation_serializer = ConversationSerializer(conversation, context={'request': request})
-            messages_serializer = MessageSerializer(page_obj.object_list, many=True)
+            messages_serializer = MessageSerializer(message_list, many=True)
             
             return Response({
                 'conversation': conversation_serializer.data,
                 'messages': messages_serializer.data,
-                'pagination': {
-                    'current_page': page_obj.number,
-                    'total_pages': paginator.num_pages,
-                    'total_count': paginator.count,
-                    'has_next': page_obj.has_next(),
-                    'has_previous': page_obj.has_previous()
-                }
+                'pagination': pagination
             }, status=status.HTTP_200_OK)
             
         except NormalUser.DoesNotExist:
@@ -288,7 +287,7 @@ class NormalUserSendMessageView(APIView):
             normal_user_id = user_info['normal_user_id']
             normal_user = NormalUser.objects.get(user_id=normal_user_id)
             
-            serializer = SendMessageSerializer(data=request.data)
+            serializer = SendMessageSerializer(data=request.data, context={'request': request})
             
             if serializer.is_valid():
                 with transaction.atomic():
@@ -297,35 +296,26 @@ class NormalUserSendMessageView(APIView):
                     conversation = Conversation.objects.get(conversation_id=conversation_id)
                     
                     # Verify user is participant
-                    if normal_user not in conversation.normal_user_participants.all():
+                    if not conversation.normal_user_participants.filter(user_id=normal_user_id).exists():
                         return Response({'error': 'You are not a participant in this conversation'}, status=status.HTTP_403_FORBIDDEN)
                     
                     # Create message
                     message = Message.objects.create(
                         conversation=conversation,
                         sender_normal_user=normal_user,
-                        content=serializer.validated_data['content'],
+                        content=serializer.validated_data.get('content', ''),
                         message_type=serializer.validated_data['message_type'],
                         attachment=serializer.validated_data.get('attachment')
                     )
                     
-                    # Create delivery records for saraf participants
-                    saraf_recipients = conversation.saraf_participants.all()
-                    deliveries = []
-                    for recipient in saraf_recipients:
-                        deliveries.append(MessageDelivery(
-                            message=message,
-                            recipient_saraf=recipient,
-                            delivery_status='sent'
-                        ))
-                    MessageDelivery.objects.bulk_create(deliveries)
+                    # Delivery and read state is tracked by participant watermarks
+                    ConversationParticipant.record_message(message)
                     
-                    # Update conversation timestamp
-                    conversation.updated_at = timezone.now()
-                    conversation.save(update_fields=['updated_at'])
+                    # Update conversation timestamp and last message preview
+                    conversation.record_last_message(message)
                     
-                    # Create in-app notifications for saraf recipients
-                    self.create_in_app_notifications(message, saraf_recipients)
+                    # In-app notifications for saraf recipients run in the fan-out worker
+                    enqueue_fanout(message)
                 
                 response_serializer = MessageSerializer(message)
                 return Response(response_serializer.data, status=status.HTTP_201_CREATED)
@@ -337,17 +327,6 @@ class NormalUserSendMessageView(APIView):
         except Exception as e:
             logger.error(f"Error in NormalUserSendMessageView: {str(e)}")
             return Response({'error': 'Internal server error'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-    
-    def create_in_app_notifications(self, message, saraf_recipients):
-        """Create in-app notifications for saraf recipients"""
-        notifications = []
-        for recipient in saraf_recipients:
-            notifications.append(MessageNotification(
-                message=message,
-                recipient_saraf=recipient,
-                is_read=False
-            ))
-        MessageNotification.objects.bulk_create(notifications)
 
 
 class NormalUserMessageStatusView(APIView):
@@ -366,24 +345,28 @@ class NormalUserMessageStatusView(APIView):
             normal_user_id = user_info['normal_user_id']
             normal_user = NormalUser.objects.get(user_id=normal_user_id)
             
-            # Get message delivery record
-            try:
-                delivery = MessageDelivery.objects.get(
-                    message_id=message_id,
-                    recipient_normal_user=normal_user
-                )
-            except MessageDelivery.DoesNotExist:
-                # Check if the user is the sender of the message
-                try:
-                    message = Message.objects.get(message_id=message_id, sender_normal_user=normal_user)
-                    # User is the sender, they can't update delivery status for their own messages
-                    return Response({'error': 'You cannot update delivery status for messages you sent'}, status=status.HTTP_400_BAD_REQUEST)
-                except Message.DoesNotExist:
-                    return Response({'error': 'Message not found or you are not authorized to update its status'}, status=status.HTTP_404_NOT_FOUND)
-            
-            serializer = MessageStatusSerializer(delivery, data=request.data, partial=True)
+            # Get the message and the user's participant state in its conversation
+            message = Message.objects.filter(message_id=message_id).first()
+            participant_state = None
+            if message:
+                participant_state = ConversationParticipant.objects.for_user(normal_user).filter(
+                    conversation_id=message.conversation_id
+                ).first()
+            if not participant_state:
+                return Response({'error': 'Message not found or you are not authorized to update its status'}, status=status.HTTP_404_NOT_FOUND)
+            
+            # User is the sender, they can't update delivery status for their own messages
+            if message.is_sent_by(participant_state):
+                return Response({'error': 'You cannot update delivery status for messages you sent'}, status=status.HTTP_400_BAD_REQUEST)
+            
+            serializer = MessageStatusSerializer(data=request.data)
             if serializer.is_valid():
-                serializer.save()
+                ConversationParticipant.advance_watermarks(
+                    message.conversation_id,
+                    normal_user,
+                    message.message_id,
+                    serializer.validated_data['delivery_status']
+                )
                 return Response({'message': 'Status updated successfully'}, status=status.HTTP_200_OK)
             
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,97 @@
+"""
+Cursor-based message history loading for conversation detail views.
+
+Clients open a conversation with the latest N messages, scroll back with
+``?before=<message_id>`` and sync new messages with ``?since=<message_id>``.
+Both walk the (conversation, created_at) index, with message_id as the tie-breaker,
+so cost depends on the page size rather than on the length of the history.
+"""
+from django.db.models import Q
+
+DEFAULT_MESSAGE_PAGE_SIZE = 50
+MAX_MESSAGE_PAGE_SIZE = 100
+
+
+class InvalidCursor(ValueError):
+    """Raised when a cursor or limit query parameter is malformed"""
+
+
+def _parse_positive_int(value, name):
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        raise InvalidCursor(f'{name} must be a positive integer')
+    if value <= 0:
+        raise InvalidCursor(f'{name} must be a positive integer')
+    return value
+
+
+def get_message_limit(params):
+    """Read the page size from ?limit= (or legacy ?page_size=)"""
+    raw_limit = params.get('limit') or params.get('page_size')
+    if raw_limit in (None, ''):
+        return DEFAULT_MESSAGE_PAGE_SIZE
+    return min(_parse_positive_int(raw_limit, 'limit'), MAX_MESSAGE_PAGE_SIZE)
+
+
+def _cursor_position(conversation, message_id):
+    """Return (created_at, message_id) of a cursor message within the conversation"""
+    created_at = conversation.messages.filter(message_id=message_id).values_list('created_at', flat=True).first()
+    if created_at is None:
+        raise InvalidCursor('Cursor message not found in this conversation')
+    return created_at, message_id
+
+
+def paginate_messages(conversation, params):
+    """
+    Load one window of a conversation's messages.
+
+    Returns (messages, pagination) where messages are in chronological order and
+    pagination describes the cursors for the next request:
+
+    - default: the latest ``limit`` messages
+    - ``before``: up to ``limit`` messages older than the cursor
+    - ``since``: up to ``limit`` messages newer than the cursor (incremental sync)
+    """
+    limit = get_message_limit(params)
+    messages = conversation.messages.select_related('sender_saraf', 'sender_normal_user', 'sender_employee')
+
+    since = params.get('since')
+    before = params.get('before')
+    if since not in (None, '') and before not in (None, ''):
+        raise InvalidCursor('Use either before or since, not both')
+
+    if since not in (None, ''):
+        since = _parse_positive_int(since, 'since')
+        created_at, message_id = _cursor_position(conversation, since)
+        window = list(messages.filter(
+            Q(created_at__gt=created_at) | Q(created_at=created_at, message_id__gt=message_id)
+        ).order_by('created_at', 'message_id')[:limit + 1])
+        has_more = len(window) > limit
+        window = window[:limit]
+        return window, {
+            'mode': 'since',
+            'limit': limit,
+            'has_more': has_more,
+            'next_since': window[-1].message_id if window else since,
+        }
+
+    if before not in (None, ''):
+        before = _parse_positive_int(before, 'before')
+        created_at, message_id = _cursor_position(conversation, before)
+        messages = messages.filter(
+            Q(created_at__lt=created_at) | Q(created_at=created_at, message_id__lt=message_id)
+        )
+
+    window = list(messages.order_by('-created_at', '-message_id')[:limit + 1])
+    has_more = len(window) > limit
+    window = window[:limit]
+    window.reverse()
+    mode = 'before' if before not in (None, '') else 'latest'
+    return window, {
+        'mode': mode,
+        'limit': limit,
+        'has_more': has_more,
+        'next_before': window[0].message_id if window and has_more else None,
+        'next_since': window[-1].message_id if window and mode == 'latest' else None,
+    }
@@ -1,6 +1,7 @@
 from rest_framework import serializers
-from .models import Conversation, Message, MessageDelivery, MessageNotification
+from .models import Conversation, ConversationParticipant, Message, MessageDelivery, MessageNotification
 from saraf_account.models import SarafAccount, SarafEmployee
+from media_uploads.fields import DirectUploadFileField
 
 class MessageDeliverySerializer(serializers.ModelSerializer):
     recipient_name = serializers.SerializerMethodField()
@@ -19,17 +20,22 @@ class MessageSerializer(serializers.ModelSerializer):
     sender_display_name = serializers.CharField(source='get_sender_display_name', read_only=True)
     sender_employee_name = serializers.SerializerMethodField()
     file_size = serializers.SerializerMethodField()
-    deliveries = MessageDeliverySerializer(many=True, read_only=True)
+    deliveries = serializers.SerializerMethodField()
+    attachment = serializers.SerializerMethodField()
     attachment_url = serializers.SerializerMethodField()
     
     class Meta:
         model = Message
         fields = [
             'message_id', 'content', 'message_type', 'attachment', 'attachment_url',
+            'attachment_size', 'attachment_content_type', 'attachment_width', 'attachment_height',
             'sender_display_name', 'sender_employee_name', 'file_size',
             'created_at', 'deliveries'
         ]
-        read_only_fields = ['message_id', 'created_at']
+        read_only_fields = [
+            'message_id', 'created_at', 'attachment_size', 'attachment_content_type',
+            'attachment_width', 'attachment_height'
+        ]
         extra_kwargs = {
             'content': {'allow_blank': True, 'required': False}
         }
@@ -41,30 +47,43 @@ class MessageSerializer(serializers.ModelSerializer):
         except Exception:
             return None
     
+    def get_deliveries(self, obj):
+        """Per-recipient status derived from ConversationParticipant watermarks"""
+        # Load each conversation's participant states once per serialization
+        states_cache = self.context.setdefault('participant_states', {})
+        if obj.conversation_id not in states_cache:
+            states_cache[obj.conversation_id] = list(
+                ConversationParticipant.objects.filter(
+                    conversation_id=obj.conversation_id
+                ).select_related('saraf_account', 'normal_user')
+            )
+        statuses = []
+        for status in obj.get_recipient_statuses(states_cache[obj.conversation_id]):
+            recipient = status.pop('recipient')
+            status['recipient_name'] = recipient.full_name if recipient else "Unknown Recipient"
+            statuses.append(status)
+        return statuses
+    
     def get_file_size(self, obj):
-        """Get human-readable file size"""
-        if obj.attachment:
-            try:
-                size = obj.attachment.size
-                for unit in ['B', 'KB', 'MB', 'GB']:
-                    if size < 1024.0:
-                        return f"{size:.1f} {unit}"
-                    size /= 1024.0
-            except Exception:
-                return None
-        return None
+        """Human-readable size from the stored attachment metadata (no storage request)"""
+        return obj.get_file_size()
+    
+    def get_attachment(self, obj):
+        """Same value the FileField used to render; built once per message"""
+        return self.get_attachment_url(obj)
     
     def get_attachment_url(self, obj):
         """Return full URL for attachment if it exists"""
-        try:
-            if obj.attachment:
-                request = self.context.get('request')
-                if request:
-                    return request.build_absolute_uri(obj.attachment.url)
-                return obj.attachment.url
-            return None
-        except Exception:
+        if not obj.attachment:
             return None
+        if not hasattr(obj, '_attachment_url'):
+            try:
+                url = obj.attachment.url
+                request = self.context.get('request')
+                obj._attachment_url = request.build_absolute_uri(url) if request else url
+            except Exception:
+                obj._attachment_url = None
+        return obj._attachment_url
 
 class ConversationSerializer(serializers.ModelSerializer):
     saraf_participants = serializers.StringRelatedField(many=True, read_only=True)
@@ -174,6 +193,8 @@ class SendMessageSerializer(serializers.ModelSerializer):
     conversation_id = serializers.IntegerField(write_only=True)
     employee_id = serializers.IntegerField(required=False, allow_null=True, write_only=True)
     content = FlexibleCharField(required=False, allow_blank=True, allow_null=True)
+    # Multipart file or an upload key from /api/uploads/slots/
+    attachment = DirectUploadFileField(purpose='message_attachment', required=False, allow_null=True)
     
     class Meta:
         model = Message
@@ -268,23 +289,9 @@ class SendMessageSerializer(serializers.ModelSerializer):
         
         return data
 
-class MessageStatusSerializer(serializers.ModelSerializer):
-    class Meta:
-        model = MessageDelivery
-        fields = ['delivery_status', 'read_at']
-    
-    def update(self, instance, validated_data):
-        delivery_status = validated_data.get('delivery_status')
-        
-        if delivery_status == 'read':
-            instance.mark_as_read()
-        elif delivery_status == 'delivered':
-            instance.mark_as_delivered()
-        else:
-            instance.delivery_status = delivery_status
-            instance.save()
-        
-        return instance
+class MessageStatusSerializer(serializers.Serializer):
+    """Advance the caller's delivered/read watermark up to a message"""
+    delivery_status = serializers.ChoiceField(choices=['delivered', 'read'])
 
 class MessageNotificationSerializer(serializers.ModelSerializer):
     class Meta:
@@ -306,20 +313,13 @@ class ConversationListSerializer(serializers.ModelSerializer):
         ]
     
     def get_last_message_preview(self, obj):
-        last_message = obj.get_last_message()
-        if last_message:
-            preview = last_message.content[:100]
-            if len(last_message.content) > 100:
-                preview += "..."
-            return {
-                'content': preview,
-                'sender': last_message.get_sender_display_name(),
-                'message_type': last_message.message_type,
-                'created_at': last_message.created_at
-            }
-        return None
+        # Read from the denormalized columns; no per-row message query
+        return obj.get_last_message_preview()
     
     def get_unread_count(self, obj):
+        # Counter precomputed from ConversationParticipant by the list views
+        if hasattr(obj, 'unread_count'):
+            return obj.unread_count
         request = self.context.get('request')
         if request:
             # Try to get user info from JWT token
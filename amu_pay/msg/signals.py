@@ -0,0 +1,43 @@
+from django.db.models.signals import m2m_changed
+from django.dispatch import Signal, receiver
+
+from .models import Conversation, ConversationParticipant
+
+
+def _sync_participant_states(instance, action, reverse, pk_set, participant_field):
+    """Mirror participant M2M changes onto ConversationParticipant rows"""
+    if action == 'post_add':
+        conversations = Conversation.objects.filter(pk__in=pk_set) if reverse else [instance]
+        for conversation in conversations:
+            conversation.ensure_participant_states()
+    elif action == 'post_remove':
+        if reverse:
+            lookup = {participant_field: instance, 'conversation_id__in': pk_set}
+        else:
+            lookup = {'conversation': instance, f'{participant_field}_id__in': pk_set}
+        ConversationParticipant.objects.filter(**lookup).delete()
+    elif action == 'pre_clear' and reverse:
+        # pk_set is not provided on clear, so capture the affected rows up front
+        ConversationParticipant.objects.filter(**{participant_field: instance}).delete()
+    elif action == 'post_clear' and not reverse:
+        ConversationParticipant.objects.filter(
+            conversation=instance,
+            **{f'{participant_field}__isnull': False}
+        ).delete()
+
+
+@receiver(m2m_changed, sender=Conversation.saraf_participants.through)
+def sync_saraf_participant_states(sender, instance, action, reverse, pk_set, **kwargs):
+    """Keep ConversationParticipant rows in step with saraf_participants"""
+    _sync_participant_states(instance, action, reverse, pk_set, 'saraf_account')
+
+
+@receiver(m2m_changed, sender=Conversation.normal_user_participants.through)
+def sync_normal_user_participant_states(sender, instance, action, reverse, pk_set, **kwargs):
+    """Keep ConversationParticipant rows in step with normal_user_participants"""
+    _sync_participant_states(instance, action, reverse, pk_set, 'normal_user')
+
+
+# Sent by the fan-out worker once a message's notifications are committed.
+# Push integrations connect here: kwargs are message and recipient_saraf_ids.
+message_fanned_out = Signal()
@@ -1,11 +1,12 @@
 from django.test import TestCase
+from django.utils import timezone
 from django.core.files.uploadedfile import SimpleUploadedFile
 from rest_framework.test import APITestCase
 from rest_framework import status
 from rest_framework_simplejwt.tokens import RefreshToken
 from unittest.mock import patch
 
-from .models import Conversation, Message, MessageDelivery, MessageNotification
+from .models import Conversation, ConversationParticipant, Message, MessageDelivery, MessageFanoutTask, MessageNotification
 from saraf_account.models import SarafAccount, SarafEmployee
 
 class MessageModelTests(TestCase):
@@ -277,4 +278,408 @@ class MessageAPITests(TestCase):
         
         # Test unread count
         unread_count = self.conversation.get_unread_count(self.saraf2)
-        self.assertEqual(unread_count, 0)  # No deliveries created in this test
\ No newline at end of file
+        self.assertEqual(unread_count, 0)  # No deliveries created in this test
+
+def create_test_saraf(index, is_active=True):
+    """Create a valid, active SarafAccount backed by an unused AmuPay code"""
+    from saraf_account.models import AmuPayCode
+    code = AmuPayCode.objects.create(code=f"TEST{index:04d}CODE")
+    saraf = SarafAccount.objects.create(
+        full_name=f"Test Saraf {index}",
+        exchange_name=f"Test Exchange {index}",
+        email=f"saraf{index}@example.com",
+        email_or_whatsapp_number=f"+93700000{index:03d}",
+        license_no=f"LIC{index:03d}",
+        amu_pay_code=code.code,
+        province="Kabul",
+        is_active=is_active
+    )
+    saraf.set_password("TestPass123!")
+    return saraf
+
+
+def saraf_token(saraf):
+    """Build an access token carrying the claims used by the saraf login view"""
+    refresh = RefreshToken()
+    refresh['user_type'] = 'saraf'
+    refresh['user_id'] = saraf.saraf_id
+    refresh['saraf_id'] = saraf.saraf_id
+    refresh['full_name'] = saraf.full_name
+    return str(refresh.access_token)
+
+
+class ConversationParticipantStateTests(APITestCase):
+    """Per-participant conversation state and denormalized unread counters"""
+    def setUp(self):
+        self.saraf1 = create_test_saraf(1)
+        self.saraf2 = create_test_saraf(2)
+        self.conversation = Conversation.objects.create(conversation_type='direct')
+        self.conversation.saraf_participants.set([self.saraf1, self.saraf2])
+    
+    def send(self, saraf, content):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {saraf_token(saraf)}')
+        return self.client.post('/api/messages/messages/send/', {
+            'conversation_id': self.conversation.conversation_id,
+            'content': content,
+            'message_type': 'text'
+        }, format='json')
+    
+    def list_conversations(self, saraf):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {saraf_token(saraf)}')
+        return self.client.get('/api/messages/conversations/')
+    
+    def test_states_created_for_participants(self):
+        """Adding participants creates one state row each"""
+        self.assertEqual(self.conversation.participant_states.count(), 2)
+        self.conversation.saraf_participants.remove(self.saraf2)
+        self.assertEqual(self.conversation.participant_states.count(), 1)
+    
+    def test_send_increments_recipient_unread(self):
+        """Sending bumps the recipient counter and leaves the sender at zero"""
+        self.assertEqual(self.send(self.saraf1, 'Hello').status_code, 201)
+        self.assertEqual(self.send(self.saraf1, 'Again').status_code, 201)
+        
+        self.assertEqual(self.conversation.get_unread_count(self.saraf2), 2)
+        self.assertEqual(self.conversation.get_unread_count(self.saraf1), 0)
+        
+        response = self.list_conversations(self.saraf2)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['conversations'][0]['unread_count'], 2)
+    
+    def test_opening_conversation_resets_unread(self):
+        """Opening the conversation marks everything as read"""
+        self.send(self.saraf1, 'Hello')
+        last_message = self.conversation.messages.order_by('-message_id').first()
+        
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {saraf_token(self.saraf2)}')
+        response = self.client.get(f'/api/messages/conversations/{self.conversation.conversation_id}/')
+        self.assertEqual(response.status_code, 200)
+        
+        state = self.conversation.get_participant_state(self.saraf2)
+        self.assertEqual(state.unread_count, 0)
+        self.assertEqual(state.last_read_message_id, last_message.message_id)
+    
+    def test_soft_deleted_conversation_hidden_from_list(self):
+        """Soft delete flag removes the conversation from the user's list only"""
+        self.conversation.delete_for_user(self.saraf2)
+        
+        self.assertEqual(self.list_conversations(self.saraf2).data['conversations'], [])
+        self.assertEqual(len(self.list_conversations(self.saraf1).data['conversations']), 1)
+        
+        self.conversation.restore_for_user(self.saraf2)
+        self.assertEqual(len(self.list_conversations(self.saraf2).data['conversations']), 1)
+
+
+class MessageWatermarkTests(APITestCase):
+    """Delivery and read receipts derived from participant high-water marks"""
+    def setUp(self):
+        self.saraf1 = create_test_saraf(1)
+        self.saraf2 = create_test_saraf(2)
+        self.conversation = Conversation.objects.create(conversation_type='direct')
+        self.conversation.saraf_participants.set([self.saraf1, self.saraf2])
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {saraf_token(self.saraf1)}')
+        self.messages = []
+        for content in ['First', 'Second', 'Third']:
+            response = self.client.post('/api/messages/messages/send/', {
+                'conversation_id': self.conversation.conversation_id,
+                'content': content,
+                'message_type': 'text'
+            }, format='json')
+            self.messages.append(response.data['message_id'])
+    
+    def update_status(self, saraf, message_id, delivery_status):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {saraf_token(saraf)}')
+        return self.client.patch(
+            f'/api/messages/messages/{message_id}/status/',
+            {'delivery_status': delivery_status},
+            format='json'
+        )
+    
+    def test_send_creates_no_delivery_rows(self):
+        """Sending no longer writes one MessageDelivery row per recipient"""
+        self.assertEqual(MessageDelivery.objects.count(), 0)
+        self.assertEqual(self.conversation.get_unread_count(self.saraf2), 3)
+    
+    def test_read_watermark_derives_status(self):
+        """Reading up to a message marks it and everything before it as read"""
+        response = self.update_status(self.saraf2, self.messages[1], 'read')
+        self.assertEqual(response.status_code, 200)
+        
+        state = self.conversation.get_participant_state(self.saraf2)
+        self.assertEqual(state.last_read_message_id, self.messages[1])
+        self.assertEqual(state.unread_count, 1)
+        
+        statuses = [
+            Message.objects.get(message_id=message_id).get_recipient_statuses()[0]['delivery_status']
+            for message_id in self.messages
+        ]
+        self.assertEqual(statuses, ['read', 'read', 'sent'])
+    
+    def test_watermarks_never_move_backwards(self):
+        """Acknowledging an older message leaves the watermark in place"""
+        self.update_status(self.saraf2, self.messages[2], 'delivered')
+        self.update_status(self.saraf2, self.messages[0], 'delivered')
+        
+        state = self.conversation.get_participant_state(self.saraf2)
+        self.assertEqual(state.last_delivered_message_id, self.messages[2])
+        self.assertIsNone(state.last_read_message_id)
+        self.assertEqual(state.get_delivery_status(self.messages[0]), 'delivered')
+    
+    def test_sender_cannot_update_own_message(self):
+        """The sender's own messages cannot be acknowledged"""
+        response = self.update_status(self.saraf1, self.messages[0], 'read')
+        self.assertEqual(response.status_code, 400)
+    
+    def test_backfill_from_legacy_deliveries(self):
+        """Existing MessageDelivery rows are folded into the watermarks"""
+        from importlib import import_module
+        from django.apps import apps
+        migration = import_module('msg.migrations.0005_backfill_watermarks_from_deliveries')
+        
+        MessageDelivery.objects.create(message_id=self.messages[0], recipient_saraf=self.saraf2, delivery_status='read')
+        MessageDelivery.objects.create(message_id=self.messages[1], recipient_saraf=self.saraf2, delivery_status='delivered')
+        MessageDelivery.objects.create(message_id=self.messages[2], recipient_saraf=self.saraf2, delivery_status='sent')
+        self.conversation.participant_states.update(last_read_message_id=None, last_delivered_message_id=None)
+        
+        migration.backfill_watermarks(apps, None)
+        
+        recipient_state = self.conversation.get_participant_state(self.saraf2)
+        self.assertEqual(recipient_state.last_read_message_id, self.messages[0])
+        self.assertEqual(recipient_state.last_delivered_message_id, self.messages[1])
+        sender_state = self.conversation.get_participant_state(self.saraf1)
+        self.assertEqual(sender_state.last_read_message_id, self.messages[2])
+
+
+class ConversationLastMessageTests(APITestCase):
+    """Denormalized last message columns on Conversation"""
+    def setUp(self):
+        self.saraf1 = create_test_saraf(1)
+        self.others = [create_test_saraf(index) for index in range(2, 7)]
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {saraf_token(self.saraf1)}')
+    
+    def start_conversation(self, other, content):
+        conversation = Conversation.objects.create(conversation_type='direct')
+        conversation.saraf_participants.set([self.saraf1, other])
+        self.client.post('/api/messages/messages/send/', {
+            'conversation_id': conversation.conversation_id,
+            'content': content,
+            'message_type': 'text'
+        }, format='json')
+        return conversation
+    
+    def list_query_count(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/messages/conversations/')
+        self.assertEqual(response.status_code, 200)
+        return len(queries), response
+    
+    def test_send_updates_last_message_columns(self):
+        """Sending stores a truncated preview on the conversation"""
+        conversation = self.start_conversation(self.others[0], 'x' * 150)
+        conversation.refresh_from_db()
+        
+        last_message = conversation.messages.get()
+        self.assertEqual(conversation.last_message_id, last_message.message_id)
+        self.assertEqual(conversation.last_message_preview, 'x' * 100 + '...')
+        self.assertEqual(conversation.last_message_at, last_message.created_at)
+        self.assertEqual(conversation.get_last_message(), last_message)
+    
+    def test_list_preview_reads_columns(self):
+        """Conversation list query count does not grow with page size"""
+        self.start_conversation(self.others[0], 'Hello')
+        self.start_conversation(self.others[1], 'Salam')
+        small_count, _ = self.list_query_count()
+        
+        for other in self.others[2:]:
+            self.start_conversation(other, 'More')
+        large_count, response = self.list_query_count()
+        
+        self.assertEqual(small_count, large_count)
+        self.assertEqual(len(response.data['conversations']), 5)
+        self.assertEqual(response.data['conversations'][-1]['last_message_preview']['content'], 'Hello')
+
+
+class MessageCursorPaginationTests(APITestCase):
+    """Cursor-based message history in ConversationDetailView"""
+    def setUp(self):
+        self.saraf1 = create_test_saraf(1)
+        self.saraf2 = create_test_saraf(2)
+        self.conversation = Conversation.objects.create(conversation_type='direct')
+        self.conversation.saraf_participants.set([self.saraf1, self.saraf2])
+        self.messages = [
+            Message.objects.create(
+                conversation=self.conversation,
+                sender_saraf=self.saraf2,
+                content=f'Message {index}',
+                message_type='text'
+            )
+            for index in range(7)
+        ]
+        for message in self.messages:
+            ConversationParticipant.record_message(message)
+        self.url = f'/api/messages/conversations/{self.conversation.conversation_id}/'
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {saraf_token(self.saraf1)}')
+    
+    def message_ids(self, response):
+        return [message['message_id'] for message in response.data['messages']]
+    
+    def test_latest_messages(self):
+        """Default request returns the newest messages in chronological order"""
+        response = self.client.get(self.url, {'limit': 3})
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.message_ids(response), [m.message_id for m in self.messages[-3:]])
+        self.assertTrue(response.data['pagination']['has_more'])
+        self.assertEqual(response.data['pagination']['next_before'], self.messages[4].message_id)
+        self.assertEqual(response.data['pagination']['next_since'], self.messages[6].message_id)
+    
+    def test_before_cursor_walks_back(self):
+        """?before= returns older messages and leaves the read watermark alone"""
+        response = self.client.get(self.url, {'limit': 3, 'before': self.messages[4].message_id})
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.message_ids(response), [m.message_id for m in self.messages[1:4]])
+        self.assertTrue(response.data['pagination']['has_more'])
+        
+        response = self.client.get(self.url, {'limit': 3, 'before': self.messages[1].message_id})
+        self.assertEqual(self.message_ids(response), [self.messages[0].message_id])
+        self.assertFalse(response.data['pagination']['has_more'])
+        self.assertIsNone(response.data['pagination']['next_before'])
+        self.assertEqual(self.conversation.get_unread_count(self.saraf1), 7)
+    
+    def test_since_cursor_syncs_new_messages(self):
+        """?since= returns only messages newer than the cursor"""
+        response = self.client.get(self.url, {'since': self.messages[4].message_id})
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.message_ids(response), [m.message_id for m in self.messages[5:]])
+        self.assertFalse(response.data['pagination']['has_more'])
+        self.assertEqual(response.data['pagination']['next_since'], self.messages[6].message_id)
+        
+        response = self.client.get(self.url, {'since': self.messages[6].message_id})
+        self.assertEqual(response.data['messages'], [])
+        self.assertEqual(response.data['pagination']['next_since'], self.messages[6].message_id)
+    
+    def test_invalid_cursor(self):
+        """Malformed or foreign cursors are rejected"""
+        other = Conversation.objects.create(conversation_type='direct')
+        other.saraf_participants.set([self.saraf1, self.saraf2])
+        foreign = Message.objects.create(conversation=other, sender_saraf=self.saraf2, content='Elsewhere')
+        
+        self.assertEqual(self.client.get(self.url, {'before': 'abc'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'since': foreign.message_id}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {
+            'before': self.messages[3].message_id,
+            'since': self.messages[1].message_id
+        }).status_code, 400)
+    
+    def test_legacy_page_parameter(self):
+        """?page= keeps the offset pagination response shape"""
+        response = self.client.get(self.url, {'page': 1, 'page_size': 5})
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['messages']), 5)
+        self.assertEqual(response.data['pagination']['total_count'], 7)
+
+
+class MessageFanoutTests(APITestCase):
+    """Asynchronous notification/audit fan-out for sent messages"""
+    def setUp(self):
+        self.saraf1 = create_test_saraf(1)
+        self.others = [create_test_saraf(index) for index in range(2, 7)]
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {saraf_token(self.saraf1)}')
+    
+    def create_conversation(self, participants):
+        conversation = Conversation.objects.create(conversation_type='direct')
+        conversation.saraf_participants.set([self.saraf1] + participants)
+        return conversation
+    
+    def send(self, conversation, content='Hello'):
+        return self.client.post('/api/messages/messages/send/', {
+            'conversation_id': conversation.conversation_id,
+            'content': content,
+            'message_type': 'text'
+        }, format='json')
+    
+    def test_send_defers_fanout_to_worker(self):
+        """Notifications and the action log are written by the worker, not the request"""
+        from saraf_account.models import ActionLog
+        from .fanout import process_pending
+        conversation = self.create_conversation(self.others[:2])
+        
+        response = self.send(conversation)
+        self.assertEqual(response.status_code, 201)
+        task = MessageFanoutTask.objects.get(message_id=response.data['message_id'])
+        self.assertEqual(task.status, 'pending')
+        self.assertFalse(MessageNotification.objects.exists())
+        self.assertFalse(ActionLog.objects.filter(action_type='send_message').exists())
+        
+        self.assertEqual(process_pending(), 1)
+        task.refresh_from_db()
+        self.assertEqual(task.status, 'done')
+        self.assertEqual(
+            set(MessageNotification.objects.values_list('recipient_saraf_id', flat=True)),
+            {other.saraf_id for other in self.others[:2]}
+        )
+        log = ActionLog.objects.get(action_type='send_message')
+        self.assertEqual(log.metadata['recipient_count'], 2)
+    
+    def test_tasks_run_in_order_per_conversation(self):
+        """A later task waits while an earlier one in the same conversation is unfinished"""
+        from .fanout import claim_next_task
+        conversation = self.create_conversation(self.others[:1])
+        other_conversation = self.create_conversation(self.others[1:2])
+        first = self.send(conversation, 'First').data['message_id']
+        second = self.send(conversation, 'Second').data['message_id']
+        third = self.send(other_conversation, 'Elsewhere').data['message_id']
+        
+        claimed = claim_next_task()
+        self.assertEqual(claimed.message_id, first)
+        # First task is processing: the second waits, the other conversation proceeds
+        self.assertEqual(claim_next_task().message_id, third)
+        self.assertIsNone(claim_next_task())
+        
+        MessageFanoutTask.objects.filter(pk=claimed.pk).update(status='done')
+        self.assertEqual(claim_next_task().message_id, second)
+    
+    def test_failed_task_is_retried_later(self):
+        """Errors release the task with a backoff instead of losing it"""
+        from .fanout import process_pending
+        conversation = self.create_conversation(self.others[:1])
+        self.send(conversation)
+        
+        with patch('msg.fanout._create_notifications', side_effect=RuntimeError('boom')):
+            process_pending()
+        task = MessageFanoutTask.objects.get()
+        self.assertEqual(task.status, 'pending')
+        self.assertEqual(task.attempts, 1)
+        self.assertEqual(task.last_error, 'boom')
+        self.assertGreater(task.available_at, timezone.now())
+        self.assertEqual(process_pending(), 0)
+    
+    def test_inline_fanout_setting(self):
+        """With ASYNC_FANOUT off the task runs as soon as the send commits"""
+        from django.conf import settings
+        conversation = self.create_conversation(self.others[:3])
+        
+        with self.settings(MESSAGE_SETTINGS={**settings.MESSAGE_SETTINGS, 'ASYNC_FANOUT': False}):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.send(conversation)
+        
+        self.assertEqual(MessageFanoutTask.objects.get().status, 'done')
+        self.assertEqual(MessageNotification.objects.count(), 3)
+    
+    def test_send_query_count_independent_of_group_size(self):
+        """Send cost does not grow with the number of participants"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        small = self.create_conversation(self.others[:1])
+        large = self.create_conversation(self.others)
+        
+        with CaptureQueriesContext(connection) as small_queries:
+            self.assertEqual(self.send(small).status_code, 201)
+        with CaptureQueriesContext(connection) as large_queries:
+            self.assertEqual(self.send(large).status_code, 201)
+        self.assertEqual(len(small_queries), len(large_queries))
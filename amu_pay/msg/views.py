@@ -5,17 +5,20 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
 from django.db import transaction
 from django.core.paginator import Paginator
-from django.utils import timezone
-from django.db.models import Q, Count
+from django.db.models import Count, Sum
 
-from .models import Conversation, Message, MessageDelivery, MessageNotification
+from .models import Conversation, ConversationParticipant, Message, MessageNotification
+from .fanout import enqueue_fanout
+from .pagination import InvalidCursor, paginate_messages
 from .serializers import (
     ConversationSerializer, CreateConversationSerializer, MessageSerializer,
     SendMessageSerializer, MessageStatusSerializer,
     ConversationListSerializer, MessageNotificationSerializer
 )
 from saraf_account.models import SarafAccount, SarafEmployee, ActionLog
+from saraf_account.dashboard import invalidate_dashboard
 from normal_user_account.models import NormalUser
+from utils.db_routing import read_replica
 from .normal_user_views import (
     NormalUserConversationListView,
     NormalUserCreateConversationView,
@@ -82,29 +85,26 @@ class ConversationListView(APIView):
                 except SarafEmployee.DoesNotExist:
                     return Response({'error': 'Employee not found'}, status=status.HTTP_404_NOT_FOUND)
             
-            # Get conversations where user is a participant and not deleted by them
-            conversations = Conversation.objects.filter(
-                saraf_participants__in=[saraf_account],
-                is_active=True
-            ).exclude(
-                deleted_by_saraf_participants__in=[saraf_account]
-            ).annotate(
-                unread_count=Count(
-                    'messages__deliveries',
-                    filter=Q(
-                        messages__deliveries__recipient_saraf=saraf_account,
-                        messages__deliveries__delivery_status__in=['sent', 'delivered']
-                    )
-                )
-            ).order_by('-updated_at')
+            # Range scan over the user's participant state rows (not deleted by them)
+            participant_states = ConversationParticipant.objects.for_user(saraf_account).visible().select_related(
+                'conversation'
+            ).prefetch_related(
+                'conversation__saraf_participants',
+                'conversation__normal_user_participants'
+            ).order_by('-last_message_at', '-conversation_id')
             
             # Pagination
             page = request.GET.get('page', 1)
             page_size = request.GET.get('page_size', 20)
-            paginator = Paginator(conversations, page_size)
+            paginator = Paginator(participant_states, page_size)
             page_obj = paginator.get_page(page)
             
-            serializer = ConversationListSerializer(page_obj.object_list, many=True, context={'request': request})
+            conversations = []
+            for state in page_obj.object_list:
+                state.conversation.unread_count = state.unread_count
+                conversations.append(state.conversation)
+            
+            serializer = ConversationListSerializer(conversations, many=True, context={'request': request})
             
             return Response({
                 'conversations': serializer.data,
@@ -167,7 +167,6 @@ class CreateConversationView(APIView):
                     return Response({'error': f'Invalid SarafAccount IDs: {list(missing_ids)}'}, status=status.HTTP_400_BAD_REQUEST)
                 
                 # Check if conversation already exists between these two participants
-                from django.db.models import Q, Count
                 existing_conversation = Conversation.objects.annotate(
                     participant_count=Count('saraf_participants')
                 ).filter(
@@ -284,29 +283,37 @@ class ConversationDetailView(APIView):
             if not conversation.is_visible_to_user(saraf_account):
                 return Response({'error': 'Conversation not found'}, status=status.HTTP_404_NOT_FOUND)
             
-            # Get messages with pagination
-            messages = conversation.messages.all().order_by('created_at')
-            
-            page = request.GET.get('page', 1)
-            page_size = request.GET.get('page_size', 50)
-            paginator = Paginator(messages, page_size)
-            page_obj = paginator.get_page(page)
+            if 'page' in request.GET:
+                # Legacy offset pagination, kept for clients that still send ?page=
+                messages = conversation.messages.all().order_by('created_at')
+                page_size = request.GET.get('page_size', 50)
+                paginator = Paginator(messages, page_size)
+                page_obj = paginator.get_page(request.GET.get('page'))
+                message_list = page_obj.object_list
+                pagination = {
+                    'current_page': page_obj.number,
+                    'total_pages': paginator.num_pages,
+                    'total_count': paginator.count,
+                    'has_next': page_obj.has_next(),
+                    'has_previous': page_obj.has_previous()
+                }
+            else:
+                # Cursor pagination: latest N, ?before=<message_id> or ?since=<message_id>
+                try:
+                    message_list, pagination = paginate_messages(conversation, request.GET)
+                except InvalidCursor as e:
+                    return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
             
-            # Mark messages as read for this user
-            MessageDelivery.objects.filter(
-                message__conversation=conversation,
-                recipient_saraf=saraf_account,
-                delivery_status__in=['sent', 'delivered']
-            ).update(
-                delivery_status='read',
-                read_at=timezone.now()
-            )
+            # Mark messages as read for this user by moving the read watermark.
+            # Scrolling back through older history does not change what has been read.
+            if not request.GET.get('before'):
+                ConversationParticipant.mark_conversation_read(conversation, saraf_account)
             
             conversation_serializer = ConversationSerializer(conversation, context={'request': request})
             
             # Serialize messages individually to catch errors
             try:
-                messages_serializer = MessageSerializer(page_obj.object_list, many=True, context={'request': request})
+                messages_serializer = MessageSerializer(message_list, many=True, context={'request': request})
                 messages_data = messages_serializer.data
             except Exception as msg_error:
                 logger.error(f"Error serializing messages: {str(msg_error)}")
@@ -315,13 +322,7 @@ class ConversationDetailView(APIView):
             return Response({
                 'conversation': conversation_serializer.data,
                 'messages': messages_data,
-                'pagination': {
-                    'current_page': page_obj.number,
-                    'total_pages': paginator.num_pages,
-                    'total_count': paginator.count,
-                    'has_next': page_obj.has_next(),
-                    'has_previous': page_obj.has_previous()
-                }
+                'pagination': pagination
             }, status=status.HTTP_200_OK)
             
         except SarafAccount.DoesNotExist:
@@ -410,7 +411,7 @@ class SendMessageView(APIView):
                 except SarafEmployee.DoesNotExist:
                     return Response({'error': 'Employee not found'}, status=status.HTTP_404_NOT_FOUND)
             
-            serializer = SendMessageSerializer(data=request.data)
+            serializer = SendMessageSerializer(data=request.data, context={'request': request})
             
             if serializer.is_valid():
                 with transaction.atomic():
@@ -419,14 +420,14 @@ class SendMessageView(APIView):
                     conversation = Conversation.objects.get(conversation_id=conversation_id)
                     
                     # Verify user is participant
-                    if saraf_account not in conversation.saraf_participants.all():
+                    if not conversation.saraf_participants.filter(saraf_id=saraf_id).exists():
                         return Response({'error': 'You are not a participant in this conversation'}, status=status.HTTP_403_FORBIDDEN)
                     
                     # Create message
                     message_data = {
                         'conversation': conversation,
                         'sender_saraf': saraf_account,
-                        'content': serializer.validated_data['content'],
+                        'content': serializer.validated_data.get('content', ''),
                         'message_type': serializer.validated_data['message_type'],
                         'attachment': serializer.validated_data.get('attachment')
                     }
@@ -450,52 +451,23 @@ class SendMessageView(APIView):
                     
                     message = Message.objects.create(**message_data)
                     
-                    # Create delivery records for all saraf participants except sender
-                    recipients = conversation.saraf_participants.exclude(saraf_id=saraf_id)
-                    deliveries = []
-                    for recipient in recipients:
-                        deliveries.append(MessageDelivery(
-                            message=message,
-                            recipient_saraf=recipient,
-                            delivery_status='sent'
-                        ))
-                    
-                    # Also create delivery records for normal user participants
-                    normal_recipients = conversation.normal_user_participants.all()
-                    for recipient in normal_recipients:
-                        deliveries.append(MessageDelivery(
-                            message=message,
-                            recipient_normal_user=recipient,
-                            delivery_status='sent'
-                        ))
+                    # Delivery and read state is tracked by participant watermarks,
+                    # updated with a constant number of queries regardless of group size
+                    ConversationParticipant.record_message(message)
                     
-                    MessageDelivery.objects.bulk_create(deliveries)
+                    # Update conversation timestamp and last message preview
+                    conversation.record_last_message(message)
                     
-                    # Update conversation timestamp
-                    conversation.updated_at = timezone.now()
-                    conversation.save(update_fields=['updated_at'])
-                    
-                    # Create in-app notifications for recipients
-                    self.create_in_app_notifications(message, recipients)
-                    
-                    # Log the action
+                    # Notifications, the audit log and push events run in the fan-out worker
                     employee = message_data.get('sender_employee')
-                    ActionLog.objects.create(
-                        saraf=saraf_account,
-                        user_type='employee' if employee else 'saraf',
-                        user_id=employee.employee_id if employee else saraf_id,
-                        user_name=employee.full_name if employee else saraf_account.full_name,
-                        action_type='send_message',
-                        description=f'Sent message {message.message_id} in conversation {conversation_id}' + (f' (by employee: {employee.full_name})' if employee else ''),
-                        ip_address=self.get_client_ip(request),
-                        user_agent=request.META.get('HTTP_USER_AGENT', ''),
-                        metadata={
-                            'message_id': message.message_id,
-                            'conversation_id': conversation_id,
-                            'message_type': message.message_type,
-                            'recipient_count': len(recipients)
-                        }
-                    )
+                    enqueue_fanout(message, action_log={
+                        'user_type': 'employee' if employee else 'saraf',
+                        'user_id': employee.employee_id if employee else saraf_id,
+                        'user_name': employee.full_name if employee else saraf_account.full_name,
+                        'employee_name': employee.full_name if employee else None,
+                        'ip_address': self.get_client_ip(request),
+                        'user_agent': request.META.get('HTTP_USER_AGENT', '')
+                    })
                 
                 response_serializer = MessageSerializer(message)
                 return Response(response_serializer.data, status=status.HTTP_201_CREATED)
@@ -508,25 +480,6 @@ class SendMessageView(APIView):
             logger.error(f"Error in SendMessageView: {str(e)}")
             return Response({'error': 'Internal server error'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
     
-    def create_in_app_notifications(self, message, recipients):
-        """Create simple in-app notifications for recipients"""
-        notifications = []
-        for recipient in recipients:
-            # Check if it's a SarafAccount or NormalUser
-            if hasattr(recipient, 'saraf_id'):
-                notifications.append(MessageNotification(
-                    message=message,
-                    recipient_saraf=recipient,
-                    is_read=False
-                ))
-            elif hasattr(recipient, 'user_id'):
-                notifications.append(MessageNotification(
-                    message=message,
-                    recipient_normal_user=recipient,
-                    is_read=False
-                ))
-        MessageNotification.objects.bulk_create(notifications)
-    
     def get_client_ip(self, request):
         x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
         if x_forwarded_for:
@@ -554,24 +507,28 @@ class MessageStatusView(APIView):
             
             saraf_account = SarafAccount.objects.get(saraf_id=saraf_id)
             
-            # Get message delivery record
-            try:
-                delivery = MessageDelivery.objects.get(
-                    message_id=message_id,
-                    recipient_saraf=saraf_account
-                )
-            except MessageDelivery.DoesNotExist:
-                # Check if the user is the sender of the message
-                try:
-                    message = Message.objects.get(message_id=message_id, sender_saraf=saraf_account)
-                    # User is the sender, they can't update delivery status for their own messages
-                    return Response({'error': 'You cannot update delivery status for messages you sent'}, status=status.HTTP_400_BAD_REQUEST)
-                except Message.DoesNotExist:
-                    return Response({'error': 'Message not found or you are not authorized to update its status'}, status=status.HTTP_404_NOT_FOUND)
+            # Get the message and the user's participant state in its conversation
+            message = Message.objects.filter(message_id=message_id).first()
+            participant_state = None
+            if message:
+                participant_state = ConversationParticipant.objects.for_user(saraf_account).filter(
+                    conversation_id=message.conversation_id
+                ).first()
+            if not participant_state:
+                return Response({'error': 'Message not found or you are not authorized to update its status'}, status=status.HTTP_404_NOT_FOUND)
             
-            serializer = MessageStatusSerializer(delivery, data=request.data, partial=True)
+            # User is the sender, they can't update delivery status for their own messages
+            if message.is_sent_by(participant_state):
+                return Response({'error': 'You cannot update delivery status for messages you sent'}, status=status.HTTP_400_BAD_REQUEST)
+            
+            serializer = MessageStatusSerializer(data=request.data)
             if serializer.is_valid():
-                serializer.save()
+                ConversationParticipant.advance_watermarks(
+                    message.conversation_id,
+                    saraf_account,
+                    message.message_id,
+                    serializer.validated_data['delivery_status']
+                )
                 return Response({'message': 'Status updated successfully'}, status=status.HTTP_200_OK)
             
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -615,7 +572,7 @@ class MessageSearchView(APIView):
             messages = Message.objects.filter(
                 conversation__saraf_participants__in=[saraf_account],
                 content__icontains=query
-            ).order_by('-created_at')
+            ).select_related('sender_saraf', 'sender_employee', 'sender_normal_user').order_by('-created_at')
             
             # Pagination
             page = request.GET.get('page', 1)
@@ -623,7 +580,15 @@ class MessageSearchView(APIView):
             paginator = Paginator(messages, page_size)
             page_obj = paginator.get_page(page)
             
-            serializer = MessageSerializer(page_obj.object_list, many=True)
+            # Results span many conversations; load their participant states in one query
+            page_messages = list(page_obj.object_list)
+            participant_states = {message.conversation_id: [] for message in page_messages}
+            for state in ConversationParticipant.objects.filter(
+                conversation_id__in=participant_states
+            ).select_related('saraf_account', 'normal_user'):
+                participant_states[state.conversation_id].append(state)
+            
+            serializer = MessageSerializer(page_messages, many=True, context={'participant_states': participant_states})
             
             return Response({
                 'messages': serializer.data,
@@ -649,6 +614,7 @@ class MessageStatsView(APIView):
     """
     permission_classes = [IsAuthenticated]
     
+    @read_replica
     def get(self, request):
         try:
             # Get saraf account from JWT token
@@ -671,10 +637,9 @@ class MessageStatsView(APIView):
             # Get statistics
             total_conversations = Conversation.objects.filter(saraf_participants__in=[saraf_account], is_active=True).count()
             total_messages_sent = Message.objects.filter(sender_saraf=saraf_account).count()
-            unread_messages = MessageDelivery.objects.filter(
-                recipient_saraf=saraf_account,
-                delivery_status__in=['sent', 'delivered']
-            ).count()
+            unread_messages = ConversationParticipant.objects.for_user(saraf_account).aggregate(
+                total=Sum('unread_count')
+            )['total'] or 0
             
             # Messages by type
             messages_by_type = Message.objects.filter(sender_saraf=saraf_account).values('message_type').annotate(count=Count('message_id'))
@@ -786,6 +751,7 @@ class InAppNotificationsView(APIView):
                     recipient_saraf=saraf_account,
                     is_read=False
                 ).update(is_read=True)
+                invalidate_dashboard(saraf_account.saraf_id, 'notifications')
                 return Response({'message': 'All notifications marked as read'}, status=status.HTTP_200_OK)
             
         except SarafAccount.DoesNotExist:
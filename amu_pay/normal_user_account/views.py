@@ -3,15 +3,13 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework_simplejwt.tokens import RefreshToken
-from django.conf import settings
-from django.core.mail import send_mail
 from django.template.loader import render_to_string
 from django.utils.html import strip_tags
 from django.utils.encoding import force_bytes, force_str
 from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode
 from django.contrib.auth.tokens import PasswordResetTokenGenerator
 from django.core.exceptions import ValidationError
-from twilio.rest import Client
+from outbound.queue import OTP_EXPIRY_SECONDS, queue_email
 from django.utils import timezone
 from datetime import timedelta
 import logging
@@ -31,7 +29,7 @@ logger = logging.getLogger(__name__)
 
 
 def send_otp_email(email, otp_code):
-    """Send OTP code to email"""
+    """Queue OTP code email (delivered by outbound)"""
     try:
         subject = 'Your OTP Code - Amu Pay'
         
@@ -61,20 +59,20 @@ def send_otp_email(email, otp_code):
         If you didn't request this code, please ignore this email.
         """
         
-        send_mail(
-            subject=subject,
-            message=plain_message,
-            from_email=settings.EMAIL_HOST_USER,
-            recipient_list=[email],
+        queue_email(
+            email,
+            subject,
+            plain_message,
             html_message=html_message,
-            fail_silently=False,
+            purpose='normal_user_otp',
+            expires_in=OTP_EXPIRY_SECONDS
         )
         
-        logger.info(f"OTP email sent successfully to {email}")
+        logger.info(f"OTP email queued for {email}")
         return True
         
     except Exception as e:
-        logger.error(f"Failed to send OTP email to {email}: {str(e)}")
+        logger.error(f"Failed to queue OTP email to {email}: {str(e)}")
         return False
 
 
@@ -0,0 +1,11 @@
+from django.contrib import admin
+
+from .models import OutboundNotification
+
+
+@admin.register(OutboundNotification)
+class OutboundNotificationAdmin(admin.ModelAdmin):
+    list_display = ['notification_id', 'channel', 'recipient', 'purpose', 'status', 'attempts', 'created_at', 'sent_at']
+    list_filter = ['status', 'channel', 'provider', 'purpose', 'created_at']
+    search_fields = ['recipient', 'provider_message_id', 'last_error']
+    readonly_fields = ['notification_id', 'created_at', 'sent_at', 'locked_at', 'provider_message_id']
@@ -0,0 +1,180 @@
+"""
+Process-level provider clients for outbound delivery.
+
+Building a twilio.rest.Client per send meant a new HTTP session and TLS
+handshake each time, and send_mail() opened, authenticated and closed an SMTP
+connection for every email. Under registration spikes most of the send time
+went to connection setup. This module keeps, per process:
+
+- One Twilio client whose requests session pools keep-alive connections to
+  api.twilio.com, sized to OUTBOUND_SETTINGS['CONCURRENCY']['twilio'].
+- A pool of open SMTP connections (Django email backends), at most
+  CONCURRENCY['smtp'] idle ones. A connection is checked out for one send
+  and then returned.
+
+Health checks and reconnect:
+
+- An SMTP connection idle longer than SMTP_IDLE_SECONDS is probed with NOOP
+  before use and replaced if the server no longer answers.
+- A send that fails with SMTPServerDisconnected is retried once on a fresh
+  connection. The usual cause is a connection the server closed while idle.
+- The Twilio session is rebuilt after HTTP_IDLE_SECONDS without use, since
+  servers drop idle keep-alive connections, and after any connection error.
+- check_providers() opens both clients for deployment health checks.
+"""
+import smtplib
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.mail import get_connection
+
+from utils.metrics import external_call
+
+DEFAULT_SMTP_IDLE_SECONDS = 30
+DEFAULT_HTTP_IDLE_SECONDS = 60
+HTTP_TIMEOUT_SECONDS = 15
+
+
+def _outbound_settings():
+    return getattr(settings, 'OUTBOUND_SETTINGS', {})
+
+
+def _pool_size(provider):
+    return max(_outbound_settings().get('CONCURRENCY', {}).get(provider, 4), 1)
+
+
+class TwilioClientPool:
+    """A shared twilio.rest.Client with a pooled, health-checked HTTP session"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._client = None
+        self._credentials = None
+        self._last_used = 0.0
+
+    def _build(self):
+        from requests.adapters import HTTPAdapter
+        from twilio.http.http_client import TwilioHttpClient
+        from twilio.rest import Client
+
+        http_client = TwilioHttpClient(pool_connections=True, timeout=HTTP_TIMEOUT_SECONDS)
+        http_client.session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=_pool_size('twilio')))
+        return Client(settings.TWILIO_ACCOUNT_SID, settings.TWILIO_AUTH_TOKEN, http_client=http_client)
+
+    def client(self):
+        idle_seconds = _outbound_settings().get('HTTP_IDLE_SECONDS', DEFAULT_HTTP_IDLE_SECONDS)
+        credentials = (settings.TWILIO_ACCOUNT_SID, settings.TWILIO_AUTH_TOKEN)
+        with self._lock:
+            now = time.monotonic()
+            if self._client is None or self._credentials != credentials or now - self._last_used > idle_seconds:
+                self._client = self._build()
+                self._credentials = credentials
+            self._last_used = now
+            return self._client
+
+    def reset(self):
+        """Drop the session; the next client() call connects afresh. In-flight requests finish on the old one."""
+        with self._lock:
+            self._client = None
+
+
+class SMTPConnectionPool:
+    """Open Django email backend connections, reused between sends"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._idle = []
+
+    def _healthy(self, backend, idle_for):
+        connection = getattr(backend, 'connection', False)
+        if connection is False:
+            # Not an SMTP backend (locmem, console): nothing to check
+            return True
+        if connection is None:
+            return False
+        if idle_for <= _outbound_settings().get('SMTP_IDLE_SECONDS', DEFAULT_SMTP_IDLE_SECONDS):
+            return True
+        try:
+            return connection.noop()[0] == 250
+        except (smtplib.SMTPException, OSError):
+            return False
+
+    def _checkout(self):
+        while True:
+            with self._lock:
+                if not self._idle:
+                    break
+                backend, last_used = self._idle.pop()
+            if self._healthy(backend, time.monotonic() - last_used):
+                return backend
+            self._discard(backend)
+        backend = get_connection(fail_silently=False)
+        backend.open()
+        return backend
+
+    def _checkin(self, backend):
+        with self._lock:
+            if len(self._idle) < _pool_size('smtp'):
+                self._idle.append((backend, time.monotonic()))
+                return
+        self._discard(backend)
+
+    def _discard(self, backend):
+        try:
+            backend.close()
+        except Exception:
+            pass
+
+    @contextmanager
+    def connection(self):
+        backend = self._checkout()
+        try:
+            yield backend
+        except Exception:
+            # The connection may be mid-transaction or dead; never reuse it
+            self._discard(backend)
+            raise
+        self._checkin(backend)
+
+    def close_all(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for backend, _ in idle:
+            self._discard(backend)
+
+
+twilio_clients = TwilioClientPool()
+smtp_connections = SMTPConnectionPool()
+
+
+def send_email_message(message):
+    """Send an EmailMessage over a pooled SMTP connection, reconnecting once if it was dropped"""
+    with external_call('smtp'):
+        try:
+            with smtp_connections.connection() as backend:
+                return backend.send_messages([message])
+        except smtplib.SMTPServerDisconnected:
+            with smtp_connections.connection() as backend:
+                return backend.send_messages([message])
+
+
+def check_providers():
+    """{'smtp': error or None, 'twilio': error or None} after opening each client"""
+    results = {}
+    try:
+        with smtp_connections.connection() as backend:
+            connection = getattr(backend, 'connection', None)
+            if connection is not None and connection.noop()[0] != 250:
+                raise smtplib.SMTPException('NOOP was not accepted')
+        results['smtp'] = None
+    except Exception as e:
+        results['smtp'] = str(e)
+    try:
+        twilio_clients.client().api.v2010.accounts(settings.TWILIO_ACCOUNT_SID).fetch()
+        results['twilio'] = None
+    except Exception as e:
+        twilio_clients.reset()
+        results['twilio'] = str(e)
+    return results
@@ -0,0 +1,171 @@
+"""
+Offline stand-ins for SMTP and Twilio, for tests and local development.
+
+Point OUTBOUND_SETTINGS['PROVIDERS'] at the provider classes
+(OUTBOUND_SMTP_PROVIDER and OUTBOUND_TWILIO_PROVIDER in .env) and nothing
+leaves the machine: every delivery is appended to the class's outbox.
+fail_next() makes the following sends raise, and
+OUTBOUND_SETTINGS['FAKE_LATENCY'] adds a delay to each send to imitate a slow
+provider.
+
+FakeSMTPServer is a minimal SMTP server on localhost for exercising the real
+SMTP path (connection pooling, reconnects, slow relays) without a mail
+provider.
+"""
+import itertools
+import socket
+import socketserver
+import threading
+import time
+
+from django.conf import settings
+
+from .providers import PermanentDeliveryError
+
+
+class FakeProvider:
+    outbox = None
+    failures = None
+    _lock = threading.Lock()
+    _ids = itertools.count(1)
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.outbox = []
+        cls.failures = []
+
+    @classmethod
+    def reset(cls):
+        with cls._lock:
+            cls.outbox.clear()
+            cls.failures.clear()
+
+    @classmethod
+    def fail_next(cls, times=1, permanent=False):
+        """Make the next `times` sends fail, with a retryable or a permanent error"""
+        with cls._lock:
+            cls.failures.extend([permanent] * times)
+
+    def message_id(self, number):
+        return ''
+
+    def send(self, notification):
+        latency = getattr(settings, 'OUTBOUND_SETTINGS', {}).get('FAKE_LATENCY', 0)
+        if latency:
+            time.sleep(latency)
+        with self._lock:
+            if self.failures:
+                if self.failures.pop(0):
+                    raise PermanentDeliveryError(f"Fake {self.name} rejected {notification.recipient}")
+                raise ConnectionError(f"Fake {self.name} unavailable")
+            message_id = self.message_id(next(self._ids))
+            self.outbox.append({
+                'notification_id': notification.notification_id,
+                'channel': notification.channel,
+                'recipient': notification.recipient,
+                'payload': notification.payload,
+                'message_id': message_id,
+            })
+        return message_id
+
+
+class FakeSMTPProvider(FakeProvider):
+    name = 'SMTP'
+
+
+class FakeTwilioProvider(FakeProvider):
+    name = 'Twilio'
+
+    def message_id(self, number):
+        return f'SMfake{number:028d}'
+
+
+class _FakeSMTPHandler(socketserver.StreamRequestHandler):
+
+    def reply(self, line):
+        time.sleep(self.server.delay)
+        self.wfile.write(f'{line}\r\n'.encode())
+
+    def handle(self):
+        with self.server.lock:
+            self.server.connections += 1
+            self.server.open_sockets.add(self.request)
+        try:
+            self.converse()
+        except OSError:
+            pass
+        finally:
+            with self.server.lock:
+                self.server.open_sockets.discard(self.request)
+
+    def converse(self):
+        self.reply('220 fake ESMTP')
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode(errors='replace').strip().upper()
+            if command.startswith(('EHLO', 'HELO')):
+                self.reply('250-fake\r\n250 AUTH PLAIN LOGIN')
+            elif command.startswith('AUTH'):
+                self.reply('235 Authentication successful')
+            elif command == 'DATA':
+                self.wfile.write(b'354 End data with <CR><LF>.<CR><LF>\r\n')
+                lines = []
+                while True:
+                    data = self.rfile.readline()
+                    if data in (b'.\r\n', b''):
+                        break
+                    lines.append(data)
+                with self.server.lock:
+                    self.server.messages.append(b''.join(lines))
+                self.reply('250 OK')
+            elif command == 'QUIT':
+                self.wfile.write(b'221 Bye\r\n')
+                return
+            else:
+                self.reply('250 OK')
+
+
+class FakeSMTPServer(socketserver.ThreadingTCPServer):
+    """
+    SMTP server on 127.0.0.1 that accepts any login and message. `delay`
+    seconds pass before each reply; connections and messages are counted.
+
+        server = FakeSMTPServer().start()
+        ... EMAIL_HOST='127.0.0.1', EMAIL_PORT=server.port, EMAIL_USE_TLS=False ...
+        server.stop()
+    """
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.messages = []
+        self.open_sockets = set()
+        super().__init__(('127.0.0.1', 0), _FakeSMTPHandler)
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def drop_connections(self):
+        """Close every client connection, like a server timing out idle sessions"""
+        with self.lock:
+            sockets = list(self.open_sockets)
+        for sock in sockets:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def stop(self):
+        self.drop_connections()
+        self.shutdown()
+        self.server_close()
@@ -0,0 +1,108 @@
+import signal
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, connection
+
+from outbound.clients import check_providers, smtp_connections
+from outbound.queue import process_pending, release_stale_notifications
+
+
+class Command(BaseCommand):
+    help = 'Deliver queued email, SMS and WhatsApp notifications (OTP codes, feedback)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Drain the queue once and exit instead of polling',
+        )
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Connect to the SMTP server and Twilio, report the result and exit',
+        )
+        parser.add_argument(
+            '--threads',
+            type=int,
+            default=4,
+            help='Concurrent senders in this process (default: 4); '
+                 'OUTBOUND_SETTINGS CONCURRENCY still caps each provider',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=20,
+            help='Maximum notifications per poll and thread (default: 20)',
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=1.0,
+            help='Seconds to wait when the queue is empty (default: 1.0)',
+        )
+
+    def handle(self, *args, **options):
+        if options['check']:
+            self.check()
+            return
+
+        self.running = True
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        if options['once']:
+            release_stale_notifications()
+            total = 0
+            while self.running:
+                processed = process_pending(limit=options['batch_size'])
+                total += processed
+                if processed < options['batch_size']:
+                    break
+            smtp_connections.close_all()
+            self.stdout.write(self.style.SUCCESS(f'Processed {total} outbound notifications'))
+            return
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Outbound notification worker started ({options['threads']} threads)"
+        ))
+        threads = [
+            threading.Thread(target=self.poll, args=(options, index == 0), daemon=True)
+            for index in range(max(options['threads'], 1))
+        ]
+        for thread in threads:
+            thread.start()
+        while self.running and any(thread.is_alive() for thread in threads):
+            time.sleep(0.5)
+        for thread in threads:
+            thread.join()
+        smtp_connections.close_all()
+        self.stdout.write(self.style.WARNING('Outbound notification worker stopped'))
+
+    def poll(self, options, release_stale):
+        try:
+            while self.running:
+                close_old_connections()
+                if release_stale:
+                    release_stale_notifications()
+                processed = process_pending(limit=options['batch_size'])
+                if processed < options['batch_size']:
+                    time.sleep(options['sleep'])
+        finally:
+            connection.close()
+
+    def check(self):
+        failed = False
+        for provider, error in check_providers().items():
+            if error:
+                failed = True
+                self.stdout.write(self.style.ERROR(f'{provider}: {error}'))
+            else:
+                self.stdout.write(self.style.SUCCESS(f'{provider}: OK'))
+        smtp_connections.close_all()
+        if failed:
+            raise CommandError('Outbound provider check failed')
+
+    def stop(self, signum, frame):
+        self.running = False
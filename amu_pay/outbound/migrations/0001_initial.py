@@ -0,0 +1,40 @@
+# Generated by Django 5.2.6 on 2026-10-19 04:45
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OutboundNotification',
+            fields=[
+                ('notification_id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('channel', models.CharField(choices=[('email', 'Email'), ('sms', 'SMS'), ('whatsapp', 'WhatsApp')], max_length=20)),
+                ('provider', models.CharField(choices=[('smtp', 'SMTP'), ('twilio', 'Twilio')], max_length=20)),
+                ('recipient', models.CharField(help_text='Email address or E.164 phone number', max_length=255)),
+                ('purpose', models.CharField(blank=True, help_text='e.g. saraf_otp, feedback', max_length=50)),
+                ('payload', models.JSONField(default=dict, help_text='Provider send arguments')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('sending', 'Sending'), ('sent', 'Sent'), ('failed', 'Failed'), ('expired', 'Expired')], default='pending', max_length=20)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True)),
+                ('provider_message_id', models.CharField(blank=True, help_text='Twilio message SID', max_length=64)),
+                ('available_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('expires_at', models.DateTimeField(blank=True, help_text='Not sent after this time (OTP expiry)', null=True)),
+                ('locked_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('sent_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Outbound Notification',
+                'verbose_name_plural': 'Outbound Notifications',
+                'indexes': [models.Index(fields=['status', 'provider', 'available_at'], name='outbound_ou_status_981bb6_idx'), models.Index(fields=['recipient', 'created_at'], name='outbound_ou_recipie_75d220_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,54 @@
+from django.db import models
+from django.utils import timezone
+
+
+class OutboundNotification(models.Model):
+    """
+    One queued email, SMS or WhatsApp message and its delivery state.
+    Created by outbound.queue and delivered by the run_outbound_notifications worker.
+    """
+    CHANNEL_CHOICES = [
+        ('email', 'Email'),
+        ('sms', 'SMS'),
+        ('whatsapp', 'WhatsApp'),
+    ]
+
+    PROVIDER_CHOICES = [
+        ('smtp', 'SMTP'),
+        ('twilio', 'Twilio'),
+    ]
+
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('sending', 'Sending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+        ('expired', 'Expired'),
+    ]
+
+    notification_id = models.BigAutoField(primary_key=True)
+    channel = models.CharField(max_length=20, choices=CHANNEL_CHOICES)
+    provider = models.CharField(max_length=20, choices=PROVIDER_CHOICES)
+    recipient = models.CharField(max_length=255, help_text="Email address or E.164 phone number")
+    purpose = models.CharField(max_length=50, blank=True, help_text="e.g. saraf_otp, feedback")
+    payload = models.JSONField(default=dict, help_text="Provider send arguments")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    provider_message_id = models.CharField(max_length=64, blank=True, help_text="Twilio message SID")
+    available_at = models.DateTimeField(default=timezone.now)
+    expires_at = models.DateTimeField(null=True, blank=True, help_text="Not sent after this time (OTP expiry)")
+    locked_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = 'Outbound Notification'
+        verbose_name_plural = 'Outbound Notifications'
+        indexes = [
+            models.Index(fields=['status', 'provider', 'available_at']),
+            models.Index(fields=['recipient', 'created_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.get_channel_display()} to {self.recipient} ({self.status})"
@@ -0,0 +1,84 @@
+"""
+Delivery backends for outbound notifications.
+
+OUTBOUND_SETTINGS['PROVIDERS'] maps each provider name (smtp, twilio) to a
+class path. A provider's send(notification) delivers notification.payload to
+notification.recipient and returns the provider's message id ('' when it has
+none). It raises PermanentDeliveryError for rejections that a retry cannot
+fix, such as an invalid number or a refused recipient; any other exception is
+retried with backoff by outbound.queue.
+
+The real providers send through the pooled clients in outbound.clients.
+"""
+import smtplib
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives
+from django.utils.module_loading import import_string
+
+from utils.metrics import external_call
+
+from .clients import send_email_message, twilio_clients
+
+DEFAULT_PROVIDERS = {
+    'smtp': 'outbound.providers.SMTPProvider',
+    'twilio': 'outbound.providers.TwilioProvider',
+}
+
+
+class PermanentDeliveryError(Exception):
+    """The provider rejected the notification; retrying will not help"""
+
+
+class SMTPProvider:
+    """Email through Django's configured email backend, over pooled connections"""
+
+    def send(self, notification):
+        payload = notification.payload
+        message = EmailMultiAlternatives(
+            subject=payload['subject'],
+            body=payload['message'],
+            from_email=payload.get('from_email') or settings.EMAIL_HOST_USER,
+            to=[notification.recipient],
+        )
+        if payload.get('html_message'):
+            message.attach_alternative(payload['html_message'], 'text/html')
+        try:
+            send_email_message(message)
+        except smtplib.SMTPRecipientsRefused as e:
+            raise PermanentDeliveryError(f"Recipient refused: {e.recipients}")
+        return ''
+
+
+class TwilioProvider:
+    """SMS and WhatsApp messages through the Twilio REST API, on the shared client"""
+
+    def client(self):
+        return twilio_clients.client()
+
+    def send(self, notification):
+        from requests.exceptions import ConnectionError
+        from twilio.base.exceptions import TwilioRestException
+
+        to = notification.recipient
+        if notification.channel == 'whatsapp':
+            to = 'whatsapp:' + to
+        try:
+            with external_call('twilio'):
+                message = self.client().messages.create(to=to, **notification.payload)
+        except TwilioRestException as e:
+            # 4xx other than rate limiting: bad number, unsubscribed recipient, invalid template
+            if 400 <= e.status < 500 and e.status != 429:
+                raise PermanentDeliveryError(f"Twilio error {e.code}: {e.msg}")
+            raise
+        except ConnectionError:
+            # Reconnect on the next send; the queue retries this one
+            twilio_clients.reset()
+            raise
+        return message.sid
+
+
+def get_provider(name):
+    """Provider instance for a name, from OUTBOUND_SETTINGS['PROVIDERS']"""
+    paths = {**DEFAULT_PROVIDERS, **getattr(settings, 'OUTBOUND_SETTINGS', {}).get('PROVIDERS', {})}
+    return import_string(paths[name])()
@@ -0,0 +1,199 @@
+"""
+Queued email, SMS and WhatsApp delivery.
+
+OTP codes and the feedback email used to go out over SMTP or Twilio inside the
+request, with no retry: a slow provider meant slow registrations and a
+provider error meant a lost code. The queue_* helpers below store an
+OutboundNotification and return. The run_outbound_notifications worker
+delivers it and records the outcome on the row (status, attempts,
+last_error, provider message id). Failed sends are retried with exponential
+backoff and random jitter, so a provider outage does not end in a
+synchronized burst of retries.
+
+Each provider has a concurrency limit in OUTBOUND_SETTINGS['CONCURRENCY']. A
+worker claims a notification only while fewer than that many of the
+provider's notifications are being sent, counted across all worker
+processes. Notifications with an expires_at (OTP codes) are marked 'expired'
+instead of being delivered after the code stopped working.
+
+With OUTBOUND_SETTINGS['ASYNC_DELIVERY'] off, a notification is delivered in
+the requesting process right after its transaction commits, so no worker is
+needed.
+"""
+import json
+import logging
+import random
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F
+from django.utils import timezone
+
+from .models import OutboundNotification
+from .providers import PermanentDeliveryError, get_provider
+
+logger = logging.getLogger(__name__)
+
+CHANNEL_PROVIDERS = {'email': 'smtp', 'sms': 'twilio', 'whatsapp': 'twilio'}
+DEFAULT_CONCURRENCY = 4
+DEFAULT_MAX_ATTEMPTS = 5
+RETRY_BASE_SECONDS = 2
+MAX_RETRY_DELAY_SECONDS = 300
+# A notification left in 'sending' this long belongs to a worker that died
+STALE_LOCK_SECONDS = 300
+# OTP codes are valid for 10 minutes (see the OTP models)
+OTP_EXPIRY_SECONDS = 600
+
+
+def _outbound_settings():
+    return getattr(settings, 'OUTBOUND_SETTINGS', {})
+
+
+def enqueue(channel, recipient, payload, purpose='', expires_in=None):
+    """Store a notification for delivery. Call inside the request's transaction, if any."""
+    notification = OutboundNotification.objects.create(
+        channel=channel,
+        provider=CHANNEL_PROVIDERS[channel],
+        recipient=recipient,
+        purpose=purpose,
+        payload=payload,
+        expires_at=timezone.now() + timedelta(seconds=expires_in) if expires_in else None,
+    )
+    if not _outbound_settings().get('ASYNC_DELIVERY', True):
+        notification_id = notification.notification_id
+        transaction.on_commit(lambda: process_pending(notification_id=notification_id))
+    return notification
+
+
+def queue_email(recipient, subject, message, html_message=None, from_email=None, purpose='', expires_in=None):
+    payload = {
+        'subject': subject,
+        'message': message,
+        'from_email': from_email or settings.EMAIL_HOST_USER,
+    }
+    if html_message:
+        payload['html_message'] = html_message
+    return enqueue('email', recipient, payload, purpose=purpose, expires_in=expires_in)
+
+
+def queue_sms(recipient, body, purpose='', expires_in=None):
+    """SMS to an E.164 phone number"""
+    payload = {'body': body, 'from_': settings.TWILIO_PHONE_NUMBER}
+    return enqueue('sms', recipient, payload, purpose=purpose, expires_in=expires_in)
+
+
+def queue_whatsapp_template(recipient, content_sid, variables, purpose='', expires_in=None):
+    """WhatsApp Content API template message to an E.164 phone number"""
+    payload = {
+        'content_sid': content_sid,
+        'content_variables': json.dumps(variables),
+        'from_': 'whatsapp:' + settings.TWILIO_WHATSAPP_FROM_NUMBER,
+    }
+    return enqueue('whatsapp', recipient, payload, purpose=purpose, expires_in=expires_in)
+
+
+def release_stale_notifications():
+    """Return notifications abandoned by a crashed worker to the queue"""
+    cutoff = timezone.now() - timedelta(seconds=STALE_LOCK_SECONDS)
+    return OutboundNotification.objects.filter(status='sending', locked_at__lt=cutoff).update(
+        status='pending', locked_at=None
+    )
+
+
+def _concurrency(provider):
+    return _outbound_settings().get('CONCURRENCY', {}).get(provider, DEFAULT_CONCURRENCY)
+
+
+def claim_next_notification(notification_id=None):
+    """Claim the oldest due notification whose provider has a free slot, or return None"""
+    now = timezone.now()
+    sending = dict(
+        OutboundNotification.objects.filter(status='sending').values('provider').annotate(
+            count=Count('pk')
+        ).values_list('provider', 'count')
+    )
+    open_providers = [
+        provider for provider in set(CHANNEL_PROVIDERS.values())
+        if sending.get(provider, 0) < _concurrency(provider)
+    ]
+    if not open_providers:
+        return None
+
+    candidates = OutboundNotification.objects.filter(
+        status='pending', available_at__lte=now, provider__in=open_providers
+    )
+    if notification_id is not None:
+        candidates = candidates.filter(notification_id=notification_id)
+    candidates = candidates.order_by('available_at', 'notification_id').values_list('notification_id', 'provider')
+
+    for candidate_id, provider in candidates[:10]:
+        # Compare-and-set so concurrent workers never claim the same notification
+        claimed = OutboundNotification.objects.filter(notification_id=candidate_id, status='pending').update(
+            status='sending', locked_at=now, attempts=F('attempts') + 1
+        )
+        if not claimed:
+            continue
+        # Another worker may have taken the provider's last slot at the same time
+        if OutboundNotification.objects.filter(status='sending', provider=provider).count() > _concurrency(provider):
+            OutboundNotification.objects.filter(notification_id=candidate_id).update(
+                status='pending', locked_at=None, attempts=F('attempts') - 1
+            )
+            continue
+        return OutboundNotification.objects.get(notification_id=candidate_id)
+    return None
+
+
+def retry_delay(attempts):
+    """Seconds before retry number `attempts`: exponential, capped, with 50-100% jitter"""
+    delay = min(RETRY_BASE_SECONDS * 2 ** max(attempts - 1, 0), MAX_RETRY_DELAY_SECONDS)
+    return random.uniform(delay / 2, delay)
+
+
+def _finish(notification, status, error='', **fields):
+    OutboundNotification.objects.filter(notification_id=notification.notification_id).update(
+        status=status, locked_at=None, last_error=error, **fields
+    )
+
+
+def deliver(notification):
+    """Send one claimed notification; on a transient failure schedule a retry"""
+    if notification.expires_at and notification.expires_at <= timezone.now():
+        _finish(notification, 'expired', 'Expired before delivery')
+        logger.warning(f"Outbound notification {notification.notification_id} to "
+                       f"{notification.recipient} expired before delivery")
+        return False
+
+    try:
+        message_id = get_provider(notification.provider).send(notification)
+    except PermanentDeliveryError as e:
+        _finish(notification, 'failed', str(e))
+        logger.error(f"Outbound notification {notification.notification_id} to "
+                     f"{notification.recipient} rejected: {str(e)}")
+        return False
+    except Exception as e:
+        max_attempts = _outbound_settings().get('MAX_ATTEMPTS', DEFAULT_MAX_ATTEMPTS)
+        failed = notification.attempts >= max_attempts
+        _finish(
+            notification, 'failed' if failed else 'pending', str(e),
+            available_at=timezone.now() + timedelta(seconds=retry_delay(notification.attempts))
+        )
+        logger.error(f"Outbound notification {notification.notification_id} to {notification.recipient} "
+                     f"failed (attempt {notification.attempts}): {str(e)}")
+        return False
+
+    _finish(notification, 'sent', provider_message_id=message_id or '', sent_at=timezone.now())
+    logger.info(f"Outbound {notification.channel} {notification.notification_id} sent to {notification.recipient}")
+    return True
+
+
+def process_pending(limit=100, notification_id=None):
+    """Deliver up to limit due notifications. Returns the number processed."""
+    processed = 0
+    while processed < limit:
+        notification = claim_next_notification(notification_id=notification_id)
+        if notification is None:
+            break
+        deliver(notification)
+        processed += 1
+    return processed
@@ -0,0 +1,215 @@
+import json
+import smtplib
+from datetime import timedelta
+from unittest import mock
+
+from django.core import mail
+from django.core.mail import EmailMessage
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from .clients import TwilioClientPool, send_email_message, smtp_connections, twilio_clients
+from .fakes import FakeSMTPProvider, FakeSMTPServer, FakeTwilioProvider
+from .models import OutboundNotification
+from .providers import PermanentDeliveryError, TwilioProvider
+from .queue import (
+    claim_next_notification, process_pending, queue_email, queue_sms, queue_whatsapp_template, retry_delay
+)
+
+FAKE_OUTBOUND_SETTINGS = {
+    'ASYNC_DELIVERY': True,
+    'MAX_ATTEMPTS': 3,
+    'CONCURRENCY': {'smtp': 2, 'twilio': 1},
+    'PROVIDERS': {
+        'smtp': 'outbound.fakes.FakeSMTPProvider',
+        'twilio': 'outbound.fakes.FakeTwilioProvider',
+    },
+}
+
+
+@override_settings(
+    OUTBOUND_SETTINGS=FAKE_OUTBOUND_SETTINGS,
+    TWILIO_PHONE_NUMBER='+15550000000',
+    TWILIO_WHATSAPP_FROM_NUMBER='+15550000001',
+)
+class OutboundQueueTests(TestCase):
+    """Queued delivery through the fake SMTP and Twilio providers"""
+
+    def setUp(self):
+        FakeSMTPProvider.reset()
+        FakeTwilioProvider.reset()
+
+    def test_queued_notifications_are_delivered_and_tracked(self):
+        email = queue_email('user@example.com', 'Code', 'Your code is 1234', purpose='email_otp')
+        whatsapp = queue_whatsapp_template('+93790000000', 'HX123', {'1': '1234'}, purpose='wa_otp')
+        self.assertEqual(FakeSMTPProvider.outbox, [])
+
+        self.assertEqual(process_pending(), 2)
+
+        email.refresh_from_db()
+        whatsapp.refresh_from_db()
+        self.assertEqual((email.status, email.attempts), ('sent', 1))
+        self.assertIsNotNone(email.sent_at)
+        self.assertEqual(whatsapp.status, 'sent')
+        self.assertTrue(whatsapp.provider_message_id.startswith('SMfake'))
+        self.assertEqual(FakeSMTPProvider.outbox[0]['recipient'], 'user@example.com')
+        payload = FakeTwilioProvider.outbox[0]['payload']
+        self.assertEqual(json.loads(payload['content_variables']), {'1': '1234'})
+        self.assertEqual(payload['from_'], 'whatsapp:+15550000001')
+
+    def test_transient_failures_are_retried_with_backoff_until_max_attempts(self):
+        notification = queue_sms('+93790000000', 'Your code is 1234')
+        FakeTwilioProvider.fail_next(times=3)
+
+        before = timezone.now()
+        process_pending()
+        notification.refresh_from_db()
+        self.assertEqual((notification.status, notification.attempts), ('pending', 1))
+        self.assertIn('unavailable', notification.last_error)
+        self.assertGreater(notification.available_at, before)
+        # Not due yet
+        self.assertEqual(process_pending(), 0)
+
+        for _ in range(2):
+            OutboundNotification.objects.update(available_at=timezone.now())
+            process_pending()
+        notification.refresh_from_db()
+        self.assertEqual((notification.status, notification.attempts), ('failed', 3))
+        self.assertEqual(FakeTwilioProvider.outbox, [])
+
+    def test_retry_delay_is_jittered_and_capped(self):
+        delays = {retry_delay(3) for _ in range(20)}
+        self.assertTrue(all(4 <= delay <= 8 for delay in delays))
+        self.assertGreater(len(delays), 1)
+        self.assertLessEqual(retry_delay(50), 300)
+
+    def test_permanent_failures_are_not_retried(self):
+        notification = queue_sms('+93790000000', 'Your code is 1234')
+        FakeTwilioProvider.fail_next(permanent=True)
+        process_pending()
+        notification.refresh_from_db()
+        self.assertEqual((notification.status, notification.attempts), ('failed', 1))
+        self.assertIn('rejected', notification.last_error)
+
+    def test_expired_notifications_are_not_sent(self):
+        notification = queue_email('user@example.com', 'Code', 'Your code is 1234', expires_in=600)
+        OutboundNotification.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        process_pending()
+        notification.refresh_from_db()
+        self.assertEqual(notification.status, 'expired')
+        self.assertEqual(FakeSMTPProvider.outbox, [])
+
+    def test_provider_concurrency_limit(self):
+        busy = queue_sms('+93790000000', 'first')
+        OutboundNotification.objects.filter(pk=busy.pk).update(status='sending', locked_at=timezone.now())
+        queue_sms('+93790000001', 'second')
+        email = queue_email('user@example.com', 'Code', 'Your code is 1234')
+
+        # Twilio's single slot is taken, so only the email can be claimed
+        self.assertEqual(claim_next_notification().pk, email.pk)
+        self.assertIsNone(claim_next_notification())
+
+    @override_settings(OUTBOUND_SETTINGS={**FAKE_OUTBOUND_SETTINGS, 'ASYNC_DELIVERY': False})
+    def test_inline_delivery_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            notification = queue_email('user@example.com', 'Code', 'Your code is 1234')
+            self.assertEqual(FakeSMTPProvider.outbox, [])
+        notification.refresh_from_db()
+        self.assertEqual(notification.status, 'sent')
+        self.assertEqual(len(FakeSMTPProvider.outbox), 1)
+
+    def test_whatsapp_otp_view_queues_the_code(self):
+        response = APIClient().post('/api/wa-otp/wa-otp/', {'phone_number': '0790000000'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        notification = OutboundNotification.objects.get()
+        self.assertEqual((notification.channel, notification.recipient, notification.purpose),
+                         ('whatsapp', '+93790000000', 'wa_otp'))
+        self.assertIsNotNone(notification.expires_at)
+
+
+@override_settings(OUTBOUND_SETTINGS={'ASYNC_DELIVERY': True}, TWILIO_WHATSAPP_FROM_NUMBER='+15550000001')
+class OutboundProviderTests(TestCase):
+    """The real SMTP and Twilio providers"""
+
+    def test_smtp_provider_uses_the_email_backend(self):
+        queue_email('user@example.com', 'Code', 'Your code is 1234', html_message='<b>1234</b>')
+        process_pending()
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['user@example.com'])
+        self.assertEqual(mail.outbox[0].alternatives[0].content, '<b>1234</b>')
+
+    def test_twilio_provider_addresses_whatsapp_and_classifies_errors(self):
+        from twilio.base.exceptions import TwilioRestException
+
+        notification = queue_whatsapp_template('+93790000000', 'HX123', {'1': '1234'})
+        provider = TwilioProvider()
+        client = mock.Mock()
+        client.messages.create.return_value = mock.Mock(sid='SM123')
+        with mock.patch.object(twilio_clients, 'client', return_value=client):
+            self.assertEqual(provider.send(notification), 'SM123')
+            self.assertEqual(client.messages.create.call_args.kwargs['to'], 'whatsapp:+93790000000')
+
+            client.messages.create.side_effect = TwilioRestException(400, '/Messages', 'Invalid To', code=21211)
+            with self.assertRaises(PermanentDeliveryError):
+                provider.send(notification)
+            client.messages.create.side_effect = TwilioRestException(503, '/Messages', 'Unavailable')
+            with self.assertRaises(TwilioRestException):
+                provider.send(notification)
+
+
+class OutboundClientTests(TestCase):
+    """Pooled SMTP connections and Twilio sessions"""
+
+    def setUp(self):
+        self.server = FakeSMTPServer().start()
+        self.addCleanup(self.server.stop)
+        smtp_connections.close_all()
+        self.addCleanup(smtp_connections.close_all)
+        self.enterContext(override_settings(
+            EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend',
+            EMAIL_HOST='127.0.0.1',
+            EMAIL_PORT=self.server.port,
+            EMAIL_USE_TLS=False,
+            EMAIL_HOST_USER='',
+            EMAIL_HOST_PASSWORD='',
+            OUTBOUND_SETTINGS={'CONCURRENCY': {'smtp': 2}},
+        ))
+
+    def send(self, number):
+        return send_email_message(EmailMessage(f'Code {number}', 'body', 'from@example.com', ['user@example.com']))
+
+    def test_smtp_connection_is_reused(self):
+        for number in range(3):
+            self.assertEqual(self.send(number), 1)
+        self.assertEqual(self.server.connections, 1)
+        self.assertEqual(len(self.server.messages), 3)
+
+    def test_dropped_smtp_connection_reconnects(self):
+        self.send(1)
+        self.server.drop_connections()
+        self.assertEqual(self.send(2), 1)
+        self.assertEqual(self.server.connections, 2)
+        self.assertEqual(len(self.server.messages), 2)
+
+    def test_idle_smtp_connection_is_health_checked(self):
+        self.send(1)
+        self.server.drop_connections()
+        with override_settings(OUTBOUND_SETTINGS={'SMTP_IDLE_SECONDS': 0}):
+            # NOOP finds the connection dead, so a new one is opened before sending
+            with mock.patch.object(smtplib.SMTP, 'sendmail', autospec=True,
+                                   side_effect=smtplib.SMTP.sendmail) as sendmail:
+                self.assertEqual(self.send(2), 1)
+        self.assertEqual(sendmail.call_count, 1)
+        self.assertEqual(self.server.connections, 2)
+
+    def test_twilio_client_is_shared_and_rebuilt_when_idle_or_reset(self):
+        pool = TwilioClientPool()
+        client = pool.client()
+        self.assertIs(pool.client(), client)
+        pool.reset()
+        rebuilt = pool.client()
+        self.assertIsNot(rebuilt, client)
+        with override_settings(OUTBOUND_SETTINGS={'HTTP_IDLE_SECONDS': -1}):
+            self.assertIsNot(pool.client(), rebuilt)
+
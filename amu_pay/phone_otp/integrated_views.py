@@ -3,23 +3,27 @@ from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.permissions import AllowAny
 from django.utils import timezone
+from asgiref.sync import sync_to_async
 from .models import PhoneOTP
 from email_otp.models import EmailOTP
 from .serializers import GeneratePhoneOTPSerializer, VerifyPhoneOTPSerializer
 from email_otp.serializers import GenerateOTPSerializer, VerifyOTPSerializer
-from .utils import send_sms_otp
-from email_otp.utils import send_otp_email
+from .utils import asend_sms_otp
+from email_otp.utils import asend_otp_email
+from utils.async_views import AsyncAPIView
+import asyncio
 import logging
 
 logger = logging.getLogger(__name__)
 
-class CombinedOTPGenerateView(APIView):
+class CombinedOTPGenerateView(AsyncAPIView):
     permission_classes = [AllowAny]
     """
     API endpoint to generate OTP for both email and phone (if both are provided)
     or individual email/phone verification
+    (async: the email and SMS are sent concurrently, without holding a worker)
     """
-    def post(self, request):
+    async def post(self, request):
         email = request.data.get('email')
         phone_number = request.data.get('phone_number')
         
@@ -31,67 +35,12 @@ class CombinedOTPGenerateView(APIView):
         results = {}
         errors = {}
         
-        # Handle email OTP generation
+        sends = []
         if email:
-            email_serializer = GenerateOTPSerializer(data={'email': email})
-            if email_serializer.is_valid():
-                try:
-                    # Check if email OTP already exists
-                    try:
-                        email_otp = EmailOTP.objects.get(email=email)
-                        email_otp.delete()
-                    except EmailOTP.DoesNotExist:
-                        pass
-                    
-                    # Create new email OTP
-                    email_otp = EmailOTP.objects.create(email=email)
-                    
-                    # Send OTP via email
-                    if send_otp_email(email, email_otp.otp_code):
-                        results['email'] = {
-                            'message': 'OTP sent successfully to your email',
-                            'email': email
-                        }
-                    else:
-                        email_otp.delete()
-                        errors['email'] = 'Failed to send OTP email'
-                        
-                except Exception as e:
-                    logger.error(f"Error generating email OTP for {email}: {str(e)}")
-                    errors['email'] = 'An error occurred while generating email OTP'
-            else:
-                errors['email'] = email_serializer.errors
-        
-        # Handle phone OTP generation
+            sends.append(self.generate_email_otp(email, results, errors))
         if phone_number:
-            phone_serializer = GeneratePhoneOTPSerializer(data={'phone_number': phone_number})
-            if phone_serializer.is_valid():
-                try:
-                    # Check if phone OTP already exists
-                    try:
-                        phone_otp = PhoneOTP.objects.get(phone_number=phone_number)
-                        phone_otp.delete()
-                    except PhoneOTP.DoesNotExist:
-                        pass
-                    
-                    # Create new phone OTP
-                    phone_otp = PhoneOTP.objects.create(phone_number=phone_number)
-                    
-                    # Send OTP via SMS
-                    if send_sms_otp(phone_number, phone_otp.otp_code):
-                        results['phone'] = {
-                            'message': 'OTP sent successfully to your phone',
-                            'phone_number': phone_number
-                        }
-                    else:
-                        phone_otp.delete()
-                        errors['phone'] = 'Failed to send OTP SMS'
-                        
-                except Exception as e:
-                    logger.error(f"Error generating phone OTP for {phone_number}: {str(e)}")
-                    errors['phone'] = 'An error occurred while generating phone OTP'
-            else:
-                errors['phone'] = phone_serializer.errors
+            sends.append(self.generate_phone_otp(phone_number, results, errors))
+        await asyncio.gather(*sends)
         
         # Prepare response
         if results and not errors:
@@ -110,6 +59,68 @@ class CombinedOTPGenerateView(APIView):
                 'error': 'Failed to send OTP(s)',
                 'errors': errors
             }, status=status.HTTP_400_BAD_REQUEST)
+    
+    async def generate_email_otp(self, email, results, errors):
+        """Handle email OTP generation"""
+        email_serializer = GenerateOTPSerializer(data={'email': email})
+        if await sync_to_async(email_serializer.is_valid)():
+            try:
+                # Check if email OTP already exists
+                try:
+                    email_otp = await EmailOTP.objects.aget(email=email)
+                    await email_otp.adelete()
+                except EmailOTP.DoesNotExist:
+                    pass
+                
+                # Create new email OTP
+                email_otp = await EmailOTP.objects.acreate(email=email)
+                
+                # Send OTP via email
+                if await asend_otp_email(email, email_otp.otp_code):
+                    results['email'] = {
+                        'message': 'OTP sent successfully to your email',
+                        'email': email
+                    }
+                else:
+                    await email_otp.adelete()
+                    errors['email'] = 'Failed to send OTP email'
+                    
+            except Exception as e:
+                logger.error(f"Error generating email OTP for {email}: {str(e)}")
+                errors['email'] = 'An error occurred while generating email OTP'
+        else:
+            errors['email'] = email_serializer.errors
+    
+    async def generate_phone_otp(self, phone_number, results, errors):
+        """Handle phone OTP generation"""
+        phone_serializer = GeneratePhoneOTPSerializer(data={'phone_number': phone_number})
+        if await sync_to_async(phone_serializer.is_valid)():
+            try:
+                # Check if phone OTP already exists
+                try:
+                    phone_otp = await PhoneOTP.objects.aget(phone_number=phone_number)
+                    await phone_otp.adelete()
+                except PhoneOTP.DoesNotExist:
+                    pass
+                
+                # Create new phone OTP
+                phone_otp = await PhoneOTP.objects.acreate(phone_number=phone_number)
+                
+                # Send OTP via SMS
+                if await asend_sms_otp(phone_number, phone_otp.otp_code):
+                    results['phone'] = {
+                        'message': 'OTP sent successfully to your phone',
+                        'phone_number': phone_number
+                    }
+                else:
+                    await phone_otp.adelete()
+                    errors['phone'] = 'Failed to send OTP SMS'
+                    
+            except Exception as e:
+                logger.error(f"Error generating phone OTP for {phone_number}: {str(e)}")
+                errors['phone'] = 'An error occurred while generating phone OTP'
+        else:
+            errors['phone'] = phone_serializer.errors
 
 class CombinedOTPVerifyView(APIView):
     permission_classes = [AllowAny]
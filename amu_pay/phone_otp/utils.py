@@ -1,36 +1,35 @@
-from twilio.rest import Client
-from django.conf import settings
+from asgiref.sync import sync_to_async
+from outbound.queue import OTP_EXPIRY_SECONDS, queue_sms
 import logging
 
 logger = logging.getLogger(__name__)
 
 def send_sms_otp(phone_number, otp_code):
     """
-    Send OTP via SMS using Twilio
+    Queue OTP SMS for delivery through Twilio (see outbound.queue)
     
     Args:
         phone_number (str): Phone number in E.164 format
         otp_code (str): 6-digit OTP code
     
     Returns:
-        bool: True if SMS sent successfully, False otherwise
+        bool: True if the SMS was queued, False otherwise
     """
     try:
-        # Initialize Twilio client
-        client = Client(settings.TWILIO_ACCOUNT_SID, settings.TWILIO_AUTH_TOKEN)
-        
-        # Create SMS message
-        message_body = f"Your OTP code is: {otp_code}. This code will expire in 10 minutes. Do not share this code with anyone."
-        
-        message = client.messages.create(
-            body=message_body,
-            from_=settings.TWILIO_PHONE_NUMBER,
-            to=phone_number
+        notification = queue_sms(
+            phone_number,
+            f"Your OTP code is: {otp_code}. This code will expire in 10 minutes. Do not share this code with anyone.",
+            purpose='phone_otp',
+            expires_in=OTP_EXPIRY_SECONDS
         )
         
-        logger.info(f"SMS sent successfully to {phone_number}. Message SID: {message.sid}")
+        logger.info(f"SMS queued for {phone_number}. Notification: {notification.notification_id}")
         return True
         
     except Exception as e:
-        logger.error(f"Failed to send SMS to {phone_number}: {str(e)}")
+        logger.error(f"Failed to queue SMS to {phone_number}: {str(e)}")
         return False
+
+async def asend_sms_otp(phone_number, otp_code):
+    """send_sms_otp() for async views"""
+    return await sync_to_async(send_sms_otp)(phone_number, otp_code)
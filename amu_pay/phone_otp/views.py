@@ -2,46 +2,49 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.permissions import AllowAny
+from asgiref.sync import sync_to_async
 from django.utils import timezone
 from .models import PhoneOTP
 from .serializers import GeneratePhoneOTPSerializer, VerifyPhoneOTPSerializer, PhoneOTPSerializer
-from .utils import send_sms_otp
+from .utils import asend_sms_otp
+from utils.async_views import AsyncAPIView
 import logging
 
 logger = logging.getLogger(__name__)
 
-class GeneratePhoneOTPView(APIView):
+class GeneratePhoneOTPView(AsyncAPIView):
     permission_classes = [AllowAny]
     """
     API endpoint to generate and send OTP to phone number via SMS
+    (async: the Twilio call does not hold a worker)
     """
-    def post(self, request):
+    async def post(self, request):
         serializer = GeneratePhoneOTPSerializer(data=request.data)
         
-        if serializer.is_valid():
+        if await sync_to_async(serializer.is_valid)():
             phone_number = serializer.validated_data['phone_number']
             
             try:
                 # Check if OTP already exists for this phone number
                 try:
-                    phone_otp = PhoneOTP.objects.get(phone_number=phone_number)
+                    phone_otp = await PhoneOTP.objects.aget(phone_number=phone_number)
                     # Delete existing OTP to create a new one
-                    phone_otp.delete()
+                    await phone_otp.adelete()
                 except PhoneOTP.DoesNotExist:
                     pass
                 
                 # Create new OTP
-                phone_otp = PhoneOTP.objects.create(phone_number=phone_number)
+                phone_otp = await PhoneOTP.objects.acreate(phone_number=phone_number)
                 
                 # Send OTP via SMS
-                if send_sms_otp(phone_number, phone_otp.otp_code):
+                if await asend_sms_otp(phone_number, phone_otp.otp_code):
                     return Response({
                         'message': 'OTP sent successfully to your phone',
                         'phone_number': phone_number
                     }, status=status.HTTP_200_OK)
                 else:
                     # Delete the OTP if SMS sending failed
-                    phone_otp.delete()
+                    await phone_otp.adelete()
                     return Response({
                         'error': 'Failed to send OTP SMS. Please try again.'
                     }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
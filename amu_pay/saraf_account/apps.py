@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class SarafAccountConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'saraf_account'
+
+    def ready(self):
+        # Connect the dashboard cache invalidation signal handlers
+        from . import dashboard  # noqa: F401
@@ -0,0 +1,206 @@
+"""
+Saraf dashboard snapshot.
+
+On launch the saraf app loaded balances, hawala statistics, receivable
+hawalas, unread message counts, notifications and recent exchanges with one
+request each. build_dashboard() composes any subset of those sections from
+aggregates and denormalized counters (ConversationParticipant.unread_count),
+with at most two queries per section.
+
+Each section is cached per saraf under its own key. Writes drop only the
+sections they affect: balances, hawalas, exchanges and notifications through
+the signal handlers below, message counters through invalidate_dashboard()
+calls in msg. DASHBOARD_SETTINGS['CACHE_TIMEOUT'] is kept short, so it also
+bounds staleness from writes that send no signal (queryset update() and
+bulk_create()).
+"""
+
+import logging
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from currency.registry import get_currency
+from exchange.models import ExchangeTransaction
+from hawala.models import HawalaTransaction
+from msg.models import ConversationParticipant, MessageNotification
+from msg.signals import message_fanned_out
+from saraf_balance.models import SarafBalance
+from utils.cache import CacheNamespace
+
+logger = logging.getLogger(__name__)
+
+# Section -> employee permission needed to see it (None: every employee)
+SECTIONS = {
+    'balances': 'view_history',
+    'hawala_stats': None,
+    'pending_hawalas': 'receive_transfer',
+    'messages': 'chat',
+    'notifications': 'chat',
+    'exchanges': 'view_history',
+}
+
+_snapshots = CacheNamespace('saraf_dashboard')
+
+
+def _dashboard_settings():
+    return getattr(settings, 'DASHBOARD_SETTINGS', {})
+
+
+def _recent_items():
+    return _dashboard_settings().get('RECENT_ITEMS', 5)
+
+
+def _balances(saraf_id):
+    rows = SarafBalance.objects.filter(saraf_account_id=saraf_id).order_by('currency_id').values(
+        'currency_id', 'balance', 'total_deposits', 'total_withdrawals', 'transaction_count', 'last_updated'
+    )
+    balances = []
+    for row in rows:
+        currency = get_currency(row.pop('currency_id'), active_only=False)
+        balances.append(dict(
+            currency_code=currency.currency_code,
+            currency_name=currency.currency_name_local,
+            currency_symbol=currency.symbol,
+            **row
+        ))
+    return balances
+
+
+def _hawala_stats(saraf_id):
+    # Same figures as hawala_statistics, from one aggregate query
+    sent = Q(sender_exchange_id=saraf_id)
+    received = Q(destination_exchange_id=saraf_id) | (Q(sender_exchange_id=saraf_id) & Q(mode='external_receiver'))
+    completed = Q(status='completed')
+    stats = HawalaTransaction.objects.filter(sent | received).aggregate(
+        total_sent=Count('pk', filter=sent),
+        total_received=Count('pk', filter=received),
+        pending_sent=Count('pk', filter=sent & Q(status='pending')),
+        pending_received=Count('pk', filter=received & Q(status='pending')),
+        completed_sent=Count('pk', filter=sent & completed),
+        completed_received=Count('pk', filter=received & completed),
+        total_amount_sent=Sum('amount', filter=sent & completed),
+        total_amount_received=Sum('amount', filter=received & completed),
+        total_fees_collected=Sum('transfer_fee', filter=sent & completed),
+    )
+    return {key: value or 0 for key, value in stats.items()}
+
+
+def _pending_hawalas(saraf_id):
+    # The hawalas ReceiveHawalaListView lists: pending or sent, addressed to this saraf
+    receivable = HawalaTransaction.objects.filter(
+        Q(destination_exchange_id=saraf_id) | (Q(sender_exchange_id=saraf_id) & Q(mode='external_receiver')),
+        status__in=['pending', 'sent']
+    )
+    latest = receivable.order_by('-created_at').values(
+        'hawala_number', 'amount', 'sender_name', 'sender_exchange_name',
+        'receiver_name', 'status', 'mode', 'created_at', currency_code=F('currency_id')
+    )[:_recent_items()]
+    return {
+        'count': receivable.count(),
+        'latest': list(latest),
+    }
+
+
+def _messages(saraf_id):
+    # Same total as MessageStatsView's unread_messages
+    counts = ConversationParticipant.objects.filter(saraf_account_id=saraf_id).aggregate(
+        unread_messages=Sum('unread_count'),
+        unread_conversations=Count('pk', filter=Q(unread_count__gt=0)),
+    )
+    return {key: value or 0 for key, value in counts.items()}
+
+
+def _notifications(saraf_id):
+    unread = MessageNotification.objects.filter(recipient_saraf_id=saraf_id, is_read=False)
+    latest = unread.order_by('-created_at').values(
+        'notification_id', 'message_id', 'created_at',
+        conversation_id=F('message__conversation_id'), message_type=F('message__message_type')
+    )[:_recent_items()]
+    return {
+        'unread_count': unread.count(),
+        'latest': list(latest),
+    }
+
+
+def _exchanges(saraf_id):
+    return list(ExchangeTransaction.objects.filter(saraf_account_id=saraf_id).order_by(
+        '-transaction_date', '-created_at'
+    ).values(
+        'id', 'name', 'transaction_type', 'sell_currency', 'sell_amount',
+        'buy_currency', 'buy_amount', 'rate', 'transaction_date'
+    )[:_recent_items()])
+
+
+_BUILDERS = {
+    'balances': _balances,
+    'hawala_stats': _hawala_stats,
+    'pending_hawalas': _pending_hawalas,
+    'messages': _messages,
+    'notifications': _notifications,
+    'exchanges': _exchanges,
+}
+
+
+def build_dashboard(saraf_id, sections):
+    """{section: data} for the requested sections, each served from the cache when present"""
+    timeout = _dashboard_settings().get('CACHE_TIMEOUT', 30)
+    return {
+        section: _snapshots.get_or_set(
+            f'{saraf_id}:{section}', lambda section=section: _BUILDERS[section](saraf_id), timeout=timeout
+        )
+        for section in sections
+    }
+
+
+def invalidate_dashboard(saraf_ids, *sections):
+    """Drop cached sections (default: all) for one saraf id or an iterable of them"""
+    if isinstance(saraf_ids, (int, str)):
+        saraf_ids = [saraf_ids]
+    for saraf_id in saraf_ids:
+        if saraf_id is None:
+            continue
+        for section in sections or SECTIONS:
+            _snapshots.delete(f'{saraf_id}:{section}')
+
+
+def _invalidate_on_commit(saraf_ids, *sections):
+    saraf_ids = [saraf_id for saraf_id in saraf_ids if saraf_id is not None]
+    invalidate_dashboard(saraf_ids, *sections)
+    # Again after commit, in case a request rebuilt the section before the write was visible to it
+    transaction.on_commit(lambda: invalidate_dashboard(saraf_ids, *sections))
+
+
+@receiver(post_save, sender=SarafBalance)
+@receiver(post_delete, sender=SarafBalance)
+def balance_changed(sender, instance, **kwargs):
+    _invalidate_on_commit([instance.saraf_account_id], 'balances')
+
+
+@receiver(post_save, sender=HawalaTransaction)
+@receiver(post_delete, sender=HawalaTransaction)
+def hawala_changed(sender, instance, **kwargs):
+    _invalidate_on_commit(
+        [instance.sender_exchange_id, instance.destination_exchange_id], 'hawala_stats', 'pending_hawalas'
+    )
+
+
+@receiver(post_save, sender=ExchangeTransaction)
+@receiver(post_delete, sender=ExchangeTransaction)
+def exchange_changed(sender, instance, **kwargs):
+    _invalidate_on_commit([instance.saraf_account_id], 'exchanges')
+
+
+@receiver(post_save, sender=MessageNotification)
+@receiver(post_delete, sender=MessageNotification)
+def notification_changed(sender, instance, **kwargs):
+    _invalidate_on_commit([instance.recipient_saraf_id], 'notifications')
+
+
+@receiver(message_fanned_out)
+def message_delivered(sender, message, recipient_saraf_ids, **kwargs):
+    # Notifications are bulk-created and unread counters moved with update(), so no model signal fires
+    invalidate_dashboard(recipient_saraf_ids, 'messages', 'notifications')
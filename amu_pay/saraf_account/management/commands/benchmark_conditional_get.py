@@ -0,0 +1,79 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from saraf_account.models import SarafAccount
+
+
+class Command(BaseCommand):
+    help = 'Compare full responses with 304 revalidations on the public read endpoints'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=50,
+            help='Requests per endpoint and mode (default: 50)',
+        )
+        parser.add_argument(
+            '--saraf-id',
+            type=int,
+            help='Saraf used for the detail endpoints (default: first active saraf)',
+        )
+
+    def handle(self, *args, **options):
+        saraf = SarafAccount.objects.filter(is_active=True).order_by('saraf_id')
+        saraf = saraf.filter(saraf_id=options['saraf_id']).first() if options['saraf_id'] else saraf.first()
+        if saraf is None:
+            self.stdout.write(self.style.ERROR('No active saraf account to benchmark against'))
+            return
+
+        refresh = RefreshToken()
+        refresh['user_type'] = 'saraf'
+        refresh['user_id'] = saraf.saraf_id
+        refresh['saraf_id'] = saraf.saraf_id
+        endpoints = [
+            '/api/currency/available/',
+            '/api/saraf/list/',
+            f'/api/saraf/{saraf.saraf_id}/',
+            f'/api/saraf-social/saraf/{saraf.saraf_id}/comments/',
+            f'/api/saraf-social/saraf/{saraf.saraf_id}/stats/',
+            '/api/saraf-posts/',
+        ]
+        client = Client(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+
+        self.stdout.write(
+            f"{'endpoint':<45} {'200 ms':>8} {'304 ms':>8} {'200 bytes':>10} {'304 bytes':>10} {'queries':>9}"
+        )
+        with override_settings(ALLOWED_HOSTS=['*']):
+            for url in endpoints:
+                full = self.measure(client, url, options['requests'])
+                etag = full['response'].get('ETag')
+                if full['response'].status_code != 200 or not etag:
+                    self.stdout.write(self.style.WARNING(f'{url}: status {full["response"].status_code}, no ETag'))
+                    continue
+                revalidated = self.measure(client, url, options['requests'], HTTP_IF_NONE_MATCH=etag)
+                self.stdout.write(
+                    f"{url:<45} {full['median']:>8.2f} {revalidated['median']:>8.2f} "
+                    f"{full['bytes']:>10} {revalidated['bytes']:>10} "
+                    f"{full['queries']:>4}/{revalidated['queries']:<4}"
+                )
+
+    def measure(self, client, url, count, **headers):
+        timings = []
+        for _ in range(count):
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                response = client.get(url, **headers)
+                timings.append((time.perf_counter() - started) * 1000)
+        return {
+            'response': response,
+            'median': statistics.median(timings),
+            'bytes': len(response.content),
+            'queries': len(queries),
+        }
@@ -0,0 +1,192 @@
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from outbound.fakes import FakeSMTPServer
+from saraf_account.models import SarafAccount
+
+APPLICATIONS = {
+    'sync': 'amu_pay.wsgi:application',
+    'uvicorn.workers.UvicornWorker': 'amu_pay.asgi:application',
+}
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(fraction * (len(values) - 1))))]
+
+
+class Command(BaseCommand):
+    help = (
+        'Start gunicorn once per worker class against a slow fake SMTP relay, send a burst of '
+        'feedback submissions (SMTP-bound) alongside balance-style reads, and compare how long '
+        'the reads wait for a free worker'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--worker-class',
+            action='append',
+            choices=sorted(APPLICATIONS),
+            help='Worker class to measure; repeat for several (default: sync and uvicorn)',
+        )
+        parser.add_argument('--workers', type=int, default=2, help='Gunicorn workers (default: 2)')
+        parser.add_argument(
+            '--slow-requests', type=int, default=20, help='Concurrent feedback submissions (default: 20)'
+        )
+        parser.add_argument('--fast-requests', type=int, default=40, help='Currency list reads (default: 40)')
+        parser.add_argument(
+            '--upstream-delay',
+            type=float,
+            default=0.5,
+            help='Seconds the fake SMTP relay waits before each reply (default: 0.5)',
+        )
+
+    def handle(self, *args, **options):
+        saraf = SarafAccount.objects.filter(is_active=True).order_by('saraf_id').first()
+        if saraf is None:
+            raise CommandError('No active saraf account to authenticate the read requests with')
+        refresh = RefreshToken()
+        refresh['user_type'] = 'saraf'
+        refresh['user_id'] = saraf.saraf_id
+        refresh['saraf_id'] = saraf.saraf_id
+        self.token = str(refresh.access_token)
+
+        smtp = FakeSMTPServer(delay=options['upstream_delay']).start()
+        self.stdout.write(
+            f"Fake SMTP relay on port {smtp.port}, {options['upstream_delay']}s per reply; "
+            f"{options['workers']} workers, {options['slow_requests']} submissions, "
+            f"{options['fast_requests']} reads"
+        )
+        self.stdout.write(
+            f"{'worker class':<32} {'read p50':>9} {'read p95':>9} {'read max':>9} "
+            f"{'submit p50':>11} {'errors':>7} {'wall s':>7}"
+        )
+        try:
+            for worker_class in options['worker_class'] or list(APPLICATIONS):
+                result = self.run_worker_class(worker_class, smtp.port, options)
+                self.stdout.write(
+                    f"{worker_class:<32} {result['read_p50']:>9.0f} {result['read_p95']:>9.0f} "
+                    f"{result['read_max']:>9.0f} {result['submit_p50']:>11.0f} "
+                    f"{result['errors']:>7} {result['wall']:>7.1f}"
+                )
+        finally:
+            smtp.stop()
+        self.stdout.write('Read and submit columns are milliseconds.')
+
+    def run_worker_class(self, worker_class, smtp_port, options):
+        port = free_port()
+        env = dict(
+            os.environ,
+            EMAIL_HOST='127.0.0.1',
+            EMAIL_PORT=str(smtp_port),
+            EMAIL_USE_TLS='False',
+            EMAIL_HOST_USER='benchmark@example.com',
+            # Send inside the request, as before the outbound queue, so the SMTP wait hits the workers
+            OUTBOUND_ASYNC_DELIVERY='False',
+            FEEDBACK_ADMIN_EMAIL='benchmark@example.com',
+        )
+        server = subprocess.Popen(
+            [
+                sys.executable, '-m', 'gunicorn',
+                '--bind', f'127.0.0.1:{port}',
+                '--workers', str(options['workers']),
+                '--worker-class', worker_class,
+                '--timeout', '120',
+                '--log-level', 'warning',
+                APPLICATIONS[worker_class],
+            ],
+            cwd=settings.BASE_DIR,
+            env=env,
+        )
+        base_url = f'http://127.0.0.1:{port}'
+        try:
+            self.wait_until_ready(base_url, server)
+            self.warm_up(base_url, options['workers'])
+            return self.load(base_url, options)
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+
+    def wait_until_ready(self, base_url, server):
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            if server.poll() is not None:
+                raise CommandError(f'gunicorn exited with status {server.returncode}')
+            try:
+                requests.get(
+                    f'{base_url}/api/currency/available/',
+                    headers={'Authorization': f'Bearer {self.token}'},
+                    timeout=1,
+                )
+                return
+            except requests.RequestException:
+                time.sleep(0.2)
+        raise CommandError('gunicorn did not start within 30 seconds')
+
+    def warm_up(self, base_url, workers):
+        # The first request in each worker pays for URLconf and app imports
+        with ThreadPoolExecutor(max_workers=workers * 4) as pool:
+            list(pool.map(
+                lambda _: requests.get(
+                    f'{base_url}/api/currency/available/',
+                    headers={'Authorization': f'Bearer {self.token}'},
+                    timeout=120,
+                ),
+                range(workers * 8),
+            ))
+
+    def load(self, base_url, options):
+        headers = {'Authorization': f'Bearer {self.token}'}
+
+        def submit(index):
+            started = time.perf_counter()
+            response = requests.post(f'{base_url}/api/user-feedback/submit/', json={
+                'title': f'Benchmark {index}',
+                'email': 'benchmark@example.com',
+                'content': 'Worker saturation benchmark',
+            }, timeout=120)
+            return response.status_code, (time.perf_counter() - started) * 1000
+
+        def read(index):
+            # Let the submissions occupy the workers first
+            time.sleep(0.05 + index * 0.01)
+            started = time.perf_counter()
+            response = requests.get(f'{base_url}/api/currency/available/', headers=headers, timeout=120)
+            return response.status_code, (time.perf_counter() - started) * 1000
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['slow_requests'] + options['fast_requests']) as pool:
+            submits = [pool.submit(submit, index) for index in range(options['slow_requests'])]
+            reads = [pool.submit(read, index) for index in range(options['fast_requests'])]
+            submit_results = [future.result() for future in submits]
+            read_results = [future.result() for future in reads]
+        wall = time.perf_counter() - started
+
+        read_times = [elapsed for _, elapsed in read_results]
+        errors = sum(1 for code, _ in submit_results + read_results if code >= 400)
+        return {
+            'read_p50': statistics.median(read_times),
+            'read_p95': percentile(read_times, 0.95),
+            'read_max': max(read_times),
+            'submit_p50': statistics.median(elapsed for _, elapsed in submit_results),
+            'errors': errors,
+            'wall': wall,
+        }
@@ -0,0 +1,63 @@
+# Generated by Django 5.2.6 on 2026-10-19 04:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('saraf_account', '0004_remove_sarafaccount_whatsapp_number_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sarafaccount',
+            name='saraf_logo_checksum',
+            field=models.CharField(blank=True, default='', help_text='SHA-256 hex digest', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='sarafaccount',
+            name='saraf_logo_content_type',
+            field=models.CharField(blank=True, default='', max_length=100),
+        ),
+        migrations.AddField(
+            model_name='sarafaccount',
+            name='saraf_logo_height',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='sarafaccount',
+            name='saraf_logo_size',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='sarafaccount',
+            name='saraf_logo_wallpeper_checksum',
+            field=models.CharField(blank=True, default='', help_text='SHA-256 hex digest', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='sarafaccount',
+            name='saraf_logo_wallpeper_content_type',
+            field=models.CharField(blank=True, default='', max_length=100),
+        ),
+        migrations.AddField(
+            model_name='sarafaccount',
+            name='saraf_logo_wallpeper_height',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='sarafaccount',
+            name='saraf_logo_wallpeper_size',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='sarafaccount',
+            name='saraf_logo_wallpeper_width',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='sarafaccount',
+            name='saraf_logo_width',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.6 on 2026-10-19 04:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('saraf_account', '0005_sarafaccount_picture_metadata'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sarafaccount',
+            name='back_id_card_variants',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name='sarafaccount',
+            name='front_id_card_variants',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name='sarafaccount',
+            name='saraf_logo_variants',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name='sarafaccount',
+            name='saraf_logo_wallpeper_variants',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
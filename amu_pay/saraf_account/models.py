@@ -7,6 +7,9 @@ import re
 import secrets
 import string
 
+from media_uploads.metadata import capture_file_metadata
+from media_uploads.variants import queue_image_variants
+
 
 # Default Employee Permissions Dictionary - Each employee gets their own copy
 # All permissions are set to True by default
@@ -93,8 +96,25 @@ class SarafAccount(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     saraf_logo = models.ImageField(upload_to='saraf_photos/', null=True, blank=True)
     saraf_logo_wallpeper = models.ImageField(upload_to='saraf_photos/', null=True, blank=True)
+    # Logo metadata captured at upload (see media_uploads.metadata)
+    saraf_logo_size = models.BigIntegerField(null=True, blank=True)
+    saraf_logo_content_type = models.CharField(max_length=100, blank=True, default='')
+    saraf_logo_checksum = models.CharField(max_length=64, blank=True, default='', help_text="SHA-256 hex digest")
+    saraf_logo_width = models.PositiveIntegerField(null=True, blank=True)
+    saraf_logo_height = models.PositiveIntegerField(null=True, blank=True)
+    # Wallpaper metadata captured at upload (see media_uploads.metadata)
+    saraf_logo_wallpeper_size = models.BigIntegerField(null=True, blank=True)
+    saraf_logo_wallpeper_content_type = models.CharField(max_length=100, blank=True, default='')
+    saraf_logo_wallpeper_checksum = models.CharField(max_length=64, blank=True, default='', help_text="SHA-256 hex digest")
+    saraf_logo_wallpeper_width = models.PositiveIntegerField(null=True, blank=True)
+    saraf_logo_wallpeper_height = models.PositiveIntegerField(null=True, blank=True)
     front_id_card = models.ImageField(upload_to='saraf_photos/', null=True, blank=True)
     back_id_card = models.ImageField(upload_to='saraf_photos/', null=True, blank=True)
+    # Rendered thumbnail/medium variants (see media_uploads.variants)
+    saraf_logo_variants = models.JSONField(default=dict, blank=True)
+    saraf_logo_wallpeper_variants = models.JSONField(default=dict, blank=True)
+    front_id_card_variants = models.JSONField(default=dict, blank=True)
+    back_id_card_variants = models.JSONField(default=dict, blank=True)
     is_active = models.BooleanField(default=False)
 
     class Meta:
@@ -184,6 +204,10 @@ class SarafAccount(models.Model):
         """Ensure password is never stored in plain text and validate AmuPay code"""
         from django.db import transaction
         
+        kwargs['update_fields'] = capture_file_metadata(
+            self, 'saraf_logo', 'saraf_logo_wallpeper', update_fields=kwargs.get('update_fields')
+        )
+        
         if hasattr(self, 'password'):
             delattr(self, 'password')
         
@@ -214,6 +238,11 @@ class SarafAccount(models.Model):
             # Existing account or no code - just save normally
             self.full_clean()
             super().save(*args, **kwargs)
+        
+        queue_image_variants(
+            self, 'saraf_logo', 'saraf_logo_wallpeper', 'front_id_card', 'back_id_card',
+            update_fields=kwargs.get('update_fields')
+        )
 
 
 class SarafEmployee(models.Model):
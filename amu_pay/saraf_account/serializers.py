@@ -1,6 +1,8 @@
 from rest_framework import serializers
 from django.core.exceptions import ValidationError
 from .models import SarafAccount, SarafOTP, AmuPayCode
+from media_uploads.fields import DirectUploadImageField, ImageVariantsField
+from media_uploads.uploads import DirectUpload
 
 
 class SarafListSerializer(serializers.ModelSerializer):
@@ -8,10 +10,14 @@ class SarafListSerializer(serializers.ModelSerializer):
     Serializer for listing Saraf accounts with basic information
     """
     saraf_logo = serializers.SerializerMethodField()
+    saraf_logo_variants = ImageVariantsField('saraf_logo')
     
     class Meta:
         model = SarafAccount
-        fields = ['saraf_id', 'exchange_name', 'province', 'saraf_logo', 'email_or_whatsapp_number', 'saraf_location_google_map']
+        fields = [
+            'saraf_id', 'exchange_name', 'province', 'saraf_logo', 'saraf_logo_variants',
+            'email_or_whatsapp_number', 'saraf_location_google_map'
+        ]
     
     def get_saraf_logo(self, obj):
         """
@@ -29,12 +35,14 @@ class SarafDetailSerializer(serializers.ModelSerializer):
     """
     Serializer for detailed Saraf account information
     """
+    saraf_logo_variants = ImageVariantsField('saraf_logo')
+    
     class Meta:
         model = SarafAccount
         fields = [
             'saraf_id', 'full_name', 'exchange_name', 'email_or_whatsapp_number',
             'license_no', 'saraf_address', 'saraf_location_google_map', 'province', 'saraf_logo',
-            'is_email_verified', 'is_whatsapp_verified', 'is_active', 'created_at'
+            'saraf_logo_variants', 'is_email_verified', 'is_whatsapp_verified', 'is_active', 'created_at'
         ]
         read_only_fields = ['saraf_id', 'created_at', 'is_email_verified', 'is_whatsapp_verified']
 
@@ -266,18 +274,17 @@ class SarafPictureUpdateSerializer(serializers.ModelSerializer):
     """
     Serializer for updating Saraf account picture fields
     """
+    saraf_logo = DirectUploadImageField(purpose='saraf_picture', required=False, allow_null=True)
+    saraf_logo_wallpeper = DirectUploadImageField(purpose='saraf_picture', required=False, allow_null=True)
+    front_id_card = DirectUploadImageField(purpose='saraf_picture', required=False, allow_null=True)
+    back_id_card = DirectUploadImageField(purpose='saraf_picture', required=False, allow_null=True)
+    
     class Meta:
         model = SarafAccount
         fields = [
             'saraf_logo', 'saraf_logo_wallpeper', 
             'front_id_card', 'back_id_card'
         ]
-        extra_kwargs = {
-            'saraf_logo': {'required': False, 'allow_null': True},
-            'saraf_logo_wallpeper': {'required': False, 'allow_null': True},
-            'front_id_card': {'required': False, 'allow_null': True},
-            'back_id_card': {'required': False, 'allow_null': True},
-        }
     
     def validate_saraf_logo(self, value):
         """Validate logo image"""
@@ -308,6 +315,10 @@ class SarafPictureUpdateSerializer(serializers.ModelSerializer):
         import os
         from PIL import Image
         
+        # Direct uploads had their size and content type enforced by the upload slot
+        if isinstance(image, DirectUpload):
+            return image
+        
         # Check file size (max 5MB)
         if image.size > 5 * 1024 * 1024:
             raise serializers.ValidationError(f"{field_name} file size cannot exceed 5MB")
@@ -384,6 +395,10 @@ class SarafPictureListSerializer(serializers.ModelSerializer):
     saraf_logo_wallpeper_url = serializers.SerializerMethodField()
     front_id_card_url = serializers.SerializerMethodField()
     back_id_card_url = serializers.SerializerMethodField()
+    saraf_logo_variants = ImageVariantsField('saraf_logo')
+    saraf_logo_wallpeper_variants = ImageVariantsField('saraf_logo_wallpeper')
+    front_id_card_variants = ImageVariantsField('front_id_card')
+    back_id_card_variants = ImageVariantsField('back_id_card')
     
     class Meta:
         model = SarafAccount
@@ -392,7 +407,9 @@ class SarafPictureListSerializer(serializers.ModelSerializer):
             'saraf_logo', 'saraf_logo_wallpeper', 
             'front_id_card', 'back_id_card',
             'saraf_logo_url', 'saraf_logo_wallpeper_url',
-            'front_id_card_url', 'back_id_card_url'
+            'front_id_card_url', 'back_id_card_url',
+            'saraf_logo_variants', 'saraf_logo_wallpeper_variants',
+            'front_id_card_variants', 'back_id_card_variants'
         ]
         read_only_fields = ['saraf_id', 'full_name', 'exchange_name']
     
@@ -1,3 +1,143 @@
-from django.test import TestCase
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest.mock import patch
 
-# Create your tests here.
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from currency.models import Currency
+from saraf_balance.models import SarafBalance
+from .models import AmuPayCode, SarafAccount, SarafEmployee
+
+
+class ConditionalGetTests(APITestCase):
+    """Version-based ETags on the public saraf endpoints"""
+    
+    def setUp(self):
+        AmuPayCode.objects.create(code="ETAG0001CODE")
+        self.saraf = SarafAccount.objects.create(
+            full_name="ETag Saraf",
+            exchange_name="ETag Exchange",
+            email="etag@example.com",
+            email_or_whatsapp_number="+93711222333",
+            amu_pay_code="ETAG0001CODE",
+            province="Kabul",
+            is_active=True
+        )
+    
+    def test_list_returns_304_without_serializing(self):
+        """A matching If-None-Match is answered with the version query only"""
+        response = self.client.get('/api/saraf/list/')
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/saraf/list/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(len(queries), 1)
+    
+    def test_etag_changes_with_data(self):
+        """Updates, deactivation and related rows shown in the response change the ETag"""
+        etag = self.client.get('/api/saraf/list/')['ETag']
+        self.saraf.exchange_name = "Renamed Exchange"
+        self.saraf.save()
+        response = self.client.get('/api/saraf/list/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['saraf_accounts'][0]['exchange_name'], "Renamed Exchange")
+        
+        detail_url = f'/api/saraf/{self.saraf.saraf_id}/'
+        etag = self.client.get(detail_url)['ETag']
+        SarafEmployee.objects.create(saraf_account=self.saraf, username='cashier', full_name='Cashier')
+        response = self.client.get(detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['saraf']['employee_count'], 1)
+    
+    def test_errors_carry_no_etag(self):
+        """Inactive accounts are never cached as not modified"""
+        SarafAccount.objects.filter(pk=self.saraf.pk).update(is_active=False)
+        response = self.client.get(f'/api/saraf/{self.saraf.saraf_id}/')
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(response.has_header('ETag'))
+    
+    def test_etag_rolls_over_with_presigned_media_urls(self):
+        """With signed S3 URLs a 304 is only given within half the URL lifetime"""
+        signing_storage = SimpleNamespace(querystring_auth=True, querystring_expire=3600)
+        with patch('utils.conditional.default_storage', signing_storage), \
+                patch('utils.conditional.time.time', return_value=3600.0):
+            etag = self.client.get('/api/saraf/list/')['ETag']
+            self.assertEqual(self.client.get('/api/saraf/list/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        with patch('utils.conditional.default_storage', signing_storage), \
+                patch('utils.conditional.time.time', return_value=3600.0 + 1800):
+            response = self.client.get('/api/saraf/list/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+
+
+class SarafDashboardTests(APITestCase):
+    """Single-call dashboard snapshot with per-section caching"""
+    
+    def setUp(self):
+        cache.clear()
+        AmuPayCode.objects.create(code="DASH0001CODE")
+        self.saraf = SarafAccount.objects.create(
+            full_name="Dashboard Saraf",
+            exchange_name="Dashboard Exchange",
+            email="dashboard@example.com",
+            email_or_whatsapp_number="+93711222555",
+            amu_pay_code="DASH0001CODE",
+            province="Kabul",
+            is_active=True
+        )
+        self.usd = Currency.objects.create(
+            currency_code='USD', currency_name='US Dollar', currency_name_local='Dollar', symbol='$'
+        )
+        balance, _ = SarafBalance.get_or_create_balance(self.saraf, self.usd)
+        balance.update_balance(Decimal('100.00'), 'deposit')
+        
+        refresh = RefreshToken()
+        refresh['user_type'] = 'saraf'
+        refresh['user_id'] = self.saraf.saraf_id
+        refresh['saraf_id'] = self.saraf.saraf_id
+        refresh['full_name'] = self.saraf.full_name
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+    
+    def test_all_sections_in_bounded_queries_then_from_cache(self):
+        """A cold snapshot stays within a fixed query budget; a warm one only authenticates"""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/saraf/dashboard/')
+        self.assertEqual(response.status_code, 200)
+        sections = response.data['sections']
+        self.assertEqual(set(sections), {
+            'balances', 'hawala_stats', 'pending_hawalas', 'messages', 'notifications', 'exchanges'
+        })
+        self.assertEqual(sections['balances'][0]['currency_code'], 'USD')
+        self.assertEqual(sections['balances'][0]['balance'], Decimal('100.00'))
+        self.assertEqual(sections['hawala_stats']['total_sent'], 0)
+        self.assertEqual(sections['messages']['unread_messages'], 0)
+        self.assertLessEqual(len(queries), 10)
+        
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/saraf/dashboard/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(queries), 1)
+    
+    def test_selected_sections_only(self):
+        """?sections limits the response; unknown names are rejected"""
+        response = self.client.get('/api/saraf/dashboard/', {'sections': 'balances,messages'})
+        self.assertEqual(set(response.data['sections']), {'balances', 'messages'})
+        
+        response = self.client.get('/api/saraf/dashboard/', {'sections': 'balances,weather'})
+        self.assertEqual(response.status_code, 400)
+    
+    def test_balance_write_invalidates_section(self):
+        """A balance update is visible on the next request, before the cache timeout"""
+        self.client.get('/api/saraf/dashboard/', {'sections': 'balances'})
+        SarafBalance.objects.get(saraf_account=self.saraf).update_balance(Decimal('50.00'), 'deposit')
+        response = self.client.get('/api/saraf/dashboard/', {'sections': 'balances'})
+        self.assertEqual(response.data['sections']['balances'][0]['balance'], Decimal('150.00'))
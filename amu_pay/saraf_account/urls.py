@@ -24,6 +24,7 @@ from .views import (
     SarafResendOTPView,
     SarafPictureManagementView,
     SarafSinglePictureUpdateView,
+    SarafDashboardView,
 )
 
 urlpatterns = [
@@ -32,6 +33,7 @@ urlpatterns = [
     path('logout/', SarafLogoutView.as_view(), name='saraf_logout'),
     path('list/', SarafListView.as_view(), name='saraf_list'),
     path('<int:saraf_id>/', SarafDetailView.as_view(), name='saraf_detail'),
+    path('dashboard/', SarafDashboardView.as_view(), name='saraf_dashboard'),
     path('get-employees/', GetEmployeesView.as_view(), name='get_employees'),
     path('employees/', EmployeeManagementView.as_view(), name='employee_management'),
     
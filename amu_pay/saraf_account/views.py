@@ -10,11 +10,12 @@ from django.utils.encoding import force_bytes, force_str
 from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode
 from django.contrib.auth.tokens import PasswordResetTokenGenerator
 from django.db import transaction
-from django.db.models import Q
+from django.db.models import Count, Q
 from django.core.exceptions import ValidationError
 
 from email_otp.models import EmailOTP
 from email_otp.utils import send_otp_email
+from outbound.queue import OTP_EXPIRY_SECONDS, queue_email, queue_whatsapp_template
 from .models import SarafAccount, SarafEmployee, SarafOTP, DEFAULT_EMPLOYEE_PERMISSIONS, PERMISSION_DESCRIPTIONS
 from .serializers import (
     SarafRegistrationSerializer, SarafLoginSerializer, SarafOTPVerificationSerializer,
@@ -22,14 +23,14 @@ from .serializers import (
     SarafProfileSerializer, SarafPictureUpdateSerializer, SarafPictureDeleteSerializer,
     SarafPictureListSerializer
 )
+from utils.conditional import conditional_get, queryset_version
 import logging
 
 logger = logging.getLogger(__name__)
 
 def send_otp_email_saraf(email, otp_code):
-    """Send OTP email for Saraf account"""
+    """Queue OTP email for Saraf account (delivered by outbound)"""
     try:
-        from django.core.mail import send_mail
         from django.conf import settings
         
         subject = 'Saraf Account Verification Code'
@@ -41,27 +42,25 @@ def send_otp_email_saraf(email, otp_code):
         If you did not request this code, please ignore this email.
         '''
         
-        send_mail(
+        queue_email(
+            email,
             subject,
             message,
-            settings.DEFAULT_FROM_EMAIL,
-            [email],
-            fail_silently=False,
+            from_email=settings.DEFAULT_FROM_EMAIL,
+            purpose='saraf_otp',
+            expires_in=OTP_EXPIRY_SECONDS
         )
         return True
     except Exception as e:
-        logger.error(f"Error sending email OTP: {str(e)}")
+        logger.error(f"Error queueing email OTP: {str(e)}")
         return False
 
 def send_otp_whatsapp_saraf(phone_number, otp_code):
-    """Send OTP via WhatsApp for Saraf account"""
+    """Queue OTP via WhatsApp for Saraf account (delivered by outbound)"""
     try:
-        from twilio.rest import Client
         from django.conf import settings
         import re
         
-        client = Client(settings.TWILIO_ACCOUNT_SID, settings.TWILIO_AUTH_TOKEN)
-        
         # Clean and validate phone number format - Afghanistan focused
         cleaned_number = re.sub(r'[\s\-\(\)]', '', phone_number)
         
@@ -83,15 +82,16 @@ def send_otp_whatsapp_saraf(phone_number, otp_code):
             return False
         
         # Use WhatsApp template with content_sid and content_variables (like wa_otp app)
-        client.messages.create(
-            content_sid=settings.TWILIO_WHATSAPP_CONTENT_SID,
-            from_='whatsapp:' + settings.TWILIO_WHATSAPP_FROM_NUMBER,
-            content_variables='{"1": "' + otp_code + '"}',
-            to='whatsapp:' + formatted_phone
+        queue_whatsapp_template(
+            formatted_phone,
+            settings.TWILIO_WHATSAPP_CONTENT_SID,
+            {"1": otp_code},
+            purpose='saraf_otp',
+            expires_in=OTP_EXPIRY_SECONDS
         )
         return True
     except Exception as e:
-        logger.error(f"Error sending WhatsApp OTP: {str(e)}")
+        logger.error(f"Error queueing WhatsApp OTP: {str(e)}")
         return False
 
 def get_user_info_from_token(request):
@@ -827,9 +827,14 @@ class SarafLoginView(APIView):
             }, status=status.HTTP_200_OK)
 
 
+def _saraf_list_version(request):
+    return queryset_version(SarafAccount.objects.filter(is_active=True))
+
+
 class SarafListView(APIView):
     permission_classes = [AllowAny]
 
+    @conditional_get(_saraf_list_version, signed_urls=True)
     def get(self, request):
         """List all registered Saraf accounts with basic information"""
         try:
@@ -1661,7 +1666,9 @@ class SarafPictureManagementView(APIView):
                 }, status=status.HTTP_404_NOT_FOUND)
             
             # Validate and update pictures
-            serializer = SarafPictureUpdateSerializer(saraf, data=request.data, partial=True)
+            serializer = SarafPictureUpdateSerializer(
+                saraf, data=request.data, partial=True, context={'request': request}
+            )
             if serializer.is_valid():
                 # Update only the provided fields
                 updated_fields = []
@@ -1987,10 +1994,18 @@ class SarafSinglePictureUpdateView(APIView):
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+def _saraf_detail_version(request, saraf_id):
+    # None for missing or inactive accounts, so their 404 is never cached
+    return SarafAccount.objects.filter(saraf_id=saraf_id, is_active=True).annotate(
+        employee_count=Count('employees', filter=Q(employees__is_active=True))
+    ).values_list('updated_at', 'employee_count').first()
+
+
 class SarafDetailView(APIView):
     """Get detailed information about a specific Saraf account by ID"""
     permission_classes = [AllowAny]
     
+    @conditional_get(_saraf_detail_version, signed_urls=True)
     def get(self, request, saraf_id):
         """
         Get detailed Saraf profile by saraf_id
@@ -2049,3 +2064,57 @@ class SarafDetailView(APIView):
                 'error': 'Failed to fetch Saraf profile',
                 'details': str(e)
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class SarafDashboardView(APIView):
+    """
+    Everything the saraf app shows on launch in one request.
+    ?sections=balances,messages limits the response to those sections
+    (see saraf_account.dashboard.SECTIONS); by default all are returned.
+    """
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request):
+        """Get the dashboard snapshot for the authenticated saraf or employee"""
+        from .dashboard import SECTIONS, build_dashboard
+        
+        try:
+            saraf_id = getattr(request.user, 'saraf_id', None)
+            if not saraf_id or request.user.user_type not in ('saraf', 'employee'):
+                return Response({
+                    'error': 'Invalid user information'
+                }, status=status.HTTP_401_UNAUTHORIZED)
+            
+            requested = [s.strip() for s in request.query_params.get('sections', '').split(',') if s.strip()]
+            unknown = [s for s in requested if s not in SECTIONS]
+            if unknown:
+                return Response({
+                    'error': f"Unknown sections: {', '.join(unknown)}",
+                    'available_sections': list(SECTIONS)
+                }, status=status.HTTP_400_BAD_REQUEST)
+            sections = list(dict.fromkeys(requested)) or list(SECTIONS)
+            
+            # Employees only see the sections their permissions allow
+            denied = []
+            if request.user.user_type == 'employee':
+                employee = SarafEmployee.objects.get(employee_id=request.user.employee_id, is_active=True)
+                denied = [s for s in sections if SECTIONS[s] and not employee.has_permission(SECTIONS[s])]
+                sections = [s for s in sections if s not in denied]
+            
+            return Response({
+                'message': 'Dashboard retrieved successfully',
+                'saraf_id': saraf_id,
+                'sections': build_dashboard(saraf_id, sections),
+                'denied_sections': denied
+            }, status=status.HTTP_200_OK)
+            
+        except SarafEmployee.DoesNotExist:
+            return Response({
+                'error': 'Employee not found'
+            }, status=status.HTTP_404_NOT_FOUND)
+        except Exception as e:
+            logger.error(f"Error building dashboard: {str(e)}")
+            return Response({
+                'error': 'Error retrieving dashboard',
+                'details': str(e)
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
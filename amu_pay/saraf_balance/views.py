@@ -6,7 +6,7 @@ from django.shortcuts import get_object_or_404
 
 from .models import SarafBalance
 from saraf_account.models import SarafAccount, SarafEmployee
-from currency.models import Currency, SarafSupportedCurrency
+from currency.registry import get_currency_or_404, is_supported_currency
 import logging
 
 logger = logging.getLogger(__name__)
@@ -133,14 +133,10 @@ class SarafBalanceDetailView(APIView):
                     }, status=status.HTTP_404_NOT_FOUND)
             
             # Find currency
-            currency = get_object_or_404(Currency, currency_code=currency_code.upper())
+            currency = get_currency_or_404(currency_code)
             
             # Check supported currency
-            if not SarafSupportedCurrency.objects.filter(
-                saraf_account=saraf_account,
-                currency=currency,
-                is_active=True
-            ).exists():
+            if not is_supported_currency(saraf_account, currency):
                 return Response({
                     'error': f'Currency {currency_code} is not supported by this exchange'
                 }, status=status.HTTP_400_BAD_REQUEST)
@@ -203,7 +199,7 @@ class DeleteSarafBalanceView(APIView):
                     }, status=status.HTTP_404_NOT_FOUND)
             
             # Find currency
-            currency = get_object_or_404(Currency, currency_code=currency_code.upper())
+            currency = get_currency_or_404(currency_code)
             
             # Find balance
             balance = get_object_or_404(
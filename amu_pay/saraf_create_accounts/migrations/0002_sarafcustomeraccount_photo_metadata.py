@@ -0,0 +1,38 @@
+# Generated by Django 5.2.6 on 2026-10-19 04:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('saraf_create_accounts', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sarafcustomeraccount',
+            name='photo_checksum',
+            field=models.CharField(blank=True, default='', help_text='SHA-256 hex digest', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='sarafcustomeraccount',
+            name='photo_content_type',
+            field=models.CharField(blank=True, default='', max_length=100),
+        ),
+        migrations.AddField(
+            model_name='sarafcustomeraccount',
+            name='photo_height',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='sarafcustomeraccount',
+            name='photo_size',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='sarafcustomeraccount',
+            name='photo_width',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-19 04:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('saraf_create_accounts', '0002_sarafcustomeraccount_photo_metadata'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sarafcustomeraccount',
+            name='photo_variants',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
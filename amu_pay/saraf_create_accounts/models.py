@@ -4,6 +4,9 @@ from django.core.exceptions import ValidationError
 from decimal import Decimal
 import re
 
+from media_uploads.metadata import capture_file_metadata
+from media_uploads.variants import queue_image_variants
+
 
 class SarafCustomerAccount(models.Model):
     """Model for customer accounts created by Saraf"""
@@ -61,6 +64,14 @@ class SarafCustomerAccount(models.Model):
         null=True,
         help_text="Customer's photo"
     )
+    # Photo metadata captured at upload (see media_uploads.metadata)
+    photo_size = models.BigIntegerField(null=True, blank=True)
+    photo_content_type = models.CharField(max_length=100, blank=True, default='')
+    photo_checksum = models.CharField(max_length=64, blank=True, default='', help_text="SHA-256 hex digest")
+    photo_width = models.PositiveIntegerField(null=True, blank=True)
+    photo_height = models.PositiveIntegerField(null=True, blank=True)
+    # Rendered thumbnail/medium variants (see media_uploads.variants)
+    photo_variants = models.JSONField(default=dict, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     is_active = models.BooleanField(default=True)
@@ -96,10 +107,12 @@ class SarafCustomerAccount(models.Model):
     
     def save(self, *args, **kwargs):
         """Generate account number if not provided"""
+        kwargs['update_fields'] = capture_file_metadata(self, 'photo', update_fields=kwargs.get('update_fields'))
         if not self.account_number:
             self.account_number = self.generate_account_number()
         self.full_clean()
         super().save(*args, **kwargs)
+        queue_image_variants(self, 'photo', update_fields=kwargs.get('update_fields'))
     
     def generate_account_number(self):
         """Generate unique account number for this saraf"""
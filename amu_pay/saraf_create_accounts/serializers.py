@@ -1,16 +1,18 @@
 from rest_framework import serializers
 from .models import SarafCustomerAccount, CustomerTransaction, CustomerBalance
+from media_uploads.fields import ImageVariantsField
 
 
 class SarafCustomerAccountSerializer(serializers.ModelSerializer):
     """Serializer for Saraf Customer Account"""
     photo_url = serializers.SerializerMethodField()
+    photo_variants = ImageVariantsField('photo')
     
     class Meta:
         model = SarafCustomerAccount
         fields = [
             'account_id', 'account_number', 'full_name', 'account_type',
-            'phone', 'address', 'job', 'photo', 'photo_url',
+            'phone', 'address', 'job', 'photo', 'photo_url', 'photo_variants',
             'created_at', 'updated_at', 'is_active'
         ]
         read_only_fields = ['account_id', 'account_number', 'created_at', 'updated_at']
@@ -14,6 +14,7 @@ from .serializers import (
     CustomerTransactionCreateSerializer
 )
 from utils.jwt_helpers import get_user_info_from_token, create_error_response, create_success_response
+from media_uploads.uploads import UploadError, uploaded_file_or_key
 import logging
 
 logger = logging.getLogger(__name__)
@@ -80,6 +81,12 @@ class CreateCustomerAccountView(APIView):
                 'error': 'A customer account with this phone number already exists for your saraf'
             }, status=status.HTTP_400_BAD_REQUEST)
         
+        # Photo may be a multipart file or an upload key from /api/uploads/slots/
+        try:
+            photo = uploaded_file_or_key(request, 'photo', 'customer_photo')
+        except UploadError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
         try:
             with transaction.atomic():
                 # Create customer account
@@ -90,13 +97,13 @@ class CreateCustomerAccountView(APIView):
                     phone=phone,
                     address=request.data.get('address', '').strip() or None,
                     job=request.data.get('job', '').strip() or None,
-                    photo=request.FILES.get('photo')
+                    photo=photo
                 )
                 customer_account.save()
                 
                 # Initialize balances for all currencies
-                from currency.models import Currency
-                currencies = Currency.objects.all()
+                from currency.registry import all_currencies
+                currencies = all_currencies()
                 for currency in currencies:
                     CustomerBalance.get_or_create_balance(customer_account, currency)
                 
@@ -270,8 +277,11 @@ class CustomerAccountDetailView(APIView):
             customer_account.address = request.data.get('address', '').strip() or None
         if 'job' in request.data:
             customer_account.job = request.data.get('job', '').strip() or None
-        if 'photo' in request.FILES:
-            customer_account.photo = request.FILES.get('photo')
+        if 'photo' in request.FILES or request.data.get('photo'):
+            try:
+                customer_account.photo = uploaded_file_or_key(request, 'photo', 'customer_photo')
+            except UploadError as e:
+                return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
         
         try:
             customer_account.save()
@@ -412,8 +422,9 @@ class CustomerDepositView(APIView):
         
         # Get currency
         from currency.models import Currency
+        from currency.registry import get_currency
         try:
-            currency = Currency.objects.get(currency_code=currency_code, is_active=True)
+            currency = get_currency(currency_code)
         except Currency.DoesNotExist:
             return Response({
                 'error': f'Currency {currency_code} not found or not active'
@@ -517,8 +528,9 @@ class CustomerWithdrawView(APIView):
         
         # Get currency
         from currency.models import Currency
+        from currency.registry import get_currency
         try:
-            currency = Currency.objects.get(currency_code=currency_code, is_active=True)
+            currency = get_currency(currency_code)
         except Currency.DoesNotExist:
             return Response({
                 'error': f'Currency {currency_code} not found or not active'
@@ -623,8 +635,9 @@ class ExchangerGiveMoneyView(APIView):
         
         # Get currency
         from currency.models import Currency
+        from currency.registry import get_currency
         try:
-            currency = Currency.objects.get(currency_code=currency_code, is_active=True)
+            currency = get_currency(currency_code)
         except Currency.DoesNotExist:
             return Response({
                 'error': f'Currency {currency_code} not found or not active'
@@ -729,8 +742,9 @@ class ExchangerTakeMoneyView(APIView):
         
         # Get currency
         from currency.models import Currency
+        from currency.registry import get_currency
         try:
-            currency = Currency.objects.get(currency_code=currency_code, is_active=True)
+            currency = get_currency(currency_code)
         except Currency.DoesNotExist:
             return Response({
                 'error': f'Currency {currency_code} not found or not active'
@@ -809,7 +823,9 @@ class CustomerTransactionListView(APIView):
         employee_id = request.query_params.get('employee_id', '')  # Filter by employee ID
         
         # Build queryset
-        queryset = CustomerTransaction.objects.filter(customer_account=customer_account)
+        queryset = CustomerTransaction.objects.filter(customer_account=customer_account).select_related(
+            'currency', 'customer_account'
+        )
         
         if transaction_type:
             queryset = queryset.filter(transaction_type=transaction_type)
@@ -910,7 +926,9 @@ class PublicCustomerTransactionListView(APIView):
         date_to = request.query_params.get('date_to')
         
         # Build queryset
-        queryset = CustomerTransaction.objects.filter(customer_account=customer_account)
+        queryset = CustomerTransaction.objects.filter(customer_account=customer_account).select_related(
+            'currency', 'customer_account'
+        )
         
         if transaction_type:
             queryset = queryset.filter(transaction_type=transaction_type)
@@ -980,7 +998,9 @@ class CustomerBalanceListView(APIView):
             return Response({'error': 'Customer account not found'}, status=status.HTTP_404_NOT_FOUND)
         
         # Get balances
-        balances = CustomerBalance.objects.filter(customer_account=customer_account)
+        balances = CustomerBalance.objects.filter(customer_account=customer_account).select_related(
+            'currency', 'customer_account'
+        )
         
         # Serialize response
         serializer = CustomerBalanceSerializer(balances, many=True, context={'request': request})
@@ -1153,7 +1173,9 @@ class ExchangerBalanceView(APIView):
             return Response({'error': 'Exchanger account not found'}, status=status.HTTP_404_NOT_FOUND)
         
         # Get exchanger balances
-        customer_balances = CustomerBalance.objects.filter(customer_account=customer_account)
+        customer_balances = CustomerBalance.objects.filter(customer_account=customer_account).select_related(
+            'currency', 'customer_account'
+        )
         balances_serializer = CustomerBalanceSerializer(
             customer_balances, 
             many=True, 
@@ -1276,55 +1298,62 @@ class PublicAllAccountsTransactionsView(APIView):
         date_from = request.query_params.get('date_from')
         date_to = request.query_params.get('date_to')
         
+        # Transactions and balances of all accounts, one query each
+        transactions_queryset = CustomerTransaction.objects.filter(
+            customer_account__in=customer_accounts
+        ).select_related('currency', 'customer_account')
+        
+        # Apply filters
+        if transaction_type:
+            transactions_queryset = transactions_queryset.filter(transaction_type=transaction_type)
+        
+        if currency_id:
+            transactions_queryset = transactions_queryset.filter(currency_id=currency_id)
+        
+        if date_from:
+            from django.utils.dateparse import parse_datetime
+            try:
+                date_from_parsed = parse_datetime(date_from)
+                if date_from_parsed:
+                    transactions_queryset = transactions_queryset.filter(created_at__gte=date_from_parsed)
+            except ValueError:
+                pass
+        
+        if date_to:
+            from django.utils.dateparse import parse_datetime
+            try:
+                date_to_parsed = parse_datetime(date_to)
+                if date_to_parsed:
+                    transactions_queryset = transactions_queryset.filter(created_at__lte=date_to_parsed)
+            except ValueError:
+                pass
+        
+        # Order by creation date (newest first)
+        transactions_by_account = {}
+        for customer_transaction in transactions_queryset.order_by('-created_at'):
+            transactions_by_account.setdefault(customer_transaction.customer_account_id, []).append(customer_transaction)
+        
+        balances_by_account = {}
+        for balance in CustomerBalance.objects.filter(
+            customer_account__in=customer_accounts
+        ).select_related('currency', 'customer_account'):
+            balances_by_account.setdefault(balance.customer_account_id, []).append(balance)
+        
         # Build response data
         accounts_data = []
         total_transactions = 0
         
         for account in customer_accounts:
-            # Get transactions for this account
-            transactions_queryset = CustomerTransaction.objects.filter(
-                customer_account=account
-            ).select_related('currency')
-            
-            # Apply filters
-            if transaction_type:
-                transactions_queryset = transactions_queryset.filter(transaction_type=transaction_type)
-            
-            if currency_id:
-                transactions_queryset = transactions_queryset.filter(currency_id=currency_id)
-            
-            if date_from:
-                from django.utils.dateparse import parse_datetime
-                try:
-                    date_from_parsed = parse_datetime(date_from)
-                    if date_from_parsed:
-                        transactions_queryset = transactions_queryset.filter(created_at__gte=date_from_parsed)
-                except ValueError:
-                    pass
-            
-            if date_to:
-                from django.utils.dateparse import parse_datetime
-                try:
-                    date_to_parsed = parse_datetime(date_to)
-                    if date_to_parsed:
-                        transactions_queryset = transactions_queryset.filter(created_at__lte=date_to_parsed)
-                except ValueError:
-                    pass
-            
-            # Order by creation date (newest first)
-            transactions_queryset = transactions_queryset.order_by('-created_at')
-            
             # Serialize transactions
             transactions_serializer = CustomerTransactionSerializer(
-                transactions_queryset, 
+                transactions_by_account.get(account.account_id, []), 
                 many=True, 
                 context={'request': request}
             )
             
             # Get account balances
-            balances = CustomerBalance.objects.filter(customer_account=account)
             balances_serializer = CustomerBalanceSerializer(
-                balances, 
+                balances_by_account.get(account.account_id, []), 
                 many=True, 
                 context={'request': request}
             )
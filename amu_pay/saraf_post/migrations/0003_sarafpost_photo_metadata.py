@@ -0,0 +1,38 @@
+# Generated by Django 5.2.6 on 2026-10-19 04:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('saraf_post', '0002_remove_sarafpost_saraf_post__saraf_a_04481d_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sarafpost',
+            name='photo_checksum',
+            field=models.CharField(blank=True, default='', help_text='SHA-256 hex digest', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='sarafpost',
+            name='photo_content_type',
+            field=models.CharField(blank=True, default='', max_length=100),
+        ),
+        migrations.AddField(
+            model_name='sarafpost',
+            name='photo_height',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='sarafpost',
+            name='photo_size',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='sarafpost',
+            name='photo_width',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+    ]
@@ -3,6 +3,9 @@ from django.core.exceptions import ValidationError
 from django.utils import timezone
 import os
 
+from media_uploads.metadata import capture_file_metadata
+from media_uploads.variants import queue_image_variants
+
 
 def upload_to(instance, filename):
     """Generate upload path for post photos"""
@@ -27,6 +30,14 @@ class SarafPost(models.Model):
         null=True,
         help_text="Post photo"
     )
+    # Photo metadata captured at upload (see media_uploads.metadata)
+    photo_size = models.BigIntegerField(null=True, blank=True)
+    photo_content_type = models.CharField(max_length=100, blank=True, default='')
+    photo_checksum = models.CharField(max_length=64, blank=True, default='', help_text="SHA-256 hex digest")
+    photo_width = models.PositiveIntegerField(null=True, blank=True)
+    photo_height = models.PositiveIntegerField(null=True, blank=True)
+    # Rendered thumbnail/medium variants (see media_uploads.variants)
+    photo_variants = models.JSONField(default=dict, blank=True)
     
     # Saraf information
     saraf_account = models.ForeignKey(
@@ -94,12 +105,15 @@ class SarafPost(models.Model):
         
         # Validate photo file size (max 10MB)
         if self.photo:
-            if self.photo.size > 10 * 1024 * 1024:  # 10MB
+            photo_size = self.photo_size if self.photo_size is not None else self.photo.size
+            if photo_size > 10 * 1024 * 1024:  # 10MB
                 raise ValidationError("Photo size cannot exceed 10MB")
     
     def save(self, *args, **kwargs):
+        kwargs['update_fields'] = capture_file_metadata(self, 'photo', update_fields=kwargs.get('update_fields'))
         self.full_clean()
         super().save(*args, **kwargs)
+        queue_image_variants(self, 'photo', update_fields=kwargs.get('update_fields'))
     
     def get_created_by_info(self):
         """Get information about who created the post"""
@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from .models import SarafPost
+from media_uploads.fields import DirectUploadImageField, ImageVariantsField
 
 
 class SarafPostSerializer(serializers.ModelSerializer):
@@ -8,6 +9,7 @@ class SarafPostSerializer(serializers.ModelSerializer):
     """
     created_by_info = serializers.SerializerMethodField()
     photo_url = serializers.SerializerMethodField()
+    photo_variants = ImageVariantsField('photo', absolute_urls=False)
     photo_name = serializers.SerializerMethodField()
     word_count = serializers.ReadOnlyField()
     character_count = serializers.ReadOnlyField()
@@ -21,6 +23,7 @@ class SarafPostSerializer(serializers.ModelSerializer):
             'content',
             'photo',
             'photo_url',
+            'photo_variants',
             'photo_name',
             'saraf_account',
             'saraf_name',
@@ -37,6 +40,7 @@ class SarafPostSerializer(serializers.ModelSerializer):
             'updated_at', 
             'created_by_info', 
             'photo_url', 
+            'photo_variants',
             'photo_name',
             'word_count',
             'character_count'
@@ -76,6 +80,8 @@ class SarafPostCreateSerializer(serializers.ModelSerializer):
     """
     Serializer for creating SarafPost
     """
+    photo = DirectUploadImageField(purpose='post_photo', required=False, allow_null=True)
+    
     class Meta:
         model = SarafPost
         fields = [
@@ -124,6 +130,7 @@ class SarafPostListSerializer(serializers.ModelSerializer):
     created_by_name = serializers.SerializerMethodField()
     saraf_name = serializers.CharField(source='saraf_account.full_name', read_only=True)
     photo_url = serializers.SerializerMethodField()
+    photo_variants = ImageVariantsField('photo', absolute_urls=False)
     word_count = serializers.ReadOnlyField()
     
     class Meta:
@@ -133,6 +140,7 @@ class SarafPostListSerializer(serializers.ModelSerializer):
             'title',
             'content',
             'photo_url',
+            'photo_variants',
             'saraf_name',
             'created_by_name',
             'created_at',
@@ -156,6 +164,8 @@ class SarafPostUpdateSerializer(serializers.ModelSerializer):
     """
     Serializer for updating SarafPost
     """
+    photo = DirectUploadImageField(purpose='post_photo', required=False, allow_null=True)
+    
     class Meta:
         model = SarafPost
         fields = [
@@ -203,6 +213,7 @@ class SarafPostDetailSerializer(serializers.ModelSerializer):
     """
     created_by_info = serializers.SerializerMethodField()
     photo_url = serializers.SerializerMethodField()
+    photo_variants = ImageVariantsField('photo', absolute_urls=False)
     photo_name = serializers.SerializerMethodField()
     saraf_name = serializers.CharField(source='saraf_account.full_name', read_only=True)
     word_count = serializers.ReadOnlyField()
@@ -216,6 +227,7 @@ class SarafPostDetailSerializer(serializers.ModelSerializer):
             'content',
             'photo',
             'photo_url',
+            'photo_variants',
             'photo_name',
             'saraf_account',
             'saraf_name',
@@ -17,6 +17,7 @@ from .serializers import (
     SarafPostDetailSerializer
 )
 from saraf_account.models import SarafAccount, SarafEmployee, ActionLog
+from utils.conditional import conditional_get, queryset_version
 
 logger = logging.getLogger(__name__)
 
@@ -48,12 +49,21 @@ def get_user_info_from_token(request):
         return None
 
 
+def _post_list_version(request):
+    # Version of all posts; the filters are part of the URL, which is in the ETag
+    return queryset_version(
+        SarafPost.objects.all(),
+        'updated_at', 'saraf_account__updated_at', 'created_by_saraf__updated_at', 'created_by_employee__updated_at'
+    )
+
+
 class SarafPostListView(APIView):
     """
     List and filter saraf posts (Public endpoint)
     """
     permission_classes = [AllowAny]
     
+    @conditional_get(_post_list_version, signed_urls=True)
     def get(self, request):
         """Get list of saraf posts with filters (Public endpoint)"""
         try:
@@ -188,7 +198,7 @@ class SarafPostCreateView(APIView):
                     }, status=status.HTTP_404_NOT_FOUND)
             
             # Data validation
-            serializer = SarafPostCreateSerializer(data=request.data)
+            serializer = SarafPostCreateSerializer(data=request.data, context={'request': request})
             if not serializer.is_valid():
                 return Response({
                     'error': 'Invalid data',
@@ -303,7 +313,7 @@ class SarafPostDetailView(APIView):
             )
             
             # Data validation
-            serializer = SarafPostUpdateSerializer(post, data=request.data)
+            serializer = SarafPostUpdateSerializer(post, data=request.data, context={'request': request})
             if not serializer.is_valid():
                 return Response({
                     'error': 'Invalid data',
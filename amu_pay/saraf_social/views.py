@@ -21,6 +21,7 @@ from .serializers import (
 )
 from saraf_account.models import SarafAccount, SarafEmployee
 from normal_user_account.models import NormalUser
+from utils.conditional import conditional_get, queryset_version
 
 logger = logging.getLogger(__name__)
 
@@ -182,10 +183,21 @@ class DeleteCommentView(APIView):
             return Response({'error': 'Internal server error'}, 
                           status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+def _comment_list_version(request, saraf_id):
+    saraf_updated_at = SarafAccount.objects.filter(
+        saraf_id=saraf_id, is_active=True
+    ).values_list('updated_at', flat=True).first()
+    if saraf_updated_at is None:
+        return None
+    comments = SarafComment.objects.filter(saraf_account_id=saraf_id)
+    return saraf_updated_at, queryset_version(comments, 'updated_at', 'normal_user__updated_at')
+
+
 class CommentListView(APIView):
     """List comments for a Saraf account (public view)"""
     permission_classes = [AllowAny]
     
+    @conditional_get(_comment_list_version, signed_urls=True)
     def get(self, request, saraf_id):
         try:
             saraf_account = get_object_or_404(SarafAccount, saraf_id=saraf_id, is_active=True)
@@ -193,7 +205,7 @@ class CommentListView(APIView):
             # Get all comments (no status filtering)
             comments = SarafComment.objects.filter(
                 saraf_account=saraf_account
-            ).order_by('-created_at')
+            ).select_related('normal_user').order_by('-created_at')
             
             # Pagination
             paginator = PageNumberPagination()
@@ -220,10 +232,24 @@ class CommentListView(APIView):
             return Response({'error': 'Internal server error'}, 
                           status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+def _saraf_stats_version(request, saraf_id):
+    saraf_updated_at = SarafAccount.objects.filter(
+        saraf_id=saraf_id, is_active=True
+    ).values_list('updated_at', flat=True).first()
+    if saraf_updated_at is None:
+        return None
+    return (
+        saraf_updated_at,
+        SarafLike.objects.filter(saraf_account_id=saraf_id).count(),
+        SarafComment.objects.filter(saraf_account_id=saraf_id).count()
+    )
+
+
 class PublicSarafStatsView(APIView):
     """Public endpoint to get Saraf statistics"""
     permission_classes = [AllowAny]
     
+    @conditional_get(_saraf_stats_version)
     def get(self, request, saraf_id):
         try:
             saraf_account = get_object_or_404(SarafAccount, saraf_id=saraf_id, is_active=True)
@@ -248,7 +274,7 @@ class SarafStatsListView(APIView):
             # Get all active Saraf accounts with stats
             stats = SarafSocialStats.objects.filter(
                 saraf_account__is_active=True
-            ).order_by('-total_likes', '-total_comments')
+            ).select_related('saraf_account').order_by('-total_likes', '-total_comments')
             
             # Pagination
             paginator = PageNumberPagination()
@@ -293,7 +319,9 @@ class UserLikesView(APIView):
             normal_user_id = user.normal_user_id
             normal_user = get_object_or_404(NormalUser, user_id=normal_user_id)
             
-            likes = SarafLike.objects.filter(normal_user=normal_user).order_by('-created_at')
+            likes = SarafLike.objects.filter(normal_user=normal_user).select_related(
+                'saraf_account', 'normal_user'
+            ).order_by('-created_at')
             
             # Pagination
             paginator = PageNumberPagination()
@@ -338,7 +366,9 @@ class UserCommentsView(APIView):
             normal_user_id = user.normal_user_id
             normal_user = get_object_or_404(NormalUser, user_id=normal_user_id)
             
-            comments = SarafComment.objects.filter(normal_user=normal_user).order_by('-created_at')
+            comments = SarafComment.objects.filter(normal_user=normal_user).select_related(
+                'saraf_account', 'normal_user'
+            ).order_by('-created_at')
             
             # Pagination
             paginator = PageNumberPagination()
@@ -52,8 +52,9 @@ class CreateTransactionSerializer(serializers.Serializer):
     def validate_currency_code(self, value):
         """Currency code validation"""
         from currency.models import Currency
+        from currency.registry import get_currency
         try:
-            currency = Currency.objects.get(currency_code=value, is_active=True)
+            get_currency(value)
             return value
         except Currency.DoesNotExist:
             raise serializers.ValidationError("Selected currency is not valid")
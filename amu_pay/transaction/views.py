@@ -18,7 +18,7 @@ from .serializers import (
     TransactionListSerializer
 )
 from saraf_account.models import SarafAccount, SarafEmployee
-from currency.models import Currency, SarafSupportedCurrency
+from currency.registry import get_currency_or_404, is_supported_currency
 
 
 def get_user_info_from_token(request):
@@ -100,12 +100,8 @@ class CreateTransactionView(APIView):
             validated_data = serializer.validated_data
             
             # Check currency support
-            currency = get_object_or_404(Currency, currency_code=validated_data['currency_code'])
-            if not SarafSupportedCurrency.objects.filter(
-                saraf_account=saraf_account,
-                currency=currency,
-                is_active=True
-            ).exists():
+            currency = get_currency_or_404(validated_data['currency_code'])
+            if not is_supported_currency(saraf_account, currency):
                 return Response({
                     'error': f'Currency {currency.currency_code} is not in your supported currencies list'
                 }, status=status.HTTP_400_BAD_REQUEST)
@@ -183,7 +179,7 @@ class TransactionListView(APIView):
                 limit = 50
             
             # Get transactions
-            transactions = Transaction.objects.filter(saraf_account=saraf_account)
+            transactions = Transaction.objects.filter(saraf_account=saraf_account).select_related('currency')
             
             # Apply time filter
             now = timezone.now()
@@ -1,3 +1,40 @@
-from django.test import TestCase
+from django.core import mail
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from outbound.queue import process_pending
+
+from .models import UserFeedback
+
+
+@override_settings(FEEDBACK_ADMIN_EMAIL='admin@example.com', OUTBOUND_SETTINGS={'ASYNC_DELIVERY': True})
+class SubmitFeedbackViewTests(TestCase):
+    """Async feedback submission"""
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_submission_is_saved_and_email_queued(self):
+        response = self.client.post('/api/user-feedback/submit/', {
+            'title': 'Slow transfers',
+            'email': 'user@example.com',
+            'content': 'Hawala confirmations take a long time to arrive.',
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['email_status'], 'Email queued for delivery')
+        feedback = UserFeedback.objects.get()
+        self.assertEqual(response.data['feedback']['id'], feedback.id)
+        self.assertEqual(mail.outbox, [])
+
+        process_pending()
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['admin@example.com'])
+        self.assertIn(f'ID: {feedback.id}', mail.outbox[0].body)
+
+    def test_invalid_submission_is_rejected(self):
+        response = self.client.post('/api/user-feedback/submit/', {
+            'title': 'No', 'email': 'user@example.com', 'content': 'short',
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(UserFeedback.objects.exists())
+        self.assertEqual(mail.outbox, [])
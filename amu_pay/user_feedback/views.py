@@ -1,38 +1,40 @@
-from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.permissions import AllowAny
-from django.core.mail import send_mail
 from django.conf import settings
+from asgiref.sync import sync_to_async
 from .models import UserFeedback
 from .serializers import UserFeedbackSerializer
+from outbound.queue import queue_email
+from utils.async_views import AsyncAPIView
 import logging
 
 logger = logging.getLogger(__name__)
 
 
-class SubmitFeedbackView(APIView):
+class SubmitFeedbackView(AsyncAPIView):
     """
     API endpoint to submit user feedback.
     No authentication required - public endpoint.
+    Async: saving and queueing the admin email do not hold a worker thread.
     """
     permission_classes = [AllowAny]
     
-    def post(self, request):
+    async def post(self, request):
         """Submit user feedback"""
         serializer = UserFeedbackSerializer(data=request.data)
         
-        if serializer.is_valid():
+        if await sync_to_async(serializer.is_valid)():
             # Save feedback to database
-            feedback = serializer.save()
+            feedback = await sync_to_async(serializer.save)()
             
             # Send email notification to admin
             try:
-                self.send_feedback_email(feedback)
-                email_status = "Email sent successfully"
+                await sync_to_async(self.send_feedback_email)(feedback)
+                email_status = "Email queued for delivery"
             except Exception as e:
                 logger.error(f"Error sending feedback email: {str(e)}")
-                email_status = "Email sending failed (feedback saved)"
+                email_status = "Email queueing failed (feedback saved)"
             
             return Response({
                 'message': 'Feedback submitted successfully',
@@ -46,7 +48,7 @@ class SubmitFeedbackView(APIView):
         }, status=status.HTTP_400_BAD_REQUEST)
     
     def send_feedback_email(self, feedback):
-        """Send feedback notification email to admin"""
+        """Queue feedback notification email to admin (delivered by outbound)"""
         # Get admin email from settings
         admin_email = getattr(settings, 'FEEDBACK_ADMIN_EMAIL', None)
         
@@ -71,11 +73,5 @@ This feedback has been saved to the database with ID: {feedback.id}
 You can view all feedback in the admin panel.
         """
         
-        # Send email
-        send_mail(
-            subject=subject,
-            message=message,
-            from_email=settings.EMAIL_HOST_USER,
-            recipient_list=[admin_email],
-            fail_silently=False,
-        )
+        # Queue email
+        queue_email(admin_email, subject, message, from_email=settings.EMAIL_HOST_USER, purpose='feedback')
@@ -0,0 +1,51 @@
+"""
+Async DRF views for endpoints that mostly wait on the network (LLM, SMTP, Twilio).
+
+DRF's APIView only dispatches to sync handlers. AsyncAPIView accepts
+`async def post(...)` handlers. Under ASGI (amu_pay.asgi with the uvicorn
+worker, see gunicorn_config.py) the handler then runs on the event loop, and
+a slow upstream call holds no worker thread, so a burst of AI questions
+cannot starve balance and hawala requests. That needs every middleware to be
+async-capable; a sync-only one makes Django run the whole request under
+async_to_sync (see MIDDLEWARE in amu_pay.settings).
+
+Authentication, permissions and throttling still run through DRF's
+initial(), in a thread because they read the database. Handlers must use the
+async ORM (acreate(), aget(), asave(), ...) or sync_to_async for database
+work. Under WSGI, Django runs the coroutine in its own event loop per
+request, so the views keep working there too, just without the concurrency.
+"""
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from rest_framework.views import APIView
+
+
+class AsyncAPIView(APIView):
+    """APIView whose HTTP method handlers are coroutines"""
+
+    async def dispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+
+            if request.method.lower() in self.http_method_names:
+                handler = getattr(self, request.method.lower(), self.http_method_not_allowed)
+            else:
+                handler = self.http_method_not_allowed
+
+            if iscoroutinefunction(handler):
+                response = await handler(request, *args, **kwargs)
+            else:
+                # options() and http_method_not_allowed() stay sync
+                response = await sync_to_async(handler)(request, *args, **kwargs)
+
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
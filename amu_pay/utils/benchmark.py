@@ -0,0 +1,530 @@
+"""
+End-to-end API benchmark over the scale dataset (see utils.scale_data).
+
+Every client signs in as one generated saraf and repeats the main user
+journey, one request per step:
+
+    login            POST  /api/saraf/login/
+    dashboard        GET   /api/saraf/dashboard/
+    deposit          POST  /api/transaction/create/
+    exchange_create  POST  /api/exchange/create/
+    hawala_send      POST  /api/hawala/send/            to the next client's saraf
+    hawala_receive   PATCH /api/hawala/receive/<number>/ that saraf receives it
+    conversations    GET   /api/messages/conversations/
+    send_message     POST  /api/messages/messages/send/
+    post_feed        GET   /api/saraf-posts/             anonymous
+
+Clients run concurrently on threads, against this process through the Django
+test client (InProcessTransport) or against a running server over HTTP
+(HTTPTransport). In process, the queries of each request are counted exactly.
+Over HTTP they come from the server's /metrics (utils.metrics): the change in
+amupay_request_queries per view over the run, so other traffic to the same
+views during the run is counted too.
+
+The report is JSON: per step the request and error counts, latency
+percentiles in milliseconds, throughput and queries per request, with the git
+commit, settings and dataset size, so runs on two commits can be compared
+with compare_reports().
+"""
+
+import io
+import json
+import platform
+import re
+import statistics
+import subprocess
+import threading
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime, timezone
+
+import django
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client
+from django.test.client import BOUNDARY, MULTIPART_CONTENT, encode_multipart
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve
+
+from .scale_data import SCALE_EMAIL_DOMAIN, SCALE_PASSWORD
+
+STEPS = (
+    ('login', 'POST', '/api/saraf/login/'),
+    ('dashboard', 'GET', '/api/saraf/dashboard/'),
+    ('deposit', 'POST', '/api/transaction/create/'),
+    ('exchange_create', 'POST', '/api/exchange/create/'),
+    ('hawala_send', 'POST', '/api/hawala/send/'),
+    ('hawala_receive', 'PATCH', '/api/hawala/receive/{hawala_number}/'),
+    ('conversations', 'GET', '/api/messages/conversations/'),
+    ('send_message', 'POST', '/api/messages/messages/send/'),
+    ('post_feed', 'GET', '/api/saraf-posts/'),
+)
+
+PERCENTILES = (('p50', 0.50), ('p95', 0.95), ('p99', 0.99))
+
+# Row counts reported with the results, so runs on different datasets are not compared by mistake
+DATASET_MODELS = (
+    'saraf_account.SarafAccount',
+    'normal_user_account.NormalUser',
+    'transaction.Transaction',
+    'exchange.ExchangeTransaction',
+    'hawala.HawalaTransaction',
+    'msg.Conversation',
+    'msg.Message',
+    'saraf_post.SarafPost',
+)
+
+
+class BenchmarkError(Exception):
+    """The benchmark cannot run against this database or server"""
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(fraction * (len(values) - 1))))]
+
+
+def receiver_photo():
+    """A small PNG for the hawala receiver photo"""
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    Image.new('RGB', (64, 64), (40, 120, 200)).save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+class Actor:
+    """A generated saraf a client signs in as, with what its journey needs"""
+
+    def __init__(self, saraf_id, email, exchange_name, address, currency_codes, conversation_id):
+        self.saraf_id = saraf_id
+        self.email = email
+        self.exchange_name = exchange_name
+        self.address = address
+        self.currency_codes = currency_codes
+        self.conversation_id = conversation_id
+
+    def __repr__(self):
+        return f'<Actor saraf {self.saraf_id}>'
+
+
+def select_actors(count, using=DEFAULT_DB_ALIAS):
+    """
+    The first `count` generated sarafs that support two currencies and take
+    part in a conversation. Raises BenchmarkError when there are not enough.
+    """
+    from currency.models import SarafSupportedCurrency
+    from msg.models import ConversationParticipant
+    from saraf_account.models import SarafAccount
+
+    actors = []
+    sarafs = (
+        SarafAccount.objects.using(using)
+        .filter(email__endswith=f'@{SCALE_EMAIL_DOMAIN}', is_active=True)
+        .order_by('saraf_id')
+        .values_list('saraf_id', 'email', 'exchange_name', 'saraf_address')
+    )
+    for saraf_id, email, exchange_name, address in sarafs.iterator(chunk_size=200):
+        codes = list(
+            SarafSupportedCurrency.objects.using(using)
+            .filter(saraf_account_id=saraf_id, is_active=True, currency__is_active=True)
+            .order_by('currency__currency_code')
+            .values_list('currency__currency_code', flat=True)
+        )
+        if len(codes) < 2:
+            continue
+        conversation_id = (
+            ConversationParticipant.objects.using(using)
+            .filter(saraf_account_id=saraf_id, conversation__is_active=True)
+            .order_by('conversation_id')
+            .values_list('conversation_id', flat=True)
+            .first()
+        )
+        if conversation_id is None:
+            continue
+        actors.append(Actor(saraf_id, email, exchange_name or email, address or 'Kabul', codes, conversation_id))
+        if len(actors) == count:
+            return actors
+    raise BenchmarkError(
+        f'Found {len(actors)} of the {count} generated sarafs needed; run generate_scale_data first'
+    )
+
+
+def dataset_counts(using=DEFAULT_DB_ALIAS):
+    from django.apps import apps
+
+    return {label: apps.get_model(label).objects.using(using).count() for label in DATASET_MODELS}
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', 'HEAD'],
+            cwd=settings.BASE_DIR, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Result:
+    __slots__ = ('status', 'data', 'seconds', 'queries')
+
+    def __init__(self, status, data, seconds, queries=None):
+        self.status = status
+        self.data = data
+        self.seconds = seconds
+        self.queries = queries
+
+    @property
+    def ok(self):
+        return 200 <= self.status < 300
+
+
+def _json(content):
+    try:
+        return json.loads(content)
+    except ValueError:
+        return None
+
+
+class InProcessTransport:
+    """Requests through the Django test client; each client thread has its own connection"""
+    mode = 'in-process'
+    counts_queries = True
+
+    def __init__(self, using=DEFAULT_DB_ALIAS):
+        self.using = using
+
+    def session(self):
+        return Client()
+
+    def request(self, session, method, path, token=None, data=None, files=None):
+        headers = {'HTTP_AUTHORIZATION': f'Bearer {token}'} if token else {}
+        if files:
+            uploads = {name: SimpleUploadedFile(f'{name}.png', content, 'image/png') for name, content in files.items()}
+            body = encode_multipart(BOUNDARY, {**(data or {}), **uploads})
+            content_type = MULTIPART_CONTENT
+        elif method == 'GET':
+            body, content_type = data, None
+        else:
+            body, content_type = json.dumps(data if data is not None else {}), 'application/json'
+        with CaptureQueriesContext(connections[self.using]) as queries:
+            started = time.perf_counter()
+            if method == 'GET':
+                response = session.get(path, body, **headers)
+            else:
+                response = session.generic(method, path, body, content_type, **headers)
+            seconds = time.perf_counter() - started
+        return Result(response.status_code, _json(response.content), seconds, len(queries))
+
+    def close(self):
+        connections.close_all()
+
+
+class HTTPTransport:
+    """Requests to a running server with requests; queries come from its /metrics"""
+    mode = 'http'
+    counts_queries = False
+
+    def __init__(self, base_url, metrics_token=None, timeout=30, metrics_settle=None):
+        self.base_url = base_url.rstrip('/')
+        self.metrics_token = metrics_token
+        self.timeout = timeout
+        # Other workers write their histograms every FLUSH_INTERVAL seconds; wait that long before reading
+        if metrics_settle is None:
+            metrics_settle = getattr(settings, 'METRICS_SETTINGS', {}).get('FLUSH_INTERVAL', 5) + 1
+        self.metrics_settle = metrics_settle
+
+    def session(self):
+        import requests
+
+        return requests.Session()
+
+    def request(self, session, method, path, token=None, data=None, files=None):
+        headers = {'Authorization': f'Bearer {token}'} if token else {}
+        kwargs = {}
+        if files:
+            kwargs['data'] = data
+            kwargs['files'] = {name: (f'{name}.png', content, 'image/png') for name, content in files.items()}
+        elif method == 'GET':
+            kwargs['params'] = data
+        elif data is not None:
+            kwargs['json'] = data
+        started = time.perf_counter()
+        response = session.request(method, self.base_url + path, headers=headers, timeout=self.timeout, **kwargs)
+        seconds = time.perf_counter() - started
+        return Result(response.status_code, _json(response.content), seconds)
+
+    def close(self):
+        pass
+
+    def query_totals(self):
+        """{(view, method): (queries, requests)} from the server's /metrics, or None"""
+        import requests
+
+        headers = {'Authorization': f'Bearer {self.metrics_token}'} if self.metrics_token else {}
+        time.sleep(self.metrics_settle)
+        try:
+            response = requests.get(f'{self.base_url}/metrics', headers=headers, timeout=self.timeout)
+        except requests.RequestException:
+            return None
+        if response.status_code != 200:
+            return None
+        return parse_query_totals(response.text)
+
+
+_SERIES = re.compile(r'^amupay_request_queries_(sum|count)\{(.*)\} (\S+)$')
+_LABEL = re.compile(r'(\w+)="((?:[^"\\]|\\.)*)"')
+
+
+def parse_query_totals(text):
+    totals = defaultdict(lambda: [0.0, 0.0])
+    for line in text.splitlines():
+        match = _SERIES.match(line)
+        if not match:
+            continue
+        kind, labels, value = match.groups()
+        labels = dict(_LABEL.findall(labels))
+        totals[(labels.get('view'), labels.get('method'))][kind == 'count'] += float(value)
+    return {key: tuple(values) for key, values in totals.items()}
+
+
+class Journey:
+    """One client's repetitions of STEPS as one actor, sending hawalas to `partner`"""
+
+    def __init__(self, transport, actor, partner, partner_token, run_id, index, photo):
+        self.transport = transport
+        self.actor = actor
+        self.partner = partner
+        self.partner_token = partner_token
+        self.run_id = run_id
+        self.index = index
+        self.photo = photo
+        self.session = transport.session()
+        self.anonymous = transport.session()
+
+    def run(self, iteration, record):
+        actor = self.actor
+        sell, buy = actor.currency_codes[:2]
+        login = self.call(record, 'login', data={
+            'email_or_whatsapp_number': actor.email, 'password': SCALE_PASSWORD,
+        })
+        if not login.ok or not login.data:
+            return
+        token = login.data['access']
+        self.call(record, 'dashboard', token)
+        self.call(record, 'deposit', token, data={
+            'currency_code': sell, 'transaction_type': 'deposit', 'amount': '250.00',
+            'description': 'Benchmark deposit',
+        })
+        self.call(record, 'exchange_create', token, data={
+            'name': 'Benchmark customer', 'transaction_type': 'person',
+            'sell_currency': sell, 'sell_amount': '100.00',
+            'buy_currency': buy, 'buy_amount': '7100.00', 'rate': '71.0',
+        })
+        # Hawala numbers are the primary key and at most 20 characters
+        hawala_number = f'B{self.run_id}{self.index}-{iteration}'
+        sent = self.call(record, 'hawala_send', token, data={
+            'hawala_number': hawala_number, 'sender_name': 'Benchmark Sender', 'sender_phone': '+93700000001',
+            'receiver_name': 'Benchmark Receiver', 'receiver_phone': '+93700000002',
+            'amount': '500.00', 'transfer_fee': '5.00', 'currency_code': sell,
+            'destination_exchange_id': self.partner.saraf_id, 'destination_saraf_uses_app': True,
+            'destination_exchange_name': self.partner.exchange_name,
+            'destination_exchange_address': self.partner.address,
+        })
+        if sent.ok:
+            self.call(
+                record, 'hawala_receive', self.partner_token,
+                path_args={'hawala_number': hawala_number},
+                data={'receiver_phone': '+93700000002'},
+                files={'receiver_photo': self.photo},
+            )
+        self.call(record, 'conversations', token)
+        self.call(record, 'send_message', token, data={
+            'conversation_id': actor.conversation_id, 'content': f'Benchmark message {iteration}',
+            'message_type': 'text',
+        })
+        self.call(record, 'post_feed', session=self.anonymous)
+
+    def call(self, record, step, token=None, data=None, files=None, path_args=None, session=None):
+        _, method, path = STEP_INDEX[step]
+        result = self.transport.request(
+            session or self.session, method, path.format(**(path_args or {})), token, data, files,
+        )
+        record(step, result)
+        return result
+
+    def close(self):
+        self.transport.close()
+
+
+STEP_INDEX = {step[0]: step for step in STEPS}
+
+
+def summarize(results, seconds, counts_queries=True):
+    """Statistics for one step's Results over a run of `seconds`"""
+    latencies = [result.seconds * 1000 for result in results]
+    errors = [result for result in results if not result.ok]
+    summary = {
+        'requests': len(results),
+        'errors': len(errors),
+        'throughput_rps': round(len(results) / seconds, 2) if seconds else None,
+    }
+    for name, fraction in PERCENTILES:
+        value = percentile(latencies, fraction)
+        summary[f'{name}_ms'] = round(value, 2) if value is not None else None
+    summary['mean_ms'] = round(statistics.fmean(latencies), 2) if latencies else None
+    summary['max_ms'] = round(max(latencies), 2) if latencies else None
+    if counts_queries and results:
+        summary['queries_per_request'] = round(statistics.fmean(result.queries for result in results), 2)
+    else:
+        summary['queries_per_request'] = None
+    if errors:
+        summary['error_sample'] = {'status': errors[0].status, 'body': errors[0].data}
+    return summary
+
+
+def view_name(path):
+    return resolve(path.split('?')[0])._func_path
+
+
+def run_benchmark(transport, concurrency=4, iterations=10, warm_up=1, using=DEFAULT_DB_ALIAS, log=None):
+    """
+    Run `iterations` journeys on each of `concurrency` clients after `warm_up`
+    untimed ones, and return the report as a dict.
+    """
+    log = log or (lambda message: None)
+    actors = select_actors(max(concurrency, 2), using)
+    run_id = uuid.uuid4().hex[:6]
+    photo = receiver_photo()
+
+    # Each client's hawalas go to the next client's saraf, which receives them
+    setup_session = transport.session()
+    tokens = {}
+    for actor in actors:
+        result = transport.request(setup_session, 'POST', '/api/saraf/login/', data={
+            'email_or_whatsapp_number': actor.email, 'password': SCALE_PASSWORD,
+        })
+        if not result.ok or not result.data:
+            raise BenchmarkError(f'Signing in as {actor.email} failed with status {result.status}: {result.data}')
+        tokens[actor.saraf_id] = result.data['access']
+
+    results = defaultdict(list)
+    failures = []
+    lock = threading.Lock()
+    timing = {}
+
+    def start():
+        # Runs once, when every client has finished warming up
+        if not transport.counts_queries:
+            timing['queries_before'] = transport.query_totals()
+        timing['started'] = time.perf_counter()
+
+    start_barrier = threading.Barrier(concurrency, action=start)
+
+    def client(index):
+        actor, partner = actors[index], actors[(index + 1) % len(actors)]
+        journey = Journey(transport, actor, partner, tokens[partner.saraf_id], run_id, index, photo)
+        local = defaultdict(list)
+        try:
+            for iteration in range(warm_up):
+                journey.run(f'w{iteration}', lambda step, result: None)
+            start_barrier.wait()
+            for iteration in range(iterations):
+                journey.run(iteration, lambda step, result: local[step].append(result))
+        except threading.BrokenBarrierError:
+            return
+        except Exception as e:
+            start_barrier.abort()
+            failures.append(e)
+            return
+        finally:
+            journey.close()
+        with lock:
+            for step, step_results in local.items():
+                results[step].extend(step_results)
+
+    log(f'{concurrency} clients x {iterations} journeys ({warm_up} warm-up) as sarafs '
+        f'{", ".join(str(actor.saraf_id) for actor in actors[:concurrency])}')
+    threads = [threading.Thread(target=client, args=(index,), name=f'benchmark-{index}') for index in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if failures:
+        raise failures[0]
+    seconds = time.perf_counter() - timing['started']
+
+    steps = {step: summarize(results[step], seconds, transport.counts_queries) for step, _, _ in STEPS}
+    everything = [result for step_results in results.values() for result in step_results]
+    total = summarize(everything, seconds, transport.counts_queries)
+
+    query_totals_before = timing.get('queries_before')
+    if query_totals_before is not None:
+        query_totals_after = transport.query_totals()
+        if query_totals_after is not None:
+            for step, method, path in STEPS:
+                key = (view_name(path.format(hawala_number='x')), method)
+                queries_before, requests_before = query_totals_before.get(key, (0, 0))
+                queries_after, requests_after = query_totals_after.get(key, (0, 0))
+                if requests_after > requests_before:
+                    steps[step]['queries_per_request'] = round(
+                        (queries_after - queries_before) / (requests_after - requests_before), 2
+                    )
+            measured = [
+                summary for summary in steps.values()
+                if summary['requests'] and summary['queries_per_request'] is not None
+            ]
+            if measured:
+                total['queries_per_request'] = round(
+                    sum(summary['queries_per_request'] * summary['requests'] for summary in measured)
+                    / sum(summary['requests'] for summary in measured), 2
+                )
+
+    return {
+        'meta': {
+            'created_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'git_commit': git_commit(),
+            'mode': transport.mode,
+            'url': getattr(transport, 'base_url', None),
+            'concurrency': concurrency,
+            'iterations': iterations,
+            'warm_up': warm_up,
+            'seconds': round(seconds, 3),
+            'database': connections[using].vendor,
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'debug': settings.DEBUG,
+            'dataset': dataset_counts(using),
+        },
+        'steps': steps,
+        'total': total,
+    }
+
+
+def compare_reports(baseline, current):
+    """
+    Per step (and 'total'): p50, p95 and p99 in ms, throughput and queries per
+    request in both reports, with the relative change of each.
+    """
+    rows = {}
+    steps = dict(current['steps'], total=current['total'])
+    baseline_steps = dict(baseline['steps'], total=baseline['total'])
+    for step, summary in steps.items():
+        before = baseline_steps.get(step)
+        if before is None:
+            continue
+        row = {}
+        for key in ('p50_ms', 'p95_ms', 'p99_ms', 'throughput_rps', 'queries_per_request'):
+            old, new = before.get(key), summary.get(key)
+            change = None
+            if old and new is not None:
+                change = round((new - old) / old, 4)
+            row[key] = {'baseline': old, 'current': new, 'change': change}
+        rows[step] = row
+    return rows
@@ -0,0 +1,186 @@
+"""
+Cache-aside helpers on the shared cache tier (settings.CACHES).
+
+Keys are namespaced and versioned as <namespace>:<version>:<key>. Calling
+CacheNamespace.invalidate() moves the namespace to a new version, which drops
+all of its keys at once without scanning them.
+
+get_or_set() is single-flight. On a miss, one caller (per key, across all
+workers) computes the value while the others wait briefly for it, so an
+expired hot key does not send every worker to the database at once.
+
+Hits, misses and computes are counted per namespace in this process
+(see cache_stats()).
+"""
+
+import hashlib
+import logging
+import threading
+import time
+import uuid
+from collections import defaultdict
+
+from django.core.cache import caches
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+# Keys longer than this are hashed (memcached-compatible key lengths)
+MAX_KEY_LENGTH = 200
+
+_stats_lock = threading.Lock()
+_stats = defaultdict(lambda: {'hits': 0, 'misses': 0, 'computes': 0, 'waits': 0, 'errors': 0})
+
+
+def _record(namespace, event):
+    with _stats_lock:
+        _stats[namespace][event] += 1
+
+
+def cache_stats(reset=False):
+    """{namespace: {'hits', 'misses', 'computes', 'waits', 'errors', 'hit_rate'}} for this process"""
+    with _stats_lock:
+        snapshot = {}
+        for namespace, counts in _stats.items():
+            lookups = counts['hits'] + counts['misses']
+            snapshot[namespace] = dict(counts, hit_rate=round(counts['hits'] / lookups, 4) if lookups else None)
+        if reset:
+            _stats.clear()
+    return snapshot
+
+
+class CacheNamespace:
+    """
+    A group of cache keys that share a timeout and can be invalidated together.
+
+        currency_cache = CacheNamespace('currency', timeout=600)
+        data = currency_cache.get_or_set('active', load_active_currencies)
+        currency_cache.invalidate()  # after a write
+
+    Cache errors (e.g. Redis unreachable) are logged and treated as misses, so
+    callers fall back to computing the value.
+    """
+
+    def __init__(self, name, timeout=300, lock_timeout=10, wait_timeout=2.0, alias='default'):
+        self.name = name
+        self.timeout = timeout
+        self.lock_timeout = lock_timeout
+        self.wait_timeout = wait_timeout
+        self.alias = alias
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def _version_key(self):
+        return f'{self.name}:version'
+
+    def version(self):
+        """Current namespace version, created on first use"""
+        version = self.cache.get(self._version_key())
+        if version is None:
+            # A time-based start means an evicted version key never brings back old entries
+            self.cache.add(self._version_key(), time.time_ns(), timeout=None)
+            version = self.cache.get(self._version_key())
+        return version
+
+    def make_key(self, key):
+        key = f'{self.name}:{self.version()}:{key}'
+        if len(key) > MAX_KEY_LENGTH:
+            key = f'{self.name}:{hashlib.sha1(key.encode()).hexdigest()}'
+        return key
+
+    def get(self, key, default=None):
+        try:
+            value = self.cache.get(self.make_key(key), _MISSING)
+        except Exception as e:
+            _record(self.name, 'errors')
+            logger.warning(f"Cache get failed for {self.name}:{key}: {str(e)}")
+            value = _MISSING
+        if value is _MISSING:
+            _record(self.name, 'misses')
+            return default
+        _record(self.name, 'hits')
+        return value
+
+    def set(self, key, value, timeout=None):
+        try:
+            self.cache.set(self.make_key(key), value, timeout=self.timeout if timeout is None else timeout)
+        except Exception as e:
+            _record(self.name, 'errors')
+            logger.warning(f"Cache set failed for {self.name}:{key}: {str(e)}")
+
+    def delete(self, key):
+        try:
+            self.cache.delete(self.make_key(key))
+        except Exception as e:
+            _record(self.name, 'errors')
+            logger.warning(f"Cache delete failed for {self.name}:{key}: {str(e)}")
+
+    def invalidate(self):
+        """Drop every key in the namespace by moving to a new version"""
+        try:
+            try:
+                self.cache.incr(self._version_key())
+            except ValueError:
+                # Version key missing or evicted
+                self.cache.set(self._version_key(), time.time_ns(), timeout=None)
+        except Exception as e:
+            _record(self.name, 'errors')
+            logger.warning(f"Cache invalidate failed for {self.name}: {str(e)}")
+
+    def get_or_set(self, key, compute, timeout=None):
+        """
+        Return the cached value for key, or compute(), store and return it.
+        Only one caller computes a missing key; the others wait up to
+        wait_timeout seconds for its result before computing it themselves.
+        """
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+
+        try:
+            cache_key = self.make_key(key)
+            lock_key = f'{cache_key}:lock'
+            token = uuid.uuid4().hex
+            acquired = self.cache.add(lock_key, token, timeout=self.lock_timeout)
+        except Exception as e:
+            _record(self.name, 'errors')
+            logger.warning(f"Cache lock failed for {self.name}:{key}: {str(e)}")
+            _record(self.name, 'computes')
+            return compute()
+
+        if not acquired:
+            _record(self.name, 'waits')
+            deadline = time.monotonic() + self.wait_timeout
+            delay = 0.02
+            while time.monotonic() < deadline:
+                time.sleep(delay)
+                delay = min(delay * 2, 0.2)
+                try:
+                    value = self.cache.get(cache_key, _MISSING)
+                except Exception as e:
+                    _record(self.name, 'errors')
+                    logger.warning(f"Cache get failed for {self.name}:{key}: {str(e)}")
+                    break
+                if value is not _MISSING:
+                    return value
+            # The computing caller is slow or died; do not block the request any longer
+
+        try:
+            _record(self.name, 'computes')
+            value = compute()
+            try:
+                self.cache.set(cache_key, value, timeout=self.timeout if timeout is None else timeout)
+            except Exception as e:
+                _record(self.name, 'errors')
+                logger.warning(f"Cache set failed for {self.name}:{key}: {str(e)}")
+            return value
+        finally:
+            if acquired:
+                try:
+                    # Only release our own lock, not one taken after ours expired
+                    if self.cache.get(lock_key) == token:
+                        self.cache.delete(lock_key)
+                except Exception:
+                    pass
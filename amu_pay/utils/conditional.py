@@ -0,0 +1,96 @@
+"""
+Conditional GET for read-mostly endpoints.
+
+A view declares how to get a cheap version of the data it returns, such as the
+row count plus the latest updated_at. The ETag is derived from that version and
+the request URL, not from the response body, so a client that sends
+If-None-Match gets a 304 before any serializer runs.
+
+Responses with media URLs are different when S3 signs them (querystring_auth):
+the URLs expire after AWS_QUERYSTRING_EXPIRE whether or not the rows changed.
+Those views pass signed_urls=True, which adds the current signing window to
+the version, so a 304 never keeps a client on URLs that are more than half
+expired.
+"""
+
+import functools
+import hashlib
+import logging
+import time
+
+from django.core.files.storage import default_storage
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
+
+logger = logging.getLogger(__name__)
+
+
+def queryset_version(queryset, *fields):
+    """
+    Row count plus the latest value of each field (default: updated_at).
+    Changes on insert, update and delete of matching rows. Fields may follow
+    forward relations (e.g. 'saraf_account__updated_at'); reverse relations
+    would multiply the row count.
+    """
+    fields = fields or ('updated_at',)
+    aggregates = {'count': Count('pk')}
+    for index, field in enumerate(fields):
+        aggregates[f'latest_{index}'] = Max(field)
+    result = queryset.aggregate(**aggregates)
+    return tuple(result[key] for key in aggregates)
+
+
+def signed_url_window(storage=None):
+    """
+    Index of the current half-expiry window of the storage's presigned URLs
+    (default_storage by default), or None when it does not sign them
+    """
+    storage = default_storage if storage is None else storage
+    if not getattr(storage, 'querystring_auth', False):
+        return None
+    window = max(int(getattr(storage, 'querystring_expire', 3600)) // 2, 1)
+    return int(time.time() // window)
+
+
+def version_etag(request, version):
+    """Quoted ETag for a data version as rendered for this URL and Accept header"""
+    raw = repr((request.get_host(), request.get_full_path(), request.META.get('HTTP_ACCEPT', ''), version))
+    return quote_etag(hashlib.sha1(raw.encode()).hexdigest())
+
+
+def conditional_get(version_func, signed_urls=False):
+    """
+    Decorate an APIView get() method with ETag handling.
+
+    version_func(request, *args, **kwargs) returns any repr-stable value that
+    changes whenever the response would, or None to skip the check (e.g. the
+    object does not exist). Only 200 responses carry the ETag. Set
+    signed_urls when the response contains media URLs.
+    """
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, request, *args, **kwargs):
+            etag = None
+            try:
+                version = version_func(request, *args, **kwargs)
+                if version is not None and signed_urls:
+                    version = (version, signed_url_window())
+                if version is not None:
+                    etag = version_etag(request, version)
+            except Exception as e:
+                # Never fail the request because the version lookup did
+                logger.error(f"Error computing ETag for {request.path}: {str(e)}")
+
+            if etag:
+                not_modified = get_conditional_response(request, etag=etag)
+                if not_modified is not None:
+                    not_modified.headers['ETag'] = etag
+                    return not_modified
+
+            response = method(self, request, *args, **kwargs)
+            if etag and response.status_code == 200:
+                response.headers['ETag'] = etag
+            return response
+        return wrapper
+    return decorator
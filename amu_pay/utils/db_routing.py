@@ -0,0 +1,230 @@
+"""
+Read-replica routing for heavy list, report and statistics reads.
+
+Replica aliases come from DB_REPLICA_HOSTS (see DATABASE_REPLICA_SETTINGS).
+Routing is opt-in: only code inside replica_reads(), or an APIView method
+decorated with @read_replica, reads from a replica. Everything else, and
+every write, uses 'default'.
+
+Reads inside a replica scope still go to the primary when:
+
+- the user wrote within the last STICKY_SECONDS, so they see their own
+  postings (ReplicaStickinessMiddleware records writes per saraf, or per user
+  for normal users);
+- something in the scope has written, or a transaction is open on the primary;
+- every replica is more than MAX_LAG_SECONDS behind, or its lag cannot be read.
+  Lag is checked at most once per LAG_CHECK_INTERVAL per replica and process.
+"""
+
+import contextvars
+import functools
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+logger = logging.getLogger(__name__)
+
+STICKY_KEY_PREFIX = 'db:sticky:'
+
+# Replica scope of the current code path (None outside replica_reads())
+_scope = contextvars.ContextVar('db_replica_scope', default=None)
+# Per-request write tracking, set by ReplicaStickinessMiddleware
+_request_state = contextvars.ContextVar('db_request_state', default=None)
+
+_health_lock = threading.Lock()
+_health = {}
+
+
+class _ReplicaScope:
+    def __init__(self, alias):
+        self.alias = alias
+
+
+class _RequestState:
+    def __init__(self):
+        self.wrote = False
+
+
+def _replica_settings():
+    return getattr(settings, 'DATABASE_REPLICA_SETTINGS', {})
+
+
+def _user_key(user):
+    """Stickiness key: the saraf for saraf and employee tokens, otherwise the user"""
+    if user is None or not getattr(user, 'is_authenticated', False):
+        return None
+    saraf_id = getattr(user, 'saraf_id', None)
+    if saraf_id:
+        return f'saraf:{saraf_id}'
+    user_id = getattr(user, 'id', None)
+    if user_id is None:
+        return None
+    return f"{getattr(user, 'user_type', 'user')}:{user_id}"
+
+
+def mark_recent_write(user):
+    """Send this user's replica reads to the primary for STICKY_SECONDS"""
+    key = _user_key(user)
+    if key is None:
+        return
+    try:
+        cache.set(STICKY_KEY_PREFIX + key, True, _replica_settings().get('STICKY_SECONDS', 10))
+    except Exception as e:
+        logger.error(f"Could not record recent write for {key}: {str(e)}")
+
+
+def has_recent_write(user):
+    key = _user_key(user)
+    if key is None:
+        return False
+    try:
+        return bool(cache.get(STICKY_KEY_PREFIX + key))
+    except Exception as e:
+        # Cannot tell, so read from the primary
+        logger.error(f"Could not check recent writes for {key}: {str(e)}")
+        return True
+
+
+def replica_lag(alias):
+    """
+    Seconds the replica is behind its source, or None when it is not
+    replicating. Backends without replication status (SQLite test mirrors)
+    report 0.
+    """
+    connection = connections[alias]
+    if connection.vendor != 'mysql':
+        return 0
+    with connection.cursor() as cursor:
+        try:
+            cursor.execute('SHOW REPLICA STATUS')
+        except DatabaseError:
+            # MySQL before 8.0.22
+            cursor.execute('SHOW SLAVE STATUS')
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        status = dict(zip([column[0] for column in cursor.description], row))
+    return status.get('Seconds_Behind_Source', status.get('Seconds_Behind_Master'))
+
+
+def replica_is_healthy(alias):
+    options = _replica_settings()
+    now = time.monotonic()
+    with _health_lock:
+        checked_at, healthy = _health.get(alias, (None, False))
+    if checked_at is not None and now - checked_at < options.get('LAG_CHECK_INTERVAL', 5):
+        return healthy
+    try:
+        lag = replica_lag(alias)
+        healthy = lag is not None and lag <= options.get('MAX_LAG_SECONDS', 5)
+        if lag is None:
+            logger.warning(f"Replica {alias} is not replicating; reading from the primary")
+        elif not healthy:
+            logger.warning(f"Replica {alias} is {lag}s behind; reading from the primary")
+    except Exception as e:
+        healthy = False
+        logger.warning(f"Could not read replication lag of {alias}: {str(e)}")
+    with _health_lock:
+        _health[alias] = (now, healthy)
+    return healthy
+
+
+def choose_replica(user=None):
+    """A healthy replica alias for this user's reads, or None for the primary"""
+    replicas = _replica_settings().get('REPLICAS', [])
+    if not replicas or has_recent_write(user):
+        return None
+    healthy = [alias for alias in replicas if replica_is_healthy(alias)]
+    return random.choice(healthy) if healthy else None
+
+
+@contextmanager
+def replica_reads(user=None):
+    """Route reads in this block to a replica when it is safe for this user"""
+    scope = _ReplicaScope(choose_replica(user))
+    token = _scope.set(scope)
+    try:
+        yield scope.alias
+    finally:
+        _scope.reset(token)
+
+
+def read_replica(method):
+    """Decorate an APIView handler whose reads may be served by a replica"""
+    @functools.wraps(method)
+    def wrapper(self, request, *args, **kwargs):
+        with replica_reads(request.user):
+            return method(self, request, *args, **kwargs)
+    return wrapper
+
+
+class ReplicaRouter:
+    """Writes and default reads to 'default'; reads in a replica scope to its replica"""
+
+    def db_for_read(self, model, **hints):
+        scope = _scope.get()
+        if scope is None or scope.alias is None:
+            return DEFAULT_DB_ALIAS
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return scope.alias
+
+    def db_for_write(self, model, **hints):
+        scope = _scope.get()
+        if scope is not None:
+            # Read the rest of the scope back from where it was written
+            scope.alias = None
+        state = _request_state.get()
+        if state is not None:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+class ReplicaStickinessMiddleware:
+    """Remember which users wrote, so their next reads see those writes"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        state = _RequestState()
+        token = _request_state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _request_state.reset(token)
+        if state.wrote:
+            # DRF copies the token user onto the underlying request
+            mark_recent_write(getattr(request, 'user', None))
+        return response
+
+    async def __acall__(self, request):
+        state = _RequestState()
+        token = _request_state.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _request_state.reset(token)
+        if state.wrote:
+            await sync_to_async(mark_recent_write)(getattr(request, 'user', None))
+        return response
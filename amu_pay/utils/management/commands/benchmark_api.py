@@ -0,0 +1,118 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from utils.benchmark import (
+    STEPS, BenchmarkError, HTTPTransport, InProcessTransport, compare_reports, run_benchmark,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Drive the main saraf journeys (login, dashboard, deposit, exchange, hawala send and receive, '
+        'messages, post feed) with concurrent clients over the generate_scale_data dataset and report '
+        'p50/p95/p99 latency, throughput and queries per request as JSON'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=4, help='Concurrent clients (default: 4)')
+        parser.add_argument('--iterations', type=int, default=10, help='Timed journeys per client (default: 10)')
+        parser.add_argument('--warm-up', type=int, default=1, help='Untimed journeys per client first (default: 1)')
+        parser.add_argument(
+            '--url',
+            help='Benchmark a running server at this base URL over HTTP instead of in process. '
+                 'It must use the same database as this command.',
+        )
+        parser.add_argument(
+            '--metrics-token',
+            default=getattr(settings, 'METRICS_SETTINGS', {}).get('TOKEN') or None,
+            help="Bearer token for the server's /metrics, to report queries per request over HTTP "
+                 '(default: METRICS_TOKEN)',
+        )
+        parser.add_argument('--database', default='default', help='Database alias (default: default)')
+        parser.add_argument('--output', help='Write the JSON report to this file')
+        parser.add_argument('--compare', help='A previous JSON report to compare against')
+
+    def handle(self, *args, **options):
+        if options['concurrency'] < 1 or options['iterations'] < 1:
+            raise CommandError('--concurrency and --iterations must be at least 1')
+        baseline = None
+        if options['compare']:
+            try:
+                with open(options['compare']) as f:
+                    baseline = json.load(f)
+            except (OSError, ValueError) as e:
+                raise CommandError(f"Cannot read {options['compare']}: {e}")
+
+        if options['url']:
+            transport = HTTPTransport(options['url'], metrics_token=options['metrics_token'])
+        else:
+            transport = InProcessTransport(using=options['database'])
+        try:
+            with override_settings(ALLOWED_HOSTS=['*']):
+                report = run_benchmark(
+                    transport,
+                    concurrency=options['concurrency'],
+                    iterations=options['iterations'],
+                    warm_up=options['warm_up'],
+                    using=options['database'],
+                    log=self.stdout.write,
+                )
+        except BenchmarkError as e:
+            raise CommandError(str(e))
+
+        self.write_table(report)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2)
+                f.write('\n')
+            self.stdout.write(f"Report written to {options['output']}")
+        if baseline is not None:
+            self.write_comparison(baseline, report)
+
+    def write_table(self, report):
+        meta = report['meta']
+        self.stdout.write(
+            f"{meta['mode']}, {meta['concurrency']} clients, {meta['seconds']}s, {meta['database']}, "
+            f"commit {(meta['git_commit'] or 'unknown')[:10]}"
+        )
+        self.stdout.write(
+            f"{'step':<16} {'requests':>8} {'errors':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+            f"{'req/s':>8} {'queries':>8}"
+        )
+        rows = [(step, report['steps'][step]) for step, _, _ in STEPS] + [('total', report['total'])]
+        for step, summary in rows:
+            self.stdout.write(
+                f"{step:<16} {summary['requests']:>8} {summary['errors']:>7} "
+                f"{self.number(summary['p50_ms'])} {self.number(summary['p95_ms'])} "
+                f"{self.number(summary['p99_ms'])} {self.number(summary['throughput_rps'])} "
+                f"{self.number(summary['queries_per_request'])}"
+            )
+        for step, summary in rows:
+            if summary.get('error_sample'):
+                sample = summary['error_sample']
+                self.stdout.write(self.style.WARNING(f"{step}: status {sample['status']}: {sample['body']}"))
+
+    def write_comparison(self, baseline, report):
+        commit = (baseline['meta'].get('git_commit') or 'unknown')[:10]
+        self.stdout.write(f'Change against {commit} (negative is faster or fewer):')
+        # Not the dataset: every run adds the rows it creates
+        for key in ('mode', 'concurrency', 'iterations', 'database'):
+            if baseline['meta'].get(key) != report['meta'].get(key):
+                self.stdout.write(self.style.WARNING(f'The baseline was run with a different {key}'))
+        self.stdout.write(f"{'step':<16} {'p50':>8} {'p95':>8} {'p99':>8} {'req/s':>8} {'queries':>8}")
+        for step, row in compare_reports(baseline, report).items():
+            self.stdout.write(f'{step:<16} ' + ' '.join(
+                self.change(row[key])
+                for key in ('p50_ms', 'p95_ms', 'p99_ms', 'throughput_rps', 'queries_per_request')
+            ))
+
+    def number(self, value):
+        return f"{'-':>8}" if value is None else f'{value:>8.2f}'
+
+    def change(self, values):
+        if values['change'] is None:
+            return f"{'-':>8}"
+        return f"{values['change']:>+8.1%}"
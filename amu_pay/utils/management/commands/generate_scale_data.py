@@ -0,0 +1,83 @@
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from utils.scale_data import (
+    DEFAULT_COUNTS, SCALE_PASSWORD, ScaleDataGenerator, clear_scale_data, scale_counts, scale_data_exists,
+)
+
+
+class Command(BaseCommand):
+    help = 'Generate a deterministic benchmark dataset with bulk inserts (about 5.8M rows at --scale 1)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=0, help='Random seed (default: 0)')
+        parser.add_argument(
+            '--scale',
+            type=float,
+            default=1.0,
+            help='Multiplies every table size below; --scale 2 is about 10M rows (default: 1)',
+        )
+        for name, value in DEFAULT_COUNTS.items():
+            parser.add_argument(
+                f"--{name.replace('_', '-')}",
+                type=int,
+                dest=name,
+                help=f'Override the {name.replace("_", " ")} count (default: {value} x scale)',
+            )
+        parser.add_argument(
+            '--until',
+            help='Last day of the generated history, YYYY-MM-DD; fix it to get identical rows later '
+                 '(default: today)',
+        )
+        parser.add_argument('--days', type=int, default=365, help='Days of history (default: 365)')
+        parser.add_argument('--chunk-size', type=int, default=5000, help='Rows per insert (default: 5000)')
+        parser.add_argument('--database', default='default', help='Database alias (default: default)')
+        parser.add_argument(
+            '--clear',
+            action='store_true',
+            help='Delete previously generated scale data first',
+        )
+        parser.add_argument(
+            '--allow-non-debug',
+            action='store_true',
+            help='Run with DEBUG off. The generated accounts are active and share a published password; '
+                 'never use this on a database that serves real users',
+        )
+
+    def handle(self, *args, **options):
+        if not settings.DEBUG and not options['allow_non_debug']:
+            raise CommandError(
+                'DEBUG is off, so this may be a production database. Scale data adds active accounts with '
+                f'the password {SCALE_PASSWORD!r}, allocates primary keys assuming no other writers, and '
+                '--clear cascades deletes. Pass --allow-non-debug if this database is a disposable copy.'
+            )
+        using = options['database']
+        if scale_data_exists(using):
+            if not options['clear']:
+                raise CommandError('Scale data already exists; pass --clear to replace it')
+            clear_scale_data(using, log=self.stdout.write)
+
+        until = None
+        if options['until']:
+            try:
+                until = datetime.strptime(options['until'], '%Y-%m-%d').replace(tzinfo=timezone.utc)
+            except ValueError:
+                raise CommandError('--until must be a date in YYYY-MM-DD format')
+
+        counts = scale_counts(options['scale'], **{name: options[name] for name in DEFAULT_COUNTS})
+        generator = ScaleDataGenerator(
+            counts,
+            seed=options['seed'],
+            until=until,
+            days=options['days'],
+            chunk_size=options['chunk_size'],
+            using=using,
+            log=self.stdout.write,
+        )
+        inserted = generator.generate()
+        self.stdout.write(self.style.SUCCESS(
+            f"Generated {sum(inserted.values())} rows. Accounts use emails like saraf0@... and "
+            f"user0@..., password {SCALE_PASSWORD!r}"
+        ))
@@ -0,0 +1,80 @@
+import json
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand, CommandError
+
+from utils.startup import STARTUP_BUDGET_SECONDS, measure_startup
+
+
+class Command(BaseCommand):
+    help = 'Boot a fresh worker process and report its startup time and heaviest imports'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--top',
+            type=int,
+            default=20,
+            help='Modules and packages to list (default: 20)',
+        )
+        parser.add_argument(
+            '--budget',
+            type=float,
+            default=STARTUP_BUDGET_SECONDS,
+            help=f'Startup budget in seconds (default: {STARTUP_BUDGET_SECONDS})',
+        )
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Exit with an error when over budget or when heavy modules load at startup',
+        )
+        parser.add_argument(
+            '--json',
+            metavar='PATH',
+            help='Also write the report as JSON to PATH',
+        )
+
+    def handle(self, *args, **options):
+        # A clean boot for the time, then one under -X importtime for the breakdown
+        startup = measure_startup()
+        imports = measure_startup(importtime=True)['imports']
+
+        packages = defaultdict(int)
+        for name, self_us, _ in imports:
+            packages[name.split('.')[0]] += self_us
+        slowest = sorted(imports, key=lambda row: row[2], reverse=True)[:options['top']]
+        heaviest = sorted(packages.items(), key=lambda item: item[1], reverse=True)[:options['top']]
+
+        over_budget = startup['seconds'] > options['budget']
+        style = self.style.ERROR if over_budget else self.style.SUCCESS
+        self.stdout.write(style(
+            f"Startup {startup['seconds']:.2f}s (budget {options['budget']:.2f}s), "
+            f"{startup['module_count']} modules"
+        ))
+        if startup['heavy_modules']:
+            self.stdout.write(self.style.ERROR(
+                f"Loaded at startup, should load on first use: {', '.join(startup['heavy_modules'])}"
+            ))
+
+        self.stdout.write(f"\nSlowest imports{'':<46}cumulative ms   self ms")
+        for name, self_us, cumulative_us in slowest:
+            self.stdout.write(f"  {name:<60}{cumulative_us / 1000:>13.1f}{self_us / 1000:>10.1f}")
+        self.stdout.write(f"\nPackages by own import time{'':<34}ms")
+        for package, self_us in heaviest:
+            self.stdout.write(f"  {package:<60}{self_us / 1000:>7.1f}")
+
+        if options['json']:
+            with open(options['json'], 'w') as report:
+                json.dump({
+                    'seconds': startup['seconds'],
+                    'budget_seconds': options['budget'],
+                    'module_count': startup['module_count'],
+                    'heavy_modules': startup['heavy_modules'],
+                    'slowest_imports': [
+                        {'module': name, 'self_us': self_us, 'cumulative_us': cumulative_us}
+                        for name, self_us, cumulative_us in slowest
+                    ],
+                    'packages': [{'package': package, 'self_us': self_us} for package, self_us in heaviest],
+                }, report, indent=2)
+
+        if options['check'] and (over_budget or startup['heavy_modules']):
+            raise CommandError('Worker startup is over budget or loads heavy modules eagerly')
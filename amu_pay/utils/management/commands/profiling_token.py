@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from utils.profiling import issue_token
+
+
+class Command(BaseCommand):
+    help = (
+        'Issue a token that profiles any request sent with an X-Profile-Token header, '
+        'and lets its holder download the reports made with it from /profiles/'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--issued-by', required=True, help='Who the token is for; recorded in every report')
+        parser.add_argument('--minutes', type=int, default=60, help='How long the token is valid (default: 60)')
+
+    def handle(self, *args, **options):
+        if options['minutes'] < 1:
+            raise CommandError('--minutes must be at least 1')
+        token = issue_token(options['issued_by'], seconds=options['minutes'] * 60)
+        self.stderr.write(f"Valid for {options['minutes']} minutes. Send it as:")
+        self.stdout.write(f'X-Profile-Token: {token}')
@@ -0,0 +1,440 @@
+"""
+Per-request performance metrics, exported in the Prometheus text format.
+
+MetricsMiddleware times every request and records, per view (the dotted path
+of the resolved view) and method:
+
+    amupay_request_duration_seconds   latency, also labelled with the status
+    amupay_request_queries            database queries run for the request
+    amupay_request_db_seconds         time spent in those queries
+    amupay_request_external_seconds   time spent waiting on external services
+
+and, wherever the call is made (a request or a worker process):
+
+    amupay_external_call_seconds{service, outcome}
+
+Queries are timed by a database execute wrapper on every connection. External
+calls are timed where they are made: external_call('smtp') around SMTP,
+Twilio, Pinecone and embedding service calls, LangChain callbacks for Gemini
+(ai.llm.LLMCallTimer) and botocore events for S3 (instrument_boto3). An
+external call made inside another one (the embedding lookup inside a
+Pinecone search) gets its own observation but is not added to the request
+total twice.
+
+Each process keeps its histograms in memory, and a background thread writes
+them to METRICS_SETTINGS['DIR']/<host>-<pid>-<start>.json every
+FLUSH_INTERVAL seconds and at exit. GET /metrics merges the files of every
+process, as prometheus_client's multiprocess mode does, so whichever
+gunicorn worker answers reports for all of them. Files of processes that have exited are
+folded into retired.json, so counters never go backwards.
+
+/metrics only answers internal callers: a request from ALLOWED_NETWORKS that
+did not come through the proxy (no X-Forwarded-For or X-Real-IP header), or
+one with `Authorization: Bearer <TOKEN>`.
+"""
+
+import atexit
+import contextvars
+import fcntl
+import ipaddress
+import json
+import logging
+import os
+import socket
+import threading
+import time
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+# name: (help, buckets)
+METRICS = {
+    'amupay_request_duration_seconds': ('Request latency by view', LATENCY_BUCKETS),
+    'amupay_request_queries': ('Database queries per request by view', QUERY_BUCKETS),
+    'amupay_request_db_seconds': ('Database time per request by view', LATENCY_BUCKETS),
+    'amupay_request_external_seconds': ('External service time per request by view', LATENCY_BUCKETS),
+    'amupay_external_call_seconds': ('External service call latency', LATENCY_BUCKETS),
+}
+
+RETIRED_FILE = 'retired.json'
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Request being measured in the current context (None outside MetricsMiddleware)
+_current = contextvars.ContextVar('metrics_request', default=None)
+# External calls in progress in the current context, to avoid counting nested ones twice
+_external_depth = contextvars.ContextVar('metrics_external_depth', default=0)
+
+_lock = threading.Lock()
+# (name, labels) -> [per-bucket counts..., overflow count, sum]
+_histograms = {}
+# The process the histograms belong to, and its snapshot file name (reset in forked workers)
+_process = {'pid': None, 'name': None}
+
+
+class _RequestMetrics:
+    __slots__ = ('queries', 'db_seconds', 'external_seconds')
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.external_seconds = 0.0
+
+
+def _metrics_settings():
+    return getattr(settings, 'METRICS_SETTINGS', {})
+
+
+def observe(name, value, **labels):
+    """Record one observation of a histogram in METRICS"""
+    buckets = METRICS[name][1]
+    key = (name, tuple(sorted(labels.items())))
+    if _process['pid'] != os.getpid():
+        _start_flusher()
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = [0] * (len(buckets) + 1) + [0.0]
+        for index, bound in enumerate(buckets):
+            if value <= bound:
+                histogram[index] += 1
+                break
+        else:
+            histogram[len(buckets)] += 1
+        histogram[-1] += value
+
+
+def snapshot(reset=False):
+    """{name: {labels json: [bucket counts..., overflow, sum]}} for this process"""
+    data = {}
+    with _lock:
+        for (name, labels), histogram in _histograms.items():
+            data.setdefault(name, {})[json.dumps(labels)] = list(histogram)
+        if reset:
+            _histograms.clear()
+    return data
+
+
+def merge(total, data):
+    for name, series in data.items():
+        target = total.setdefault(name, {})
+        for labels, values in series.items():
+            if labels in target:
+                target[labels] = [a + b for a, b in zip(target[labels], values)]
+            else:
+                target[labels] = list(values)
+    return total
+
+
+# Database time
+
+def _time_query(execute, sql, params, many, context):
+    current = _current.get()
+    if current is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        current.queries += 1
+        current.db_seconds += time.perf_counter() - started
+
+
+def instrument_connection(connection, **kwargs):
+    if _time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_time_query)
+
+
+connection_created.connect(instrument_connection)
+
+
+# External calls
+
+def record_external(service, seconds, outcome='ok'):
+    """Record a finished external call, and add it to the current request unless nested"""
+    observe('amupay_external_call_seconds', seconds, service=service, outcome=outcome)
+    current = _current.get()
+    if current is not None and _external_depth.get() == 0:
+        current.external_seconds += seconds
+
+
+@contextmanager
+def external_call(service):
+    """Time a call to an external service (smtp, twilio, pinecone, ...)"""
+    token = _external_depth.set(_external_depth.get() + 1)
+    outcome = 'error'
+    started = time.perf_counter()
+    try:
+        yield
+        outcome = 'ok'
+    finally:
+        elapsed = time.perf_counter() - started
+        _external_depth.reset(token)
+        record_external(service, elapsed, outcome)
+
+
+def _boto_before_call(context, **kwargs):
+    context['metrics_started'] = time.perf_counter()
+
+
+def _boto_after_call(context, service, outcome):
+    started = context.pop('metrics_started', None)
+    if started is not None:
+        record_external(service, time.perf_counter() - started, outcome)
+
+
+def instrument_boto3(client, service):
+    """Time every API call of a boto3 client, retries included"""
+    events = client.meta.events
+    events.register('before-call', _boto_before_call, unique_id='metrics-before-call')
+    events.register(
+        'after-call',
+        lambda context, **kwargs: _boto_after_call(context, service, 'ok'),
+        unique_id='metrics-after-call',
+    )
+    events.register(
+        'after-call-error',
+        lambda context, **kwargs: _boto_after_call(context, service, 'error'),
+        unique_id='metrics-after-call-error',
+    )
+
+
+# Cross-process aggregation
+
+def _directory():
+    path = _metrics_settings().get('DIR')
+    if path:
+        os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _write_json(path, data):
+    temporary = f'{path}.{os.getpid()}.tmp'
+    with open(temporary, 'w') as f:
+        json.dump(data, f)
+    os.replace(temporary, path)
+
+
+def _read_json(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except ValueError:
+        logger.error(f"Ignoring unreadable metrics file {path}")
+        return {}
+
+
+@contextmanager
+def _directory_lock(path, mode):
+    with open(os.path.join(path, '.lock'), 'a') as lock:
+        fcntl.flock(lock, mode)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def flush():
+    """Write this process's histograms to its file in METRICS_SETTINGS['DIR']"""
+    if _process['pid'] != os.getpid():
+        return
+    try:
+        path = _directory()
+        if path:
+            _write_json(os.path.join(path, f"{_process['name']}.json"), snapshot())
+    except OSError as e:
+        logger.error(f"Could not write metrics: {str(e)}")
+
+
+def _flush_periodically():
+    while True:
+        time.sleep(_metrics_settings().get('FLUSH_INTERVAL', 5))
+        flush()
+
+
+def _start_flusher():
+    with _lock:
+        if _process['pid'] == os.getpid():
+            return
+        if _process['pid'] is not None:
+            # Forked after recording: the parent reports those observations
+            _histograms.clear()
+        _process['pid'] = os.getpid()
+        _process['name'] = f'{socket.gethostname()}-{os.getpid()}-{int(time.time())}'
+    threading.Thread(target=_flush_periodically, name='metrics-flusher', daemon=True).start()
+    atexit.register(flush)
+
+
+def _is_exited(file_name):
+    """Whether the file belongs to a process on this host that is no longer running"""
+    host, _, rest = file_name[:-len('.json')].rpartition('-')[0].rpartition('-')
+    if host != socket.gethostname():
+        return False
+    try:
+        os.kill(int(rest), 0)
+    except ProcessLookupError:
+        return True
+    except (PermissionError, ValueError):
+        return False
+    return False
+
+
+def _retire(path, file_names):
+    with _directory_lock(path, fcntl.LOCK_EX):
+        retired_path = os.path.join(path, RETIRED_FILE)
+        retired = _read_json(retired_path)
+        for file_name in file_names:
+            merge(retired, _read_json(os.path.join(path, file_name)))
+        _write_json(retired_path, retired)
+        for file_name in file_names:
+            os.unlink(os.path.join(path, file_name))
+
+
+def collect():
+    """Histograms of every process sharing METRICS_SETTINGS['DIR'], merged"""
+    flush()
+    path = _directory()
+    if not path:
+        return snapshot()
+    file_names = [
+        name for name in os.listdir(path)
+        if name.endswith('.json') and name != RETIRED_FILE
+    ]
+    exited = [name for name in file_names if _is_exited(name)]
+    if exited:
+        _retire(path, exited)
+    total = {}
+    with _directory_lock(path, fcntl.LOCK_SH):
+        for name in os.listdir(path):
+            if name.endswith('.json'):
+                merge(total, _read_json(os.path.join(path, name)))
+    return total
+
+
+# Exposition
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels) + '}'
+
+
+def render(data):
+    """Merged histograms in the Prometheus text exposition format (0.0.4)"""
+    lines = []
+    for name, (help_text, buckets) in METRICS.items():
+        series = data.get(name)
+        if not series:
+            continue
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} histogram')
+        for labels_json, values in sorted(series.items()):
+            labels = [tuple(pair) for pair in json.loads(labels_json)]
+            cumulative = 0
+            for bound, count in zip(buckets, values):
+                cumulative += count
+                lines.append(f"{name}_bucket{_format_labels(labels + [('le', float(bound))])} {cumulative}")
+            count = cumulative + values[len(buckets)]
+            lines.append(f"{name}_bucket{_format_labels(labels + [('le', '+Inf')])} {count}")
+            lines.append(f'{name}_sum{_format_labels(labels)} {values[-1]}')
+            lines.append(f'{name}_count{_format_labels(labels)} {count}')
+    return '\n'.join(lines) + '\n'
+
+
+def is_internal_request(request):
+    options = _metrics_settings()
+    token = options.get('TOKEN')
+    authorization = request.META.get('HTTP_AUTHORIZATION', '')
+    if token and authorization.startswith('Bearer '):
+        return constant_time_compare(authorization[len('Bearer '):], token)
+    # Anything nginx forwarded came from outside, whatever the socket address says
+    if 'HTTP_X_FORWARDED_FOR' in request.META or 'HTTP_X_REAL_IP' in request.META:
+        return False
+    try:
+        address = ipaddress.ip_address(request.META.get('REMOTE_ADDR', ''))
+    except ValueError:
+        return False
+    return any(address in ipaddress.ip_network(network) for network in options.get('ALLOWED_NETWORKS', []))
+
+
+def metrics_view(request):
+    if not is_internal_request(request):
+        return HttpResponseForbidden()
+    return HttpResponse(render(collect()), content_type=CONTENT_TYPE)
+
+
+# Middleware
+
+def _view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    return match._func_path if match is not None else 'unmatched'
+
+
+class MetricsMiddleware:
+    """Record latency, queries, database time and external time per view"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not _metrics_settings().get('ENABLED', True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        # Connections opened before this module was loaded missed connection_created
+        for connection in connections.all(initialized_only=True):
+            instrument_connection(connection)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        current = _RequestMetrics()
+        token = _current.set(current)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        self.record(request, response, current, time.perf_counter() - started)
+        return response
+
+    async def __acall__(self, request):
+        current = _RequestMetrics()
+        token = _current.set(current)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        self.record(request, response, current, time.perf_counter() - started)
+        return response
+
+    def record(self, request, response, current, seconds):
+        view = _view_name(request)
+        method = request.method
+        observe('amupay_request_duration_seconds', seconds, view=view, method=method, status=response.status_code)
+        observe('amupay_request_queries', current.queries, view=view, method=method)
+        observe('amupay_request_db_seconds', current.db_seconds, view=view, method=method)
+        observe('amupay_request_external_seconds', current.external_seconds, view=view, method=method)
+        if seconds >= _metrics_settings().get('SLOW_REQUEST_SECONDS', 2.0):
+            logger.warning(
+                f"Slow request {method} {request.path} ({view}) {response.status_code}: "
+                f"{seconds:.3f}s, {current.queries} queries in {current.db_seconds:.3f}s, "
+                f"{current.external_seconds:.3f}s in external calls"
+            )
@@ -0,0 +1,374 @@
+"""
+On-demand profiling of single requests.
+
+A request carrying `X-Profile-Token: <token>` runs under cProfile with every
+SQL statement captured. The response gets an `X-Profile-Id` header and the
+report is stored under PROFILING_SETTINGS['DIR']:
+
+    <id>.json   the request, the slowest functions by cumulative time, every
+                statement with its duration, the statements repeated most,
+                and EXPLAIN plans of the slowest SELECTs
+    <id>.prof   the raw cProfile stats, for snakeviz or pstats
+
+Tokens are signed with SECRET_KEY and expire; an admin issues one with
+`manage.py profiling_token --issued-by <name>`, and it is valid for any user's
+requests, so a slow screen can be replayed with the saraf's own JWT. Requests
+without the header only pay for one dict lookup; an invalid or expired token
+is logged and the request is served without profiling.
+
+GET /profiles/ lists the stored reports and /profiles/<id>.json or
+/profiles/<id>.prof downloads one. Staff users signed in to the admin see
+every report; a caller sending a valid token sees only the reports made with
+that same token. Reports contain SQL parameters (phone numbers, balances, OTP
+rows), so treat them as customer data: nginx does not proxy /profiles/, and
+DIR must be shared by all workers that serve it.
+"""
+
+import cProfile
+import hashlib
+import io
+import json
+import logging
+import os
+import pstats
+import re
+import time
+import uuid
+from collections import Counter
+from contextlib import ExitStack
+from datetime import datetime, timezone
+
+from asgiref.sync import async_to_sync, iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core import signing
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DatabaseError, connections
+from django.http import FileResponse, Http404, HttpResponseForbidden, JsonResponse
+from django.urls import reverse
+
+logger = logging.getLogger(__name__)
+
+HEADER = 'HTTP_X_PROFILE_TOKEN'
+TOKEN_SALT = 'utils.profiling'
+# Functions listed in the report, by cumulative time
+TOP_FUNCTIONS = 40
+# Longest parameter repr kept per statement
+MAX_PARAMS_LENGTH = 500
+PROFILE_ID = re.compile(r'^\d{8}-\d{6}-[0-9a-f]{8}$')
+
+
+def _profiling_settings():
+    return getattr(settings, 'PROFILING_SETTINGS', {})
+
+
+def _directory():
+    return _profiling_settings().get('DIR')
+
+
+# Tokens
+
+def issue_token(issued_by, seconds=3600):
+    """A token that triggers profiling for `seconds`"""
+    return signing.dumps({'by': issued_by, 'exp': int(time.time() + seconds)}, salt=TOKEN_SALT)
+
+
+def verify_token(token):
+    """The name the token was issued to, or None if it is invalid or expired"""
+    try:
+        data = signing.loads(token, salt=TOKEN_SALT)
+    except signing.BadSignature:
+        return None
+    if not isinstance(data, dict) or data.get('exp', 0) < time.time():
+        return None
+    return data.get('by') or 'unknown'
+
+
+def token_fingerprint(token):
+    """Stored with each report instead of the token, to match it to later downloads"""
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+# SQL capture
+
+class SQLCapture:
+    """Every statement run on any database connection of this thread while active"""
+
+    def __init__(self):
+        self.queries = []
+        self._stack = None
+
+    def __enter__(self):
+        self._stack = ExitStack()
+        for alias in connections:
+            self._stack.enter_context(connections[alias].execute_wrapper(self._wrapper(alias)))
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stack.close()
+        return False
+
+    def _wrapper(self, alias):
+        def record(execute, sql, params, many, context):
+            started = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                self.queries.append({
+                    'alias': alias,
+                    'sql': sql,
+                    'params': params,
+                    'many': many,
+                    'seconds': time.perf_counter() - started,
+                })
+        return record
+
+
+def explain(query):
+    """The query plan lines of a captured SELECT, or an error message"""
+    connection = connections[query['alias']]
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(f"{connection.ops.explain_query_prefix()} {query['sql']}", query['params'])
+            return [' '.join(str(column) for column in row) for row in cursor.fetchall()]
+    except DatabaseError as e:
+        return [f'EXPLAIN failed: {e}']
+
+
+def _params_repr(params):
+    text = repr(params)
+    return text if len(text) <= MAX_PARAMS_LENGTH else text[:MAX_PARAMS_LENGTH] + '...'
+
+
+def sql_report(queries, explain_slowest=5):
+    slowest = sorted(range(len(queries)), key=lambda index: queries[index]['seconds'], reverse=True)
+    explained = [
+        index for index in slowest
+        if not queries[index]['many'] and queries[index]['sql'].lstrip().upper().startswith('SELECT')
+    ][:explain_slowest]
+    repeated = Counter(query['sql'] for query in queries)
+    return {
+        'count': len(queries),
+        'seconds': round(sum(query['seconds'] for query in queries), 6),
+        'repeated': [
+            {'sql': sql, 'count': count} for sql, count in repeated.most_common(10) if count > 1
+        ],
+        'slowest': [
+            {
+                'index': index,
+                'seconds': round(queries[index]['seconds'], 6),
+                'sql': queries[index]['sql'],
+                'explain': explain(queries[index]),
+            }
+            for index in explained
+        ],
+        'queries': [
+            {
+                'alias': query['alias'],
+                'seconds': round(query['seconds'], 6),
+                'sql': query['sql'],
+                'params': _params_repr(query['params']),
+            }
+            for query in queries
+        ],
+    }
+
+
+def function_report(profiler, limit=TOP_FUNCTIONS):
+    stats = pstats.Stats(profiler, stream=io.StringIO())
+    rows = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)[:limit]
+    return {
+        'total_calls': stats.total_calls,
+        'seconds': round(stats.total_tt, 6),
+        'functions': [
+            {
+                'function': f'{file_name}:{line}({name})',
+                'calls': calls,
+                'primitive_calls': primitive_calls,
+                'own_seconds': round(own_seconds, 6),
+                'cumulative_seconds': round(cumulative_seconds, 6),
+            }
+            for (file_name, line, name), (primitive_calls, calls, own_seconds, cumulative_seconds, _) in rows
+        ],
+    }
+
+
+# Storage
+
+def save_report(report, profiler):
+    """Write <id>.json and <id>.prof, drop the oldest beyond KEEP, and return the id"""
+    path = _directory()
+    os.makedirs(path, exist_ok=True)
+    profile_id = f"{datetime.now(timezone.utc):%Y%m%d-%H%M%S}-{uuid.uuid4().hex[:8]}"
+    report['id'] = profile_id
+    profiler.dump_stats(os.path.join(path, f'{profile_id}.prof'))
+    temporary = os.path.join(path, f'.{profile_id}.json')
+    with open(temporary, 'w') as f:
+        json.dump(report, f, indent=1, default=str)
+    os.replace(temporary, os.path.join(path, f'{profile_id}.json'))
+
+    stored = stored_profile_ids()
+    for old_id in stored[:max(len(stored) - _profiling_settings().get('KEEP', 100), 0)]:
+        for extension in ('json', 'prof'):
+            try:
+                os.unlink(os.path.join(path, f'{old_id}.{extension}'))
+            except FileNotFoundError:
+                pass
+    return profile_id
+
+
+def stored_profile_ids():
+    """Ids of the stored reports, oldest first"""
+    path = _directory()
+    if not path or not os.path.isdir(path):
+        return []
+    return sorted(
+        name[:-len('.json')] for name in os.listdir(path)
+        if name.endswith('.json') and PROFILE_ID.match(name[:-len('.json')])
+    )
+
+
+# Middleware
+
+class ProfilingMiddleware:
+    """Profile requests that carry a valid X-Profile-Token header"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not _profiling_settings().get('ENABLED', True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if HEADER not in request.META:
+            return self.get_response(request)
+        return self.profile(request, self.get_response)
+
+    async def __acall__(self, request):
+        if HEADER not in request.META:
+            return await self.get_response(request)
+        # cProfile only sees its own thread. Profile on a worker thread that
+        # drives the rest of the chain; sync views run on that same thread.
+        return await sync_to_async(self.profile_in_thread, thread_sensitive=False)(
+            request, async_to_sync(self.get_response)
+        )
+
+    def profile_in_thread(self, request, get_response):
+        try:
+            return self.profile(request, get_response)
+        finally:
+            connections.close_all()
+
+    def profile(self, request, get_response):
+        # Downloading reports sends the token too
+        if request.path.startswith(reverse('profiles')):
+            return get_response(request)
+        issued_by = verify_token(request.META[HEADER])
+        if issued_by is None:
+            logger.warning(f"Ignoring an invalid or expired profiling token on {request.method} {request.path}")
+            return get_response(request)
+
+        profiler = cProfile.Profile()
+        capture = SQLCapture()
+        started = time.perf_counter()
+        with capture:
+            profiler.enable()
+            try:
+                response = get_response(request)
+            finally:
+                profiler.disable()
+        seconds = time.perf_counter() - started
+
+        match = getattr(request, 'resolver_match', None)
+        report = {
+            'created_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'issued_by': issued_by,
+            'token': token_fingerprint(request.META[HEADER]),
+            'method': request.method,
+            'path': request.path,
+            'query_string': request.META.get('QUERY_STRING', ''),
+            'view': match._func_path if match is not None else None,
+            'status': response.status_code,
+            'seconds': round(seconds, 6),
+            'profile': function_report(profiler),
+            'sql': sql_report(capture.queries, _profiling_settings().get('EXPLAIN_SLOWEST', 5)),
+        }
+        try:
+            profile_id = save_report(report, profiler)
+        except OSError as e:
+            logger.error(f"Could not store the profile of {request.method} {request.path}: {e}")
+            return response
+        logger.info(
+            f"Profiled {request.method} {request.path} for {issued_by}: {profile_id}, {seconds:.3f}s, "
+            f"{report['sql']['count']} queries"
+        )
+        response['X-Profile-Id'] = profile_id
+        return response
+
+
+# Download
+
+def report_reader(request):
+    """
+    Which reports the caller may read: 'staff' for all of them, the
+    fingerprint of a valid profiling token for those made with it, or None
+    """
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated and user.is_staff:
+        return 'staff'
+    token = request.META.get(HEADER)
+    if token and verify_token(token) is not None:
+        return token_fingerprint(token)
+    return None
+
+
+def load_report(profile_id):
+    try:
+        with open(os.path.join(_directory(), f'{profile_id}.json')) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def can_read(reader, report):
+    return reader == 'staff' or reader == report.get('token')
+
+
+def profiles_view(request):
+    reader = report_reader(request)
+    if reader is None:
+        return HttpResponseForbidden()
+    profiles = []
+    for profile_id in reversed(stored_profile_ids()):
+        report = load_report(profile_id)
+        if report is None or not can_read(reader, report):
+            continue
+        profiles.append({
+            key: report.get(key)
+            for key in ('id', 'created_at', 'issued_by', 'method', 'path', 'view', 'status', 'seconds')
+        } | {'queries': report.get('sql', {}).get('count')})
+    return JsonResponse({'profiles': profiles})
+
+
+def profile_view(request, profile_id, extension):
+    reader = report_reader(request)
+    if reader is None:
+        return HttpResponseForbidden()
+    if not PROFILE_ID.match(profile_id) or extension not in ('json', 'prof'):
+        raise Http404
+    report = load_report(profile_id)
+    if report is None or not can_read(reader, report):
+        raise Http404
+    path = os.path.join(_directory(), f'{profile_id}.{extension}')
+    if not os.path.exists(path):
+        raise Http404
+    return FileResponse(
+        open(path, 'rb'),
+        as_attachment=extension == 'prof',
+        filename=f'{profile_id}.{extension}',
+        content_type='application/json' if extension == 'json' else 'application/octet-stream',
+    )
@@ -0,0 +1,134 @@
+"""
+Query budgets for tests.
+
+query_budget(n) fails the test when the code inside it runs more than n
+queries, and lists them in the failure message:
+
+    with query_budget(6):
+        response = self.client.get('/api/hawala/history/')
+
+    @query_budget(3)
+    def test_...(self):
+
+ENDPOINT_BUDGETS is the registry of list endpoints and their budgets.
+utils.tests.EndpointQueryBudgetTests requests every entry against seeded data
+of two sizes: the count must be within the budget at both sizes and must not
+grow with the data, so an N+1 in a serializer fails the build even while it
+is still under budget. New list endpoints get an entry here.
+"""
+
+from contextlib import ContextDecorator
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test.utils import CaptureQueriesContext
+
+
+class QueryBudgetExceeded(AssertionError):
+    """More queries ran than the budget allows"""
+
+
+def format_queries(queries):
+    return '\n'.join(f"{number}. {query['sql']}" for number, query in enumerate(queries, start=1))
+
+
+class query_budget(ContextDecorator):
+    """Fail when more than `budget` queries run inside the block or decorated function"""
+
+    def __init__(self, budget, using=DEFAULT_DB_ALIAS, label=None):
+        self.budget = budget
+        self.using = using
+        self.label = label
+        self.capture = None
+
+    def __enter__(self):
+        self.capture = CaptureQueriesContext(connections[self.using])
+        self.capture.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.capture.__exit__(exc_type, exc_value, traceback)
+        if exc_type is None and len(self) > self.budget:
+            raise QueryBudgetExceeded(
+                f"{self.label or 'Block'} ran {len(self)} queries, budget is {self.budget}:\n"
+                f"{format_queries(self.queries)}"
+            )
+        return False
+
+    def __len__(self):
+        return len(self.capture) if self.capture is not None else 0
+
+    @property
+    def queries(self):
+        return self.capture.captured_queries if self.capture is not None else []
+
+
+class EndpointBudget:
+    """
+    A list endpoint and the most queries one request may run.
+
+    path is formatted with the ids of the seeded data (see
+    utils.tests.seed_budget_data), e.g. '/api/saraf/{saraf_id}/'. user is who
+    calls it: 'saraf', 'employee', 'normal_user' or None for anonymous.
+    params are the query string, or the JSON body for method='post'.
+    """
+
+    def __init__(self, path, budget, user='saraf', params=None, method='get'):
+        self.path = path
+        self.budget = budget
+        self.user = user
+        self.params = params or {}
+        self.method = method
+
+    def __repr__(self):
+        return f'<EndpointBudget {self.path} as {self.user}: {self.budget}>'
+
+
+ENDPOINT_BUDGETS = [
+    # saraf_account
+    EndpointBudget('/api/saraf/list/', 2, user=None),
+    EndpointBudget('/api/saraf/get-employees/', 2, user=None, params={'email': '{email}'}),
+    EndpointBudget('/api/saraf/employees/', 3),
+    EndpointBudget('/api/saraf/permissions/', 1),
+    EndpointBudget('/api/saraf/permissions/templates/', 1),
+    # saraf_social
+    EndpointBudget('/api/saraf-social/saraf/{saraf_id}/comments/', 5, user=None),
+    EndpointBudget('/api/saraf-social/saraf/stats/', 2, user=None),
+    EndpointBudget('/api/saraf-social/user/likes/', 4, user='normal_user'),
+    EndpointBudget('/api/saraf-social/user/comments/', 4, user='normal_user'),
+    # currency
+    EndpointBudget('/api/currency/available/', 3),
+    EndpointBudget('/api/currency/supported/', 3),
+    # saraf_balance
+    EndpointBudget('/api/balance/', 3),
+    # transaction
+    EndpointBudget('/api/transaction/', 3),
+    EndpointBudget('/api/transaction/', 4, user='employee'),
+    # hawala
+    EndpointBudget('/api/hawala/receive/', 5),
+    EndpointBudget('/api/hawala/history/', 5),
+    EndpointBudget('/api/hawala/history/', 5, user='employee'),
+    EndpointBudget('/api/hawala/list-all/', 5),
+    EndpointBudget('/api/hawala/supported-currencies/', 3),
+    EndpointBudget('/api/hawala/lookup-by-phone/', 2, user=None,
+                   params={'receiver_phone': '+93711111111'}, method='post'),
+    # msg
+    EndpointBudget('/api/messages/conversations/', 6),
+    EndpointBudget('/api/messages/messages/search/', 5, params={'q': 'Reply'}),
+    EndpointBudget('/api/messages/notifications/', 5),
+    EndpointBudget('/api/messages/normal-user/conversations/', 6, user='normal_user'),
+    EndpointBudget('/api/messages/normal-user/notifications/', 4, user='normal_user'),
+    # saraf_create_accounts
+    EndpointBudget('/api/saraf-create-accounts/list/', 3),
+    EndpointBudget('/api/saraf-create-accounts/{account_id}/transactions/', 4),
+    EndpointBudget('/api/saraf-create-accounts/{account_id}/balances/', 4),
+    EndpointBudget('/api/saraf-create-accounts/{account_id}/withdrawal-amounts/', 4),
+    EndpointBudget('/api/saraf-create-accounts/{account_id}/deposit-amounts/', 4),
+    EndpointBudget('/api/saraf-create-accounts/{exchanger_id}/given-amounts/', 4),
+    EndpointBudget('/api/saraf-create-accounts/{exchanger_id}/taken-amounts/', 4),
+    EndpointBudget('/api/saraf-create-accounts/public/transactions/{phone}/', 2, user=None),
+    EndpointBudget('/api/saraf-create-accounts/public/all-accounts/{shared_phone}/', 4, user=None),
+    # exchange
+    EndpointBudget('/api/exchange/', 4),
+    # saraf_post
+    EndpointBudget('/api/saraf-posts/', 3, user=None),
+]
@@ -0,0 +1,773 @@
+"""
+Deterministic, bulk-inserted datasets for benchmarks.
+
+ScaleDataGenerator builds sarafs with employees, customers and supported
+currencies, normal users, and then the high-volume tables: Transactions,
+CustomerTransactions, ExchangeTransactions, HawalaTransactions,
+conversations with messages and participant read/delivery state, and posts,
+likes and comments. It is run with `manage.py generate_scale_data`.
+
+Everything is inserted with bulk_create in chunks, each chunk in its own
+transaction, so model save() methods, validation and signals do not run.
+Whatever they would maintain is computed here instead:
+
+- balance_before/balance_after on Transactions and CustomerTransactions,
+  and the final SarafBalance and CustomerBalance rows
+- SarafSocialStats totals
+- the conversations' last-message columns and each participant's
+  watermarks and unread count
+
+Primary keys of the tables other rows point to are allocated up front from
+the table's current maximum, so foreign keys are plain integers and nothing
+is read back after an insert. The generator therefore expects to be the
+only writer while it runs.
+
+The same seed, counts and `until` date give the same rows. Every table draws
+from its own random stream, so changing one count leaves the other tables
+unchanged. Scale accounts use email addresses at SCALE_EMAIL_DOMAIN, which is
+how clear_scale_data finds them again.
+"""
+
+import logging
+import random
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.color import no_style
+from django.db import DEFAULT_DB_ALIAS, connections, models, transaction
+from django.db.models import Q
+
+logger = logging.getLogger(__name__)
+
+SCALE_EMAIL_DOMAIN = 'scale.invalid'
+# Also the password of every generated saraf, employee and normal user
+SCALE_PASSWORD = 'Scale-data-1'
+
+# Rows at scale 1, about 5.8 million in total. Scale 2 is a 10M-row dataset
+DEFAULT_COUNTS = {
+    'sarafs': 1000,
+    'employees_per_saraf': 3,
+    'customer_accounts_per_saraf': 20,
+    'users': 20000,
+    'transactions': 1000000,
+    'customer_transactions': 1000000,
+    'exchanges': 500000,
+    'hawalas': 1000000,
+    'conversations': 50000,
+    'messages_per_conversation': 20,
+    'posts': 20000,
+    'likes': 100000,
+    'comments': 100000,
+}
+# Counts that describe each saraf or conversation rather than a table size
+PER_PARENT_COUNTS = {'employees_per_saraf', 'customer_accounts_per_saraf', 'messages_per_conversation'}
+
+# Used when the database has no active currencies yet
+BASE_CURRENCIES = [
+    ('USD', 'US Dollar', 'دالر امریکایی', '$'),
+    ('AFN', 'Afghan Afghani', 'افغانی', '؋'),
+    ('EUR', 'Euro', 'یورو', '€'),
+    ('PKR', 'Pakistani Rupee', 'کلدار پاکستانی', '₨'),
+    ('IRR', 'Iranian Rial', 'ریال ایران', '﷼'),
+    ('AED', 'UAE Dirham', 'درهم امارات', 'د.إ'),
+    ('GBP', 'British Pound', 'پوند انگلیس', '£'),
+    ('TRY', 'Turkish Lira', 'لیره ترکیه', '₺'),
+]
+
+PROVINCES = ['Kabul', 'Herat', 'Kandahar', 'Balkh', 'Nangarhar', 'Kunduz', 'Ghazni', 'Bamyan']
+FIRST_NAMES = ['Ahmad', 'Mohammad', 'Ali', 'Hassan', 'Omar', 'Nasir', 'Farid', 'Jawid', 'Sara', 'Fatima',
+               'Mariam', 'Laila', 'Zainab', 'Shabnam', 'Parwana', 'Nargis']
+LAST_NAMES = ['Karimi', 'Noori', 'Aziz', 'Hussain', 'Khan', 'Shah', 'Ahmadi', 'Rahimi', 'Sultani', 'Hashimi']
+MESSAGE_TEXTS = [
+    'Salam, what is your USD rate today?',
+    'The hawala has been paid to the receiver.',
+    'Please confirm the amount before sending.',
+    'Can you take 5000 AFN for Herat?',
+    'Rates updated, check the latest post.',
+    'Thank you, received.',
+]
+
+
+def scale_counts(scale=1.0, **overrides):
+    """DEFAULT_COUNTS multiplied by scale (per-parent counts stay as they are), then overrides"""
+    counts = {
+        name: value if name in PER_PARENT_COUNTS else max(int(value * scale), 1)
+        for name, value in DEFAULT_COUNTS.items()
+    }
+    counts.update({name: value for name, value in overrides.items() if value is not None})
+    return counts
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+@contextmanager
+def explicit_timestamps(*model_classes):
+    """
+    Let bulk_create store the given created_at/updated_at values instead of now.
+    auto_now and auto_now_add are switched off on the model fields for the whole
+    process while this is active.
+    """
+    fields = [
+        field
+        for model in model_classes
+        for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)
+    ]
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+class ScaleDataGenerator:
+    """Generate one dataset; see the module docstring"""
+
+    def __init__(self, counts, seed=0, until=None, days=365, chunk_size=5000, using=DEFAULT_DB_ALIAS, log=None):
+        from django.utils import timezone
+
+        self.counts = counts
+        self.seed = seed
+        until = until or timezone.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        self.start = until - timedelta(days=days)
+        self.span = (until - self.start).total_seconds()
+        self.chunk_size = chunk_size
+        self.using = using
+        self.log = log or logger.info
+        self.inserted = {}
+        self.password_hash = make_password(SCALE_PASSWORD, salt=f'scale{seed}')
+
+    def random(self, table):
+        """The random stream of one table"""
+        return random.Random(f'{self.seed}:{table}')
+
+    def moment(self, index, total, rng):
+        """A time in the dataset's window; grows with index so running balances follow time"""
+        step = self.span / max(total, 1)
+        return self.start + timedelta(seconds=index * step + rng.random() * step)
+
+    def amount(self, rng, low=10, high=100000):
+        return Decimal(rng.randrange(low * 100, high * 100)) / 100
+
+    def name(self, rng):
+        return f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}'
+
+    def next_id(self, model):
+        highest = model.objects.using(self.using).aggregate(highest=models.Max('pk'))['highest']
+        return (highest or 0) + 1
+
+    def insert(self, model, rows, report=True):
+        """bulk_create rows (any iterable of unsaved instances) in chunks"""
+        started = time.monotonic()
+        count = 0
+        for chunk in chunked(rows, self.chunk_size):
+            with transaction.atomic(using=self.using):
+                model.objects.using(self.using).bulk_create(chunk, batch_size=self.chunk_size)
+            count += len(chunk)
+        label = model._meta.label
+        self.inserted[label] = self.inserted.get(label, 0) + count
+        if report:
+            self.report(label, count, time.monotonic() - started)
+
+    def report(self, label, count, elapsed):
+        self.log(f'{label}: {count} rows in {elapsed:.1f}s ({count / max(elapsed, 1e-9):.0f} rows/s)')
+
+    def generate(self):
+        from currency.models import Currency, SarafSupportedCurrency
+        from exchange.models import ExchangeTransaction
+        from hawala.models import HawalaTransaction
+        from msg.models import Conversation, ConversationParticipant, Message
+        from normal_user_account.models import NormalUser
+        from saraf_account.models import AmuPayCode, SarafAccount, SarafEmployee
+        from saraf_balance.models import SarafBalance
+        from saraf_create_accounts.models import CustomerBalance, CustomerTransaction, SarafCustomerAccount
+        from saraf_post.models import SarafPost
+        from saraf_social.models import SarafComment, SarafLike, SarafSocialStats
+        from transaction.models import Transaction
+
+        timestamped = [
+            Currency, SarafSupportedCurrency, ExchangeTransaction, HawalaTransaction, Conversation,
+            ConversationParticipant, Message, NormalUser, AmuPayCode, SarafAccount, SarafEmployee, SarafBalance,
+            CustomerBalance, CustomerTransaction, SarafCustomerAccount, SarafPost, SarafComment, SarafLike,
+            SarafSocialStats, Transaction,
+        ]
+        started = time.monotonic()
+        with explicit_timestamps(*timestamped):
+            self.generate_currencies()
+            self.generate_sarafs()
+            self.generate_users()
+            self.generate_transactions()
+            self.generate_customer_accounts()
+            self.generate_customer_transactions()
+            self.generate_balances()
+            self.generate_exchanges()
+            self.generate_hawalas()
+            self.generate_conversations()
+            self.generate_social()
+        self.reset_sequences([SarafAccount, SarafEmployee, NormalUser, SarafCustomerAccount, Conversation, Message])
+
+        from currency.registry import invalidate_currency_registry, invalidate_supported_currencies
+        invalidate_currency_registry()
+        # bulk_create skips the signal that drops each saraf's cached supported currencies
+        for saraf_id in self.saraf_ids:
+            invalidate_supported_currencies(saraf_id)
+        self.log(f'{sum(self.inserted.values())} rows in {time.monotonic() - started:.1f}s')
+        return self.inserted
+
+    def reset_sequences(self, model_classes):
+        """Point the id sequences past the ids we allocated (needed on PostgreSQL)"""
+        connection = connections[self.using]
+        statements = connection.ops.sequence_reset_sql(no_style(), model_classes)
+        if statements:
+            with connection.cursor() as cursor:
+                for statement in statements:
+                    cursor.execute(statement)
+
+    def generate_currencies(self):
+        from currency.models import Currency
+
+        currencies = Currency.objects.using(self.using).filter(is_active=True).order_by('currency_code')
+        if currencies.count() < 2:
+            # Exchanges need two currencies; add the common ones that are missing
+            existing = set(Currency.objects.using(self.using).values_list('currency_code', flat=True))
+            self.insert(Currency, (
+                Currency(
+                    currency_code=code, currency_name=name, currency_name_local=local, symbol=symbol,
+                    is_active=True, created_at=self.start, updated_at=self.start,
+                )
+                for code, name, local, symbol in BASE_CURRENCIES
+                if code not in existing
+            ))
+        self.currencies = list(currencies.all())
+
+    def generate_sarafs(self):
+        from currency.models import SarafSupportedCurrency
+        from saraf_account.models import DEFAULT_EMPLOYEE_PERMISSIONS, AmuPayCode, SarafAccount, SarafEmployee
+
+        rng = self.random('sarafs')
+        count = self.counts['sarafs']
+        first_id = self.next_id(SarafAccount)
+        self.saraf_ids = list(range(first_id, first_id + count))
+        self.saraf_names = {}
+        self.saraf_currencies = {}
+        sarafs = []
+        for index, saraf_id in enumerate(self.saraf_ids):
+            self.saraf_names[saraf_id] = self.name(rng)
+            self.saraf_currencies[saraf_id] = rng.sample(self.currencies, min(4, len(self.currencies)))
+            created_at = self.start + timedelta(seconds=rng.random() * self.span / 10)
+            sarafs.append(SarafAccount(
+                saraf_id=saraf_id,
+                full_name=self.saraf_names[saraf_id],
+                exchange_name=f'{self.saraf_names[saraf_id]} Exchange {index}',
+                email=f'saraf{index}@{SCALE_EMAIL_DOMAIN}',
+                email_or_whatsapp_number=f'+9370{index:07d}',
+                license_no=f'SCALE-{self.seed}-{index}',
+                amu_pay_code=self.amu_pay_code(index),
+                saraf_address=f'Street {rng.randrange(1, 200)}',
+                province=rng.choice(PROVINCES),
+                password_hash=self.password_hash,
+                is_email_verified=True,
+                is_active=True,
+                created_at=created_at,
+                updated_at=created_at,
+            ))
+        self.insert(SarafAccount, sarafs)
+        self.insert(AmuPayCode, (
+            AmuPayCode(
+                code=saraf.amu_pay_code, description='Scale data', is_used=True, used_by_id=saraf.saraf_id,
+                created_at=saraf.created_at, used_at=saraf.created_at, created_by='generate_scale_data',
+            )
+            for saraf in sarafs
+        ))
+        self.insert(SarafSupportedCurrency, (
+            SarafSupportedCurrency(
+                saraf_account_id=saraf.saraf_id, currency_id=currency.pk, is_active=True,
+                added_at=saraf.created_at, added_by_saraf_id=saraf.saraf_id,
+            )
+            for saraf in sarafs
+            for currency in self.saraf_currencies[saraf.saraf_id]
+        ))
+
+        per_saraf = self.counts['employees_per_saraf']
+        employee_id = self.next_id(SarafEmployee)
+        self.employees = defaultdict(list)
+        employees = []
+        for saraf in sarafs:
+            for number in range(per_saraf):
+                name = self.name(rng)
+                self.employees[saraf.saraf_id].append((employee_id, name))
+                employees.append(SarafEmployee(
+                    employee_id=employee_id, saraf_account_id=saraf.saraf_id, username=f'employee{number}',
+                    full_name=name, password_hash=self.password_hash,
+                    permissions=dict(DEFAULT_EMPLOYEE_PERMISSIONS), is_active=True,
+                    created_at=saraf.created_at, updated_at=saraf.created_at,
+                ))
+                employee_id += 1
+        self.insert(SarafEmployee, employees)
+
+    def amu_pay_code(self, index):
+        """12 characters, 4 letters + 4 digits + 4 letters, unique per index"""
+        letters = ''
+        value = index // 10000
+        for _ in range(4):
+            value, remainder = divmod(value, 26)
+            letters += chr(ord('A') + remainder)
+        return f'SCAL{index % 10000:04d}{letters}'
+
+    def generate_users(self):
+        from normal_user_account.models import NormalUser
+
+        rng = self.random('users')
+        count = self.counts['users']
+        first_id = self.next_id(NormalUser)
+        self.user_ids = list(range(first_id, first_id + count))
+        self.user_names = {}
+
+        def users():
+            for index, user_id in enumerate(self.user_ids):
+                self.user_names[user_id] = self.name(rng)
+                created_at = self.moment(index, count, rng)
+                yield NormalUser(
+                    user_id=user_id, full_name=self.user_names[user_id],
+                    email=f'user{index}@{SCALE_EMAIL_DOMAIN}', email_or_whatsapp=f'+9379{index:08d}',
+                    password_hash=self.password_hash, is_email_verified=True, is_active=True,
+                    created_at=created_at, updated_at=created_at,
+                )
+
+        self.insert(NormalUser, users())
+
+    def performer(self, rng, saraf_id):
+        """(user_id, user_type, full_name, employee_id, employee_name) of the saraf or one of its employees"""
+        employees = self.employees[saraf_id]
+        if employees and rng.random() < 0.6:
+            employee_id, name = rng.choice(employees)
+            return employee_id, 'employee', name, employee_id, name
+        return saraf_id, 'saraf', self.saraf_names[saraf_id], None, None
+
+    def generate_transactions(self):
+        from transaction.models import Transaction
+
+        rng = self.random('transactions')
+        count = self.counts['transactions']
+        # Running saraf balances: (saraf_id, currency_id) -> [balance, deposits, withdrawals, count]
+        self.saraf_balances = defaultdict(lambda: [Decimal('0'), Decimal('0'), Decimal('0'), 0])
+
+        def transactions():
+            for index in range(count):
+                saraf_id = rng.choice(self.saraf_ids)
+                currency = rng.choice(self.saraf_currencies[saraf_id])
+                balance = self.saraf_balances[saraf_id, currency.pk]
+                amount = self.amount(rng)
+                transaction_type = 'withdrawal' if rng.random() < 0.4 and balance[0] >= amount else 'deposit'
+                before = balance[0]
+                if transaction_type == 'deposit':
+                    balance[0] += amount
+                    balance[1] += amount
+                else:
+                    balance[0] -= amount
+                    balance[2] += amount
+                balance[3] += 1
+                user_id, user_type, full_name, employee_id, employee_name = self.performer(rng, saraf_id)
+                created_at = self.moment(index, count, rng)
+                yield Transaction(
+                    saraf_account_id=saraf_id, currency_id=currency.pk, transaction_type=transaction_type,
+                    amount=amount, description=f'{transaction_type.title()} {index}',
+                    performer_user_id=user_id, performer_user_type=user_type, performer_full_name=full_name,
+                    performer_employee_id=employee_id, performer_employee_name=employee_name,
+                    balance_before=before, balance_after=balance[0],
+                    created_at=created_at, updated_at=created_at,
+                )
+
+        self.insert(Transaction, transactions())
+
+    def generate_customer_accounts(self):
+        from saraf_create_accounts.models import SarafCustomerAccount
+
+        rng = self.random('customer_accounts')
+        per_saraf = self.counts['customer_accounts_per_saraf']
+        # People bank with several sarafs, so phones repeat across (never within) sarafs
+        people = max(len(self.saraf_ids) * per_saraf * 7 // 10, per_saraf)
+        account_id = self.next_id(SarafCustomerAccount)
+        self.customer_accounts = []
+        accounts = []
+        for saraf_id in self.saraf_ids:
+            for person in rng.sample(range(people), per_saraf):
+                account_type = 'exchanger' if rng.random() < 0.2 else 'customer'
+                created_at = self.start + timedelta(seconds=rng.random() * self.span / 5)
+                self.customer_accounts.append((account_id, saraf_id, account_type))
+                accounts.append(SarafCustomerAccount(
+                    account_id=account_id, saraf_account_id=saraf_id, account_number=f'S{account_id:012d}',
+                    full_name=self.name(rng), account_type=account_type, phone=f'07{person:08d}',
+                    address=rng.choice(PROVINCES), job='Trader' if account_type == 'exchanger' else 'Shopkeeper',
+                    is_active=True, created_at=created_at, updated_at=created_at,
+                ))
+                account_id += 1
+        self.insert(SarafCustomerAccount, accounts)
+
+    def generate_customer_transactions(self):
+        from saraf_create_accounts.models import CustomerTransaction
+
+        rng = self.random('customer_transactions')
+        count = self.counts['customer_transactions']
+        self.customer_balances = defaultdict(lambda: [Decimal('0'), Decimal('0'), Decimal('0'), 0])
+
+        def customer_transactions():
+            for index in range(count):
+                account_id, saraf_id, account_type = rng.choice(self.customer_accounts)
+                currency = rng.choice(self.saraf_currencies[saraf_id])
+                if account_type == 'exchanger':
+                    transaction_type = rng.choice(['give_money', 'take_money'])
+                else:
+                    transaction_type = 'withdrawal' if rng.random() < 0.4 else 'deposit'
+                amount = self.amount(rng)
+                # The same bookkeeping as CustomerTransaction.save()
+                balance = self.customer_balances[account_id, currency.pk]
+                before = balance[0]
+                if transaction_type in ('deposit', 'give_money'):
+                    balance[0] += amount
+                    balance[1] += amount
+                else:
+                    balance[0] -= amount
+                    balance[2] += amount
+                balance[3] += 1
+                saraf_balance = self.saraf_balances[saraf_id, currency.pk]
+                if transaction_type in ('deposit', 'take_money'):
+                    saraf_balance[0] += amount
+                    saraf_balance[1] += amount
+                else:
+                    saraf_balance[0] -= amount
+                    saraf_balance[2] += amount
+                saraf_balance[3] += 1
+                user_id, user_type, full_name, employee_id, employee_name = self.performer(rng, saraf_id)
+                created_at = self.moment(index, count, rng)
+                yield CustomerTransaction(
+                    customer_account_id=account_id, currency_id=currency.pk, transaction_type=transaction_type,
+                    amount=amount, description=f'{transaction_type.replace("_", " ").title()} {index}',
+                    performer_user_id=user_id, performer_user_type=user_type, performer_full_name=full_name,
+                    performer_employee_id=employee_id, performer_employee_name=employee_name,
+                    balance_before=before, balance_after=balance[0],
+                    created_at=created_at, updated_at=created_at,
+                )
+
+        self.insert(CustomerTransaction, customer_transactions())
+
+    def generate_balances(self):
+        from saraf_balance.models import SarafBalance
+        from saraf_create_accounts.models import CustomerBalance
+
+        until = self.start + timedelta(seconds=self.span)
+        self.insert(SarafBalance, (
+            SarafBalance(
+                saraf_account_id=saraf_id, currency_id=currency_id, balance=balance, total_deposits=deposits,
+                total_withdrawals=withdrawals, transaction_count=transactions, created_at=self.start,
+                last_updated=until,
+            )
+            for (saraf_id, currency_id), (balance, deposits, withdrawals, transactions) in sorted(
+                self.saraf_balances.items())
+        ))
+        self.insert(CustomerBalance, (
+            CustomerBalance(
+                customer_account_id=account_id, currency_id=currency_id, balance=balance,
+                total_deposits=deposits, total_withdrawals=withdrawals, transaction_count=transactions,
+                created_at=self.start, updated_at=until,
+            )
+            for (account_id, currency_id), (balance, deposits, withdrawals, transactions) in sorted(
+                self.customer_balances.items())
+        ))
+
+    def generate_exchanges(self):
+        from exchange.models import ExchangeTransaction
+
+        rng = self.random('exchanges')
+        count = self.counts['exchanges']
+        accounts_by_saraf = defaultdict(list)
+        for account_id, saraf_id, account_type in self.customer_accounts:
+            accounts_by_saraf[saraf_id].append((account_id, account_type))
+
+        def exchanges():
+            for index in range(count):
+                saraf_id = rng.choice(self.saraf_ids)
+                sell, buy = rng.sample(self.currencies, 2)
+                sell_amount = self.amount(rng)
+                rate = Decimal(rng.randrange(1, 10000000)) / 10000
+                transaction_type = rng.choice(['customer', 'customer', 'exchanger', 'person'])
+                account_id = None
+                name = self.name(rng)
+                if transaction_type != 'person' and accounts_by_saraf[saraf_id]:
+                    account_id, _ = rng.choice(accounts_by_saraf[saraf_id])
+                user_id, user_type, _, employee_id, _ = self.performer(rng, saraf_id)
+                transaction_date = self.moment(index, count, rng)
+                yield ExchangeTransaction(
+                    name=name, transaction_type=transaction_type, sell_currency=sell.currency_code,
+                    sell_amount=sell_amount, buy_currency=buy.currency_code,
+                    buy_amount=(sell_amount * rate).quantize(Decimal('0.01')) or Decimal('0.01'), rate=rate,
+                    transaction_date=transaction_date, saraf_account_id=saraf_id, customer_account_id=account_id,
+                    performed_by_saraf_id=saraf_id if user_type == 'saraf' else None,
+                    performed_by_employee_id=employee_id, created_at=transaction_date, updated_at=transaction_date,
+                )
+
+        self.insert(ExchangeTransaction, exchanges())
+
+    def generate_hawalas(self):
+        from hawala.models import HawalaTransaction
+
+        rng = self.random('hawalas')
+        count = self.counts['hawalas']
+
+        def hawalas():
+            for index in range(count):
+                saraf_id = rng.choice(self.saraf_ids)
+                currency = rng.choice(self.saraf_currencies[saraf_id])
+                created_at = self.moment(index, count, rng)
+                mode = rng.choices(['internal', 'external_sender', 'external_receiver'], [7, 2, 1])[0]
+                destination_id = rng.choice(self.saraf_ids) if mode == 'internal' else None
+                # Older hawalas are further along
+                age = 1 - index / count
+                status = rng.choices(['pending', 'sent', 'received', 'completed'], [1, 1, 1 + 3 * age, 1 + 6 * age])[0]
+                sent_at = created_at + timedelta(minutes=rng.randrange(1, 60)) if status != 'pending' else None
+                received_at = sent_at + timedelta(hours=rng.randrange(1, 48)) if status in ('received', 'completed') else None
+                completed_at = received_at + timedelta(minutes=rng.randrange(1, 120)) if status == 'completed' else None
+                employees = self.employees[saraf_id]
+                created_by = rng.choice(employees)[0] if employees and rng.random() < 0.6 else None
+                received_by = None
+                if received_at and destination_id and self.employees[destination_id] and rng.random() < 0.6:
+                    received_by = rng.choice(self.employees[destination_id])[0]
+                yield HawalaTransaction(
+                    hawala_number=f'SC{self.seed % 1000:03d}{index:010d}',
+                    sender_name=self.name(rng), sender_phone=f'+937{rng.randrange(10 ** 8):08d}',
+                    receiver_name=self.name(rng),
+                    receiver_phone=f'+937{rng.randrange(10 ** 8):08d}' if received_at else None,
+                    amount=self.amount(rng), currency_id=currency.pk,
+                    transfer_fee=self.amount(rng, 1, 500),
+                    sender_exchange_id=saraf_id, sender_exchange_name=self.saraf_names[saraf_id],
+                    destination_exchange_id=destination_id,
+                    destination_exchange_name=(
+                        self.saraf_names[destination_id] if destination_id else f'{rng.choice(PROVINCES)} Exchange'
+                    ),
+                    destination_exchange_address=rng.choice(PROVINCES),
+                    status=status, mode=mode, destination_saraf_uses_app=mode == 'internal',
+                    created_at=created_at, sent_at=sent_at, received_at=received_at, completed_at=completed_at,
+                    updated_at=completed_at or received_at or sent_at or created_at,
+                    created_by_employee_id=created_by, received_by_employee_id=received_by,
+                )
+
+        self.insert(HawalaTransaction, hawalas())
+
+    def generate_conversations(self):
+        """
+        Conversations, their messages and participant state, a chunk of conversations at a time.
+        Read and delivery receipts are the participants' watermarks, as the messaging app stores them.
+        """
+        from msg.models import Conversation, ConversationParticipant, Message
+
+        rng = self.random('conversations')
+        count = self.counts['conversations']
+        per_conversation = self.counts['messages_per_conversation']
+        SarafParticipant = Conversation.saraf_participants.through
+        UserParticipant = Conversation.normal_user_participants.through
+        conversation_id = self.next_id(Conversation)
+        message_id = self.next_id(Message)
+        conversations_per_chunk = max(self.chunk_size // max(per_conversation, 1), 1)
+        started = time.monotonic()
+        for first in range(0, count, conversations_per_chunk):
+            conversations, saraf_links, user_links, messages, states = [], [], [], [], []
+            for index in range(first, min(first + conversations_per_chunk, count)):
+                created_at = self.moment(index, count, rng)
+                if rng.random() < 0.6:
+                    conversation_type = 'direct'
+                    participants = [('saraf', saraf_id) for saraf_id in rng.sample(self.saraf_ids, 2)]
+                else:
+                    conversation_type = 'normal_to_saraf'
+                    participants = [('user', rng.choice(self.user_ids)), ('saraf', rng.choice(self.saraf_ids))]
+                conversation = Conversation(
+                    conversation_id=conversation_id, conversation_type=conversation_type, is_active=True,
+                    created_at=created_at,
+                )
+                conversations.append(conversation)
+                for kind, participant_id in participants:
+                    if kind == 'saraf':
+                        saraf_links.append(SarafParticipant(conversation_id=conversation_id, sarafaccount_id=participant_id))
+                    else:
+                        user_links.append(UserParticipant(conversation_id=conversation_id, normaluser_id=participant_id))
+
+                sent_at = created_at
+                conversation_messages = []
+                for _ in range(per_conversation):
+                    sent_at += timedelta(seconds=rng.randrange(30, 3600))
+                    kind, sender_id = rng.choice(participants)
+                    employee = None
+                    if kind == 'saraf' and self.employees[sender_id] and rng.random() < 0.3:
+                        employee = rng.choice(self.employees[sender_id])
+                    message = Message(
+                        message_id=message_id, conversation_id=conversation_id,
+                        sender_saraf_id=sender_id if kind == 'saraf' else None,
+                        sender_normal_user_id=sender_id if kind == 'user' else None,
+                        sender_employee_id=employee[0] if employee else None,
+                        content=rng.choice(MESSAGE_TEXTS), message_type='text', created_at=sent_at,
+                    )
+                    message.sender = (kind, sender_id)
+                    conversation_messages.append(message)
+                    message_id += 1
+                messages.extend(conversation_messages)
+
+                last = conversation_messages[-1] if conversation_messages else None
+                if last:
+                    if last.sender[0] == 'saraf':
+                        sender_name = self.saraf_names[last.sender[1]]
+                        if last.sender_employee_id:
+                            employee_name = dict(self.employees[last.sender[1]])[last.sender_employee_id]
+                            sender_name = f'{sender_name} ({employee_name})'
+                    else:
+                        sender_name = self.user_names[last.sender[1]]
+                    conversation.last_message_id = last.message_id
+                    conversation.last_message_preview = last.content[:100]
+                    conversation.last_message_sender_name = sender_name
+                    conversation.last_message_type = last.message_type
+                    conversation.last_message_at = last.created_at
+                conversation.updated_at = last.created_at if last else created_at
+
+                for kind, participant_id in participants:
+                    # Everything is delivered; the newest few messages from others may still be unread
+                    received = [message for message in conversation_messages if message.sender != (kind, participant_id)]
+                    unread = rng.choice([0, 0, 0, 1, 2, 5]) if received else 0
+                    unread = min(unread, len(received))
+                    read_up_to = received[-unread - 1].message_id if len(received) > unread else None
+                    states.append(ConversationParticipant(
+                        conversation_id=conversation_id,
+                        saraf_account_id=participant_id if kind == 'saraf' else None,
+                        normal_user_id=participant_id if kind == 'user' else None,
+                        unread_count=unread,
+                        last_delivered_message_id=last.message_id if last else None,
+                        last_delivered_at=last.created_at if last else None,
+                        last_read_message_id=read_up_to,
+                        last_read_at=last.created_at if read_up_to else None,
+                        last_message_at=last.created_at if last else created_at,
+                        created_at=created_at, updated_at=conversation.updated_at,
+                    ))
+                conversation_id += 1
+
+            self.insert(Conversation, conversations, report=False)
+            self.insert(SarafParticipant, saraf_links, report=False)
+            self.insert(UserParticipant, user_links, report=False)
+            self.insert(Message, messages, report=False)
+            self.insert(ConversationParticipant, states, report=False)
+        rows = sum(
+            self.inserted.get(model._meta.label, 0)
+            for model in (Conversation, SarafParticipant, UserParticipant, Message, ConversationParticipant)
+        )
+        self.report('Conversations, messages and participants', rows, time.monotonic() - started)
+
+    def generate_social(self):
+        from saraf_post.models import SarafPost
+        from saraf_social.models import SarafComment, SarafLike, SarafSocialStats
+
+        rng = self.random('posts')
+        count = self.counts['posts']
+
+        def posts():
+            for index in range(count):
+                saraf_id = rng.choice(self.saraf_ids)
+                employees = self.employees[saraf_id]
+                employee_id = rng.choice(employees)[0] if employees and rng.random() < 0.5 else None
+                published_at = self.moment(index, count, rng)
+                yield SarafPost(
+                    title=f'Exchange rates, update {index}',
+                    content=' '.join(rng.choice(MESSAGE_TEXTS) for _ in range(3)),
+                    saraf_account_id=saraf_id,
+                    created_by_saraf_id=None if employee_id else saraf_id, created_by_employee_id=employee_id,
+                    published_at=published_at, created_at=published_at, updated_at=published_at,
+                )
+
+        self.insert(SarafPost, posts())
+
+        likes_received = defaultdict(int)
+        comments_received = defaultdict(int)
+        rng = self.random('likes')
+        # A user's n-th like goes to the n-th saraf after a random starting saraf, so pairs never repeat
+        likes = min(self.counts['likes'], len(self.user_ids) * len(self.saraf_ids))
+        first_saraf = [rng.randrange(len(self.saraf_ids)) for _ in self.user_ids]
+
+        def like_rows():
+            for index in range(likes):
+                user_index = index % len(self.user_ids)
+                saraf_id = self.saraf_ids[(first_saraf[user_index] + index // len(self.user_ids)) % len(self.saraf_ids)]
+                likes_received[saraf_id] += 1
+                yield SarafLike(
+                    saraf_account_id=saraf_id, normal_user_id=self.user_ids[user_index],
+                    created_at=self.moment(index, likes, rng),
+                )
+
+        self.insert(SarafLike, like_rows())
+
+        rng = self.random('comments')
+        count = self.counts['comments']
+
+        def comments():
+            for index in range(count):
+                saraf_id = rng.choice(self.saraf_ids)
+                comments_received[saraf_id] += 1
+                created_at = self.moment(index, count, rng)
+                yield SarafComment(
+                    saraf_account_id=saraf_id, normal_user_id=rng.choice(self.user_ids),
+                    content=f'{rng.choice(MESSAGE_TEXTS)} Comment {index}.',
+                    created_at=created_at, updated_at=created_at,
+                )
+
+        self.insert(SarafComment, comments())
+        until = self.start + timedelta(seconds=self.span)
+        self.insert(SarafSocialStats, (
+            SarafSocialStats(
+                saraf_account_id=saraf_id, total_likes=likes_received[saraf_id],
+                total_comments=comments_received[saraf_id], last_updated=until,
+            )
+            for saraf_id in self.saraf_ids
+        ))
+
+
+def scale_data_exists(using=DEFAULT_DB_ALIAS):
+    from saraf_account.models import SarafAccount
+
+    return SarafAccount.objects.using(using).filter(email__endswith=f'@{SCALE_EMAIL_DOMAIN}').exists()
+
+
+def clear_scale_data(using=DEFAULT_DB_ALIAS, log=None):
+    """Delete everything generate() created, children first"""
+    from exchange.models import ExchangeTransaction
+    from hawala.models import HawalaTransaction
+    from msg.models import Conversation, ConversationParticipant
+    from normal_user_account.models import NormalUser
+    from saraf_account.models import AmuPayCode, SarafAccount
+    from saraf_create_accounts.models import SarafCustomerAccount
+
+    log = log or logger.info
+    scale_email = f'@{SCALE_EMAIL_DOMAIN}'
+    sarafs = SarafAccount.objects.using(using).filter(email__endswith=scale_email)
+    users = NormalUser.objects.using(using).filter(email__endswith=scale_email)
+    querysets = [
+        Conversation.objects.using(using).filter(pk__in=ConversationParticipant.objects.using(using).filter(
+            Q(saraf_account__in=sarafs) | Q(normal_user__in=users)
+        ).values('conversation_id')),
+        HawalaTransaction.objects.using(using).filter(sender_exchange__in=sarafs),
+        ExchangeTransaction.objects.using(using).filter(saraf_account__in=sarafs),
+        SarafCustomerAccount.objects.using(using).filter(saraf_account__in=sarafs),
+        AmuPayCode.objects.using(using).filter(used_by__in=sarafs),
+        sarafs,
+        users,
+    ]
+    for queryset in querysets:
+        started = time.monotonic()
+        with transaction.atomic(using=using):
+            deleted, _ = queryset.delete()
+        log(f'{queryset.model._meta.label}: deleted {deleted} rows with dependents in {time.monotonic() - started:.1f}s')
@@ -0,0 +1,84 @@
+"""
+Worker startup cost: what a fresh process imports before it can serve.
+
+measure_startup() boots Django in a child process the way a gunicorn worker
+does (amu_pay.asgi, then the URLconf that the first request would load) and
+reports the wall time, the modules loaded, and, with importtime=True, each
+import's own and cumulative time from `python -X importtime`.
+
+The AI stack (langchain, langgraph, Gemini, Pinecone, sentence-transformers)
+and boto3 load on first use, not at startup; HEAVY_MODULES lists the packages
+that must stay out of a fresh worker. utils.tests enforces that and
+STARTUP_BUDGET_SECONDS; `manage.py profile_imports` shows where the time goes.
+"""
+
+import json
+import os
+import subprocess
+import sys
+
+from django.conf import settings
+
+STARTUP_BUDGET_SECONDS = 2.0
+
+HEAVY_MODULES = (
+    'boto3',
+    'botocore',
+    'langchain',
+    'langchain_core',
+    'langchain_google_genai',
+    'langchain_huggingface',
+    'langchain_pinecone',
+    'langgraph',
+    'pinecone',
+    'sentence_transformers',
+    'torch',
+    'transformers',
+)
+
+_BOOT_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+from amu_pay.asgi import application
+from django.urls import get_resolver
+get_resolver().url_patterns
+print(json.dumps({'seconds': time.perf_counter() - start, 'modules': sorted(sys.modules)}))
+"""
+
+
+def parse_importtime(output):
+    """[(module, self_us, cumulative_us)] from `python -X importtime` stderr"""
+    imports = []
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        imports.append((name.strip(), int(self_us), int(cumulative_us)))
+    return imports
+
+
+def measure_startup(importtime=False):
+    """
+    {'seconds', 'module_count', 'heavy_modules', 'imports'} for a fresh
+    process on the current settings module. `imports` is empty unless
+    importtime=True, which also slows the boot it measures.
+    """
+    base_dir = str(settings.BASE_DIR)
+    env = dict(
+        os.environ,
+        DJANGO_SETTINGS_MODULE=settings.SETTINGS_MODULE,
+        PYTHONPATH=os.pathsep.join(filter(None, [base_dir, os.environ.get('PYTHONPATH')])),
+    )
+    command = [sys.executable] + (['-X', 'importtime'] if importtime else []) + ['-c', _BOOT_SCRIPT]
+    result = subprocess.run(command, cwd=base_dir, env=env, capture_output=True, text=True, timeout=300)
+    if result.returncode != 0:
+        raise RuntimeError(f"Startup failed: {result.stderr.strip()[-2000:]}")
+
+    boot = json.loads(result.stdout.strip().splitlines()[-1])
+    loaded = {name.split('.')[0] for name in boot['modules']}
+    return {
+        'seconds': boot['seconds'],
+        'module_count': len(boot['modules']),
+        'heavy_modules': sorted(loaded.intersection(HEAVY_MODULES)),
+        'imports': parse_importtime(result.stderr) if importtime else [],
+    }
@@ -0,0 +1,21 @@
+"""
+Static files for ASGI deployments that have no nginx in front (docker-compose).
+
+WhiteNoiseMiddleware is sync-only, so in the middleware chain it made Django
+adapt the whole chain and run every request under async_to_sync.
+StaticRootHandler wraps the ASGI application instead: requests under
+STATIC_URL are served from STATIC_ROOT on a worker thread, and every other
+request goes straight to the application. Behind nginx (nginx.conf)
+/static/ never reaches Django, so the wrapper costs one prefix check.
+"""
+
+from django.conf import settings
+from django.contrib.staticfiles.handlers import ASGIStaticFilesHandler
+from django.views import static
+
+
+class StaticRootHandler(ASGIStaticFilesHandler):
+    """ASGIStaticFilesHandler serving the collected files rather than the finders"""
+
+    def serve(self, request):
+        return static.serve(request, self.file_path(request.path), document_root=settings.STATIC_ROOT)
@@ -0,0 +1,878 @@
+import asyncio
+import json
+import logging
+import os
+import socket
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone as dt_timezone
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from asgiref.sync import async_to_sync
+from django.core.cache import caches
+from django.core.handlers.asgi import ASGIHandler
+from django.db import DatabaseError, connection, router, transaction
+from django.http import HttpResponse
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.urls import path
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.test import APIClient, APIRequestFactory, force_authenticate
+from rest_framework.views import APIView
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .async_views import AsyncAPIView
+from .benchmark import STEPS, InProcessTransport, compare_reports, parse_query_totals, percentile, run_benchmark
+from .cache import CacheNamespace, cache_stats
+from . import db_routing, metrics, profiling
+from .db_routing import ReplicaStickinessMiddleware, read_replica, replica_reads
+from .query_budget import ENDPOINT_BUDGETS, QueryBudgetExceeded, query_budget
+from .static_files import StaticRootHandler
+from .scale_data import ScaleDataGenerator, clear_scale_data, scale_counts, scale_data_exists
+from .startup import STARTUP_BUDGET_SECONDS, measure_startup
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'utils-tests'}})
+class CacheNamespaceTests(SimpleTestCase):
+    """Versioned, single-flight cache-aside helpers"""
+
+    def setUp(self):
+        caches['default'].clear()
+        cache_stats(reset=True)
+
+    def test_get_or_set_computes_once(self):
+        """Misses compute and store; later calls are hits, including cached None"""
+        namespace = CacheNamespace('tests-basic')
+        calls = []
+        self.assertEqual(namespace.get_or_set('key', lambda: calls.append(1) or 'value'), 'value')
+        self.assertEqual(namespace.get_or_set('key', lambda: calls.append(1) or 'other'), 'value')
+        self.assertIsNone(namespace.get_or_set('none', lambda: None))
+        self.assertIsNone(namespace.get_or_set('none', lambda: calls.append(1)))
+        self.assertEqual(len(calls), 1)
+
+        stats = cache_stats()['tests-basic']
+        self.assertEqual((stats['hits'], stats['misses'], stats['computes']), (2, 2, 2))
+
+    def test_invalidate_drops_namespace_only(self):
+        """A version bump hides every key of one namespace and leaves others alone"""
+        rates = CacheNamespace('tests-rates')
+        other = CacheNamespace('tests-other')
+        rates.set('usd', 1)
+        rates.set('eur', 2)
+        other.set('usd', 3)
+
+        rates.invalidate()
+        self.assertIsNone(rates.get('usd'))
+        self.assertIsNone(rates.get('eur'))
+        self.assertEqual(other.get('usd'), 3)
+
+        # An evicted version key starts a new version instead of reviving old entries
+        rates.set('usd', 4)
+        caches['default'].delete('tests-rates:version')
+        self.assertIsNone(rates.get('usd'))
+
+    def test_single_flight(self):
+        """Concurrent misses for one key run the computation once"""
+        namespace = CacheNamespace('tests-flight')
+        calls = []
+
+        def compute():
+            calls.append(1)
+            time.sleep(0.2)
+            return 'slow value'
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(namespace.get_or_set('hot', compute)))
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(results, ['slow value'] * 5)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(cache_stats()['tests-flight']['waits'], 4)
+
+    def test_cache_errors_fall_back_to_compute(self):
+        """An unreachable cache is treated as a miss, not an error"""
+        namespace = CacheNamespace('tests-down')
+        with patch.object(caches['default'], 'get', side_effect=ConnectionError('down')):
+            self.assertEqual(namespace.get_or_set('key', lambda: 'fresh'), 'fresh')
+        self.assertGreater(cache_stats()['tests-down']['errors'], 0)
+
+    def test_cache_errors_while_waiting_fall_back_to_compute(self):
+        """A cache that drops while another caller holds the lock does not fail the waiter"""
+        namespace = CacheNamespace('tests-wait-down', wait_timeout=5)
+        cache = caches['default']
+        cache_key = namespace.make_key('key')
+        cache.add(f'{cache_key}:lock', 'another caller')
+        real_get = cache.get
+
+        def get(key, *args, **kwargs):
+            if key == cache_key:
+                raise ConnectionError('down')
+            return real_get(key, *args, **kwargs)
+
+        started = time.monotonic()
+        with patch.object(cache, 'get', side_effect=get):
+            self.assertEqual(namespace.get_or_set('key', lambda: 'fresh'), 'fresh')
+        self.assertLess(time.monotonic() - started, 1)
+        stats = cache_stats()['tests-wait-down']
+        self.assertEqual((stats['waits'], stats['errors'], stats['computes']), (1, 2, 1))
+
+
+class EchoView(AsyncAPIView):
+    permission_classes = []
+
+    async def post(self, request):
+        return Response({'echo': request.data.get('value')})
+
+
+class PrivateEchoView(EchoView):
+    permission_classes = [IsAuthenticated]
+
+
+class AsyncAPIViewTests(SimpleTestCase):
+    """DRF dispatch for coroutine handlers"""
+
+    def setUp(self):
+        self.factory = APIRequestFactory()
+
+    def call(self, view_class, request):
+        return async_to_sync(view_class.as_view())(request)
+
+    def test_coroutine_handler_response_is_finalized(self):
+        response = self.call(EchoView, self.factory.post('/', {'value': 'hi'}, format='json'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, {'echo': 'hi'})
+        self.assertEqual(response.accepted_renderer.format, 'json')
+
+    def test_permissions_run_before_the_handler(self):
+        response = self.call(PrivateEchoView, self.factory.post('/', {'value': 'hi'}, format='json'))
+        self.assertIn(response.status_code, (401, 403))
+
+    def test_sync_handlers_still_work(self):
+        self.assertEqual(self.call(EchoView, self.factory.options('/')).status_code, 200)
+        self.assertEqual(self.call(EchoView, self.factory.get('/')).status_code, 405)
+
+    @override_settings(DEBUG=True)
+    def test_no_middleware_is_adapted_under_asgi(self):
+        # A sync-only middleware would run every request under async_to_sync
+        with self.assertLogs('django.request', 'DEBUG') as logs:
+            ASGIHandler()
+            logging.getLogger('django.request').debug('Middleware loaded')
+        self.assertEqual([line for line in logs.output if 'adapted for middleware' in line], [])
+
+    def test_static_files_are_served_outside_the_middleware_chain(self):
+        static_root = tempfile.mkdtemp()
+        with open(os.path.join(static_root, 'app.css'), 'w') as f:
+            f.write('body {}')
+
+        def call(handler, path):
+            messages = []
+            requests = [{'type': 'http.request', 'body': b''}]
+
+            async def receive():
+                if requests:
+                    return requests.pop()
+                # The client stays connected until the response is sent
+                await asyncio.Event().wait()
+
+            async def send(message):
+                messages.append(message)
+
+            scope = {
+                'type': 'http', 'method': 'GET', 'path': path, 'query_string': b'', 'headers': [],
+                'server': ('testserver', 80),
+            }
+            async_to_sync(handler)(scope, receive, send)
+            return messages[0]['status'], b''.join(message.get('body', b'') for message in messages[1:])
+
+        async def application(scope, receive, send):
+            await send({'type': 'http.response.start', 'status': 204, 'headers': []})
+            await send({'type': 'http.response.body', 'body': b''})
+
+        with override_settings(STATIC_ROOT=static_root, STATIC_URL='/static/'):
+            handler = StaticRootHandler(application)
+            self.assertEqual(call(handler, '/static/app.css'), (200, b'body {}'))
+            self.assertEqual(call(handler, '/static/missing.css')[0], 404)
+            self.assertEqual(call(handler, '/api/saraf/list/')[0], 204)
+
+
+class ReplicaReadView(APIView):
+    permission_classes = []
+
+    @read_replica
+    def get(self, request):
+        return Response({'db': router.db_for_read(None)})
+
+
+def saraf_user(saraf_id):
+    return SimpleNamespace(is_authenticated=True, saraf_id=saraf_id, id=saraf_id, user_type='saraf')
+
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'replica-tests'}},
+    DATABASE_REPLICA_SETTINGS={
+        'REPLICAS': ['replica_0'], 'MAX_LAG_SECONDS': 5, 'LAG_CHECK_INTERVAL': 60, 'STICKY_SECONDS': 10,
+    },
+)
+class ReplicaRoutingTests(SimpleTestCase):
+    """Opt-in replica reads with read-your-writes stickiness and lag fallback"""
+
+    def setUp(self):
+        caches['default'].clear()
+        db_routing._health.clear()
+        lag = patch.object(db_routing, 'replica_lag', return_value=0)
+        self.replica_lag = lag.start()
+        self.addCleanup(lag.stop)
+        self.addCleanup(db_routing._health.clear)
+
+    def write_as(self, user):
+        """A request that saves something, through the stickiness middleware"""
+        def get_response(request):
+            router.db_for_write(None)
+            return Response()
+        ReplicaStickinessMiddleware(get_response)(SimpleNamespace(user=user))
+
+    def test_reads_use_the_primary_unless_opted_in(self):
+        self.assertEqual(router.db_for_read(None), 'default')
+        with replica_reads(saraf_user(1)):
+            self.assertEqual(router.db_for_read(None), 'replica_0')
+            self.assertEqual(router.db_for_write(None), 'default')
+            # Reads after a write in the same scope see it
+            self.assertEqual(router.db_for_read(None), 'default')
+        self.assertEqual(router.db_for_read(None), 'default')
+
+    def test_decorated_view_reads_from_the_replica(self):
+        request = APIRequestFactory().get('/')
+        force_authenticate(request, user=saraf_user(1))
+        self.assertEqual(ReplicaReadView.as_view()(request).data, {'db': 'replica_0'})
+
+    def test_users_read_their_own_writes_from_the_primary(self):
+        self.write_as(saraf_user(1))
+        with replica_reads(saraf_user(1)) as alias:
+            self.assertIsNone(alias)
+            self.assertEqual(router.db_for_read(None), 'default')
+        with replica_reads(saraf_user(2)) as alias:
+            self.assertEqual(alias, 'replica_0')
+
+        caches['default'].clear()
+        with replica_reads(saraf_user(1)) as alias:
+            self.assertEqual(alias, 'replica_0')
+
+    def test_requests_without_writes_are_not_sticky(self):
+        ReplicaStickinessMiddleware(lambda request: Response())(SimpleNamespace(user=saraf_user(1)))
+        with replica_reads(saraf_user(1)) as alias:
+            self.assertEqual(alias, 'replica_0')
+
+    def test_lagging_or_broken_replica_falls_back_to_the_primary(self):
+        # Too far behind, replication stopped, status not readable
+        self.replica_lag.side_effect = [30, None, DatabaseError('access denied')]
+        for _ in range(3):
+            db_routing._health.clear()
+            with replica_reads(saraf_user(1)) as alias:
+                self.assertIsNone(alias)
+
+        # Lag is checked once per interval
+        db_routing._health.clear()
+        self.replica_lag.side_effect = None
+        self.replica_lag.reset_mock()
+        for _ in range(3):
+            with replica_reads(saraf_user(1)) as alias:
+                self.assertEqual(alias, 'replica_0')
+        self.assertEqual(self.replica_lag.call_count, 1)
+
+    @override_settings(DATABASE_REPLICA_SETTINGS={'REPLICAS': []})
+    def test_no_replicas_configured(self):
+        with replica_reads(saraf_user(1)) as alias:
+            self.assertIsNone(alias)
+            self.assertEqual(router.db_for_read(None), 'default')
+
+
+class StartupBudgetTests(SimpleTestCase):
+    """A fresh worker boots within budget without the AI stack or boto3"""
+
+    def test_worker_startup_is_within_budget(self):
+        startup = measure_startup()
+        self.assertEqual(startup['heavy_modules'], [])
+        self.assertLess(
+            startup['seconds'], STARTUP_BUDGET_SECONDS,
+            'Worker startup is over budget; see `manage.py profile_imports`',
+        )
+
+
+def instrumented_view(request):
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT 1')
+        cursor.execute('SELECT 2')
+    with metrics.external_call('pinecone'):
+        # Nested call: observed on its own, but counted once in the request total
+        with metrics.external_call('embedding'):
+            time.sleep(0.05)
+    return HttpResponse('ok')
+
+
+urlpatterns = [
+    path('instrumented/', instrumented_view),
+    path('metrics', metrics.metrics_view),
+]
+
+
+@override_settings(ROOT_URLCONF=__name__)
+class MetricsTests(TestCase):
+    """Per-view histograms, merged across processes and served to internal callers"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        settings_override = override_settings(METRICS_SETTINGS={
+            'DIR': self.directory,
+            'FLUSH_INTERVAL': 3600,
+            'TOKEN': 'scrape-token',
+            'ALLOWED_NETWORKS': ['127.0.0.0/8'],
+            'SLOW_REQUEST_SECONDS': 60,
+        })
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        metrics.snapshot(reset=True)
+
+    def series(self, name, **labels):
+        return metrics.snapshot()[name][json.dumps(sorted(labels.items()))]
+
+    def test_request_records_queries_db_and_external_time(self):
+        self.client.get('/instrumented/')
+
+        view = {'view': 'utils.tests.instrumented_view', 'method': 'GET'}
+        duration = self.series('amupay_request_duration_seconds', status=200, **view)
+        queries = self.series('amupay_request_queries', **view)
+        external = self.series('amupay_request_external_seconds', **view)
+        self.assertEqual(sum(duration[:-1]), 1)
+        self.assertEqual(queries[-1], 2)
+        self.assertGreater(self.series('amupay_request_db_seconds', **view)[-1], 0)
+        self.assertGreaterEqual(external[-1], 0.05)
+        self.assertLess(external[-1], 0.1)
+        for service in ('pinecone', 'embedding'):
+            self.assertEqual(sum(self.series('amupay_external_call_seconds', service=service, outcome='ok')[:-1]), 1)
+
+    def test_prometheus_exposition(self):
+        metrics.observe('amupay_request_queries', 3, view='a.View', method='GET')
+        metrics.observe('amupay_request_queries', 1000, view='a.View', method='GET')
+        metrics.observe('amupay_external_call_seconds', 0.2, service='sm"tp\n', outcome='ok')
+        text = metrics.render(metrics.snapshot())
+
+        self.assertIn('# TYPE amupay_request_queries histogram', text)
+        self.assertIn('amupay_request_queries_bucket{method="GET",view="a.View",le="2.0"} 0', text)
+        self.assertIn('amupay_request_queries_bucket{method="GET",view="a.View",le="5.0"} 1', text)
+        self.assertIn('amupay_request_queries_bucket{method="GET",view="a.View",le="500.0"} 1', text)
+        self.assertIn('amupay_request_queries_bucket{method="GET",view="a.View",le="+Inf"} 2', text)
+        self.assertIn('amupay_request_queries_sum{method="GET",view="a.View"} 1003', text)
+        self.assertIn('amupay_request_queries_count{method="GET",view="a.View"} 2', text)
+        self.assertIn('service="sm\\"tp\\n"', text)
+        self.assertNotIn('amupay_request_db_seconds', text)
+
+    def test_processes_are_merged_and_exited_ones_retired(self):
+        metrics.observe('amupay_request_queries', 1, view='a.View', method='GET')
+        # Two requests with 2 queries each: bucket counts, overflow count, sum
+        other = {'amupay_request_queries': {
+            json.dumps([['method', 'GET'], ['view', 'a.View']]): [0, 0, 2] + [0] * 8 + [4],
+        }}
+        # A worker on this host that has exited, and one on another host
+        exited = f'{socket.gethostname()}-999999999-1.json'
+        with open(os.path.join(self.directory, exited), 'w') as f:
+            json.dump(other, f)
+        with open(os.path.join(self.directory, 'other-host-12-1.json'), 'w') as f:
+            json.dump(other, f)
+
+        for _ in range(2):
+            merged = metrics.collect()['amupay_request_queries']
+            self.assertEqual(list(merged.values())[0][-1], 9)
+            self.assertEqual(sum(list(merged.values())[0][:-1]), 5)
+        files = os.listdir(self.directory)
+        self.assertNotIn(exited, files)
+        self.assertIn('other-host-12-1.json', files)
+        self.assertIn(metrics.RETIRED_FILE, files)
+
+    def test_endpoint_only_answers_internal_callers(self):
+        metrics.observe('amupay_request_queries', 1, view='a.View', method='GET')
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], metrics.CONTENT_TYPE)
+        self.assertIn(b'amupay_request_queries_count{method="GET",view="a.View"} 1', response.content)
+
+        # Through nginx, or from outside the allowed networks
+        self.assertEqual(self.client.get('/metrics', HTTP_X_FORWARDED_FOR='203.0.113.5').status_code, 403)
+        self.assertEqual(self.client.get('/metrics', REMOTE_ADDR='203.0.113.5').status_code, 403)
+        self.assertEqual(self.client.get(
+            '/metrics', REMOTE_ADDR='203.0.113.5', HTTP_AUTHORIZATION='Bearer wrong',
+        ).status_code, 403)
+        self.assertEqual(self.client.get(
+            '/metrics', HTTP_X_FORWARDED_FOR='203.0.113.5', HTTP_AUTHORIZATION='Bearer scrape-token',
+        ).status_code, 200)
+
+
+def access_token(user_type, user_id, **claims):
+    refresh = RefreshToken()
+    refresh['user_type'] = user_type
+    refresh['user_id'] = user_id
+    for name, value in claims.items():
+        refresh[name] = value
+    return str(refresh.access_token)
+
+
+def seed_budget_data(size):
+    """
+    An acting saraf, one of its employees and a normal user, with `size` rows
+    behind every list endpoint in ENDPOINT_BUDGETS: other sarafs, employees,
+    currencies and balances, transactions, hawalas in both directions,
+    conversations with messages and notifications, likes, comments, posts,
+    customer accounts with transactions, and exchanges.
+    """
+    from currency.models import Currency, SarafSupportedCurrency
+    from exchange.models import ExchangeTransaction
+    from hawala.models import HawalaTransaction
+    from msg.fanout import process_pending
+    from msg.models import Conversation
+    from normal_user_account.models import NormalUser
+    from saraf_account.models import AmuPayCode, SarafAccount, SarafEmployee
+    from saraf_create_accounts.models import CustomerTransaction, SarafCustomerAccount
+    from saraf_post.models import SarafPost
+    from saraf_social.models import SarafComment, SarafLike, SarafSocialStats
+    from transaction.models import Transaction
+
+    def create_saraf(index):
+        AmuPayCode.objects.create(code=f'BUDGET{index:04d}')
+        saraf = SarafAccount.objects.create(
+            full_name=f'Budget Saraf {index}', exchange_name=f'Budget Exchange {index}',
+            email=f'budget{index}@example.com', email_or_whatsapp_number=f'+9370010{index:04d}',
+            amu_pay_code=f'BUDGET{index:04d}', province='Kabul', is_active=True,
+        )
+        SarafSocialStats.objects.create(saraf_account=saraf)
+        return saraf
+
+    saraf = create_saraf(0)
+    others = [create_saraf(index) for index in range(1, size + 1)]
+    employees = [
+        SarafEmployee.objects.create(saraf_account=saraf, username=f'cashier{index}', full_name=f'Cashier {index}')
+        for index in range(size)
+    ]
+    employee = employees[0]
+    users = [
+        NormalUser.objects.create(
+            full_name=f'Budget User {index}', email=f'user{index}@example.com',
+            email_or_whatsapp=f'+9379900{index:04d}', password_hash='x', is_active=True,
+        )
+        for index in range(size)
+    ]
+    user = users[0]
+
+    currencies = [
+        Currency.objects.create(
+            currency_code=f'C{index:02d}', currency_name=f'Currency {index}',
+            currency_name_local=f'Currency {index}', symbol='¤',
+        )
+        for index in range(size)
+    ]
+    for index, currency in enumerate(currencies):
+        SarafSupportedCurrency.objects.create(saraf_account=saraf, currency=currency, added_by_saraf=saraf)
+        Transaction.objects.create(
+            saraf_account=saraf, currency=currency, transaction_type='deposit', amount=Decimal('100.00'),
+            performer_user_id=employee.employee_id, performer_user_type='employee',
+            performer_full_name=employee.full_name, performer_employee_id=employee.employee_id,
+            performer_employee_name=employee.full_name,
+        )
+
+    for index, other in enumerate(others):
+        currency = currencies[index]
+        common = {
+            'sender_name': f'Sender {index}', 'sender_phone': '+93700000000', 'receiver_name': f'Receiver {index}',
+            'receiver_phone': '+93711111111', 'amount': Decimal('50.00'), 'currency': currency,
+            'destination_exchange_address': 'Kabul', 'status': 'pending', 'mode': 'internal',
+        }
+        HawalaTransaction.objects.create(
+            hawala_number=f'OUT{index:05d}', sender_exchange=saraf, sender_exchange_name=saraf.exchange_name,
+            destination_exchange_id=other.saraf_id, destination_exchange_name=other.exchange_name,
+            created_by_employee=employees[index], **common,
+        )
+        HawalaTransaction.objects.create(
+            hawala_number=f'IN{index:05d}', sender_exchange=other, sender_exchange_name=other.exchange_name,
+            destination_exchange_id=saraf.saraf_id, destination_exchange_name=saraf.exchange_name, **common,
+        )
+
+    client = APIClient()
+    saraf_token = access_token('saraf', saraf.saraf_id, saraf_id=saraf.saraf_id, full_name=saraf.full_name)
+    for index, other in enumerate(others):
+        conversation = Conversation.objects.create(conversation_type='direct')
+        conversation.saraf_participants.set([saraf, other])
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {saraf_token}')
+        client.post('/api/messages/messages/send/', {
+            'conversation_id': conversation.conversation_id, 'content': f'Salam {index}', 'message_type': 'text',
+        }, format='json')
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {access_token('saraf', other.saraf_id, saraf_id=other.saraf_id)}")
+        client.post('/api/messages/messages/send/', {
+            'conversation_id': conversation.conversation_id, 'content': f'Reply {index}', 'message_type': 'text',
+        }, format='json')
+
+        conversation = Conversation.objects.create(conversation_type='normal_to_saraf')
+        conversation.saraf_participants.set([other])
+        conversation.normal_user_participants.set([user])
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {access_token('saraf', other.saraf_id, saraf_id=other.saraf_id)}")
+        client.post('/api/messages/messages/send/', {
+            'conversation_id': conversation.conversation_id, 'content': f'Welcome {index}', 'message_type': 'text',
+        }, format='json')
+    process_pending(limit=10 * size)
+
+    for index, normal_user in enumerate(users):
+        SarafLike.objects.create(saraf_account=saraf, normal_user=normal_user)
+        SarafComment.objects.create(saraf_account=saraf, normal_user=normal_user, content=f'Great service {index}')
+        SarafLike.objects.create(saraf_account=others[index], normal_user=user)
+        SarafComment.objects.create(saraf_account=others[index], normal_user=user, content=f'Fast transfer {index}')
+        SarafPost.objects.create(
+            saraf_account=saraf, title=f'Rates {index}', content=f'Exchange rates, update {index}',
+            created_by_saraf=saraf if index % 2 else None, created_by_employee=None if index % 2 else employee,
+        )
+
+    accounts = [
+        SarafCustomerAccount.objects.create(
+            saraf_account=saraf, full_name=f'Customer {index}', phone=f'07000000{index:02d}',
+            account_type='exchanger' if index % 2 else 'customer',
+        )
+        for index in range(size)
+    ]
+    account = accounts[0]
+    exchanger = accounts[1]
+    # Another customer banks with every other saraf (public lookup across sarafs by phone)
+    for other in others:
+        CustomerTransaction.objects.create(
+            customer_account=SarafCustomerAccount.objects.create(
+                saraf_account=other, full_name='Shared Customer', phone='0799999999', account_type='customer',
+            ),
+            currency=currencies[0], transaction_type='deposit', amount=Decimal('10.00'),
+            performer_user_id=other.saraf_id, performer_user_type='saraf', performer_full_name=other.full_name,
+        )
+    for index, currency in enumerate(currencies):
+        for customer_account, transaction_type in (
+            (account, 'deposit'), (account, 'withdrawal'), (exchanger, 'take_money'), (exchanger, 'give_money'),
+        ):
+            CustomerTransaction.objects.create(
+                customer_account=customer_account, currency=currency, transaction_type=transaction_type,
+                amount=Decimal('10.00'), performer_user_id=saraf.saraf_id, performer_user_type='saraf',
+                performer_full_name=saraf.full_name,
+            )
+        ExchangeTransaction.objects.create(
+            name=f'Exchange {index}', transaction_type='customer', sell_currency='USD', buy_currency='AFN',
+            sell_amount=Decimal('100'), buy_amount=Decimal('7000'), rate=Decimal('70'),
+            saraf_account=saraf, customer_account=accounts[index], performed_by_employee=employees[index],
+        )
+
+    return {
+        'ids': {
+            'saraf_id': saraf.saraf_id,
+            'email': saraf.email,
+            'account_id': account.account_id,
+            'exchanger_id': exchanger.account_id,
+            'phone': account.phone,
+            'shared_phone': '0799999999',
+            'currency_code': currencies[0].currency_code,
+        },
+        'tokens': {
+            'saraf': saraf_token,
+            'employee': access_token(
+                'employee', employee.employee_id, saraf_id=saraf.saraf_id, employee_id=employee.employee_id,
+            ),
+            'normal_user': access_token('normal_user', user.user_id),
+        },
+    }
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'query-budgets'}})
+class EndpointQueryBudgetTests(TestCase):
+    """Every list endpoint stays within its query budget, whatever the amount of data"""
+
+    SIZES = (2, 5)
+
+    def measure(self, size):
+        """Query count, or the over-budget failure, of every endpoint against data of the given size"""
+        counts = {}
+        with transaction.atomic():
+            seed = seed_budget_data(size)
+            caches['default'].clear()
+            client = APIClient()
+            for endpoint in ENDPOINT_BUDGETS:
+                token = seed['tokens'].get(endpoint.user)
+                client.credentials(**({'HTTP_AUTHORIZATION': f'Bearer {token}'} if token else {}))
+                path = endpoint.path.format(**seed['ids'])
+                params = {name: str(value).format(**seed['ids']) for name, value in endpoint.params.items()}
+                try:
+                    with query_budget(endpoint.budget, label=f'{endpoint.method.upper()} {path} with {size} rows') as queries:
+                        if endpoint.method == 'post':
+                            response = client.post(path, params, format='json')
+                        else:
+                            response = client.get(path, params)
+                except QueryBudgetExceeded as e:
+                    counts[endpoint] = e
+                    continue
+                self.assertEqual(response.status_code, 200, f'{path} as {endpoint.user}: {response.content[:200]}')
+                counts[endpoint] = len(queries)
+            transaction.set_rollback(True)
+        return counts
+
+    def test_list_endpoints_within_budget_at_every_size(self):
+        small, large = (self.measure(size) for size in self.SIZES)
+        for endpoint in ENDPOINT_BUDGETS:
+            with self.subTest(endpoint=endpoint):
+                for count in (small[endpoint], large[endpoint]):
+                    if isinstance(count, QueryBudgetExceeded):
+                        raise count
+                self.assertEqual(
+                    small[endpoint], large[endpoint],
+                    f'{endpoint.path} ran {small[endpoint]} queries with {self.SIZES[0]} rows '
+                    f'and {large[endpoint]} with {self.SIZES[1]}',
+                )
+
+    def test_query_budget_lists_the_queries_over_budget(self):
+        from currency.models import Currency
+        from saraf_account.models import SarafAccount
+
+        with query_budget(1) as queries:
+            list(Currency.objects.all())
+        self.assertEqual(len(queries), 1)
+
+        @query_budget(1, label='Two lookups')
+        def two_lookups():
+            list(Currency.objects.all())
+            list(SarafAccount.objects.all())
+
+        with self.assertRaisesMessage(QueryBudgetExceeded, 'Two lookups ran 2 queries, budget is 1'):
+            two_lookups()
+
+
+class ScaleDataTests(TestCase):
+    """The benchmark dataset is reproducible and keeps the derived columns consistent"""
+
+    COUNTS = scale_counts(
+        sarafs=4, employees_per_saraf=2, customer_accounts_per_saraf=3, users=6, transactions=40,
+        customer_transactions=40, exchanges=10, hawalas=12, conversations=5, messages_per_conversation=4,
+        posts=3, likes=8, comments=5,
+    )
+    UNTIL = datetime(2026, 1, 1, tzinfo=dt_timezone.utc)
+
+    def generate(self):
+        return ScaleDataGenerator(self.COUNTS, seed=7, until=self.UNTIL, chunk_size=7, log=lambda line: None).generate()
+
+    def snapshot(self):
+        from hawala.models import HawalaTransaction
+        from msg.models import ConversationParticipant
+        from transaction.models import Transaction
+
+        return (
+            list(Transaction.objects.order_by('created_at').values_list(
+                'saraf_account__email', 'transaction_type', 'amount', 'balance_after', 'created_at')),
+            list(HawalaTransaction.objects.order_by('hawala_number').values_list(
+                'hawala_number', 'sender_exchange__email', 'amount', 'status', 'created_at')),
+            list(ConversationParticipant.objects.order_by('conversation__created_at', 'saraf_account__email').values_list(
+                'saraf_account__email', 'normal_user__email', 'unread_count')),
+        )
+
+    def test_command_refuses_without_debug(self):
+        from django.core.management import CommandError, call_command
+
+        with self.assertRaisesMessage(CommandError, '--allow-non-debug'):
+            call_command('generate_scale_data', '--sarafs', '1')
+        self.assertFalse(scale_data_exists())
+
+    def test_same_seed_gives_the_same_rows(self):
+        from saraf_account.models import SarafAccount
+
+        inserted = self.generate()
+        self.assertEqual(inserted['transaction.Transaction'], 40)
+        self.assertEqual(inserted['msg.Message'], 20)
+        first = self.snapshot()
+        self.assertTrue(scale_data_exists())
+
+        clear_scale_data(log=lambda line: None)
+        self.assertFalse(scale_data_exists())
+        self.assertFalse(SarafAccount.objects.exists())
+        self.generate()
+        self.assertEqual(self.snapshot(), first)
+
+    def test_derived_columns_match_the_rows(self):
+        from msg.models import Conversation, ConversationParticipant, Message
+        from saraf_balance.models import SarafBalance
+        from saraf_create_accounts.models import CustomerBalance, CustomerTransaction
+        from saraf_social.models import SarafLike, SarafSocialStats
+        from transaction.models import Transaction
+
+        self.generate()
+        for balance in CustomerBalance.objects.all():
+            transactions = CustomerTransaction.objects.filter(
+                customer_account=balance.customer_account_id, currency=balance.currency_id
+            ).order_by('created_at')
+            self.assertEqual(transactions.count(), balance.transaction_count)
+            self.assertEqual(transactions.last().balance_after, balance.balance)
+        for balance in SarafBalance.objects.all():
+            count = Transaction.objects.filter(saraf_account=balance.saraf_account_id, currency=balance.currency_id).count()
+            count += CustomerTransaction.objects.filter(
+                customer_account__saraf_account=balance.saraf_account_id, currency=balance.currency_id
+            ).count()
+            self.assertEqual(count, balance.transaction_count)
+        for stats in SarafSocialStats.objects.all():
+            self.assertEqual(SarafLike.objects.filter(saraf_account=stats.saraf_account_id).count(), stats.total_likes)
+
+        for conversation in Conversation.objects.all():
+            last = Message.objects.filter(conversation=conversation).order_by('message_id').last()
+            self.assertEqual(conversation.last_message_id, last.message_id)
+            self.assertEqual(conversation.last_message_at, last.created_at)
+            for state in ConversationParticipant.objects.filter(conversation=conversation):
+                received = Message.objects.filter(conversation=conversation).exclude(
+                    **({'sender_saraf': state.saraf_account_id, 'sender_normal_user': None}
+                       if state.saraf_account_id else {'sender_normal_user': state.normal_user_id})
+                )
+                unread = received.filter(message_id__gt=state.last_read_message_id or 0).count()
+                self.assertEqual(unread, state.unread_count)
+                self.assertEqual(state.last_delivered_message_id, last.message_id)
+        self.assertLessEqual(Transaction.objects.latest('created_at').created_at, self.UNTIL)
+
+
+class BenchmarkTests(TransactionTestCase):
+    """The API benchmark completes every journey step against generated data"""
+
+    def test_every_step_succeeds_in_process(self):
+        counts = scale_counts(
+            sarafs=3, employees_per_saraf=1, customer_accounts_per_saraf=1, users=3, transactions=6,
+            customer_transactions=3, exchanges=3, hawalas=3, conversations=6, messages_per_conversation=2,
+            posts=2, likes=2, comments=2,
+        )
+        ScaleDataGenerator(counts, seed=3, log=lambda line: None).generate()
+
+        # hawala_receive uploads a receiver photo; keep it off S3 whatever USE_S3 is
+        storages = {
+            'default': {'BACKEND': 'amu_pay.storage_backends.ContentAddressedFileSystemStorage'},
+            'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+        }
+        with tempfile.TemporaryDirectory() as media_root, override_settings(MEDIA_ROOT=media_root, STORAGES=storages):
+            # One client: SQLite test databases lock whole tables under concurrent writes
+            report = run_benchmark(InProcessTransport(), concurrency=1, iterations=2, warm_up=0)
+
+        self.assertEqual(report['meta']['mode'], 'in-process')
+        self.assertEqual(report['meta']['dataset']['saraf_account.SarafAccount'], 3)
+        for step, _, _ in STEPS:
+            summary = report['steps'][step]
+            self.assertEqual((summary['requests'], summary['errors']), (2, 0), (step, summary.get('error_sample')))
+            self.assertGreaterEqual(summary['queries_per_request'], 1, step)
+            self.assertLessEqual(summary['p50_ms'], summary['p99_ms'])
+        self.assertEqual(report['total']['requests'], 2 * len(STEPS))
+
+    def test_queries_per_view_are_read_from_metrics(self):
+        text = (
+            'amupay_request_queries_sum{view="saraf_post.views.SarafPostListView",method="GET"} 30.0\n'
+            'amupay_request_queries_count{view="saraf_post.views.SarafPostListView",method="GET"} 10\n'
+            'amupay_request_duration_seconds_sum{view="saraf_post.views.SarafPostListView",method="GET",status="200"} 1.5\n'
+        )
+        self.assertEqual(
+            parse_query_totals(text),
+            {('saraf_post.views.SarafPostListView', 'GET'): (30.0, 10.0)},
+        )
+        self.assertEqual(percentile([5, 1, 3, 2, 4], 0.5), 3)
+        self.assertIsNone(percentile([], 0.99))
+
+        baseline = {'steps': {'login': {'p50_ms': 10.0, 'queries_per_request': 2}}, 'total': {'p50_ms': 20.0}}
+        current = {'steps': {'login': {'p50_ms': 15.0, 'queries_per_request': 1}}, 'total': {'p50_ms': 20.0}}
+        rows = compare_reports(baseline, current)
+        self.assertEqual(rows['login']['p50_ms'], {'baseline': 10.0, 'current': 15.0, 'change': 0.5})
+        self.assertEqual(rows['login']['queries_per_request']['change'], -0.5)
+        self.assertEqual(rows['total']['p50_ms']['change'], 0.0)
+
+
+class ProfilingTests(TestCase):
+    """Requests with a profiling token are profiled and their reports stored for staff and that token"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        settings_override = override_settings(PROFILING_SETTINGS={
+            'DIR': self.directory, 'KEEP': 2, 'EXPLAIN_SLOWEST': 1,
+        })
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.token = profiling.issue_token('ops')
+
+    def report(self, profile_id):
+        response = self.client.get(f'/profiles/{profile_id}.json', HTTP_X_PROFILE_TOKEN=self.token)
+        self.assertEqual(response.status_code, 200)
+        return json.loads(b''.join(response.streaming_content))
+
+    def test_token_profiles_the_request_with_sql_and_explain(self):
+        response = self.client.get('/api/saraf/list/', HTTP_X_PROFILE_TOKEN=self.token)
+
+        self.assertEqual(response.status_code, 200)
+        report = self.report(response['X-Profile-Id'])
+        self.assertEqual(report['issued_by'], 'ops')
+        self.assertEqual(report['view'], 'saraf_account.views.SarafListView')
+        self.assertEqual(report['sql']['count'], len(report['sql']['queries']))
+        self.assertGreater(report['sql']['count'], 0)
+        slowest, = report['sql']['slowest']
+        self.assertTrue(slowest['sql'].startswith('SELECT'))
+        self.assertTrue(slowest['explain'])
+        self.assertFalse(slowest['explain'][0].startswith('EXPLAIN failed'))
+        self.assertTrue(any('SarafListView' in row['function'] or 'saraf_account/views.py' in row['function']
+                            for row in report['profile']['functions']))
+
+        download = self.client.get(f"/profiles/{response['X-Profile-Id']}.prof", HTTP_X_PROFILE_TOKEN=self.token)
+        self.assertEqual(download.status_code, 200)
+        self.assertIn('attachment', download['Content-Disposition'])
+
+    def test_requests_without_a_valid_token_are_not_profiled(self):
+        with patch.object(profiling.ProfilingMiddleware, 'profile') as profile:
+            self.assertEqual(self.client.get('/api/saraf/list/').status_code, 200)
+        profile.assert_not_called()
+
+        expired = profiling.issue_token('ops', seconds=-1)
+        for token in (expired, 'forged'):
+            response = self.client.get('/api/saraf/list/', HTTP_X_PROFILE_TOKEN=token)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn('X-Profile-Id', response)
+        self.assertEqual(profiling.stored_profile_ids(), [])
+
+    def test_reports_are_for_staff_or_token_holders_and_pruned(self):
+        from django.contrib.auth.models import User
+
+        ids = [
+            self.client.get('/api/saraf/list/', HTTP_X_PROFILE_TOKEN=self.token)['X-Profile-Id']
+            for _ in range(3)
+        ]
+        self.assertEqual(profiling.stored_profile_ids(), sorted(ids)[1:])
+
+        self.assertEqual(self.client.get('/profiles/').status_code, 403)
+        self.assertEqual(self.client.get(f'/profiles/{ids[-1]}.json').status_code, 403)
+        listed = self.client.get('/profiles/', HTTP_X_PROFILE_TOKEN=self.token).json()['profiles']
+        self.assertEqual([profile['id'] for profile in listed], sorted(ids)[1:][::-1])
+        self.assertNotIn('token', listed[0])
+
+        # Another valid token sees neither the list nor the files
+        other = profiling.issue_token('someone else')
+        self.assertEqual(self.client.get('/profiles/', HTTP_X_PROFILE_TOKEN=other).json()['profiles'], [])
+        for extension in ('json', 'prof'):
+            response = self.client.get(f'/profiles/{ids[-1]}.{extension}', HTTP_X_PROFILE_TOKEN=other)
+            self.assertEqual(response.status_code, 404)
+
+        self.client.force_login(User.objects.create_user('admin', is_staff=True))
+        listed = self.client.get('/profiles/').json()['profiles']
+        self.assertEqual([profile['id'] for profile in listed], sorted(ids)[1:][::-1])
+        self.assertEqual(self.client.get('/profiles/../settings.json').status_code, 404)
+        # Downloading with the token is not profiled itself
+        self.assertEqual(len(profiling.stored_profile_ids()), 2)
+
+    async def test_async_requests_profile_the_sync_view(self):
+        from django.test import AsyncClient
+
+        response = await AsyncClient().get('/api/saraf/list/', headers={'X-Profile-Token': self.token})
+
+        self.assertEqual(response.status_code, 200)
+        with open(os.path.join(self.directory, f"{response['X-Profile-Id']}.json")) as f:
+            report = json.load(f)
+        self.assertGreater(report['sql']['count'], 0)
+        self.assertEqual(report['view'], 'saraf_account.views.SarafListView')
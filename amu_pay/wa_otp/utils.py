@@ -3,16 +3,32 @@ Utility functions for WhatsApp OTP handling
 Specifically optimized for Afghanistan phone numbers via Twilio
 """
 
-from twilio.rest import Client
 from django.conf import settings
+from asgiref.sync import sync_to_async
+from outbound.queue import OTP_EXPIRY_SECONDS, queue_whatsapp_template
 import logging
 
 logger = logging.getLogger(__name__)
 
 
+def _validate_otp_request(phone_number, otp_code):
+    """Error message for an unusable phone number or OTP code, or None"""
+    if not phone_number:
+        return "Phone number is required"
+    
+    if not otp_code:
+        return "OTP code is required"
+    
+    # Ensure phone number is in correct format for Twilio
+    # Should already be in E.164 format (+93XXXXXXXXX) from serializer
+    if not phone_number.startswith('+93'):
+        return f"Invalid Afghanistan phone format. Expected +93XXXXXXXXX, got: {phone_number}"
+    return None
+
+
 def send_whatsapp_otp(phone_number, otp_code):
     """
-    Send OTP via WhatsApp using Twilio Content API
+    Queue OTP for WhatsApp delivery through the Twilio Content API (see outbound.queue)
     
     This function handles Afghanistan phone numbers specifically:
     - Accepts: 0790976268 (10 digits starting with 07)
@@ -27,38 +43,33 @@ def send_whatsapp_otp(phone_number, otp_code):
         tuple: (success: bool, message: str or error: str)
     """
     try:
-        # Validate input
-        if not phone_number:
-            return False, "Phone number is required"
-        
-        if not otp_code:
-            return False, "OTP code is required"
+        error = _validate_otp_request(phone_number, otp_code)
+        if error:
+            return False, error
         
-        # Ensure phone number is in correct format for Twilio
-        # Should already be in E.164 format (+93XXXXXXXXX) from serializer
-        if not phone_number.startswith('+93'):
-            return False, f"Invalid Afghanistan phone format. Expected +93XXXXXXXXX, got: {phone_number}"
-        
-        # Initialize Twilio client
-        client = Client(settings.TWILIO_ACCOUNT_SID, settings.TWILIO_AUTH_TOKEN)
-        
-        # Create WhatsApp message using Content API
-        message = client.messages.create(
-            content_sid=settings.TWILIO_WHATSAPP_CONTENT_SID,
-            from_='whatsapp:' + settings.TWILIO_WHATSAPP_FROM_NUMBER,
-            content_variables='{"1": "' + otp_code + '"}',  # OTP code in template variable
-            to='whatsapp:' + phone_number  # E.164 format: +93XXXXXXXXX
+        # Content template with the OTP code in variable 1; sent to whatsapp:+93XXXXXXXXX
+        notification = queue_whatsapp_template(
+            phone_number,
+            settings.TWILIO_WHATSAPP_CONTENT_SID,
+            {"1": otp_code},
+            purpose='wa_otp',
+            expires_in=OTP_EXPIRY_SECONDS
         )
         
-        logger.info(f"WhatsApp OTP sent successfully to {phone_number}. Message SID: {message.sid}")
-        return True, f"OTP sent successfully. SID: {message.sid}"
+        logger.info(f"WhatsApp OTP queued for {phone_number}. Notification: {notification.notification_id}")
+        return True, f"OTP queued for delivery. Notification: {notification.notification_id}"
         
     except Exception as e:
         error_msg = str(e)
-        logger.error(f"Failed to send WhatsApp OTP to {phone_number}: {error_msg}")
+        logger.error(f"Failed to queue WhatsApp OTP to {phone_number}: {error_msg}")
         return False, f"Failed to send WhatsApp OTP: {error_msg}"
 
 
+async def asend_whatsapp_otp(phone_number, otp_code):
+    """send_whatsapp_otp() for async views"""
+    return await sync_to_async(send_whatsapp_otp)(phone_number, otp_code)
+
+
 def validate_afghan_whatsapp_number(phone_number):
     """
     Validate if phone number is a valid Afghanistan WhatsApp number
@@ -2,31 +2,34 @@ from django.conf import settings
 from rest_framework import status
 from rest_framework.response import Response
 from rest_framework.views import APIView
+from asgiref.sync import sync_to_async
 import logging
 
 from .models import WhatsAppOTP
 from .serializers import WhatsAppOTPSerializer, VerifyWhatsAppOTPSerializer
-from .utils import send_whatsapp_otp
+from .utils import asend_whatsapp_otp
+from utils.async_views import AsyncAPIView
 
 logger = logging.getLogger(__name__)
 
-class WhatsAppOTPView(APIView):
-    def post(self, request):
+class WhatsAppOTPView(AsyncAPIView):
+    # Async: the Twilio call does not hold a worker
+    async def post(self, request):
         serializer = WhatsAppOTPSerializer(data=request.data)
-        if serializer.is_valid():
+        if await sync_to_async(serializer.is_valid)():
             # Get the formatted phone number (E.164 format: +93XXXXXXXXX)
             phone_number = serializer.validated_data['phone_number']
             
             try:
-                otp_instance = WhatsAppOTP.objects.get(phone_number=phone_number)
+                otp_instance = await WhatsAppOTP.objects.aget(phone_number=phone_number)
                 otp_instance.otp_code = '' # Reset OTP to trigger generation
                 otp_instance.expires_at = None # Reset expiry to trigger generation
-                otp_instance.save()
+                await otp_instance.asave()
             except WhatsAppOTP.DoesNotExist:
-                otp_instance = WhatsAppOTP.objects.create(phone_number=phone_number)
+                otp_instance = await WhatsAppOTP.objects.acreate(phone_number=phone_number)
 
             # Send WhatsApp OTP using utility function
-            success, result = send_whatsapp_otp(phone_number, otp_instance.otp_code)
+            success, result = await asend_whatsapp_otp(phone_number, otp_instance.otp_code)
             
             if success:
                 return Response({
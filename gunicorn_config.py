@@ -8,7 +8,11 @@ backlog = 2048
 
 # Worker processes
 workers = multiprocessing.cpu_count() * 2 + 1
-worker_class = "sync"
+# Serve amu_pay.asgi:application. Async views (AI chat, OTP sends, feedback)
+# wait on Gemini/SMTP/Twilio on the event loop instead of holding a worker;
+# sync views run in the worker's thread pool.
+# GUNICORN_WORKER_CLASS=sync with amu_pay.wsgi:application restores the old setup.
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "uvicorn.workers.UvicornWorker")
 worker_connections = 1000
 timeout = 120
 keepalive = 5
@@ -99,9 +99,17 @@ fi
 echo "Setting up systemd service..."
 if [ -f amu_pay.service ]; then
     sudo cp amu_pay.service /etc/systemd/system/
+    # Background workers; each starts and restarts along with amu_pay
+    WORKERS="amu_pay-outbound amu_pay-fanout amu_pay-images"
+    for worker in $WORKERS; do
+        sudo cp "$worker.service" /etc/systemd/system/
+    done
     sudo systemctl daemon-reload
+    for worker in $WORKERS; do
+        sudo systemctl enable "$worker"
+    done
     echo "Systemd service installed. Enable with: sudo systemctl enable amu_pay"
-    echo "Start with: sudo systemctl start amu_pay"
+    echo "Start with: sudo systemctl start amu_pay (starts the workers too: $WORKERS)"
 else
     echo "Warning: amu_pay.service not found."
 fi